@@ -0,0 +1,382 @@
+"""
+Archivering van oude analyses maandpartities
+Partities ouder dan ARCHIVE_AFTER_MONTHS worden als Parquet (zstd) plus een
+foto manifest weggeschreven, losgekoppeld (DETACH) en verwijderd. De
+gearchiveerde maanden blijven leesbaar via read_archived_analyses
+(GET /api/archive/analyses); de dagelijkse rollup houdt hun statistieken.
+
+Gebruik:
+    python analysis_archive.py partitions        # maak komende maandpartities aan
+    python analysis_archive.py run [--months N]  # archiveer partities ouder dan N maanden
+    python analysis_archive.py list              # toon gearchiveerde maanden
+
+Vereist pyarrow (alleen voor archiveren en lezen, niet voor de API zelf).
+"""
+
+import json
+import os
+import sys
+from datetime import date, datetime
+from pathlib import Path
+from psycopg2.extensions import cursor as tuple_cursor
+from dotenv import load_dotenv
+
+from database import get_db_connection
+from migrations import (get_connection, is_partitioned, list_partitions, ensure_partitions,
+                        month_start, add_months)
+
+load_dotenv()
+
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR", "data/archive"))
+ARCHIVE_AFTER_MONTHS = int(os.getenv("ARCHIVE_AFTER_MONTHS", "12"))
+
+# Rijen per Parquet row group / fetch uit de server-side cursor
+ARCHIVE_BATCH_ROWS = 10000
+
+# Maximaal zo lang wachten op de lock voor DETACH (blokkeert anders analyses)
+ARCHIVE_LOCK_TIMEOUT = os.getenv("ARCHIVE_LOCK_TIMEOUT", "5s")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.dataset
+    except ImportError:
+        raise RuntimeError("pyarrow is niet geïnstalleerd (pip install pyarrow)")
+    return pyarrow
+
+
+# ========================================
+# PARTITIE ONDERHOUD
+# ========================================
+
+def maintain_partitions():
+    """
+    Maak de maandpartities voor de komende maanden aan (idempotent)
+
+    Wordt bij startup aangeroepen; doet niets zolang analyses nog niet
+    gepartitioneerd is (migratie 10).
+
+    Returns:
+        List van aangemaakte partitie namen
+    """
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cursor:
+            if not is_partitioned(cursor):
+                return []
+            created = ensure_partitions(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    if created:
+        print(f"🗓️ Analyses partities aangemaakt: {', '.join(created)}")
+    return created
+
+
+# ========================================
+# ARCHIVEREN
+# ========================================
+
+def _arrow_type(pa, type_code):
+    """PostgreSQL type OID -> Arrow type (onbekende types als string)"""
+    return {
+        16: pa.bool_(),
+        20: pa.int64(), 21: pa.int32(), 23: pa.int32(),
+        700: pa.float64(), 701: pa.float64(), 1700: pa.float64(),
+        1082: pa.date32(),
+        1114: pa.timestamp("us"),
+        1184: pa.timestamp("us", tz="UTC"),
+        1009: pa.list_(pa.string()),
+    }.get(type_code, pa.string())
+
+
+def _arrow_value(value, arrow_type, pa):
+    if value is None:
+        return None
+    if arrow_type == pa.float64():
+        return float(value)
+    if arrow_type == pa.string() and not isinstance(value, str):
+        # jsonb (metadata) en overige types als tekst
+        return json.dumps(value, default=str) if isinstance(value, (dict, list)) else str(value)
+    return value
+
+
+def _image_manifest(images):
+    """Manifest van de foto's van een partitie (bestaan + grootte, foto's blijven staan)"""
+    entries = []
+    for analysis_id, image_path in images:
+        path = Path(image_path.replace("\\", "/")) if image_path else None
+        exists = bool(path) and path.is_file()
+        entries.append({
+            "id": analysis_id,
+            "image_path": image_path,
+            "exists": exists,
+            "size_bytes": path.stat().st_size if exists else None
+        })
+    return entries
+
+
+def archive_partition(conn, name, range_start, range_end):
+    """
+    Archiveer een maandpartitie: Parquet + manifest, DETACH, registreren, DROP
+
+    Alles in een transactie met een SHARE lock op de partitie, zodat er tijdens
+    het schrijven geen correcties in die maand bijkomen. Mislukt iets, dan blijft
+    de partitie gewoon staan en wordt hij bij de volgende run opnieuw gedaan.
+
+    Args:
+        conn: Database connectie (autocommit uit, buiten de pool)
+        name: Partitie naam (analyses_pYYYY_MM)
+        range_start: Eerste dag van de maand
+        range_end: Eerste dag van de volgende maand
+
+    Returns:
+        Dict met partition_name, parquet_path, manifest_path en row_count
+    """
+    pa = _require_pyarrow()
+    import pyarrow.parquet as pq
+
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    parquet_path = ARCHIVE_DIR / f"{name}.parquet"
+    manifest_path = ARCHIVE_DIR / f"{name}.manifest.json"
+    tmp_path = parquet_path.with_suffix(".parquet.tmp")
+
+    row_count = 0
+    images = []
+
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(f"LOCK TABLE {name} IN SHARE MODE")
+
+        rows = conn.cursor(name=f"archive_{name}", cursor_factory=tuple_cursor)
+        rows.itersize = ARCHIVE_BATCH_ROWS
+        rows.execute(f"SELECT * FROM {name} ORDER BY timestamp, id")
+
+        writer = None
+        try:
+            while True:
+                batch = rows.fetchmany(ARCHIVE_BATCH_ROWS)
+                if not batch:
+                    break
+
+                columns = [column.name for column in rows.description]
+                if writer is None:
+                    schema = pa.schema([(column.name, _arrow_type(pa, column.type_code))
+                                        for column in rows.description])
+                    writer = pq.ParquetWriter(tmp_path, schema, compression="zstd")
+
+                arrays = [
+                    pa.array([_arrow_value(row[index], field.type, pa) for row in batch], type=field.type)
+                    for index, field in enumerate(schema)
+                ]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+
+                id_index, image_index = columns.index("id"), columns.index("image_path")
+                images.extend((row[id_index], row[image_index]) for row in batch)
+                row_count += len(batch)
+        finally:
+            if writer is not None:
+                writer.close()
+            rows.close()
+
+        if row_count:
+            tmp_path.replace(parquet_path)
+        manifest_path.write_text(json.dumps({
+            "partition": name,
+            "range_start": range_start.isoformat(),
+            "range_end": range_end.isoformat(),
+            "row_count": row_count,
+            "archived_at": datetime.now().isoformat(),
+            "images": _image_manifest(images)
+        }, indent=2), encoding="utf-8")
+
+        with conn.cursor() as cursor:
+            cursor.execute("SET LOCAL lock_timeout = %s", (ARCHIVE_LOCK_TIMEOUT,))
+            # DETACH vuurt geen row triggers: de rollup houdt de statistieken van deze maand
+            cursor.execute(f"ALTER TABLE analyses DETACH PARTITION {name}")
+            cursor.execute("""
+                INSERT INTO analyses_archive
+                (partition_name, range_start, range_end, parquet_path, manifest_path, row_count)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                ON CONFLICT (partition_name) DO UPDATE SET
+                    parquet_path = EXCLUDED.parquet_path,
+                    manifest_path = EXCLUDED.manifest_path,
+                    row_count = EXCLUDED.row_count,
+                    archived_at = CURRENT_TIMESTAMP
+            """, (name, range_start, range_end,
+                  str(parquet_path) if row_count else "", str(manifest_path), row_count))
+            cursor.execute(f"DROP TABLE {name}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    print(f"📦 {name}: {row_count} analyses gearchiveerd naar {parquet_path}")
+    return {
+        "partition_name": name,
+        "parquet_path": str(parquet_path) if row_count else None,
+        "manifest_path": str(manifest_path),
+        "row_count": row_count
+    }
+
+
+def archive_old_partitions(months=ARCHIVE_AFTER_MONTHS):
+    """
+    Archiveer alle maandpartities die volledig ouder zijn dan `months` maanden
+
+    Returns:
+        List van archive_partition resultaten
+    """
+    cutoff = add_months(month_start(date.today()), -months)
+    conn = get_connection()
+    archived = []
+
+    try:
+        with conn.cursor() as cursor:
+            if not is_partitioned(cursor):
+                print("⚠️ analyses is niet gepartitioneerd (draai eerst migratie 10)")
+                return []
+            partitions = list_partitions(cursor)
+        conn.commit()
+
+        for name in partitions:
+            range_start = datetime.strptime(name[len("analyses_p"):], "%Y_%m").date()
+            range_end = add_months(range_start, 1)
+            if range_end > cutoff:
+                continue
+            archived.append(archive_partition(conn, name, range_start, range_end))
+    finally:
+        conn.close()
+
+    return archived
+
+
+# ========================================
+# ARCHIEF LEZEN
+# ========================================
+
+def list_archives(start=None, end=None):
+    """
+    Gearchiveerde maanden (uit analyses_archive), optioneel overlappend met [start, end)
+
+    Returns:
+        List van dicts, nieuwste maand eerst
+    """
+    conditions = []
+    params = []
+
+    if start:
+        conditions.append("range_end > %s")
+        params.append(start)
+
+    if end:
+        conditions.append("range_start < %s")
+        params.append(end)
+
+    query = "SELECT * FROM analyses_archive"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY range_start DESC"
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(query, params)
+    archives = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+
+    return archives
+
+
+def read_archived_analyses(start=None, end=None, workplace_id=None, model_version=None,
+                           status=None, limit=1000):
+    """
+    Lees gearchiveerde analyses uit de Parquet bestanden
+
+    Alleen de bestanden van maanden die overlappen met [start, end) worden
+    geopend; filters worden als Arrow expressies naar de scan gepusht.
+
+    Args:
+        start: Vanaf datum/tijd (optioneel)
+        end: Tot datum/tijd (optioneel)
+        workplace_id: Filter op werkplek (optioneel)
+        model_version: Filter op model versie (optioneel)
+        status: Filter op OK/NOK (optioneel)
+        limit: Maximum aantal resultaten
+
+    Returns:
+        List van analyse dicts (nieuwste eerst) met frontend veldnamen
+    """
+    pa = _require_pyarrow()
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    # Datums als begin van de dag (timestamp kolom)
+    start, end = [datetime.combine(value, datetime.min.time())
+                  if isinstance(value, date) and not isinstance(value, datetime) else value
+                  for value in (start, end)]
+
+    files = [a['parquet_path'] for a in list_archives(start, end)
+             if a['parquet_path'] and Path(a['parquet_path']).is_file()]
+    if not files:
+        return []
+
+    # Oudere archieven kunnen minder kolommen hebben
+    schema = pa.unify_schemas([pq.read_schema(path) for path in files])
+    dataset = ds.dataset(files, schema=schema, format="parquet")
+
+    expression = None
+    for condition in [
+        ds.field("timestamp") >= pa.scalar(start, type=schema.field("timestamp").type) if start else None,
+        ds.field("timestamp") < pa.scalar(end, type=schema.field("timestamp").type) if end else None,
+        ds.field("workplace_id") == workplace_id if workplace_id is not None else None,
+        ds.field("model_version") == model_version if model_version else None,
+        ds.field("result") == status if status else None,
+    ]:
+        if condition is not None:
+            expression = condition if expression is None else expression & condition
+
+    table = dataset.to_table(filter=expression)
+    table = table.sort_by([("timestamp", "descending"), ("id", "descending")]).slice(0, limit)
+
+    analyses = []
+    for row in table.to_pylist():
+        # Zelfde aliassen als HISTORY_COLUMNS in database.py
+        row['created_at'] = row.get('timestamp')
+        row['status'] = row.get('result')
+        row['predicted_label'] = row['predicted_class'] = row.get('model_prediction')
+        row['corrected_label'] = row.get('user_correction')
+        if isinstance(row.get('metadata'), str):
+            row['metadata'] = json.loads(row['metadata'])
+        analyses.append(row)
+    return analyses
+
+
+if __name__ == "__main__":
+    # Fix Windows console encoding
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+
+    if command == "partitions":
+        created = maintain_partitions()
+        print(f"✅ {len(created)} partities aangemaakt")
+    elif command == "run":
+        months = ARCHIVE_AFTER_MONTHS
+        if "--months" in sys.argv:
+            months = int(sys.argv[sys.argv.index("--months") + 1])
+        archived = archive_old_partitions(months)
+        print(f"✅ {len(archived)} partities gearchiveerd")
+    elif command == "list":
+        for archive in list_archives():
+            print(f"{archive['partition_name']}  {archive['row_count']:>8} rijen  {archive['parquet_path'] or '-'}")
+    else:
+        print(__doc__)
+        sys.exit(1)
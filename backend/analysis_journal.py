@@ -0,0 +1,389 @@
+"""
+Write-behind persistence voor analyses
+Inspecties schrijven hun resultaat naar een lokaal append-only journal
+(fsync'd, per segment geroteerd) en krijgen direct een voorlopige ID terug.
+Een achtergrond flusher slaat de journal records batch-gewijs op in PostgreSQL.
+
+Na een crash worden niet-opgeslagen records bij startup opnieuw afgespeeld;
+bij een nette shutdown wordt het journal eerst leeggemaakt (drain).
+
+Een database die even weg is (verbinding, timeout) wordt met backoff
+opnieuw geprobeerd. Bij een permanente fout (constraint, ongeldige data)
+wordt de batch per record opgeslagen; records die zelf blijven falen gaan
+naar quarantine.jsonl zodat ze de rest van het journal niet blokkeren.
+"""
+
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime
+from pathlib import Path
+from dotenv import load_dotenv
+
+from database import find_analyses_by_provisional_id
+from analysis_writer import analysis_writer, PERMANENT_ERRORS
+
+load_dotenv()
+
+JOURNAL_DIR = Path(os.getenv("JOURNAL_DIR", "data/journal"))
+JOURNAL_SEGMENT_BYTES = int(os.getenv("JOURNAL_SEGMENT_BYTES", str(4 * 1024 * 1024)))
+JOURNAL_FLUSH_INTERVAL = float(os.getenv("JOURNAL_FLUSH_INTERVAL", "0.2"))
+JOURNAL_BATCH_SIZE = int(os.getenv("JOURNAL_BATCH_SIZE", "100"))
+
+# Maximaal aantal opgeloste voorlopige IDs dat in geheugen bewaard wordt
+RESOLVED_CACHE_SIZE = 10000
+
+# Maximale wachttijd tussen retries als de database niet bereikbaar is
+MAX_RETRY_DELAY = 30.0
+
+# Records die niet op te slaan zijn (per regel: provisional_id, data, error)
+QUARANTINE_NAME = "quarantine.jsonl"
+
+
+class AnalysisJournal:
+    """Append-only journal met achtergrond flusher naar de analyses tabel"""
+
+    def __init__(self, directory=JOURNAL_DIR, segment_bytes=JOURNAL_SEGMENT_BYTES,
+                 flush_interval=JOURNAL_FLUSH_INTERVAL, batch_size=JOURNAL_BATCH_SIZE):
+        self.directory = Path(directory)
+        self.segment_bytes = segment_bytes
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._pending = deque()          # (provisional_id, data, segment_no)
+        self._segment_outstanding = {}   # segment_no -> aantal nog niet opgeslagen records
+        self._resolved = OrderedDict()   # provisional_id -> analysis_id
+        self._quarantined = set()        # provisional_ids in quarantine.jsonl
+        self._segment_no = 0
+        self._segment_file = None
+        self._segment_size = 0
+        self._thread = None
+        self._stopping = False
+
+    # ----------------------------------------
+    # Segment beheer
+    # ----------------------------------------
+
+    def _segment_path(self, segment_no):
+        return self.directory / f"segment_{segment_no:08d}.log"
+
+    def _existing_segments(self):
+        segments = []
+        for path in self.directory.glob("segment_*.log"):
+            try:
+                segments.append(int(path.stem.split("_")[1]))
+            except (IndexError, ValueError):
+                continue
+        return sorted(segments)
+
+    def _open_new_segment(self):
+        """Open een nieuw actief segment (lock moet vastgehouden worden)"""
+        if self._segment_file is not None:
+            self._segment_file.close()
+            # Een gesloten segment zonder openstaande records kan direct weg
+            if not self._segment_outstanding.get(self._segment_no):
+                self._remove_segment(self._segment_no)
+
+        self._segment_no += 1
+        self._segment_file = open(self._segment_path(self._segment_no), "ab")
+        self._segment_size = 0
+        self._segment_outstanding[self._segment_no] = 0
+
+        # Directory entry van het nieuwe segment ook duurzaam maken
+        if hasattr(os, "O_DIRECTORY"):
+            dir_fd = os.open(str(self.directory), os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+
+    def _remove_segment(self, segment_no):
+        self._segment_outstanding.pop(segment_no, None)
+        try:
+            self._segment_path(segment_no).unlink()
+        except FileNotFoundError:
+            pass
+
+    # ----------------------------------------
+    # Publieke API
+    # ----------------------------------------
+
+    def start(self):
+        """Speel achtergebleven segmenten af en start de flusher thread"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        with self._lock:
+            self._replay()
+            self._open_new_segment()
+            self._stopping = False
+
+        self._thread = threading.Thread(target=self._run, name="analysis-journal-flusher", daemon=True)
+        self._thread.start()
+        print(f"✅ Analysis journal gestart ({self.directory}, {len(self._pending)} records af te spelen)")
+
+    def stop(self, timeout=30.0):
+        """
+        Stop de flusher na het leegmaken van het journal (graceful shutdown)
+
+        Args:
+            timeout: Maximaal aantal seconden om te wachten op de drain
+        """
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify_all()
+
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+        with self._lock:
+            if self._pending:
+                print(f"⚠️ Analysis journal gestopt met {len(self._pending)} niet-opgeslagen records (worden bij volgende start afgespeeld)")
+            if self._segment_file is not None:
+                self._segment_file.close()
+                self._segment_file = None
+                if not self._segment_outstanding.get(self._segment_no):
+                    self._remove_segment(self._segment_no)
+
+    def submit(self, data, image_bytes=None):
+        """
+        Schrijf analyse naar het journal en geef direct een voorlopige ID terug
+
+        Args:
+            data: Dict met analyse gegevens (zelfde formaat als save_analysis)
+            image_bytes: Optioneel - gecodeerde JPEG bytes voor data['image_path']
+
+        Returns:
+            Voorlopige ID (str) die later naar de echte analysis_id resolved
+        """
+        if image_bytes is not None and data.get('image_path'):
+            with open(data['image_path'], "wb") as f:
+                f.write(image_bytes)
+
+        provisional_id = uuid.uuid4().hex
+        data = dict(data, provisional_id=provisional_id)
+        line = (json.dumps({"provisional_id": provisional_id, "data": data}, default=str) + "\n").encode("utf-8")
+
+        with self._lock:
+            if self._segment_file is None:
+                raise RuntimeError("Analysis journal is niet gestart")
+
+            if self._segment_size and self._segment_size + len(line) > self.segment_bytes:
+                self._open_new_segment()
+
+            self._segment_file.write(line)
+            self._segment_file.flush()
+            os.fsync(self._segment_file.fileno())
+            self._segment_size += len(line)
+
+            self._pending.append((provisional_id, data, self._segment_no))
+            self._segment_outstanding[self._segment_no] += 1
+
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.notify()
+
+        return provisional_id
+
+    def resolve(self, provisional_id):
+        """
+        Resolve een voorlopige ID naar de echte analysis_id
+
+        Returns:
+            Tuple (status, analysis_id) met status 'saved', 'pending',
+            'quarantined' of 'unknown'
+        """
+        with self._lock:
+            if provisional_id in self._resolved:
+                return 'saved', self._resolved[provisional_id]
+            if provisional_id in self._quarantined:
+                return 'quarantined', None
+            if any(entry[0] == provisional_id for entry in self._pending):
+                return 'pending', None
+
+        # Ouder dan de in-memory cache: zoek op in de database
+        found = find_analyses_by_provisional_id([provisional_id])
+        if provisional_id in found:
+            return 'saved', found[provisional_id]
+        return 'unknown', None
+
+    def stats(self):
+        """Huidige journal status (voor monitoring)"""
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "quarantined": len(self._quarantined),
+                "segments": len(self._segment_outstanding),
+                "active_segment": self._segment_no,
+                "active_segment_bytes": self._segment_size
+            }
+
+    # ----------------------------------------
+    # Replay en flusher
+    # ----------------------------------------
+
+    def _replay(self):
+        """Lees achtergebleven segmenten na een crash (lock moet vastgehouden worden)"""
+        self._load_quarantined()
+        segments = self._existing_segments()
+        if not segments:
+            return
+
+        records = []
+        for segment_no in segments:
+            count = 0
+            with open(self._segment_path(segment_no), "rb") as f:
+                for raw in f:
+                    try:
+                        record = json.loads(raw.decode("utf-8"))
+                    except (UnicodeDecodeError, json.JSONDecodeError):
+                        # Half geschreven laatste regel (crash tijdens append)
+                        continue
+                    records.append((record["provisional_id"], record["data"], segment_no))
+                    count += 1
+            self._segment_outstanding[segment_no] = count
+
+        self._segment_no = segments[-1]
+
+        # Records die al in de database staan (crash na INSERT, voor opruimen) overslaan
+        try:
+            already_saved = find_analyses_by_provisional_id([r[0] for r in records])
+        except Exception as e:
+            print(f"⚠️ Journal replay: kon opgeslagen records niet controleren ({e}), alles wordt opnieuw geprobeerd")
+            already_saved = {}
+
+        for provisional_id, data, segment_no in records:
+            if provisional_id in already_saved:
+                self._mark_saved(provisional_id, already_saved[provisional_id], segment_no)
+            elif provisional_id in self._quarantined:
+                # Crash na quarantaine, voor het opruimen van het segment
+                self._release(segment_no)
+            else:
+                self._pending.append((provisional_id, data, segment_no))
+
+        for segment_no in segments:
+            if not self._segment_outstanding.get(segment_no):
+                self._remove_segment(segment_no)
+
+        print(f"🔁 Journal replay: {len(records)} records gevonden, {len(already_saved)} al opgeslagen")
+
+    def _mark_saved(self, provisional_id, analysis_id, segment_no):
+        """Registreer opgeslagen record (lock moet vastgehouden worden)"""
+        self._resolved[provisional_id] = analysis_id
+        while len(self._resolved) > RESOLVED_CACHE_SIZE:
+            self._resolved.popitem(last=False)
+        self._release(segment_no)
+
+    def _release(self, segment_no):
+        """Record uit segment is afgehandeld (lock moet vastgehouden worden)"""
+        self._segment_outstanding[segment_no] -= 1
+        if self._segment_outstanding[segment_no] <= 0 and segment_no != self._segment_no:
+            self._remove_segment(segment_no)
+
+    # ----------------------------------------
+    # Quarantaine
+    # ----------------------------------------
+
+    def _load_quarantined(self):
+        """Lees de provisional_ids uit quarantine.jsonl (lock moet vastgehouden worden)"""
+        path = self.directory / QUARANTINE_NAME
+        if not path.exists():
+            return
+        with open(path, "rb") as f:
+            for raw in f:
+                try:
+                    self._quarantined.add(json.loads(raw.decode("utf-8"))["provisional_id"])
+                except (UnicodeDecodeError, json.JSONDecodeError, KeyError):
+                    continue
+
+    def _quarantine(self, provisional_id, data, segment_no, error):
+        """Zet een record dat niet op te slaan is apart en haal het uit de queue"""
+        line = (json.dumps({
+            "provisional_id": provisional_id,
+            "data": data,
+            "error": f"{type(error).__name__}: {error}",
+            "quarantined_at": datetime.now().isoformat()
+        }, default=str) + "\n").encode("utf-8")
+
+        with open(self.directory / QUARANTINE_NAME, "ab") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+        with self._lock:
+            self._pending.popleft()
+            self._quarantined.add(provisional_id)
+            self._release(segment_no)
+        print(f"🚫 Journal record {provisional_id} in quarantaine: {error}")
+
+    def _flush_one_by_one(self, batch):
+        """
+        Sla een batch met een permanente fout per record op
+
+        Records die zelf permanent falen gaan naar de quarantaine, de rest
+        wordt gewoon opgeslagen.
+
+        Returns:
+            None, of de tijdelijke fout waarop gestopt is (rest blijft pending)
+        """
+        for provisional_id, data, segment_no in batch:
+            try:
+                analysis_id = analysis_writer.write_batch([data])[0]
+            except PERMANENT_ERRORS as e:
+                self._quarantine(provisional_id, data, segment_no, e)
+                continue
+            except Exception as e:
+                return e
+
+            with self._lock:
+                self._pending.popleft()
+                self._mark_saved(provisional_id, analysis_id, segment_no)
+        return None
+
+    def _run(self):
+        retry_delay = self.flush_interval
+
+        while True:
+            with self._lock:
+                if not self._pending and not self._stopping:
+                    self._wakeup.wait(self.flush_interval)
+                if not self._pending:
+                    if self._stopping:
+                        return
+                    continue
+                batch = [self._pending[i] for i in range(min(self.batch_size, len(self._pending)))]
+
+            try:
+                analysis_ids = analysis_writer.write_batch([data for _, data, _ in batch])
+            except Exception as e:
+                if isinstance(e, PERMANENT_ERRORS):
+                    print(f"⚠️ Journal flush: permanente fout in batch van {len(batch)} ({e}), per record opslaan")
+                    e = self._flush_one_by_one(batch)
+                    if e is None:
+                        retry_delay = self.flush_interval
+                        continue
+
+                print(f"⚠️ Journal flush mislukt ({len(batch)} records): {e} - retry over {retry_delay:.1f}s")
+                with self._lock:
+                    if self._stopping:
+                        # Bij shutdown niet eindeloos blijven proberen: replay bij volgende start
+                        return
+                    self._wakeup.wait(retry_delay)
+                retry_delay = min(retry_delay * 2, MAX_RETRY_DELAY)
+                continue
+
+            retry_delay = self.flush_interval
+            with self._lock:
+                for (provisional_id, _, segment_no), analysis_id in zip(batch, analysis_ids):
+                    self._pending.popleft()
+                    self._mark_saved(provisional_id, analysis_id, segment_no)
+
+                # Actief segment volledig opgeslagen en groot genoeg: roteren
+                if not self._segment_outstanding.get(self._segment_no) and self._segment_size >= self.segment_bytes:
+                    self._open_new_segment()
+
+
+# Globale journal instantie voor de API
+analysis_journal = AnalysisJournal()
@@ -0,0 +1,265 @@
+"""
+Batched analysis writer met group commit
+Buffert analyses een paar milliseconden (of tot N rijen) en schrijft ze in
+een enkele transactie weg. Grote offline batches gaan via COPY. Faalt een
+group commit op één rij (constraint, ongeldige data), dan worden de rijen
+los opgeslagen en krijgt alleen die caller de fout.
+
+Gebruik:
+    analysis_id = analysis_writer.save(data)          # live pad, blokkeert tot commit
+    future = analysis_writer.submit(data)             # live pad, asynchroon
+    analysis_ids = analysis_writer.write_batch(items) # bulk / offline jobs
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+import psycopg2
+from dotenv import load_dotenv
+
+from database import save_analyses_batch, copy_analyses
+
+load_dotenv()
+
+# Group commit: wacht maximaal zoveel ms op extra analyses voor een batch
+WRITER_MAX_DELAY_MS = float(os.getenv("WRITER_MAX_DELAY_MS", "5"))
+WRITER_MAX_BATCH = int(os.getenv("WRITER_MAX_BATCH", "200"))
+
+# Vanaf dit aantal rijen wordt COPY gebruikt i.p.v. multi-row INSERT
+WRITER_COPY_THRESHOLD = int(os.getenv("WRITER_COPY_THRESHOLD", "1000"))
+
+# Aantal recente batches waarover latency percentielen berekend worden
+METRICS_WINDOW = 1000
+
+# Fouten die bij opnieuw proberen van hetzelfde record niet verdwijnen.
+# ProgrammingError (bijv. ontbrekende kolom voor een migratie) telt bewust
+# niet mee: dat raakt elk record en moet na de migratie alsnog lukken.
+PERMANENT_ERRORS = (psycopg2.DataError, psycopg2.IntegrityError, TypeError, ValueError)
+
+
+class AnalysisBatchWriter:
+    """Verzamelt analyses van meerdere callers en commit ze per batch"""
+
+    def __init__(self, max_delay_ms=WRITER_MAX_DELAY_MS, max_batch=WRITER_MAX_BATCH,
+                 copy_threshold=WRITER_COPY_THRESHOLD):
+        self.max_delay = max_delay_ms / 1000.0
+        self.max_batch = max_batch
+        self.copy_threshold = copy_threshold
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._queue = deque()  # (data, Future)
+        self._thread = None
+        self._stopping = False
+
+        # Metrics
+        self._metrics_lock = threading.Lock()
+        self._batch_sizes = deque(maxlen=METRICS_WINDOW)
+        self._commit_latencies = deque(maxlen=METRICS_WINDOW)
+        self._total_batches = 0
+        self._total_rows = 0
+        self._total_errors = 0
+        self._copy_batches = 0
+
+    # ----------------------------------------
+    # Publieke API
+    # ----------------------------------------
+
+    def submit(self, data):
+        """
+        Zet analyse in de group commit queue
+
+        Args:
+            data: Dict met analyse gegevens (zelfde formaat als save_analysis)
+
+        Returns:
+            concurrent.futures.Future die resolved naar de analysis_id
+        """
+        future = Future()
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping = False
+                self._thread = threading.Thread(target=self._run, name="analysis-batch-writer", daemon=True)
+                self._thread.start()
+            self._queue.append((data, future))
+            if len(self._queue) >= self.max_batch:
+                self._wakeup.notify()
+            elif len(self._queue) == 1:
+                # Eerste item start het batch window
+                self._wakeup.notify()
+        return future
+
+    def save(self, data, timeout=30.0):
+        """
+        Sla analyse op via group commit en wacht op de analysis_id
+
+        Args:
+            data: Dict met analyse gegevens
+            timeout: Maximaal aantal seconden wachten op commit
+
+        Returns:
+            ID van opgeslagen analyse
+        """
+        return self.submit(data).result(timeout)
+
+    def write_batch(self, items):
+        """
+        Schrijf een complete batch direct weg (bulk en offline jobs)
+
+        Batches vanaf copy_threshold rijen gaan via COPY, kleinere via een
+        multi-row INSERT. Elke batch is een enkele transactie.
+
+        Args:
+            items: List van analyse dicts
+
+        Returns:
+            List van analysis IDs in dezelfde volgorde als items
+        """
+        if not items:
+            return []
+
+        use_copy = len(items) >= self.copy_threshold
+        start = time.perf_counter()
+        try:
+            analysis_ids = copy_analyses(items) if use_copy else save_analyses_batch(items)
+        except Exception:
+            with self._metrics_lock:
+                self._total_errors += 1
+            raise
+
+        self._record_batch(len(items), time.perf_counter() - start, use_copy)
+        return analysis_ids
+
+    def write_many(self, items, chunk_size=5000):
+        """
+        Schrijf een willekeurig grote lijst analyses weg in chunks
+
+        Args:
+            items: Iterable van analyse dicts
+            chunk_size: Aantal rijen per transactie
+
+        Returns:
+            List van analysis IDs in dezelfde volgorde als items
+        """
+        analysis_ids = []
+        chunk = []
+        for data in items:
+            chunk.append(data)
+            if len(chunk) >= chunk_size:
+                analysis_ids.extend(self.write_batch(chunk))
+                chunk = []
+        if chunk:
+            analysis_ids.extend(self.write_batch(chunk))
+        return analysis_ids
+
+    def stop(self, timeout=10.0):
+        """Schrijf resterende analyses weg en stop de writer thread"""
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def metrics(self):
+        """Batch grootte en commit latency metrics"""
+        with self._metrics_lock:
+            sizes = list(self._batch_sizes)
+            latencies = sorted(self._commit_latencies)
+            total_batches = self._total_batches
+            total_rows = self._total_rows
+            total_errors = self._total_errors
+            copy_batches = self._copy_batches
+
+        def percentile(values, pct):
+            if not values:
+                return 0.0
+            index = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+            return round(values[index] * 1000, 2)
+
+        with self._lock:
+            queued = len(self._queue)
+
+        return {
+            "total_batches": total_batches,
+            "total_rows": total_rows,
+            "total_errors": total_errors,
+            "copy_batches": copy_batches,
+            "queued": queued,
+            "batch_size": {
+                "avg": round(sum(sizes) / len(sizes), 2) if sizes else 0,
+                "max": max(sizes) if sizes else 0,
+                "last": sizes[-1] if sizes else 0
+            },
+            "commit_latency_ms": {
+                "avg": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "max": percentile(latencies, 100)
+            }
+        }
+
+    # ----------------------------------------
+    # Intern
+    # ----------------------------------------
+
+    def _record_batch(self, size, latency, used_copy):
+        with self._metrics_lock:
+            self._batch_sizes.append(size)
+            self._commit_latencies.append(latency)
+            self._total_batches += 1
+            self._total_rows += size
+            if used_copy:
+                self._copy_batches += 1
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._queue and not self._stopping:
+                    self._wakeup.wait()
+                if not self._queue and self._stopping:
+                    return
+
+                # Batch window: wacht kort op meer analyses tenzij de batch al vol is
+                deadline = time.monotonic() + self.max_delay
+                while len(self._queue) < self.max_batch and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._wakeup.wait(remaining)
+
+                batch = []
+                while self._queue and len(batch) < self.max_batch:
+                    batch.append(self._queue.popleft())
+
+            try:
+                analysis_ids = self.write_batch([data for data, _ in batch])
+            except PERMANENT_ERRORS as e:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                    continue
+                print(f"⚠️ Analysis writer batch mislukt ({len(batch)} rijen): {e} - per rij opslaan")
+                self._write_one_by_one(batch)
+                continue
+            except Exception as e:
+                print(f"⚠️ Analysis writer batch mislukt ({len(batch)} rijen): {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), analysis_id in zip(batch, analysis_ids):
+                future.set_result(analysis_id)
+
+    def _write_one_by_one(self, batch):
+        """Sla een mislukte group commit per rij op; alleen de foute rij faalt"""
+        for data, future in batch:
+            try:
+                future.set_result(self.write_batch([data])[0])
+            except Exception as e:
+                future.set_exception(e)
+
+
+# Globale writer instantie voor API en offline jobs
+analysis_writer = AnalysisBatchWriter()
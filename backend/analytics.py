@@ -0,0 +1,330 @@
+"""
+Analytics export en lokale columnar queries
+Schrijft analyses (met platgeslagen metadata, detectie tellingen en
+correctie notities) als Parquet dataset, gepartitioneerd per werkplek en
+maand. Rapportages draaien met DuckDB op die bestanden, zodat zware ad-hoc
+queries niet op de productie PostgreSQL van /api/inspect terechtkomen.
+
+Gebruik:
+    python analytics.py export                   # (her)schrijf data/analytics
+    python analytics.py summary [--group-by G]   # aggregatie per G (zie ANALYTICS_GROUPS)
+
+Vereist pyarrow (export) en duckdb (queries).
+"""
+
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+from pathlib import Path
+from psycopg2.extras import RealDictCursor
+from dotenv import load_dotenv
+
+from migrations import get_connection
+
+load_dotenv()
+
+ANALYTICS_DIR = Path(os.getenv("ANALYTICS_DIR", "data/analytics"))
+
+# Rijen per fetch uit de server-side cursor / per write_dataset aanroep
+ANALYTICS_BATCH_ROWS = 20000
+
+# Kolommen van de Parquet dataset; metadata velden die rapportages gebruiken
+# worden platgeslagen, de rest blijft beschikbaar als metadata_json
+ANALYTICS_COLUMNS = """
+    id, COALESCE(workplace_id, 0) AS workplace_id, to_char(timestamp, 'YYYY-MM') AS month, timestamp,
+    model_version, model_type, device_id,
+    result, model_prediction, user_correction, is_correct,
+    user_correction IS NOT NULL AS reviewed,
+    confidence, processing_time,
+    detected_hamer, detected_schaar, detected_sleutel, total_detections,
+    missing_items,
+    metadata->'correction_notes' #>> '{}' AS correction_notes,
+    metadata->'camera_info'->>'capture_method' AS camera_capture_method,
+    metadata->'camera_info'->>'camera_facing' AS camera_facing,
+    metadata->'camera_info'->>'image_format' AS image_format,
+    CASE WHEN jsonb_typeof(metadata->'camera_info'->'file_size_kb') = 'number'
+         THEN (metadata->'camera_info'->>'file_size_kb')::float8 END AS image_size_kb,
+    COALESCE(metadata->>'exported_for_training' = 'true', FALSE) AS exported_for_training,
+    metadata::text AS metadata_json
+"""
+
+# group_by waarde -> DuckDB expressie
+ANALYTICS_GROUPS = {
+    "day": "CAST(timestamp AS DATE)",
+    "week": "CAST(isoyear(timestamp) AS VARCHAR) || '-' || lpad(CAST(week(timestamp) AS VARCHAR), 2, '0')",
+    "month": "month",
+    "workplace": "workplace_id",
+    "model_version": "model_version",
+    "model_type": "model_type",
+    "device": "device_id",
+    "prediction": "model_prediction",
+}
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+    except ImportError:
+        raise RuntimeError("pyarrow is niet geïnstalleerd (pip install pyarrow)")
+    return pyarrow
+
+
+def _require_duckdb():
+    try:
+        import duckdb
+    except ImportError:
+        raise RuntimeError("duckdb is niet geïnstalleerd (pip install duckdb)")
+    return duckdb
+
+
+def _analytics_schema(pa):
+    return pa.schema([
+        ("id", pa.int64()),
+        ("workplace_id", pa.int32()),
+        ("month", pa.string()),
+        ("timestamp", pa.timestamp("us")),
+        ("model_version", pa.string()),
+        ("model_type", pa.string()),
+        ("device_id", pa.string()),
+        ("result", pa.string()),
+        ("model_prediction", pa.string()),
+        ("user_correction", pa.string()),
+        ("is_correct", pa.bool_()),
+        ("reviewed", pa.bool_()),
+        ("confidence", pa.float64()),
+        ("processing_time", pa.float64()),
+        ("detected_hamer", pa.int32()),
+        ("detected_schaar", pa.int32()),
+        ("detected_sleutel", pa.int32()),
+        ("total_detections", pa.int32()),
+        ("missing_items", pa.list_(pa.string())),
+        ("correction_notes", pa.string()),
+        ("camera_capture_method", pa.string()),
+        ("camera_facing", pa.string()),
+        ("image_format", pa.string()),
+        ("image_size_kb", pa.float64()),
+        ("exported_for_training", pa.bool_()),
+        ("metadata_json", pa.string()),
+    ])
+
+
+# ========================================
+# EXPORT
+# ========================================
+
+def export_analytics_dataset(output_dir=ANALYTICS_DIR):
+    """
+    Schrijf alle analyses als Parquet dataset (hive partities workplace_id/month)
+
+    Leest via een server-side cursor in batches (constant geheugen) op een
+    eigen connectie buiten de pool. De nieuwe dataset wordt naast de oude
+    opgebouwd en pas aan het eind omgewisseld, zodat lopende queries nooit
+    een halve export zien.
+
+    Args:
+        output_dir: Doelmap van de dataset
+
+    Returns:
+        Dict met path, row_count en exported_at
+    """
+    pa = _require_pyarrow()
+    import pyarrow.dataset as ds
+
+    output_dir = Path(output_dir)
+    staging_dir = output_dir.with_name(output_dir.name + ".new")
+    old_dir = output_dir.with_name(output_dir.name + ".old")
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    staging_dir.mkdir(parents=True)
+
+    schema = _analytics_schema(pa)
+    file_options = ds.ParquetFileFormat().make_write_options(compression="zstd")
+    row_count = 0
+
+    conn = get_connection()
+    try:
+        rows = conn.cursor(name="analytics_export", cursor_factory=RealDictCursor)
+        rows.itersize = ANALYTICS_BATCH_ROWS
+        rows.execute(f"SELECT {ANALYTICS_COLUMNS} FROM analyses ORDER BY workplace_id, timestamp")
+
+        batch_index = 0
+        while True:
+            batch = rows.fetchmany(ANALYTICS_BATCH_ROWS)
+            if not batch:
+                break
+
+            ds.write_dataset(
+                pa.Table.from_pylist([dict(row) for row in batch], schema=schema),
+                staging_dir,
+                format="parquet",
+                partitioning=["workplace_id", "month"],
+                partitioning_flavor="hive",
+                basename_template=f"part-{batch_index}-{{i}}.parquet",
+                existing_data_behavior="overwrite_or_ignore",
+                file_options=file_options
+            )
+            batch_index += 1
+            row_count += len(batch)
+        rows.close()
+        conn.commit()
+    except Exception:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    finally:
+        conn.close()
+
+    exported_at = datetime.now().isoformat()
+    (staging_dir / "_export.json").write_text(json.dumps({
+        "row_count": row_count,
+        "exported_at": exported_at
+    }), encoding="utf-8")
+
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if output_dir.exists():
+        output_dir.rename(old_dir)
+    staging_dir.rename(output_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    print(f"📊 Analytics export: {row_count} analyses naar {output_dir}")
+    return {
+        "path": str(output_dir),
+        "row_count": row_count,
+        "exported_at": exported_at
+    }
+
+
+def get_analytics_export_info(output_dir=ANALYTICS_DIR):
+    """Info over de laatste export (_export.json), of None als er nog geen is"""
+    info_path = Path(output_dir) / "_export.json"
+    if not info_path.is_file():
+        return None
+    return json.loads(info_path.read_text(encoding="utf-8"))
+
+
+# ========================================
+# QUERIES (DUCKDB)
+# ========================================
+
+def _analytics_source(output_dir):
+    pattern = (Path(output_dir) / "**" / "*.parquet").as_posix().replace("'", "''")
+    return f"read_parquet('{pattern}', hive_partitioning = true, union_by_name = true)"
+
+
+def analytics_summary(group_by="month", start=None, end=None, workplace_id=None,
+                      model_version=None, output_dir=ANALYTICS_DIR):
+    """
+    Aggregeer de analytics dataset met DuckDB (raakt PostgreSQL niet)
+
+    Args:
+        group_by: Groepering, een van ANALYTICS_GROUPS
+        start: Vanaf datum/tijd (optioneel)
+        end: Tot datum/tijd (optioneel)
+        workplace_id: Filter op werkplek (optioneel)
+        model_version: Filter op model versie (optioneel)
+        output_dir: Map van de dataset
+
+    Returns:
+        Dict met groups (per bucket totalen, OK/NOK, accuracy, confidence,
+        detecties) en missing_items (meest ontbrekende items)
+    """
+    if group_by not in ANALYTICS_GROUPS:
+        raise ValueError(f"Onbekende group_by '{group_by}', kies uit: {', '.join(ANALYTICS_GROUPS)}")
+
+    if get_analytics_export_info(output_dir) is None:
+        return {'groups': [], 'missing_items': [], 'export': None}
+
+    duckdb = _require_duckdb()
+
+    conditions = []
+    params = []
+
+    if start:
+        conditions.append("timestamp >= ?")
+        params.append(start)
+
+    if end:
+        conditions.append("timestamp < ?")
+        params.append(end)
+
+    if workplace_id is not None:
+        conditions.append("workplace_id = ?")
+        params.append(workplace_id)
+
+    if model_version:
+        conditions.append("model_version = ?")
+        params.append(model_version)
+
+    where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+    source = _analytics_source(output_dir)
+
+    con = duckdb.connect()
+    try:
+        groups = con.execute(f"""
+            SELECT
+                {ANALYTICS_GROUPS[group_by]} AS bucket,
+                COUNT(*) AS total,
+                COUNT(*) FILTER (WHERE result = 'OK') AS ok_count,
+                COUNT(*) FILTER (WHERE result = 'NOK') AS nok_count,
+                AVG(confidence) AS avg_confidence,
+                COUNT(*) FILTER (WHERE reviewed) AS reviewed,
+                COUNT(*) FILTER (WHERE reviewed AND is_correct) AS correct,
+                AVG(total_detections) AS avg_detections,
+                AVG(processing_time) AS avg_processing_time
+            FROM {source}
+            {where}
+            GROUP BY bucket
+            ORDER BY bucket
+        """, params).fetchall()
+
+        missing_items = con.execute(f"""
+            SELECT item, COUNT(*) AS count
+            FROM (SELECT unnest(missing_items) AS item FROM {source} {where})
+            GROUP BY item
+            ORDER BY count DESC
+            LIMIT 20
+        """, params).fetchall()
+    finally:
+        con.close()
+
+    return {
+        'groups': [{
+            'bucket': str(bucket) if bucket is not None else None,
+            'total': total,
+            'ok_count': ok_count,
+            'nok_count': nok_count,
+            'avg_confidence': round(avg_confidence, 4) if avg_confidence is not None else None,
+            'reviewed': reviewed,
+            'correct': correct,
+            'accuracy': round(correct / reviewed * 100, 1) if reviewed else None,
+            'avg_detections': round(avg_detections, 2) if avg_detections is not None else None,
+            'avg_processing_time': round(avg_processing_time, 3) if avg_processing_time is not None else None
+        } for bucket, total, ok_count, nok_count, avg_confidence, reviewed, correct,
+              avg_detections, avg_processing_time in groups],
+        'missing_items': [{'item': item, 'count': count} for item, count in missing_items],
+        'export': get_analytics_export_info(output_dir)
+    }
+
+
+if __name__ == "__main__":
+    # Fix Windows console encoding
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "summary"
+
+    if command == "export":
+        result = export_analytics_dataset()
+        print(f"✅ {result['row_count']} analyses geëxporteerd naar {result['path']}")
+    elif command == "summary":
+        group_by = "month"
+        if "--group-by" in sys.argv:
+            group_by = sys.argv[sys.argv.index("--group-by") + 1]
+        summary = analytics_summary(group_by)
+        for group in summary['groups']:
+            print(f"{group['bucket'] or '-':<20} {group['total']:>8}  NOK {group['nok_count']:>6}  "
+                  f"accuracy {group['accuracy'] if group['accuracy'] is not None else '-'}")
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -0,0 +1,89 @@
+"""
+Werkplek cache invalidatie tussen processen via PostgreSQL LISTEN/NOTIFY
+workplace_cache (database.py) is per proces. Triggers op workplaces en models
+(migrations.py, versie 16) sturen bij elke commit een NOTIFY; elke uvicorn
+worker en de losse job worker luisteren en legen dan hun cache, zodat een
+nieuwe werkplek of een ander actief model meteen overal zichtbaar is.
+
+Zonder verbinding geldt alleen WORKPLACE_CACHE_TTL; na een (her)verbinding
+wordt de cache geleegd omdat meldingen van tijdens de onderbreking gemist zijn.
+"""
+
+import os
+import select
+import threading
+import psycopg2
+from dotenv import load_dotenv
+
+from database import DATABASE_URL, workplace_cache
+
+load_dotenv()
+
+WORKPLACE_CACHE_CHANNEL = "workplace_cache"
+CACHE_LISTENER_RECONNECT_SECONDS = float(os.getenv("CACHE_LISTENER_RECONNECT_SECONDS", "2"))
+
+
+class CacheInvalidationListener:
+    """Leegt workplace_cache bij een NOTIFY van een ander (of dit) proces"""
+
+    def __init__(self, channel=WORKPLACE_CACHE_CHANNEL):
+        self.channel = channel
+        self._thread = None
+        self._stopping = threading.Event()
+        self._connected = False
+        self._received = 0
+
+    def start(self):
+        """Start de listener thread (no-op als die al draait)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-listener", daemon=True)
+        self._thread.start()
+        print(f"📡 Cache listener: LISTEN {self.channel}")
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            conn = None
+            try:
+                conn = psycopg2.connect(DATABASE_URL)
+                conn.autocommit = True
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel}")
+                self._connected = True
+                workplace_cache.invalidate()
+
+                while not self._stopping.is_set():
+                    if not select.select([conn], [], [], 1.0)[0]:
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        self._received += len(conn.notifies)
+                        conn.notifies.clear()
+                        workplace_cache.invalidate()
+            except Exception as e:
+                print(f"⚠️ Cache listener verbroken: {e}")
+            finally:
+                self._connected = False
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+            self._stopping.wait(CACHE_LISTENER_RECONNECT_SECONDS)
+
+    def stats(self):
+        return {
+            'channel': self.channel,
+            'connected': self._connected,
+            'received': self._received
+        }
+
+
+# Globale listener instantie (API startup en `python job_queue.py worker`)
+cache_listener = CacheInvalidationListener()
@@ -4,24 +4,457 @@ Slaat alle analyses op voor latere review en model verbetering
 """
 
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2 import pool as pg_pool
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+from psycopg2.extras import RealDictCursor, execute_values
 import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dotenv import load_dotenv
 from datetime import datetime
 from pathlib import Path
 import json
+import base64
+import copy
+
+from utils.ttl_cache import TTLCache
 
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Connection pool configuratie
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Connecties die langer idle waren krijgen een SELECT 1 health check bij uitgifte
+DB_POOL_HEALTHCHECK_IDLE = float(os.getenv("DB_POOL_HEALTHCHECK_IDLE", "30"))
+
+# Korte cache voor dashboard statistieken en history pagina's (0 = uit)
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", "5"))
+
+# Werkplek rijen + actief model config (inspect hot path); 0 = uit
+WORKPLACE_CACHE_TTL = float(os.getenv("WORKPLACE_CACHE_TTL", "60"))
+
+# Delta sync: overlap in seconden zodat rijen uit nog lopende transacties
+# (updated_at gezet voor de commit) bij de volgende sync alsnog meekomen
+SYNC_SAFETY_SECONDS = float(os.getenv("SYNC_SAFETY_SECONDS", "5"))
+
+
+class ConnectionPool:
+    """
+    Thread-safe PostgreSQL connection pool met health checks en wait-time metrics
+
+    Wacht (tot timeout) op een vrije connectie als de pool vol is, in plaats
+    van direct een PoolError te geven zoals psycopg2's ThreadedConnectionPool.
+    """
+
+    def __init__(self, dsn, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX,
+                 timeout=DB_POOL_TIMEOUT, healthcheck_idle=DB_POOL_HEALTHCHECK_IDLE):
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+
+        self._pool = None
+        self._init_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._last_used = {}  # id(conn) -> monotonic tijd van laatste release
+
+        # Metrics
+        self._metrics_lock = threading.Lock()
+        self._wait_times = deque(maxlen=1000)
+        self._acquired = 0
+        self._in_use = 0
+        self._timeouts = 0
+        self._health_failures = 0
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._init_lock:
+                if self._pool is None:
+                    self._pool = pg_pool.ThreadedConnectionPool(
+                        self.minconn, self.maxconn, self.dsn, cursor_factory=RealDictCursor
+                    )
+        return self._pool
+
+    def _is_healthy(self, conn):
+        if conn.closed or conn.get_transaction_status() == TRANSACTION_STATUS_UNKNOWN:
+            return False
+
+        idle_since = self._last_used.get(id(conn))
+        if idle_since is None or time.monotonic() - idle_since < self.healthcheck_idle:
+            return True
+
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def acquire(self):
+        """
+        Haal connectie uit de pool (wacht maximaal timeout seconden)
+
+        Returns:
+            psycopg2 connectie met RealDictCursor
+        """
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._metrics_lock:
+                self._timeouts += 1
+            raise pg_pool.PoolError(f"Geen database connectie beschikbaar binnen {self.timeout}s")
+        waited = time.perf_counter() - start
+
+        try:
+            pool = self._get_pool()
+            conn = pool.getconn()
+            if not self._is_healthy(conn):
+                with self._metrics_lock:
+                    self._health_failures += 1
+                pool.putconn(conn, close=True)
+                self._last_used.pop(id(conn), None)
+                conn = pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._metrics_lock:
+            self._wait_times.append(waited)
+            self._acquired += 1
+            self._in_use += 1
+        return conn
+
+    def release(self, conn, discard=False):
+        """
+        Geef connectie terug aan de pool
+
+        Open transacties worden teruggedraaid, net als bij conn.close().
+        """
+        try:
+            if not discard and not conn.closed:
+                try:
+                    if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                        conn.rollback()
+                except psycopg2.Error:
+                    discard = True
+            self._get_pool().putconn(conn, close=discard or conn.closed)
+            if discard:
+                self._last_used.pop(id(conn), None)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+        finally:
+            with self._metrics_lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def stats(self):
+        """Pool grootte, gebruik en wait-time metrics"""
+        with self._metrics_lock:
+            waits = sorted(self._wait_times)
+            stats = {
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "in_use": self._in_use,
+                "acquired_total": self._acquired,
+                "timeouts": self._timeouts,
+                "health_check_failures": self._health_failures,
+            }
+
+        def percentile(pct):
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(round(pct / 100.0 * (len(waits) - 1))))] * 1000, 2)
+
+        stats["wait_ms"] = {
+            "avg": round(sum(waits) / len(waits) * 1000, 2) if waits else 0.0,
+            "p50": percentile(50),
+            "p95": percentile(95),
+            "max": percentile(100)
+        }
+        return stats
+
+    def close_all(self):
+        """Sluit alle connecties (bij shutdown)"""
+        if self._pool is not None:
+            self._pool.closeall()
+            self._pool = None
+            self._last_used.clear()
+
+
+db_pool = ConnectionPool(DATABASE_URL)
+
+
+class _RequestScope:
+    """Houdt een enkele connectie vast die binnen een HTTP request hergebruikt wordt"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.conn = None
+        self.in_use = False
+        self.active = True
+
+    def checkout(self):
+        """Geef de request connectie uit, of None als die al in gebruik is"""
+        with self.lock:
+            if not self.active or self.in_use:
+                return None
+            if self.conn is None:
+                self.conn = db_pool.acquire()
+            self.in_use = True
+            return self.conn
+
+    def checkin(self, conn):
+        with self.lock:
+            self.in_use = False
+            if self.active:
+                # Transactie afsluiten zoals conn.close() dat zou doen
+                try:
+                    if not conn.closed and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                        conn.rollback()
+                except psycopg2.Error:
+                    self.conn = None
+                    db_pool.release(conn, discard=True)
+                return
+            self.conn = None
+        db_pool.release(conn)
+
+    def close(self):
+        with self.lock:
+            self.active = False
+            conn = self.conn if not self.in_use else None
+            if conn is not None:
+                self.conn = None
+        if conn is not None:
+            db_pool.release(conn)
+
+
+_request_scope = ContextVar("db_request_scope", default=None)
+
+
+@contextmanager
+def request_connection_scope():
+    """
+    Hergebruik een enkele pool connectie voor alle database calls binnen een request
+
+    Gebruikt door de HTTP middleware in main.py; get_db_connection() geeft binnen
+    deze scope steeds dezelfde connectie uit (zolang die niet al in gebruik is).
+    """
+    scope = _RequestScope()
+    token = _request_scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _request_scope.reset(token)
+        scope.close()
+
+
+class PooledConnection:
+    """
+    Wrapper rond een pool connectie: close() geeft de connectie terug aan de pool
+
+    Zo blijft het bestaande patroon `conn = get_db_connection() ... conn.close()`
+    ongewijzigd werken.
+    """
+
+    def __init__(self, conn, scope=None):
+        self._conn = conn
+        self._scope = scope
+        self._closed = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def cursor(self, *args, **kwargs):
+        return self._conn.cursor(*args, **kwargs)
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    @property
+    def closed(self):
+        return self._closed or self._conn.closed
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._scope is not None:
+            self._scope.checkin(self._conn)
+        else:
+            db_pool.release(self._conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # Vangnet voor code paden die door een exception close() overslaan
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
 def get_db_connection():
-    """Maak database connectie met RealDictCursor"""
-    return psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+    """Haal database connectie (RealDictCursor) uit de pool"""
+    scope = _request_scope.get()
+    if scope is not None:
+        conn = scope.checkout()
+        if conn is not None:
+            return PooledConnection(conn, scope)
+    return PooledConnection(db_pool.acquire())
+
+
+def get_pool_stats():
+    """Connection pool metrics voor monitoring"""
+    return db_pool.stats()
+
+
+def close_pool():
+    """Sluit alle pool connecties (bij shutdown)"""
+    db_pool.close_all()
+
+
+# ========================================
+# ANALYSE CACHE
+# ========================================
+
+# Gedeeld met database_async.py. Per proces: bij meerdere workers begrenst
+# de TTL hoe lang een andere worker verouderde statistieken kan tonen.
+analysis_cache = TTLCache(ttl=ANALYSIS_CACHE_TTL)
+
+
+def invalidate_analysis_cache():
+    """Invalideer gecachte statistieken en history na een wijziging in analyses"""
+    analysis_cache.invalidate()
+
+
+# Werkplek config per workplace_id, gedeeld met database_async.py. Ook
+# "bestaat niet" wordt gecached; create_workplace invalideert daarom ook.
+# Wijzigingen uit andere processen (uvicorn workers, job worker) komen via
+# NOTIFY binnen (cache_listener.py); zonder listener geldt alleen de TTL.
+workplace_cache = TTLCache(ttl=WORKPLACE_CACHE_TTL)
+
+
+def invalidate_workplace_cache():
+    """Invalideer gecachte werkplek / model config na een wijziging"""
+    workplace_cache.invalidate()
 
 
 # NOTE: init_database() removed - PostgreSQL schema already exists!
 # Schema is managed externally and has different field names than SQLite
 # DO NOT recreate or alter tables - this will break existing data!
+# Indexes en additieve schema wijzigingen gaan via migrations.py (schema_migrations)
+
+
+def _analysis_insert_params(data):
+    """
+    Zet een analyse dict om naar de parameters voor de analyses INSERT
+
+    Gedeeld door save_analysis en save_analyses_batch zodat beide precies
+    dezelfde veld mapping gebruiken.
+
+    Args:
+        data: Dict met analyse gegevens
+
+    Returns:
+        Tuple met waarden in de volgorde van ANALYSIS_INSERT_COLUMNS
+    """
+    # FIX #2: Confidence NULL prevention - ensure confidence is never NULL
+    confidence = data.get('confidence')
+    if confidence is None:
+        confidence = 0.0
+
+    # Map frontend fields to PostgreSQL fields
+    # Frontend sends: status, predicted_class, predicted_label
+    # PostgreSQL has: result, model_prediction
+    result = data.get('status', 'OK')  # status -> result
+    model_prediction = data.get('predicted_label') or data.get('predicted_class', 'unknown')
+
+    # Model type, device en detectie tellingen hebben eigen kolommen
+    # (migrations.py, versie 5); metadata bevat alleen nog de overige info
+    metadata = {}
+    if 'camera_info' in data and data['camera_info']:
+        metadata['camera_info'] = data['camera_info']
+    if data.get('provisional_id'):
+        # Write-behind journal: koppelt voorlopige ID aan echte analysis_id
+        metadata['provisional_id'] = data['provisional_id']
+    if data.get('stage_timings'):
+        # Tijd per inspectie stage in ms (inspection_pipeline.py)
+        metadata['stage_timings'] = data['stage_timings']
+    if data.get('stage_errors'):
+        metadata['stage_errors'] = data['stage_errors']
+
+    # Determine is_correct (None initially, will be set by user correction)
+    is_correct = None
+
+    # Calculate processing_time if not provided
+    processing_time = data.get('processing_time', 0.0)
+
+    return (
+        data.get('workplace_id', None),
+        data.get('user_id', None),
+        data.get('timestamp', datetime.now()),
+        data.get('image_path'),
+        result,  # status -> result
+        confidence,  # FIX #2: Never NULL
+        model_prediction,  # predicted_label -> model_prediction
+        is_correct,  # Will be set on user correction
+        processing_time,
+        json.dumps(metadata) if metadata else None,  # FIX #4: JSONB casting
+        data.get('model_version', None),
+        data.get('model_type'),
+        data.get('device_id'),
+        data.get('detected_hamer'),
+        data.get('detected_schaar'),
+        data.get('detected_sleutel'),
+        data.get('total_detections'),
+        list(data['missing_items']) if data.get('missing_items') is not None else None
+    )
+
+
+_ANALYSIS_INSERT_NAMES = """workplace_id, user_id, timestamp, image_path, result, confidence,
+     model_prediction, is_correct, processing_time, metadata, model_version,
+     model_type, device_id, detected_hamer, detected_schaar, detected_sleutel,
+     total_detections, missing_items"""
+
+_ANALYSIS_INSERT_PLACEHOLDERS = "%s, %s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb, %s, %s, %s, %s, %s, %s, %s, %s::text[]"
+
+ANALYSIS_INSERT_COLUMNS = f"({_ANALYSIS_INSERT_NAMES})"
+
+# VALUES template bij ANALYSIS_INSERT_COLUMNS
+ANALYSIS_INSERT_TEMPLATE = f"({_ANALYSIS_INSERT_PLACEHOLDERS})"
+
+# Bulk inserts met vooraf gereserveerde IDs (zie _reserve_analysis_ids)
+ANALYSIS_INSERT_ID_COLUMNS = f"(id, {_ANALYSIS_INSERT_NAMES})"
+ANALYSIS_INSERT_ID_TEMPLATE = f"(%s, {_ANALYSIS_INSERT_PLACEHOLDERS})"
+
+
+def _reserve_analysis_ids(cursor, count):
+    """
+    Reserveer analysis IDs uit de id sequence voor een bulk insert
+
+    PostgreSQL garandeert niet dat RETURNING de volgorde van de invoer
+    volgt; met vooraf gereserveerde IDs hoort elk ID zeker bij zijn item.
+
+    Returns:
+        List van count IDs
+    """
+    cursor.execute("SELECT nextval(pg_get_serial_sequence('analyses', 'id')) AS id FROM generate_series(1, %s)",
+                   (count,))
+    return [row['id'] for row in cursor.fetchall()]
 
 
 def save_analysis(data):
@@ -31,7 +464,8 @@ def save_analysis(data):
     PostgreSQL Schema Mapping:
     - status -> result
     - predicted_class/predicted_label -> model_prediction
-    - missing_items -> metadata (jsonb)
+    - missing_items, model_type, device_id, detection counts -> eigen kolommen
+    - analyses_daily_rollup wordt in dezelfde transactie bijgewerkt (trigger)
 
     Args:
         data: Dict met analyse gegevens
@@ -42,67 +476,993 @@ def save_analysis(data):
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    # FIX #2: Confidence NULL prevention - ensure confidence is never NULL
-    confidence = data.get('confidence')
-    if confidence is None:
-        confidence = 0.0
+    cursor.execute(f"""
+        INSERT INTO analyses
+        {ANALYSIS_INSERT_COLUMNS}
+        VALUES {ANALYSIS_INSERT_TEMPLATE}
+        RETURNING id
+    """, _analysis_insert_params(data))
+
+    analysis_id = cursor.fetchone()['id']
+    conn.commit()
+    conn.close()
+    invalidate_analysis_cache()
+
+    return analysis_id
+
+
+def save_analyses_batch(items):
+    """
+    Sla meerdere analyses op in een enkele multi-row INSERT en transactie
+
+    Args:
+        items: List van analyse dicts (zelfde formaat als save_analysis)
+
+    Returns:
+        List van analysis IDs in dezelfde volgorde als items
+    """
+    if not items:
+        return []
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        analysis_ids = _reserve_analysis_ids(cursor, len(items))
+        execute_values(cursor, f"""
+            INSERT INTO analyses
+            {ANALYSIS_INSERT_ID_COLUMNS}
+            VALUES %s
+        """, [(analysis_id,) + tuple(_analysis_insert_params(data))
+              for analysis_id, data in zip(analysis_ids, items)],
+            template=ANALYSIS_INSERT_ID_TEMPLATE,
+            page_size=len(items))
+
+        conn.commit()
+        invalidate_analysis_cache()
+        return analysis_ids
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _copy_text_value(value):
+    """Formatteer een waarde voor COPY text formaat (NULL = \\N)"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (list, tuple)):
+        # Array literal: {"a","b"}
+        value = '{' + ','.join(
+            'NULL' if item is None else '"' + str(item).replace('\\', '\\\\').replace('"', '\\"') + '"'
+            for item in value
+        ) + '}'
+    return (str(value)
+            .replace('\\', '\\\\')
+            .replace('\t', '\\t')
+            .replace('\n', '\\n')
+            .replace('\r', '\\r'))
+
+
+def copy_analyses(items):
+    """
+    Bulk insert van analyses via COPY (voor grote offline batches)
+
+    COPY zelf geeft geen IDs terug; de IDs worden vooraf gereserveerd en
+    via een tijdelijke staging tabel met een INSERT ... SELECT in dezelfde
+    transactie weggeschreven.
+
+    Args:
+        items: List van analyse dicts (zelfde formaat als save_analysis)
+
+    Returns:
+        List van analysis IDs in dezelfde volgorde als items
+    """
+    import io
+
+    if not items:
+        return []
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        analysis_ids = _reserve_analysis_ids(cursor, len(items))
+
+        buffer = io.StringIO()
+        for analysis_id, data in zip(analysis_ids, items):
+            values = [analysis_id] + list(_analysis_insert_params(data))
+            buffer.write('\t'.join(_copy_text_value(value) for value in values) + '\n')
+        buffer.seek(0)
+
+        cursor.execute("""
+            CREATE TEMP TABLE analyses_staging (
+                id bigint,
+                workplace_id integer,
+                user_id integer,
+                timestamp text,
+                image_path text,
+                result text,
+                confidence double precision,
+                model_prediction text,
+                is_correct boolean,
+                processing_time double precision,
+                metadata jsonb,
+                model_version text,
+                model_type text,
+                device_id text,
+                detected_hamer integer,
+                detected_schaar integer,
+                detected_sleutel integer,
+                total_detections integer,
+                missing_items text[]
+            ) ON COMMIT DROP
+        """)
+        cursor.copy_expert("COPY analyses_staging FROM STDIN", buffer)
+        cursor.execute(f"""
+            INSERT INTO analyses
+            {ANALYSIS_INSERT_ID_COLUMNS}
+            SELECT id, workplace_id, user_id, timestamp::timestamp, image_path, result, confidence,
+                   model_prediction, is_correct, processing_time, metadata, model_version,
+                   model_type, device_id, detected_hamer, detected_schaar, detected_sleutel,
+                   total_detections, missing_items
+            FROM analyses_staging
+        """)
+        conn.commit()
+        invalidate_analysis_cache()
+        return analysis_ids
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+# Journal replay / resolve. De ? conditie hoort bij het partial predicate van
+# idx_analyses_provisional_id; zonder kiest de planner de index niet.
+PROVISIONAL_ID_LOOKUP_QUERY = """
+    SELECT id, metadata->>'provisional_id' AS provisional_id
+    FROM analyses
+    WHERE metadata ? 'provisional_id' AND metadata->>'provisional_id' = ANY(%s)
+"""
+
+
+def find_analyses_by_provisional_id(provisional_ids):
+    """
+    Zoek analyses op die via het write-behind journal zijn opgeslagen
+
+    Args:
+        provisional_ids: List van voorlopige IDs
+
+    Returns:
+        Dict {provisional_id: analysis_id} voor de gevonden analyses
+    """
+    if not provisional_ids:
+        return {}
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute(PROVISIONAL_ID_LOOKUP_QUERY, (list(provisional_ids),))
+
+    found = {row['provisional_id']: row['id'] for row in cursor.fetchall()}
+    conn.close()
+    return found
+
+
+# ========================================
+# ROW SHAPING (gedeeld met database_async.py)
+# ========================================
+
+def _parse_json_field(value):
+    """
+    Parse een jsonb kolom (dict of JSON string) naar een dict
+
+    FIX #5: JSON parsing error handling - ongeldige JSON wordt een lege dict
+    """
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            return {}
+    return value if isinstance(value, dict) else {}
+
+
+# Frontend veldnamen worden in SQL geprojecteerd (alias + defaults), zodat
+# Python geen rijen hoeft om te bouwen en list endpoints de JSON direct uit
+# PostgreSQL kunnen doorgeven (zie _json_page_query).
+#
+# PostgreSQL -> Frontend Field Mapping:
+# - result -> status
+# - model_prediction -> predicted_label AND predicted_class
+# - user_correction -> corrected_label
+# - timestamp -> created_at
+
+ANALYSIS_LIST_COLUMNS = """
+    id, workplace_id, user_id, timestamp, timestamp AS created_at,
+    replace(image_path, chr(92), '/') AS image_path,
+    result, result AS status,
+    confidence, processing_time, is_correct, model_version,
+    model_prediction, model_prediction AS predicted_label, model_prediction AS predicted_class,
+    user_correction, user_correction AS corrected_label,
+    COALESCE(missing_items, '{}') AS missing_items,
+    COALESCE(detected_hamer, 0) AS detected_hamer,
+    COALESCE(detected_schaar, 0) AS detected_schaar,
+    COALESCE(detected_sleutel, 0) AS detected_sleutel,
+    COALESCE(total_detections, 0) AS total_detections,
+    COALESCE(model_type, 'classification') AS model_type
+"""
+
+HISTORY_COLUMNS = """
+    id, workplace_id, model_version, timestamp, timestamp AS created_at, updated_at,
+    image_path, confidence, is_correct,
+    result, result AS status,
+    model_prediction, model_prediction AS predicted_label, model_prediction AS predicted_class,
+    user_correction, user_correction AS corrected_label,
+    COALESCE(missing_items, '{}') AS missing_items,
+    COALESCE(model_type, 'classification') AS model_type,
+    COALESCE(device_id, 'onbekend') AS device_id,
+    metadata->'camera_info' AS camera_info,
+    CASE WHEN model_type = 'detection' THEN COALESCE(detected_hamer, 0) END AS detected_hamer,
+    CASE WHEN model_type = 'detection' THEN COALESCE(detected_schaar, 0) END AS detected_schaar,
+    CASE WHEN model_type = 'detection' THEN COALESCE(detected_sleutel, 0) END AS detected_sleutel,
+    CASE WHEN model_type = 'detection' THEN COALESCE(total_detections, 0) END AS total_detections
+"""
+
+# Tombstone rijen in de delta sync: zelfde kolommen als HISTORY_COLUMNS
+# (plus removed), alleen id / werkplek / versie / resultaat zijn gevuld
+TOMBSTONE_COLUMNS = """
+    id, workplace_id, model_version, NULL AS timestamp, NULL AS created_at,
+    deleted_at AS updated_at,
+    NULL AS image_path, NULL AS confidence, NULL AS is_correct,
+    result, result AS status,
+    NULL AS model_prediction, NULL AS predicted_label, NULL AS predicted_class,
+    NULL AS user_correction, NULL AS corrected_label,
+    NULL AS missing_items,
+    NULL AS model_type,
+    NULL AS device_id,
+    NULL AS camera_info,
+    NULL AS detected_hamer,
+    NULL AS detected_schaar,
+    NULL AS detected_sleutel,
+    NULL AS total_detections,
+    TRUE AS removed
+"""
+
+TRAINING_CANDIDATE_COLUMNS = """
+    id, workplace_id, model_version, timestamp, image_path, confidence, is_correct,
+    result, result AS status,
+    model_prediction, model_prediction AS predicted_label, model_prediction AS predicted_class,
+    user_correction, user_correction AS corrected_label,
+    COALESCE(missing_items, '{}') AS missing_items,
+    COALESCE(model_type, 'classification') AS model_type,
+    device_id
+"""
+
+
+def _json_page_query(query, params, order_by, key_column=None):
+    """
+    Wikkel een list query zodat PostgreSQL de hele pagina als een JSON array
+    teruggeeft (json_agg), plus het aantal rijen en de sleutel van de laatste rij
+
+    Args:
+        query: SELECT met een van de *_COLUMNS projecties
+        params: Query parameters
+        order_by: Sortering binnen de JSON array (zelfde als de query)
+        key_column: Optioneel - kolom voor de (key, id) cursor van de laatste rij
+
+    Returns:
+        Tuple (query, params); de rij heeft items (JSON tekst), count en
+        last_key/last_id
+    """
+    last = ""
+    if key_column:
+        last = f""",
+            (array_agg({key_column} ORDER BY {order_by}))[COUNT(*)::int] AS last_key,
+            (array_agg(id ORDER BY {order_by}))[COUNT(*)::int] AS last_id"""
+
+    wrapped = f"""
+        SELECT
+            COALESCE(json_agg(page ORDER BY {order_by}), '[]')::text AS items,
+            COUNT(*) AS count{last}
+        FROM ({query}) page
+    """
+    return wrapped, params
+
+
+def _shape_workplace(row):
+    """
+    Map een workplaces rij naar de velden die de frontend verwacht
+
+    PostgreSQL Schema:
+    - reference_photo_path needs to be mapped to reference_photo for frontend
+    """
+    wp = dict(row)
+
+    # Map PostgreSQL fields to frontend expected fields
+    wp['reference_photo'] = wp.get('reference_photo_path')  # Map reference_photo_path -> reference_photo
+
+    # FIX #6: Items empty string edge case - handle trailing commas
+    if wp.get('items'):
+        items_str = wp['items'].strip()
+        # Split and filter out empty strings
+        wp['items'] = [item.strip() for item in items_str.split(',') if item.strip()] if items_str else []
+    else:
+        wp['items'] = []
+
+    # FIX #5: Whiteboard JSON parsing error handling
+    if wp.get('whiteboard_region'):
+        try:
+            if isinstance(wp['whiteboard_region'], str):
+                wp['whiteboard_region'] = json.loads(wp['whiteboard_region'])
+        except (json.JSONDecodeError, TypeError):
+            wp['whiteboard_region'] = None
+
+    if isinstance(wp.get('pipeline_stages'), str):
+        try:
+            wp['pipeline_stages'] = json.loads(wp['pipeline_stages'])
+        except json.JSONDecodeError:
+            wp['pipeline_stages'] = None
+
+    # Alias for frontend compatibility (always True if no is_active field)
+    wp['active'] = True
+
+    return wp
+
+
+# Werkplek rij + versie van het actieve model in een query (cache miss)
+WORKPLACE_CONFIG_QUERY = """
+    SELECT w.*, m.version AS active_model_version
+    FROM workplaces w
+    LEFT JOIN LATERAL (
+        SELECT version FROM models
+        WHERE workplace_id = w.id AND is_active = TRUE
+        ORDER BY training_date DESC
+        LIMIT 1
+    ) m ON TRUE
+    WHERE w.id = %s
+"""
+
+
+def _shape_workplace_config(row):
+    """
+    Zet een WORKPLACE_CONFIG_QUERY rij om naar de gecachte werkplek config
+
+    Returns:
+        Dict met workplace (of None), model (of None) en confidence_threshold
+    """
+    if not row:
+        return {'workplace': None, 'model': None, 'confidence_threshold': None}
+
+    row = dict(row)
+    model_version = row.pop('active_model_version', None)
+    workplace = _shape_workplace(row)
+
+    # PostgreSQL schema: workplaces has 'model_type' (NOT 'active_model_type')
+    model = None
+    if row.get('model_type'):
+        model = {
+            'model_type': row['model_type'],
+            'model_path': row.get('active_model_path'),
+            'model_version': model_version  # Kan None zijn als geen actief model in models tabel
+        }
+
+    return {
+        'workplace': workplace,
+        'model': model,
+        'confidence_threshold': row.get('confidence_threshold')
+    }
+
+
+def _shape_model(row):
+    """
+    Map een models rij naar de velden die de frontend verwacht
+
+    PostgreSQL Schema:
+    - training_date (NOT uploaded_at)
+    - metrics jsonb contains test_accuracy, config, notes
+    """
+    model = dict(row)
+    # FIX #3: Boolean conversion for is_active field
+    if 'is_active' in model:
+        model['is_active'] = bool(model['is_active'])
+
+    # Extract metrics for frontend compatibility
+    metrics = _parse_json_field(model.get('metrics'))
+
+    # Map metrics fields to top-level for frontend compatibility
+    model['test_accuracy'] = metrics.get('test_accuracy')
+    model['config'] = metrics.get('config')
+    model['notes'] = metrics.get('notes')
+
+    # Map training_date to uploaded_at for frontend compatibility
+    model['uploaded_at'] = model.get('training_date')
+
+    return model
+
+
+def _shape_dataset_export(row):
+    """Parse class_distribution van een dataset_exports rij"""
+    export = dict(row)
+    distribution = export.get('class_distribution')
+    if isinstance(distribution, str):
+        try:
+            distribution = json.loads(distribution)
+        except (json.JSONDecodeError, TypeError):
+            distribution = {}
+    export['class_distribution'] = distribution if isinstance(distribution, dict) else {}
+    return export
+
+
+def _analysis_filters(status=None, workplace_id=None, model_version=None):
+    """
+    WHERE condities voor de history filters (werkplek, model versie, status)
+
+    Returns:
+        Tuple (conditions, params)
+    """
+    conditions = []
+    params = []
+
+    if workplace_id is not None:
+        conditions.append("workplace_id = %s")
+        params.append(workplace_id)
+
+    if model_version is not None:
+        conditions.append("model_version = %s")
+        params.append(model_version)
+
+    if status:
+        # PostgreSQL uses 'result' field, not 'status'
+        conditions.append("result = %s")
+        params.append(status)
+
+    return conditions, params
+
+
+def encode_history_cursor(timestamp, row_id):
+    """Maak een opaque cursor token van (timestamp, id)"""
+    payload = json.dumps([timestamp.isoformat(), row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_history_cursor(token):
+    """
+    Lees een cursor token terug naar (datetime, id)
+
+    Raises:
+        ValueError: Bij een ongeldige cursor
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception:
+        raise ValueError(f"Ongeldige cursor: {token}")
+
+
+def _history_query(limit, offset, status=None, workplace_id=None, model_version=None, after=None):
+    """
+    Bouw de query voor /api/history
+
+    Met after (timestamp, id van de laatste rij van de vorige pagina)
+    wordt keyset paginatie gebruikt in plaats van OFFSET, zodat oudere
+    pagina's even snel zijn als de eerste.
+
+    Returns:
+        Tuple (query, params)
+    """
+    conditions, params = _analysis_filters(status, workplace_id, model_version)
+
+    # Filter out analyses waar foto al naar training data is verplaatst
+    conditions.insert(0, "image_path IS NOT NULL")
+
+    if after is not None:
+        conditions.append("(timestamp, id) < (%s, %s)")
+        params.extend(after)
+
+    query = f"SELECT {HISTORY_COLUMNS} FROM analyses WHERE " + " AND ".join(conditions)
+    query += " ORDER BY timestamp DESC, id DESC LIMIT %s"
+    params.append(limit)
+
+    if after is None:
+        query += " OFFSET %s"
+        params.append(offset)
+
+    return query, params
+
+
+def _history_changes_query(since, limit, status=None, workplace_id=None, model_version=None):
+    """
+    Bouw de delta sync query: rijen toegevoegd, gewijzigd of verwijderd na
+    (updated_at, id)
+
+    updated_at wordt door de database trigger gezet (migrations.py, versie 3).
+    Rijen met removed = true moet de client weghalen: analyses waarvan de
+    foto weg is (image_path NULL, valt uit /api/history) en tombstones van
+    verwijderde analyses (migrations.py, versie 14 en 15).
+
+    Returns:
+        Tuple (query, params)
+    """
+    # Tombstones hebben dezelfde filter kolommen (workplace_id, model_version, result)
+    conditions, params = _analysis_filters(status, workplace_id, model_version)
+    conditions.append("(updated_at, id) > (%s, %s)")
+    params.extend(since)
+
+    tombstone_conditions, tombstone_params = _analysis_filters(status, workplace_id, model_version)
+    tombstone_conditions.append("(deleted_at, id) > (%s, %s)")
+    tombstone_params.extend(since)
+
+    query = f"""
+        SELECT * FROM (
+            (SELECT {HISTORY_COLUMNS}, image_path IS NULL AS removed
+             FROM analyses WHERE {" AND ".join(conditions)}
+             ORDER BY updated_at, id LIMIT %s)
+            UNION ALL
+            (SELECT {TOMBSTONE_COLUMNS}
+             FROM analyses_tombstones WHERE {" AND ".join(tombstone_conditions)}
+             ORDER BY deleted_at, id LIMIT %s)
+        ) changes
+        ORDER BY updated_at, id LIMIT %s
+    """
+    params = params + [limit] + tombstone_params + [limit, limit]
+
+    return query, params
+
+
+def _history_count_estimate_query(status=None, workplace_id=None, model_version=None):
+    """
+    EXPLAIN query voor een geschat aantal history rijen (planner statistieken,
+    geen COUNT(*) scan)
+
+    Returns:
+        Tuple (query, params)
+    """
+    conditions, params = _analysis_filters(status, workplace_id, model_version)
+    conditions.insert(0, "image_path IS NOT NULL")
+    return "EXPLAIN (FORMAT JSON) SELECT 1 FROM analyses WHERE " + " AND ".join(conditions), params
+
+
+def _plan_rows(explain_row):
+    """Lees 'Plan Rows' uit een EXPLAIN (FORMAT JSON) resultaat"""
+    plan = explain_row['QUERY PLAN']
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def _next_sync_cursor(last, count, since, limit, watermark):
+    """
+    Bepaal de volgende 'since' cursor na een delta sync
+
+    Bij een volle pagina gaat de cursor verder vanaf de laatste rij; anders
+    naar het watermark (servertijd min SYNC_SAFETY_SECONDS), maar nooit terug.
+
+    Args:
+        last: (updated_at, id) van de laatste rij, of None
+        count: Aantal rijen in deze sync
+        since: Cursor van deze sync
+        limit: Maximum aantal rijen per sync
+        watermark: Servertijd min SYNC_SAFETY_SECONDS
+
+    Returns:
+        Tuple (next_since, has_more)
+    """
+    if count >= limit and last is not None:
+        return last, True
+    if since is None or watermark > since[0]:
+        return (watermark, 0), False
+    return since, False
+
+
+def _training_candidates_query(confidence_threshold):
+    """
+    Query voor training candidates: beoordeeld EN (fout OF lage confidence)
+
+    Returns:
+        Tuple (query, params)
+    """
+    # Convert percentage naar decimaal
+    threshold_decimal = confidence_threshold / 100.0
+
+    query = f"""
+        SELECT {TRAINING_CANDIDATE_COLUMNS} FROM analyses
+        WHERE user_correction IS NOT NULL
+        AND (
+            is_correct = FALSE
+            OR confidence < %s
+        )
+        ORDER BY timestamp DESC
+    """
+    return query, [threshold_decimal]
+
+
+def _rollup_filters(status=None, workplace_id=None, model_version=None):
+    """
+    WHERE condities op analyses_daily_rollup (zelfde filters als _analysis_filters)
+
+    Returns:
+        Tuple (conditions, params)
+    """
+    conditions = []
+    params = []
+
+    if status:
+        conditions.append("result = %s")
+        params.append(status)
+
+    if workplace_id is not None:
+        conditions.append("workplace_id = %s")
+        params.append(workplace_id)
+
+    if model_version:
+        conditions.append("model_version = %s")
+        params.append(model_version)
+
+    return conditions, params
+
+
+def _statistics_query(status=None, workplace_id=None, model_version=None):
+    """
+    Bouw de aggregate query voor get_statistics op analyses_daily_rollup
+
+    De rollup (migratie 8) heeft een rij per werkplek/model/dag/resultaat,
+    dus dit leest een paar rijen per dag in plaats van alle analyses. De top 5
+    NOK voorspellingen komen uit prediction_counts.
+
+    Returns:
+        Tuple (query, params)
+    """
+    conditions, params = _rollup_filters(status, workplace_id, model_version)
+    where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+
+    query = f"""
+        WITH filtered AS (
+            SELECT result, total, confidence_sum, confidence_count, reviewed, prediction_counts
+            FROM analyses_daily_rollup
+            {where}
+        ),
+        issues AS (
+            SELECT NULLIF(p.key, '') AS model_prediction, SUM(p.value::bigint) AS count
+            FROM filtered f, jsonb_each_text(f.prediction_counts) p
+            WHERE f.result = 'NOK'
+            GROUP BY p.key
+            HAVING SUM(p.value::bigint) > 0
+            ORDER BY count DESC
+            LIMIT 5
+        )
+        SELECT
+            COALESCE(SUM(total), 0)::bigint as total,
+            COALESCE(SUM(total) FILTER (WHERE result = 'OK'), 0)::bigint as ok_count,
+            COALESCE(SUM(total) FILTER (WHERE result = 'NOK'), 0)::bigint as nok_count,
+            COALESCE(SUM(confidence_sum) / NULLIF(SUM(confidence_count), 0), 0) as avg_conf,
+            COALESCE(SUM(reviewed), 0)::bigint as corrections_count,
+            (
+                SELECT COALESCE(json_agg(json_build_object('label', model_prediction, 'count', count)
+                                         ORDER BY count DESC), '[]'::json)
+                FROM issues
+            ) as common_issues
+        FROM filtered
+    """
+    return query, params
+
+
+def _accuracy_timeline_query(workplace_id=None, model_version=None):
+    """
+    Query voor de accuracy tijdlijn (beoordeelde analyses per dag) uit de rollup
+
+    Returns:
+        Tuple (query, params)
+    """
+    conditions, params = _rollup_filters(None, workplace_id, model_version)
+    where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+
+    query = f"""
+        SELECT
+            TO_CHAR(day, 'IYYY-IW') as week,
+            TO_CHAR(day, 'YYYY-MM-DD') as date,
+            SUM(reviewed)::bigint as total,
+            SUM(correct)::bigint as correct
+        FROM analyses_daily_rollup
+        {where}
+        GROUP BY day
+        HAVING SUM(reviewed) > 0
+        ORDER BY day ASC
+    """
+    return query, params
+
+
+def _accuracy_stats_query(workplace_id=None, model_version=None):
+    """
+    Query voor totale accuracy (beoordeeld / correct) uit de rollup
+
+    Returns:
+        Tuple (query, params)
+    """
+    conditions, params = _rollup_filters(None, workplace_id, model_version)
+    where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+
+    query = f"""
+        SELECT
+            COALESCE(SUM(reviewed), 0)::bigint as total,
+            COALESCE(SUM(correct), 0)::bigint as correct
+        FROM analyses_daily_rollup
+        {where}
+    """
+    return query, params
+
+
+def _shape_accuracy_stats(row):
+    """Zet de _accuracy_stats_query rij om naar het get_accuracy_stats formaat"""
+    total = row['total'] if row else 0
+    correct = row['correct'] if row else 0
+
+    accuracy = round((correct / total * 100), 1) if total > 0 else 0
+
+    return {
+        'total': total,
+        'correct': correct,
+        'accuracy': accuracy
+    }
+
+
+def _shape_statistics(row):
+    """Zet de _statistics_query rij om naar het get_statistics formaat"""
+    common_issues = row['common_issues']
+    if isinstance(common_issues, str):
+        common_issues = json.loads(common_issues)
+    avg_confidence = float(row['avg_conf'] or 0)
+
+    return {
+        'total_analyses': row['total'],
+        'ok_count': row['ok_count'],
+        'nok_count': row['nok_count'],
+        'common_issues': common_issues or [],
+        'avg_confidence': round(avg_confidence, 2) if avg_confidence else 0,
+        'corrections_count': row['corrections_count']
+    }
+
+
+def _correction_update(row, corrected_label, notes):
+    """
+    Bepaal is_correct en nieuwe metadata voor een correctie
+
+    Args:
+        row: Originele analyse (model_prediction, confidence, metadata)
+        corrected_label: Correct label
+        notes: Optionele notities (JSON string of dict)
+
+    Returns:
+        Tuple (is_correct, metadata dict)
+    """
+    metadata = _parse_json_field(row.get('metadata'))
+
+    # Determine if prediction is correct
+    is_correct = (row['model_prediction'] == corrected_label)
+
+    # Store correction info in metadata
+    if notes:
+        try:
+            notes_dict = json.loads(notes) if isinstance(notes, str) else notes
+            metadata['correction_notes'] = notes_dict
+        except:
+            metadata['correction_notes'] = notes
+
+    return is_correct, metadata
+
+
+def _accuracy_timeline(rows):
+    """Bereken accuracy percentage per tijdlijn rij"""
+    timeline = []
+    for row in rows:
+        total = row['total']
+        correct = row['correct']
+        accuracy = round((correct / total * 100), 1) if total > 0 else 0
+        timeline.append({
+            'week': row['week'],
+            'date': row['date'],
+            'total': total,
+            'correct': correct,
+            'accuracy': accuracy
+        })
+    return timeline
+
+
+def _training_dataset_stats_query(workplace_id, model_version=None):
+    """
+    Bouw een enkele set-based query voor get_training_dataset_stats
+
+    Alle tellingen, fout types, label distributie en detectie fouten per object
+    (uit metadata->correction_notes) worden in PostgreSQL berekend; de
+    gefilterde rijen worden een keer gescand via de 'scoped' CTE.
+
+    Alleen correction_notes van het type object tellen mee (zelfde gedrag als
+    de oude Python parser, die andere vormen oversloeg).
+
+    Returns:
+        Tuple (query, params)
+    """
+    if model_version:
+        where_base = "workplace_id = %s AND model_version = %s"
+        params = (workplace_id, model_version)
+    else:
+        where_base = "workplace_id = %s"
+        params = (workplace_id,)
+
+    query = f"""
+        WITH scoped AS (
+            SELECT
+                model_prediction,
+                user_correction,
+                is_correct,
+                CASE WHEN jsonb_typeof(metadata->'correction_notes') = 'object'
+                     THEN metadata->'correction_notes' END as notes
+            FROM analyses
+            WHERE {where_base}
+        ),
+        totals AS (
+            SELECT
+                COUNT(*) as total,
+                COUNT(*) FILTER (WHERE user_correction IS NOT NULL AND user_correction != '') as labeled_count,
+                COUNT(*) FILTER (WHERE user_correction IS NOT NULL AND is_correct = TRUE) as correct_predictions,
+                COUNT(*) FILTER (WHERE user_correction IS NOT NULL AND is_correct = FALSE) as incorrect_predictions
+            FROM scoped
+        ),
+        error_types AS (
+            SELECT model_prediction, user_correction, COUNT(*) as count
+            FROM scoped
+            WHERE user_correction IS NOT NULL AND is_correct = FALSE
+            GROUP BY model_prediction, user_correction
+        ),
+        labels AS (
+            SELECT user_correction, COUNT(*) as count
+            FROM scoped
+            WHERE user_correction IS NOT NULL AND user_correction != ''
+            GROUP BY user_correction
+        ),
+        noted AS (
+            SELECT notes FROM scoped WHERE notes IS NOT NULL
+        ),
+        missing AS (
+            SELECT item, COUNT(*) as count
+            FROM noted,
+                 jsonb_array_elements_text(CASE WHEN jsonb_typeof(notes->'missing_items') = 'array'
+                                                THEN notes->'missing_items' ELSE '[]'::jsonb END) as item
+            WHERE item IS NOT NULL
+            GROUP BY item
+        ),
+        false_positives AS (
+            SELECT item, COUNT(*) as count
+            FROM noted,
+                 jsonb_array_elements_text(CASE WHEN jsonb_typeof(notes->'false_positives') = 'array'
+                                                THEN notes->'false_positives' ELSE '[]'::jsonb END) as item
+            WHERE item IS NOT NULL
+            GROUP BY item
+        ),
+        count_errors AS (
+            SELECT
+                format('%%s (%%sx ipv %%sx)', counts.key,
+                       COALESCE(counts.value->>'detected', '0'),
+                       COALESCE(counts.value->>'expected', '0')) as item,
+                COUNT(*) as count
+            FROM noted,
+                 jsonb_each(CASE WHEN jsonb_typeof(notes->'incorrect_counts') = 'object'
+                                 THEN notes->'incorrect_counts' ELSE '{{}}'::jsonb END) as counts
+            WHERE jsonb_typeof(counts.value) = 'object'
+            GROUP BY 1
+        )
+        SELECT
+            totals.*,
+            (SELECT COALESCE(json_agg(json_build_object('model_prediction', model_prediction,
+                                                        'user_correction', user_correction,
+                                                        'count', count) ORDER BY count DESC), '[]'::json)
+             FROM error_types) as error_types,
+            (SELECT COALESCE(json_object_agg(user_correction, count ORDER BY count DESC), '{{}}'::json)
+             FROM labels) as label_distribution,
+            (SELECT COALESCE(json_object_agg(item, count), '{{}}'::json) FROM missing) as missing,
+            (SELECT COALESCE(json_object_agg(item, count), '{{}}'::json) FROM false_positives) as false_positive,
+            (SELECT COALESCE(json_object_agg(item, count), '{{}}'::json) FROM count_errors) as count_error
+        FROM totals
+    """
+    return query, params
+
+
+def _shape_training_dataset_stats(row):
+    """Zet de _training_dataset_stats_query rij om naar het get_training_dataset_stats formaat"""
+    def as_json(value, default):
+        if isinstance(value, str):
+            value = json.loads(value)
+        return value if value is not None else default
+
+    total = row['total']
+    labeled_count = row['labeled_count']
+    correct_predictions = row['correct_predictions']
+    accuracy = round((correct_predictions / labeled_count * 100), 1) if labeled_count > 0 else 0
+
+    return {
+        'total_images': total,
+        'labeled_count': labeled_count,
+        'unlabeled_count': total - labeled_count,
+        'training_ready': labeled_count,
+        'correct_predictions': correct_predictions,
+        'incorrect_predictions': row['incorrect_predictions'],
+        'accuracy': accuracy,
+        'error_types': [_error_type(error) for error in as_json(row['error_types'], [])],
+        'label_distribution': as_json(row['label_distribution'], {}),
+        'detection_errors': {
+            'missing': as_json(row['missing'], {}),             # Item niet gedetecteerd (false negative)
+            'false_positive': as_json(row['false_positive'], {}),  # Item foutief gedetecteerd (false positive)
+            'count_error': as_json(row['count_error'], {})      # Verkeerd aantal gedetecteerd
+        }
+    }
+
+
+def _error_type(row):
+    return {
+        'predicted': row['model_prediction'],
+        'actual': row['user_correction'],
+        'count': row['count'],
+        'description': f"Model zei '{row['model_prediction']}' maar was '{row['user_correction']}'"
+    }
 
-    # Map frontend fields to PostgreSQL fields
-    # Frontend sends: status, predicted_class, predicted_label
-    # PostgreSQL has: result, model_prediction
-    result = data.get('status', 'OK')  # status -> result
-    model_prediction = data.get('predicted_label') or data.get('predicted_class', 'unknown')
 
-    # Build metadata JSON from missing_items and other detection info
-    metadata = {}
-    if 'missing_items' in data:
-        metadata['missing_items'] = data['missing_items']
-    if 'detected_hamer' in data:
-        metadata['detected_hamer'] = data['detected_hamer']
-    if 'detected_schaar' in data:
-        metadata['detected_schaar'] = data['detected_schaar']
-    if 'detected_sleutel' in data:
-        metadata['detected_sleutel'] = data['detected_sleutel']
-    if 'total_detections' in data:
-        metadata['total_detections'] = data['total_detections']
-    if 'model_type' in data:
-        metadata['model_type'] = data['model_type']
-    if 'device_id' in data:
-        metadata['device_id'] = data['device_id']
-    if 'camera_info' in data and data['camera_info']:
-        metadata['camera_info'] = data['camera_info']
+def _model_metrics(test_accuracy=None, config=None, notes=None):
+    """Bouw metrics JSON uit test_accuracy, config en notes"""
+    metrics = {}
+    if test_accuracy is not None:
+        metrics['test_accuracy'] = test_accuracy
+    if config:
+        try:
+            metrics['config'] = json.loads(config) if isinstance(config, str) else config
+        except:
+            metrics['config'] = config
+    if notes:
+        metrics['notes'] = notes
+    return metrics
 
-    # Determine is_correct (None initially, will be set by user correction)
-    is_correct = None
 
-    # Calculate processing_time if not provided
-    processing_time = data.get('processing_time', 0.0)
+def _workplace_updates(name=None, description=None, items=None, reference_photo=None,
+                       confidence_threshold=None, whiteboard_region=None, pipeline_stages=None):
+    """
+    Bouw SET clausules voor update_workplace
 
-    cursor.execute("""
-        INSERT INTO analyses
-        (workplace_id, user_id, timestamp, image_path, result, confidence,
-         model_prediction, is_correct, processing_time, metadata, model_version)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb, %s)
-        RETURNING id
-    """, (
-        data.get('workplace_id', None),
-        data.get('user_id', None),
-        data.get('timestamp', datetime.now()),
-        data.get('image_path'),
-        result,  # status -> result
-        confidence,  # FIX #2: Never NULL
-        model_prediction,  # predicted_label -> model_prediction
-        is_correct,  # Will be set on user correction
-        processing_time,
-        json.dumps(metadata) if metadata else None,  # FIX #4: JSONB casting
-        data.get('model_version', None)
-    ))
+    Returns:
+        Tuple (updates list, params list)
+    """
+    updates = []
+    params = []
 
-    analysis_id = cursor.fetchone()['id']
-    conn.commit()
-    conn.close()
+    if name is not None:
+        updates.append("name = %s")
+        params.append(name)
+    if description is not None:
+        updates.append("description = %s")
+        params.append(description)
+    if items is not None:
+        updates.append("items = %s")
+        # Convert list to comma-separated string
+        items_str = ','.join(items) if isinstance(items, list) else items
+        params.append(items_str)
+    if reference_photo is not None:
+        # Map reference_photo to reference_photo_path
+        updates.append("reference_photo_path = %s")
+        params.append(reference_photo)
+    if confidence_threshold is not None:
+        updates.append("confidence_threshold = %s")
+        params.append(confidence_threshold)
+    # Note: active is ignored - not in PostgreSQL schema
+    if whiteboard_region is not None:
+        updates.append("whiteboard_region = %s::jsonb")
+        params.append(json.dumps(whiteboard_region) if whiteboard_region else None)
+    if pipeline_stages is not None:
+        updates.append("pipeline_stages = %s::jsonb")
+        params.append(json.dumps(pipeline_stages) if pipeline_stages else None)
 
-    return analysis_id
+    return updates, params
 
 
 def get_all_analyses(limit=100, offset=0, filter_status=None):
@@ -113,7 +1473,7 @@ def get_all_analyses(limit=100, offset=0, filter_status=None):
     - result -> status (frontend expects 'status')
     - model_prediction -> predicted_label AND predicted_class
     - user_correction -> corrected_label
-    - metadata -> extract missing_items and detection counts
+    - projectie in SQL, zie ANALYSIS_LIST_COLUMNS
 
     Args:
         limit: Maximum aantal resultaten
@@ -126,7 +1486,7 @@ def get_all_analyses(limit=100, offset=0, filter_status=None):
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    query = "SELECT * FROM analyses"
+    query = f"SELECT {ANALYSIS_LIST_COLUMNS} FROM analyses"
     params = []
 
     if filter_status:
@@ -138,48 +1498,173 @@ def get_all_analyses(limit=100, offset=0, filter_status=None):
     params.extend([limit, offset])
 
     cursor.execute(query, params)
-    rows = cursor.fetchall()
+    analyses = [dict(row) for row in cursor.fetchall()]
 
-    analyses = []
-    for row in rows:
-        analysis = dict(row)
+    conn.close()
+    return analyses
+
+
+def get_history(limit=100, offset=0, status=None, workplace_id=None, model_version=None, after=None):
+    """
+    Haal analyse geschiedenis op voor review (/api/history)
+
+    Args:
+        limit: Maximum aantal resultaten
+        offset: Offset voor paginatie (genegeerd als after gezet is)
+        status: Filter op OK/NOK (optioneel)
+        workplace_id: Filter op specifieke werkplek (optioneel)
+        model_version: Filter op specifieke model versie (optioneel)
+        after: Optioneel - (timestamp, id) van de laatste rij van de vorige pagina (keyset paginatie)
+
+    Returns:
+        List van analyse dicts met metadata velden
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
 
-        # CRITICAL: Map PostgreSQL fields to frontend expected fields
-        analysis['status'] = analysis.get('result')  # result -> status
-        analysis['predicted_label'] = analysis.get('model_prediction')  # model_prediction -> predicted_label
-        analysis['predicted_class'] = analysis.get('model_prediction')  # Also set predicted_class
-        analysis['corrected_label'] = analysis.get('user_correction')  # user_correction -> corrected_label
-        analysis['created_at'] = analysis.get('timestamp')  # timestamp -> created_at for frontend
-
-        # Extract metadata fields for frontend compatibility
-        # FIX #5: JSON parsing error handling
-        metadata = analysis.get('metadata', {})
-        if isinstance(metadata, str):
-            try:
-                metadata = json.loads(metadata)
-            except (json.JSONDecodeError, TypeError):
-                metadata = {}
-        elif metadata is None:
-            metadata = {}
-
-        # Extract fields from metadata
-        analysis['missing_items'] = metadata.get('missing_items', [])
-        analysis['detected_hamer'] = metadata.get('detected_hamer', 0)
-        analysis['detected_schaar'] = metadata.get('detected_schaar', 0)
-        analysis['detected_sleutel'] = metadata.get('detected_sleutel', 0)
-        analysis['total_detections'] = metadata.get('total_detections', 0)
-        analysis['model_type'] = metadata.get('model_type', 'classification')
-
-        # FIX #6: Path separator fixes - Convert Windows backslashes to forward slashes for frontend
-        if analysis.get('image_path'):
-            analysis['image_path'] = analysis['image_path'].replace('\\', '/')
-
-        analyses.append(analysis)
+    query, params = _history_query(limit, offset, status, workplace_id, model_version, after)
+    cursor.execute(query, params)
+    analyses = [dict(row) for row in cursor.fetchall()]
 
     conn.close()
     return analyses
 
 
+def get_sync_watermark():
+    """Servertijd min SYNC_SAFETY_SECONDS: startpunt voor de volgende delta sync"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT clock_timestamp() - make_interval(secs => %s) AS watermark",
+                   (SYNC_SAFETY_SECONDS,))
+    watermark = cursor.fetchone()['watermark']
+    conn.close()
+    return watermark
+
+
+def get_history_changes(since, limit=500, status=None, workplace_id=None, model_version=None):
+    """
+    Delta sync: analyses toegevoegd, gecorrigeerd of verwijderd na de 'since' cursor
+
+    Rijen binnen het SYNC_SAFETY_SECONDS venster kunnen twee keer komen;
+    clients mergen op id en halen rijen met removed = true weg.
+
+    Args:
+        since: (updated_at, id) tuple uit de vorige sync cursor
+        limit: Maximum aantal rijen per sync
+
+    Returns:
+        Tuple (analyses, next_since, has_more)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    # Watermark voor de query: wat na dit moment commit komt bij de volgende sync
+    cursor.execute("SELECT clock_timestamp() - make_interval(secs => %s) AS watermark",
+                   (SYNC_SAFETY_SECONDS,))
+    watermark = cursor.fetchone()['watermark']
+
+    query, params = _history_changes_query(since, limit, status, workplace_id, model_version)
+    cursor.execute(query, params)
+    analyses = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+
+    last = (analyses[-1]['updated_at'], analyses[-1]['id']) if analyses else None
+    next_since, has_more = _next_sync_cursor(last, len(analyses), since, limit, watermark)
+    return analyses, next_since, has_more
+
+
+def estimate_history_count(status=None, workplace_id=None, model_version=None):
+    """
+    Geschat aantal history rijen uit de planner statistieken (geen COUNT(*))
+
+    Returns:
+        Geschat aantal rijen (int)
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    query, params = _history_count_estimate_query(status, workplace_id, model_version)
+    cursor.execute(query, params)
+    estimate = _plan_rows(cursor.fetchone())
+    conn.close()
+    return estimate
+
+
+def get_analysis(analysis_id):
+    """
+    Haal een enkele analyse op (ruwe rij)
+
+    Args:
+        analysis_id: ID van analyse
+
+    Returns:
+        Analyse dict of None
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT * FROM analyses WHERE id = %s", (analysis_id,))
+    row = cursor.fetchone()
+    conn.close()
+
+    return dict(row) if row else None
+
+
+def delete_analysis(analysis_id):
+    """
+    Verwijder een analyse
+
+    Args:
+        analysis_id: ID van analyse
+
+    Returns:
+        Tuple (success: bool, image_path: str) - path voor file cleanup
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("DELETE FROM analyses WHERE id = %s RETURNING image_path", (analysis_id,))
+    row = cursor.fetchone()
+    conn.commit()
+    conn.close()
+    invalidate_analysis_cache()
+
+    if not row:
+        return False, None
+    return True, row['image_path']
+
+
+def move_analysis_to_training(analysis_id, new_image_path, label):
+    """
+    Update analyse nadat de foto naar trainingsdata is verplaatst
+
+    - Update image_path naar nieuwe locatie
+    - Set user_correction to label (PostgreSQL field)
+    - is_correct wordt bepaald door model_prediction met label te vergelijken
+
+    Args:
+        analysis_id: ID van analyse
+        new_image_path: Nieuw pad van de foto
+        label: Label voor de training image
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("""
+        UPDATE analyses
+        SET image_path = %s,
+            user_correction = %s,
+            is_correct = CASE
+                WHEN model_prediction IS NULL OR model_prediction = '' THEN NULL
+                ELSE model_prediction = %s
+            END
+        WHERE id = %s
+    """, (new_image_path, label, label, analysis_id))
+
+    conn.commit()
+    conn.close()
+    invalidate_analysis_cache()
+
+
 def update_correction(analysis_id, corrected_class, corrected_label, notes=None, confidence_threshold=70.0):
     """
     Update analyse met correctie (voor model verbetering)
@@ -188,6 +1673,7 @@ def update_correction(analysis_id, corrected_class, corrected_label, notes=None,
     - Uses user_correction field (NOT corrected_label)
     - Uses is_correct boolean field
     - model_prediction stays unchanged for accuracy tracking
+    - analyses_daily_rollup (reviewed/correct) volgt via de rollup trigger
 
     Args:
         analysis_id: ID van analyse
@@ -196,7 +1682,6 @@ def update_correction(analysis_id, corrected_class, corrected_label, notes=None,
         notes: Optionele notities (stored in metadata)
         confidence_threshold: Dynamische drempel voor lage confidence (default 70%)
     """
-    import os
     conn = get_db_connection()
     cursor = conn.cursor()
 
@@ -214,34 +1699,8 @@ def update_correction(analysis_id, corrected_class, corrected_label, notes=None,
 
     model_prediction = result['model_prediction']
     confidence = result['confidence'] or 0.0
-    image_path = result['image_path']
-
-    # Parse existing metadata
-    # FIX #5: JSON parsing error handling
-    metadata = result.get('metadata', {})
-    if isinstance(metadata, str):
-        try:
-            metadata = json.loads(metadata)
-        except (json.JSONDecodeError, TypeError):
-            metadata = {}
-    elif metadata is None:
-        metadata = {}
-
-    # Determine if prediction is correct
-    is_correct = (model_prediction == corrected_label)
-
-    # Bepaal of dit een training candidate is
-    threshold_decimal = confidence_threshold / 100.0
-    is_low_confidence = (confidence < threshold_decimal)
-    has_notes = notes and notes.strip() and notes.strip() != "{}"
 
-    # Store correction info in metadata
-    if notes:
-        try:
-            notes_dict = json.loads(notes) if isinstance(notes, str) else notes
-            metadata['correction_notes'] = notes_dict
-        except:
-            metadata['correction_notes'] = notes
+    is_correct, metadata = _correction_update(result, corrected_label, notes)
 
     print(f"📝 Correctie ID {analysis_id}:")
     print(f"  - AI voorspelling: {model_prediction}")
@@ -262,72 +1721,57 @@ def update_correction(analysis_id, corrected_class, corrected_label, notes=None,
 
     conn.commit()
     conn.close()
-    print(f"✅ Correctie opgeslagen!")
+    invalidate_analysis_cache()
+    print("✅ Correctie opgeslagen!")
 
 
-def get_statistics():
+def get_statistics(status=None, workplace_id=None, model_version=None):
     """
-    Haal statistieken op over analyses
+    Haal statistieken op over analyses (uit analyses_daily_rollup, kort gecached)
 
     PostgreSQL Schema:
     - status -> result
     - predicted_label -> model_prediction
     - corrected_class -> user_correction
 
+    Args:
+        status: Filter op OK/NOK (optioneel)
+        workplace_id: Filter op werkplek (optioneel)
+        model_version: Filter op model versie (optioneel)
+
     Returns:
         Dict met statistieken
     """
+    cache_key = ('statistics', status, workplace_id, model_version)
+    cached = analysis_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    generation = analysis_cache.generation
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    # Total analyses
-    cursor.execute("SELECT COUNT(*) as count FROM analyses")
-    total = cursor.fetchone()['count']
-
-    # OK vs NOK - use 'result' field
-    cursor.execute("SELECT result, COUNT(*) as count FROM analyses GROUP BY result")
-    status_rows = cursor.fetchall()
-    status_counts = {row['result']: row['count'] for row in status_rows}
-
-    # Meest voorkomende fouten - use model_prediction and result
-    cursor.execute("""
-        SELECT model_prediction, COUNT(*) as count
-        FROM analyses
-        WHERE result = 'NOK'
-        GROUP BY model_prediction
-        ORDER BY count DESC
-        LIMIT 5
-    """)
-    common_issues = cursor.fetchall()
-
-    # Gemiddelde confidence - FIX #1: COALESCE for NULL handling
-    cursor.execute("SELECT COALESCE(AVG(confidence), 0) as avg_conf FROM analyses")
-    avg_conf_result = cursor.fetchone()
-    avg_confidence = avg_conf_result['avg_conf'] if avg_conf_result else 0
-
-    # Aantal correcties - use user_correction field
-    cursor.execute("SELECT COUNT(*) as count FROM analyses WHERE user_correction IS NOT NULL")
-    corrections_count = cursor.fetchone()['count']
+    query, params = _statistics_query(status, workplace_id, model_version)
+    cursor.execute(query, params)
+    stats = _shape_statistics(cursor.fetchone())
 
     conn.close()
 
-    return {
-        'total_analyses': total,
-        'ok_count': status_counts.get('OK', 0),
-        'nok_count': status_counts.get('NOK', 0),
-        'common_issues': [{'label': row['model_prediction'], 'count': row['count']} for row in common_issues],
-        'avg_confidence': round(avg_confidence, 2) if avg_confidence else 0,
-        'corrections_count': corrections_count
-    }
+    analysis_cache.set(cache_key, stats, generation)
+    return stats
 
 
-def get_accuracy_over_time():
+def get_accuracy_over_time(workplace_id=None, model_version=None):
     """
-    Bereken model accuracy per week om verbetering over tijd te tracken
+    Bereken model accuracy per dag (met ISO week) om verbetering over tijd te tracken
 
-    PostgreSQL Schema:
-    - Uses is_correct boolean field
-    - user_correction IS NOT NULL indicates reviewed
+    Leest uit analyses_daily_rollup:
+    - reviewed = analyses met user_correction
+    - correct = beoordeelde analyses met is_correct = TRUE
+
+    Args:
+        workplace_id: Filter op werkplek (optioneel)
+        model_version: Filter op model versie (optioneel)
 
     Returns:
         List van dicts met week info en accuracy percentage
@@ -335,46 +1779,23 @@ def get_accuracy_over_time():
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    # FIX #1: COALESCE voor SUM() NULL handling
-    # Use is_correct boolean field instead of comparing predicted_label = corrected_label
-    cursor.execute("""
-        SELECT
-            TO_CHAR(timestamp, 'IYYY-IW') as week,
-            TO_CHAR(timestamp, 'YYYY-MM-DD') as date,
-            COUNT(*) as total,
-            COALESCE(SUM(CASE WHEN is_correct = TRUE THEN 1 ELSE 0 END), 0) as correct
-        FROM analyses
-        WHERE user_correction IS NOT NULL
-        GROUP BY week, date
-        ORDER BY date ASC
-    """)
+    query, params = _accuracy_timeline_query(workplace_id, model_version)
+    cursor.execute(query, params)
 
     results = cursor.fetchall()
     conn.close()
 
-    # Bereken accuracy percentage per week
-    timeline = []
-    for row in results:
-        total = row['total']
-        correct = row['correct']
-        accuracy = round((correct / total * 100), 1) if total > 0 else 0
-        timeline.append({
-            'week': row['week'],
-            'date': row['date'],
-            'total': total,
-            'correct': correct,
-            'accuracy': accuracy
-        })
-
-    return timeline
+    # Bereken accuracy percentage per dag
+    return _accuracy_timeline(results)
 
 
-def get_accuracy_stats():
+def get_accuracy_stats(workplace_id=None, model_version=None):
     """
     Bereken model accuracy statistieken (gebruikt voor timeline chart)
 
-    PostgreSQL Schema:
-    - Uses is_correct boolean field
+    Args:
+        workplace_id: Filter op werkplek (optioneel)
+        model_version: Filter op model versie (optioneel)
 
     Returns:
         Dict met accuracy metrics
@@ -382,29 +1803,13 @@ def get_accuracy_stats():
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    # FIX #1: COALESCE voor SUM() NULL handling - voorkomt NULL bij lege resultaten
-    # Use is_correct boolean field
-    cursor.execute("""
-        SELECT
-            COUNT(*) as total,
-            COALESCE(SUM(CASE WHEN is_correct = TRUE THEN 1 ELSE 0 END), 0) as correct
-        FROM analyses
-        WHERE user_correction IS NOT NULL
-    """)
+    query, params = _accuracy_stats_query(workplace_id, model_version)
+    cursor.execute(query, params)
 
     result = cursor.fetchone()
     conn.close()
 
-    total = result['total'] if result else 0
-    correct = result['correct'] if result else 0
-
-    accuracy = round((correct / total * 100), 1) if total > 0 else 0
-
-    return {
-        'total': total,
-        'correct': correct,
-        'accuracy': accuracy
-    }
+    return _shape_accuracy_stats(result)
 
 
 def get_training_candidates(confidence_threshold=70.0):
@@ -422,49 +1827,14 @@ def get_training_candidates(confidence_threshold=70.0):
     Returns:
         List van analyse dicts die klaar zijn voor training
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Convert percentage naar decimaal
-    threshold_decimal = confidence_threshold / 100.0
-
-    # Select candidates: reviewed (has user_correction) AND (incorrect OR low confidence)
-    cursor.execute("""
-        SELECT * FROM analyses
-        WHERE user_correction IS NOT NULL
-        AND (
-            is_correct = FALSE
-            OR confidence < %s
-        )
-        ORDER BY timestamp DESC
-    """, (threshold_decimal,))
-
-    rows = cursor.fetchall()
-
-    candidates = []
-    for row in rows:
-        analysis = dict(row)
-
-        # Map PostgreSQL fields to frontend expected fields
-        analysis['status'] = analysis.get('result')
-        analysis['predicted_label'] = analysis.get('model_prediction')
-        analysis['predicted_class'] = analysis.get('model_prediction')
-        analysis['corrected_label'] = analysis.get('user_correction')
-
-        # Extract metadata fields
-        # FIX #5: JSON parsing error handling
-        metadata = analysis.get('metadata', {})
-        if isinstance(metadata, str):
-            try:
-                metadata = json.loads(metadata)
-            except (json.JSONDecodeError, TypeError):
-                metadata = {}
-        elif metadata is None:
-            metadata = {}
+    conn = get_db_connection()
+    cursor = conn.cursor()
 
-        analysis['missing_items'] = metadata.get('missing_items', [])
+    # Select candidates: reviewed (has user_correction) AND (incorrect OR low confidence)
+    query, params = _training_candidates_query(confidence_threshold)
+    cursor.execute(query, params)
 
-        candidates.append(analysis)
+    candidates = [dict(row) for row in cursor.fetchall()]
 
     conn.close()
     print(f"📊 Training candidates met drempel {confidence_threshold}%: {len(candidates)} gevonden")
@@ -540,7 +1910,7 @@ def mark_as_exported(analysis_ids):
 def export_training_data(analysis_ids, export_base_path):
     """
     Exporteer geselecteerde analyses voor retraining
-    Organiseert foto's in mappen per corrected_class
+    Organiseert foto's in mappen per corrected_class (hardlinks uit de object store)
 
     Args:
         analysis_ids: List van analysis IDs om te exporteren
@@ -549,9 +1919,6 @@ def export_training_data(analysis_ids, export_base_path):
     Returns:
         Dict met export statistieken
     """
-    import shutil
-    from pathlib import Path
-
     conn = get_db_connection()
     cursor = conn.cursor()
 
@@ -564,67 +1931,213 @@ def export_training_data(analysis_ids, export_base_path):
     rows = cursor.fetchall()
     conn.close()
 
-    export_path = Path(export_base_path)
-    export_path.mkdir(parents=True, exist_ok=True)
+    result = _export_training_files(rows, export_base_path)
 
-    stats = {}
+    # Markeer als geëxporteerd (alleen analyses waarvan de foto er echt in zit)
+    if result['analysis_ids']:
+        mark_as_exported(result['analysis_ids'])
 
-    for row in rows:
-        analysis = dict(row)
-        corrected_class = analysis['corrected_class']
-        image_path = Path(analysis['image_path']) if analysis.get('image_path') else None
+    return result
 
-        if not image_path:
-            continue
 
-        # Maak class directory aan
-        class_dir = export_path / str(corrected_class)
-        class_dir.mkdir(exist_ok=True)
+def _export_training_files(rows, export_base_path):
+    """
+    Schrijf analyse foto's als snapshot met mappen per gecorrigeerde class
+
+    De foto's komen via de object store als hardlinks in de export (geen
+    kopieën); manifest.json legt per foto content hash, label en split vast.
+
+    Args:
+        rows: Analyse rijen
+        export_base_path: Basis pad voor export
 
-        # Kopieer afbeelding
-        if image_path.exists():
-            dest_path = class_dir / image_path.name
-            shutil.copy2(image_path, dest_path)
+    Returns:
+        Dict met export statistieken; total_exported telt alleen de foto's
+        die in de snapshot staan (ontbrekende bestanden tellen als skipped)
+    """
+    from training_snapshots import build_manifest, write_snapshot
+
+    items = []
+    for row in rows:
+        analysis = dict(row)
+        # PostgreSQL: corrected_class -> user_correction
+        corrected_class = analysis.get('user_correction')
+        if not analysis.get('image_path'):
+            continue
 
-            # Update statistieken
-            if corrected_class not in stats:
-                stats[corrected_class] = 0
-            stats[corrected_class] += 1
+        image_path = Path(analysis['image_path'])
+        items.append({
+            'file': f"{corrected_class}/{image_path.name}",
+            'source': image_path,
+            'label': corrected_class,
+            'analysis_id': analysis['id']
+        })
 
-    # Markeer als geëxporteerd
-    mark_as_exported(analysis_ids)
+    manifest = build_manifest(items)
+    manifest_path = write_snapshot(export_base_path, manifest)
 
+    exported_ids = [entry['analysis_id'] for entry in manifest['entries']]
     return {
-        'total_exported': len(rows),
-        'export_path': str(export_path),
-        'class_distribution': stats
+        'total_exported': len(exported_ids),
+        'skipped': len(rows) - len(exported_ids),
+        'analysis_ids': exported_ids,
+        'export_path': str(Path(export_base_path)),
+        'manifest_path': str(manifest_path),
+        'content_hash': manifest['content_hash'],
+        'class_distribution': manifest['class_distribution']
     }
 
 
-def export_to_csv(output_path):
+EXPORT_CSV_COLUMNS = """
+    id, workplace_id, timestamp, result, model_prediction, user_correction, is_correct,
+    confidence, processing_time, model_version, model_type, device_id,
+    detected_hamer, detected_schaar, detected_sleutel, total_detections,
+    array_to_string(missing_items, ',') AS missing_items, image_path, metadata::text AS metadata
+"""
+
+
+def _export_csv_query(start=None, end=None, workplace_id=None, model_version=None):
     """
-    Export alle analyses naar CSV voor analyse in Excel
+    COPY statement voor de CSV export (nieuwste eerst)
+
+    Een datumbereik beperkt de scan tot de betreffende maandpartities.
 
     Args:
-        output_path: Pad voor CSV bestand
+        start: Vanaf datum/tijd (optioneel)
+        end: Tot datum/tijd (optioneel)
+        workplace_id: Filter op werkplek (optioneel)
+        model_version: Filter op model versie (optioneel)
+
+    Returns:
+        Tuple (copy_statement, params)
+    """
+    conditions, params = _analysis_filters(None, workplace_id, model_version)
+
+    if start:
+        conditions.append("timestamp >= %s")
+        params.append(start)
+
+    if end:
+        conditions.append("timestamp < %s")
+        params.append(end)
+
+    query = f"SELECT {EXPORT_CSV_COLUMNS} FROM analyses"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY timestamp DESC, id DESC"
+
+    return f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)", params
+
+
+def export_to_csv(output_path, start=None, end=None, workplace_id=None, model_version=None):
     """
-    import csv
+    Export analyses naar CSV voor analyse in Excel (via COPY, constant geheugen)
+
+    Args:
+        output_path: Pad voor CSV bestand
+        start: Vanaf datum/tijd (optioneel)
+        end: Tot datum/tijd (optioneel)
+        workplace_id: Filter op werkplek (optioneel)
+        model_version: Filter op model versie (optioneel)
 
+    Returns:
+        Aantal geëxporteerde analyses
+    """
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    cursor.execute("SELECT * FROM analyses ORDER BY created_at DESC")
-    rows = cursor.fetchall()
+    statement, params = _export_csv_query(start, end, workplace_id, model_version)
 
     with open(output_path, 'w', newline='', encoding='utf-8') as f:
-        if rows:
-            writer = csv.DictWriter(f, fieldnames=rows[0].keys())
-            writer.writeheader()
-            for row in rows:
-                writer.writerow(dict(row))
+        cursor.copy_expert(cursor.mogrify(statement, params).decode('utf-8'), f)
+
+    count = cursor.rowcount
+    conn.close()
+    return count
+
+
+def _rescore_filters(start=None, end=None, workplace_id=None, model_version=None, analysis_ids=None):
+    """WHERE condities voor bulk re-scoring"""
+    conditions, params = _analysis_filters(workplace_id=workplace_id, model_version=model_version)
+
+    if start:
+        conditions.append("timestamp >= %s")
+        params.append(start)
+
+    if end:
+        conditions.append("timestamp < %s")
+        params.append(end)
+
+    if analysis_ids:
+        conditions.append("id = ANY(%s)")
+        params.append(list(analysis_ids))
+
+    return conditions, params
+
+
+def count_rescore_candidates(**filters):
+    """Aantal analyses dat een re-scoring job met deze filters verwerkt"""
+    conditions, params = _rescore_filters(**filters)
+    where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT COUNT(*) AS count FROM analyses {where}", params)
+    count = cursor.fetchone()['count']
+    conn.close()
+    return count
+
+
+def get_rescore_batch(after_id=0, limit=100, **filters):
+    """
+    Volgende batch analyses voor bulk re-scoring (keyset op id)
+
+    Args:
+        after_id: Laatst verwerkte analysis ID (checkpoint)
+        limit: Batch grootte
+        **filters: start, end, workplace_id, model_version, analysis_ids
+
+    Returns:
+        List van dicts met id, workplace_id, image_path, model_prediction
+    """
+    conditions, params = _rescore_filters(**filters)
+    conditions.append("id > %s")
+    params += [after_id, limit]
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT id, workplace_id, image_path, model_prediction
+        FROM analyses
+        WHERE {' AND '.join(conditions)}
+        ORDER BY id
+        LIMIT %s
+    """, params)
+    rows = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    return rows
+
+
+def save_rescore_results(results):
+    """
+    Sla re-scoring resultaten op in metadata.rescore (originele voorspelling blijft staan)
+
+    Args:
+        results: List van (analysis_id, rescore dict)
+    """
+    if not results:
+        return
 
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    execute_values(cursor, """
+        UPDATE analyses AS a
+        SET metadata = COALESCE(a.metadata, '{}'::jsonb) || jsonb_build_object('rescore', v.rescore::jsonb)
+        FROM (VALUES %s) AS v(id, rescore)
+        WHERE a.id = v.id
+    """, [(analysis_id, json.dumps(rescore)) for analysis_id, rescore in results])
+    conn.commit()
     conn.close()
-    return len(rows)
 
 
 # ========================================
@@ -663,6 +2176,7 @@ def create_workplace(name, description, items, reference_photo=None):
 
         workplace_id = cursor.fetchone()['id']
         conn.commit()
+        invalidate_workplace_cache()
         print(f"OK Werkplek '{name}' aangemaakt (ID: {workplace_id})")
         return workplace_id
 
@@ -697,43 +2211,46 @@ def get_all_workplaces(active_only=True):
     query += " ORDER BY created_at DESC"
 
     cursor.execute(query)
-    rows = cursor.fetchall()
+    workplaces = [_shape_workplace(row) for row in cursor.fetchall()]
 
-    workplaces = []
-    for row in rows:
-        wp = dict(row)
+    conn.close()
+    return workplaces
 
-        # Map PostgreSQL fields to frontend expected fields
-        wp['reference_photo'] = wp.get('reference_photo_path')  # Map reference_photo_path -> reference_photo
 
-        # FIX #6: Items empty string edge case - handle trailing commas
-        if wp.get('items'):
-            items_str = wp['items'].strip()
-            # Split and filter out empty strings
-            wp['items'] = [item.strip() for item in items_str.split(',') if item.strip()] if items_str else []
-        else:
-            wp['items'] = []
+def get_workplace_config(workplace_id):
+    """
+    Haal werkplek rij, actief model en drempel op (read-through cache)
 
-        # FIX #5: Whiteboard JSON parsing error handling
-        if wp.get('whiteboard_region'):
-            try:
-                if isinstance(wp['whiteboard_region'], str):
-                    wp['whiteboard_region'] = json.loads(wp['whiteboard_region'])
-            except (json.JSONDecodeError, TypeError):
-                wp['whiteboard_region'] = None
+    Een cache miss kost een query (WORKPLACE_CONFIG_QUERY); daarna komen
+    get_workplace, get_workplace_model en get_workplace_threshold uit het
+    geheugen tot de TTL verloopt of een wijziging de cache invalideert.
+
+    Args:
+        workplace_id: ID van werkplek
 
-        # Alias for frontend compatibility (always True if no is_active field)
-        wp['active'] = True
+    Returns:
+        Dict met workplace, model en confidence_threshold (niet muteren)
+    """
+    cache_key = ('workplace', workplace_id)
+    cached = workplace_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    generation = workplace_cache.generation
 
-        workplaces.append(wp)
+    conn = get_db_connection()
+    cursor = conn.cursor()
 
+    cursor.execute(WORKPLACE_CONFIG_QUERY, (workplace_id,))
+    config = _shape_workplace_config(cursor.fetchone())
     conn.close()
-    return workplaces
+
+    workplace_cache.set(cache_key, config, generation)
+    return config
 
 
 def get_workplace(workplace_id):
     """
-    Haal specifieke werkplek op
+    Haal specifieke werkplek op (via de werkplek cache)
 
     PostgreSQL Schema:
     - reference_photo_path needs to be mapped to reference_photo for frontend
@@ -744,44 +2261,21 @@ def get_workplace(workplace_id):
     Returns:
         Werkplek dict of None with frontend-compatible field names
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT * FROM workplaces WHERE id = %s", (workplace_id,))
-    row = cursor.fetchone()
-
-    if row:
-        wp = dict(row)
+    workplace = get_workplace_config(workplace_id)['workplace']
+    return copy.deepcopy(workplace) if workplace else None
 
-        # Map PostgreSQL fields to frontend expected fields
-        wp['reference_photo'] = wp.get('reference_photo_path')  # Map reference_photo_path -> reference_photo
 
-        # FIX #6: Items empty string edge case
-        if wp.get('items'):
-            items_str = wp['items'].strip()
-            wp['items'] = [item.strip() for item in items_str.split(',') if item.strip()] if items_str else []
-        else:
-            wp['items'] = []
-
-        # FIX #5: Whiteboard JSON parsing error handling
-        if wp.get('whiteboard_region'):
-            try:
-                if isinstance(wp['whiteboard_region'], str):
-                    wp['whiteboard_region'] = json.loads(wp['whiteboard_region'])
-            except (json.JSONDecodeError, TypeError):
-                wp['whiteboard_region'] = None
-
-        # Alias for frontend compatibility (always True if no is_active field)
-        wp['active'] = True
-
-        conn.close()
-        return wp
+def get_workplace_threshold(workplace_id):
+    """
+    Confidence drempel (0.0-1.0) van een werkplek, of None als niet ingesteld
 
-    conn.close()
-    return None
+    Args:
+        workplace_id: ID van werkplek
+    """
+    return get_workplace_config(workplace_id)['confidence_threshold']
 
 
-def update_workplace(workplace_id, name=None, description=None, items=None, reference_photo=None, active=None, confidence_threshold=None, whiteboard_region=None):
+def update_workplace(workplace_id, name=None, description=None, items=None, reference_photo=None, active=None, confidence_threshold=None, whiteboard_region=None, pipeline_stages=None):
     """
     Update werkplek gegevens
 
@@ -798,35 +2292,14 @@ def update_workplace(workplace_id, name=None, description=None, items=None, refe
         active: Nieuwe active status (optioneel) - IGNORED, no is_active field
         confidence_threshold: Confidence drempel 0.0-1.0 (optioneel)
         whiteboard_region: Whiteboard region dict met x1, y1, x2, y2 (optioneel)
+        pipeline_stages: Optionele inspectie stages, bijv. {"roi": true} (optioneel, {} = alles uit)
     """
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    updates = []
-    params = []
-
-    if name is not None:
-        updates.append("name = %s")
-        params.append(name)
-    if description is not None:
-        updates.append("description = %s")
-        params.append(description)
-    if items is not None:
-        updates.append("items = %s")
-        # Convert list to comma-separated string
-        items_str = ','.join(items) if isinstance(items, list) else items
-        params.append(items_str)
-    if reference_photo is not None:
-        # Map reference_photo to reference_photo_path
-        updates.append("reference_photo_path = %s")
-        params.append(reference_photo)
-    if confidence_threshold is not None:
-        updates.append("confidence_threshold = %s")
-        params.append(confidence_threshold)
     # Note: active is ignored - not in PostgreSQL schema
-    if whiteboard_region is not None:
-        updates.append("whiteboard_region = %s::jsonb")
-        params.append(json.dumps(whiteboard_region) if whiteboard_region else None)
+    updates, params = _workplace_updates(name, description, items, reference_photo,
+                                         confidence_threshold, whiteboard_region, pipeline_stages)
 
     if updates:
         updates.append("updated_at = CURRENT_TIMESTAMP")
@@ -835,6 +2308,7 @@ def update_workplace(workplace_id, name=None, description=None, items=None, refe
         query = f"UPDATE workplaces SET {', '.join(updates)} WHERE id = %s"
         cursor.execute(query, params)
         conn.commit()
+        invalidate_workplace_cache()
         print(f"OK Werkplek {workplace_id} bijgewerkt")
 
     conn.close()
@@ -853,6 +2327,7 @@ def delete_workplace(workplace_id):
     cursor.execute("DELETE FROM workplaces WHERE id = %s", (workplace_id,))
     conn.commit()
     conn.close()
+    invalidate_workplace_cache()
 
     print(f"🗑️ Werkplek {workplace_id} verwijderd")
 
@@ -879,6 +2354,7 @@ def set_workplace_model(workplace_id, model_type, model_path):
 
     conn.commit()
     conn.close()
+    invalidate_workplace_cache()
 
     print(f"✅ Werkplek {workplace_id}: model gezet naar {model_type} ({model_path})")
 
@@ -887,34 +2363,16 @@ def get_workplace_model(workplace_id):
     """
     Haal actief model configuratie op voor een werkplek (inclusief model versie)
 
+    Komt uit de werkplek cache: geen query op het inspect hot path.
+
     Args:
         workplace_id: ID van werkplek
 
     Returns:
         Dict met model_type, model_path en model_version, of None als niet geconfigureerd
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    # Haal werkplek model info + actief model uit models tabel
-    # PostgreSQL schema: workplaces has 'model_type' (NOT 'active_model_type')
-    cursor.execute("""
-        SELECT w.model_type, w.active_model_path, m.version
-        FROM workplaces w
-        LEFT JOIN models m ON m.workplace_id = w.id AND m.is_active = TRUE
-        WHERE w.id = %s
-    """, (workplace_id,))
-
-    result = cursor.fetchone()
-    conn.close()
-
-    if result and result['model_type']:
-        return {
-            'model_type': result['model_type'],
-            'model_path': result['active_model_path'],
-            'model_version': result['version']  # Kan None zijn als geen actief model in models tabel
-        }
-    return None
+    model = get_workplace_config(workplace_id)['model']
+    return dict(model) if model else None
 
 
 # ========================================
@@ -1053,7 +2511,7 @@ def delete_training_image(image_id):
         return False, None
 
 
-def get_training_dataset_stats(workplace_id, model_version=None):
+def get_training_dataset_stats(workplace_id, model_version=None, use_cache=True):
     """
     Haal dataset statistieken op voor werkplek - focus op MODEL FOUTEN
 
@@ -1063,151 +2521,36 @@ def get_training_dataset_stats(workplace_id, model_version=None):
     - Uses is_correct boolean
     - Correction notes stored in metadata->correction_notes
 
+    Berekend in een enkele query (zie _training_dataset_stats_query) en per
+    (werkplek, model versie) gecached tot de volgende correctie of wijziging.
+
     Args:
         workplace_id: ID van werkplek
         model_version: Optioneel - filter op specifieke model versie (bijv. "v1.0", "v2.0")
+        use_cache: Gebruik de analyse cache (default True)
 
     Returns:
         Dict met statistieken over model prestaties en fout types
     """
+    cache_key = ('dataset_stats', workplace_id, model_version or None)
+    if use_cache:
+        cached = analysis_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    generation = analysis_cache.generation
+
     conn = get_db_connection()
     cursor = conn.cursor()
 
-    # Build WHERE clause with optional model_version filter
-    if model_version:
-        where_base = "workplace_id = %s AND model_version = %s"
-        params_base = (workplace_id, model_version)
-    else:
-        where_base = "workplace_id = %s"
-        params_base = (workplace_id,)
-
-    # Totaal aantal analyses/foto's voor deze werkplek (+ optioneel model filter)
-    cursor.execute(f"SELECT COUNT(*) as count FROM analyses WHERE {where_base}", params_base)
-    total = cursor.fetchone()['count']
-
-    # Beoordeelde foto's (hebben user_correction)
-    cursor.execute(f"""
-        SELECT COUNT(*) as count FROM analyses
-        WHERE {where_base} AND user_correction IS NOT NULL AND user_correction != ''
-    """, params_base)
-    labeled_count = cursor.fetchone()['count']
-
-    unlabeled_count = total - labeled_count
-
-    # MODEL ACCURACY: Correct voorspeld (is_correct = TRUE)
-    cursor.execute(f"""
-        SELECT COUNT(*) as count FROM analyses
-        WHERE {where_base}
-        AND user_correction IS NOT NULL
-        AND is_correct = TRUE
-    """, params_base)
-    correct_predictions = cursor.fetchone()['count']
-
-    # MODEL FOUTEN: Incorrect voorspeld (is_correct = FALSE)
-    cursor.execute(f"""
-        SELECT COUNT(*) as count FROM analyses
-        WHERE {where_base}
-        AND user_correction IS NOT NULL
-        AND is_correct = FALSE
-    """, params_base)
-    incorrect_predictions = cursor.fetchone()['count']
-
-    # FOUT TYPES: Welke fouten maakt het model?
-    cursor.execute(f"""
-        SELECT
-            model_prediction,
-            user_correction,
-            COUNT(*) as count
-        FROM analyses
-        WHERE {where_base}
-        AND user_correction IS NOT NULL
-        AND is_correct = FALSE
-        GROUP BY model_prediction, user_correction
-        ORDER BY count DESC
-    """, params_base)
-
-    error_types = []
-    for row in cursor.fetchall():
-        error_types.append({
-            'predicted': row['model_prediction'],
-            'actual': row['user_correction'],
-            'count': row['count'],
-            'description': f"Model zei '{row['model_prediction']}' maar was '{row['user_correction']}'"
-        })
-
-    # Distributie van user_correction labels (voor training set balans)
-    cursor.execute(f"""
-        SELECT user_correction, COUNT(*) as count
-        FROM analyses
-        WHERE {where_base} AND user_correction IS NOT NULL AND user_correction != ''
-        GROUP BY user_correction
-        ORDER BY count DESC
-    """, params_base)
-    label_rows = cursor.fetchall()
-    label_distribution = {row['user_correction']: row['count'] for row in label_rows}
-
-    # DETECTIE FOUTEN PER OBJECT (uit metadata->correction_notes JSON)
-    cursor.execute(f"""
-        SELECT metadata
-        FROM analyses
-        WHERE {where_base}
-        AND metadata IS NOT NULL
-        AND metadata->>'correction_notes' IS NOT NULL
-    """, params_base)
-
-    detection_errors = {
-        'missing': {},      # Item niet gedetecteerd (false negative)
-        'false_positive': {},  # Item foutief gedetecteerd (false positive)
-        'count_error': {}   # Verkeerd aantal gedetecteerd
-    }
-
-    for row in cursor.fetchall():
-        try:
-            # FIX #5: JSON parsing error handling
-            metadata = row['metadata']
-            if isinstance(metadata, str):
-                metadata = json.loads(metadata)
-
-            notes = metadata.get('correction_notes', {})
-            if isinstance(notes, str):
-                notes = json.loads(notes)
-
-            # Parse missing items
-            if 'missing_items' in notes and notes['missing_items']:
-                for item in notes['missing_items']:
-                    detection_errors['missing'][item] = detection_errors['missing'].get(item, 0) + 1
-
-            # Parse false positives
-            if 'false_positives' in notes and notes['false_positives']:
-                for item in notes['false_positives']:
-                    detection_errors['false_positive'][item] = detection_errors['false_positive'].get(item, 0) + 1
-
-            # Parse count errors
-            if 'incorrect_counts' in notes and notes['incorrect_counts']:
-                for item, count_data in notes['incorrect_counts'].items():
-                    detected = count_data.get('detected', 0)
-                    expected = count_data.get('expected', 0)
-                    error_key = f"{item} ({detected}x ipv {expected}x)"
-                    detection_errors['count_error'][error_key] = detection_errors['count_error'].get(error_key, 0) + 1
-        except:
-            continue
+    query, params = _training_dataset_stats_query(workplace_id, model_version)
+    cursor.execute(query, params)
+    stats = _shape_training_dataset_stats(cursor.fetchone())
 
     conn.close()
 
-    accuracy = round((correct_predictions / labeled_count * 100), 1) if labeled_count > 0 else 0
-
-    return {
-        'total_images': total,
-        'labeled_count': labeled_count,
-        'unlabeled_count': unlabeled_count,
-        'training_ready': labeled_count,
-        'correct_predictions': correct_predictions,
-        'incorrect_predictions': incorrect_predictions,
-        'accuracy': accuracy,
-        'error_types': error_types,
-        'label_distribution': label_distribution,
-        'detection_errors': detection_errors
-    }
+    if use_cache:
+        analysis_cache.set(cache_key, stats, generation)
+    return stats
 
 
 def validate_training_image(image_id, validated=True):
@@ -1262,16 +2605,7 @@ def register_model(workplace_id, version, model_path, model_type='classification
     cursor = conn.cursor()
 
     # Build metrics JSON from test_accuracy, config, and notes
-    metrics = {}
-    if test_accuracy is not None:
-        metrics['test_accuracy'] = test_accuracy
-    if config:
-        try:
-            metrics['config'] = json.loads(config) if isinstance(config, str) else config
-        except:
-            metrics['config'] = config
-    if notes:
-        metrics['notes'] = notes
+    metrics = _model_metrics(test_accuracy, config, notes)
 
     cursor.execute("""
         INSERT INTO models
@@ -1315,35 +2649,7 @@ def get_models(workplace_id, status=None):
     query += " ORDER BY training_date DESC"
 
     cursor.execute(query, params)
-    rows = cursor.fetchall()
-
-    models = []
-    # FIX #3: Boolean conversion for is_active field
-    for row in rows:
-        model = dict(row)
-        if 'is_active' in model:
-            model['is_active'] = bool(model['is_active'])
-
-        # Extract metrics for frontend compatibility
-        # FIX #5: JSON parsing error handling
-        metrics = model.get('metrics', {})
-        if isinstance(metrics, str):
-            try:
-                metrics = json.loads(metrics)
-            except (json.JSONDecodeError, TypeError):
-                metrics = {}
-        elif metrics is None:
-            metrics = {}
-
-        # Map metrics fields to top-level for frontend compatibility
-        model['test_accuracy'] = metrics.get('test_accuracy')
-        model['config'] = metrics.get('config')
-        model['notes'] = metrics.get('notes')
-
-        # Map training_date to uploaded_at for frontend compatibility
-        model['uploaded_at'] = model.get('training_date')
-
-        models.append(model)
+    models = [_shape_model(row) for row in cursor.fetchall()]
 
     conn.close()
     return models
@@ -1376,33 +2682,69 @@ def get_active_model(workplace_id):
     row = cursor.fetchone()
     conn.close()
 
-    if row:
-        model = dict(row)
-        # FIX #3: Boolean conversion
-        if 'is_active' in model:
-            model['is_active'] = bool(model['is_active'])
+    return _shape_model(row) if row else None
+
+
+def get_model(model_id):
+    """
+    Haal een model op (ruwe rij)
+
+    Args:
+        model_id: ID van model
+
+    Returns:
+        Model dict of None
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT * FROM models WHERE id = %s", (model_id,))
+    row = cursor.fetchone()
+    conn.close()
+
+    return dict(row) if row else None
+
+
+def delete_model(model_id):
+    """
+    Verwijder model uit database (bestand opruimen is aan de caller)
+
+    Args:
+        model_id: ID van model
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("DELETE FROM models WHERE id = %s", (model_id,))
+    conn.commit()
+    conn.close()
+    invalidate_workplace_cache()  # Kan het actieve model zijn
+
 
-        # Extract metrics for frontend compatibility
-        # FIX #5: JSON parsing error handling
-        metrics = model.get('metrics', {})
-        if isinstance(metrics, str):
-            try:
-                metrics = json.loads(metrics)
-            except (json.JSONDecodeError, TypeError):
-                metrics = {}
-        elif metrics is None:
-            metrics = {}
+def get_model_versions(workplace_id):
+    """
+    Haal unieke model versies op die analyses hebben gegenereerd voor een werkplek
+
+    Args:
+        workplace_id: ID van werkplek
 
-        # Map metrics fields to top-level for frontend compatibility
-        model['test_accuracy'] = metrics.get('test_accuracy')
-        model['config'] = metrics.get('config')
-        model['notes'] = metrics.get('notes')
+    Returns:
+        List van model versie strings
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
 
-        # Map training_date to uploaded_at for frontend compatibility
-        model['uploaded_at'] = model.get('training_date')
+    cursor.execute("""
+        SELECT DISTINCT model_version
+        FROM analyses
+        WHERE workplace_id = %s
+        AND model_version IS NOT NULL
+        ORDER BY model_version DESC
+    """, (workplace_id,))
 
-        return model
-    return None
+    versions = [row['model_version'] for row in cursor.fetchall()]
+    conn.close()
+    return versions
 
 
 def activate_model(model_id):
@@ -1453,6 +2795,7 @@ def activate_model(model_id):
 
     conn.commit()
     conn.close()
+    invalidate_workplace_cache()
 
     print(f"✅ Model {model_id} geactiveerd voor werkplek {workplace_id} ({model_type} type)")
 
@@ -1461,17 +2804,21 @@ def activate_model(model_id):
 # DATASET EXPORT FUNCTIES
 # ========================================
 
-def register_dataset_export(workplace_id, export_path, image_count, class_distribution, exported_by='admin', notes=None):
+def register_dataset_export(workplace_id, export_path, image_count, class_distribution, exported_by='admin', notes=None,
+                            manifest_path=None, content_hash=None, base_export_id=None):
     """
     Registreer dataset export
 
     Args:
         workplace_id: ID van werkplek
-        export_path: Pad naar export ZIP
+        export_path: Pad naar de export (snapshot map)
         image_count: Aantal afbeeldingen
         class_distribution: Dict met class verdeling
         exported_by: Wie heeft geëxporteerd
         notes: Notities
+        manifest_path: Pad naar manifest.json van de snapshot
+        content_hash: Hash over (content hash, label, split) van alle images
+        base_export_id: Export waar deze delta export op voortbouwt
 
     Returns:
         ID van export
@@ -1481,10 +2828,12 @@ def register_dataset_export(workplace_id, export_path, image_count, class_distri
 
     cursor.execute("""
         INSERT INTO dataset_exports
-        (workplace_id, export_path, image_count, class_distribution, exported_by, notes)
-        VALUES (%s, %s, %s, %s, %s, %s)
+        (workplace_id, export_path, image_count, class_distribution, exported_by, notes,
+         manifest_path, content_hash, base_export_id)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
         RETURNING id
-    """, (workplace_id, export_path, image_count, json.dumps(class_distribution), exported_by, notes))
+    """, (workplace_id, export_path, image_count, json.dumps(class_distribution), exported_by, notes,
+          manifest_path, content_hash, base_export_id))
 
     export_id = cursor.fetchone()['id']
     conn.commit()
@@ -1494,6 +2843,26 @@ def register_dataset_export(workplace_id, export_path, image_count, class_distri
     return export_id
 
 
+def get_dataset_export(export_id):
+    """
+    Haal een dataset export op
+
+    Args:
+        export_id: ID van export
+
+    Returns:
+        Export dict of None
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    cursor.execute("SELECT * FROM dataset_exports WHERE id = %s", (export_id,))
+    row = cursor.fetchone()
+
+    conn.close()
+    return _shape_dataset_export(row) if row else None
+
+
 def get_dataset_exports(workplace_id):
     """
     Haal dataset exports op voor werkplek
@@ -1513,16 +2882,7 @@ def get_dataset_exports(workplace_id):
         ORDER BY exported_at DESC
     """, (workplace_id,))
 
-    rows = cursor.fetchall()
-
-    exports = []
-    for row in rows:
-        export = dict(row)
-        try:
-            export['class_distribution'] = json.loads(export['class_distribution'])
-        except:
-            export['class_distribution'] = {}
-        exports.append(export)
+    exports = [_shape_dataset_export(row) for row in cursor.fetchall()]
 
     conn.close()
     return exports
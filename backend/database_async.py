@@ -0,0 +1,660 @@
+"""
+Async database module - PostgreSQL via psycopg 3 (AsyncConnectionPool)
+Zelfde functies en dict formaten als database.py, maar non-blocking voor de
+FastAPI event loop. database.py blijft beschikbaar voor scripts en threads.
+"""
+
+import asyncio
+import copy
+import json
+import os
+from dotenv import load_dotenv
+import psycopg
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+from database import (
+    ANALYSIS_INSERT_COLUMNS, ANALYSIS_INSERT_TEMPLATE, DATABASE_URL, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT,
+    _analysis_insert_params, _shape_workplace, _shape_model, _shape_dataset_export,
+    ANALYSIS_LIST_COLUMNS, _json_page_query, _training_candidates_query,
+    _history_query, _correction_update, _accuracy_timeline, _export_csv_query,
+    _model_metrics, _workplace_updates, _export_training_files,
+    _statistics_query, _shape_statistics, _training_dataset_stats_query,
+    _accuracy_timeline_query, _accuracy_stats_query, _shape_accuracy_stats,
+    _shape_training_dataset_stats, _history_changes_query, _history_count_estimate_query,
+    _plan_rows, _next_sync_cursor, SYNC_SAFETY_SECONDS, analysis_cache, invalidate_analysis_cache,
+    WORKPLACE_CONFIG_QUERY, _shape_workplace_config, workplace_cache, invalidate_workplace_cache
+)
+
+load_dotenv()
+
+ASYNC_DB_POOL_MIN = int(os.getenv("ASYNC_DB_POOL_MIN", str(DB_POOL_MIN)))
+ASYNC_DB_POOL_MAX = int(os.getenv("ASYNC_DB_POOL_MAX", str(DB_POOL_MAX)))
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+
+async def get_pool():
+    """Haal (en open zo nodig) de async connection pool"""
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                pool = AsyncConnectionPool(
+                    DATABASE_URL,
+                    min_size=ASYNC_DB_POOL_MIN,
+                    max_size=ASYNC_DB_POOL_MAX,
+                    timeout=DB_POOL_TIMEOUT,
+                    kwargs={"row_factory": dict_row},
+                    check=AsyncConnectionPool.check_connection,
+                    open=False
+                )
+                await pool.open()
+                _pool = pool
+    return _pool
+
+
+async def close_pool():
+    """Sluit de async pool (bij shutdown)"""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def get_pool_stats():
+    """Async pool metrics (psycopg_pool get_stats)"""
+    return _pool.get_stats() if _pool is not None else {}
+
+
+async def _fetchall(query, params=None):
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        cursor = await conn.execute(query, params)
+        return await cursor.fetchall()
+
+
+async def _fetchone(query, params=None):
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        cursor = await conn.execute(query, params)
+        return await cursor.fetchone()
+
+
+async def _execute(query, params=None):
+    """Voer een write query uit en commit; geeft rowcount terug"""
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        cursor = await conn.execute(query, params)
+        return cursor.rowcount
+
+
+# ========================================
+# ANALYSES
+# ========================================
+
+async def save_analysis(data):
+    """Async variant van database.save_analysis"""
+    row = await _fetchone(f"""
+        INSERT INTO analyses
+        {ANALYSIS_INSERT_COLUMNS}
+        VALUES {ANALYSIS_INSERT_TEMPLATE}
+        RETURNING id
+    """, _analysis_insert_params(data))
+    invalidate_analysis_cache()
+    return row['id']
+
+
+async def get_all_analyses(limit=100, offset=0, filter_status=None):
+    """Async variant van database.get_all_analyses"""
+    query = f"SELECT {ANALYSIS_LIST_COLUMNS} FROM analyses"
+    params = []
+
+    if filter_status:
+        query += " WHERE result = %s"
+        params.append(filter_status)
+
+    query += " ORDER BY timestamp DESC LIMIT %s OFFSET %s"
+    params.extend([limit, offset])
+
+    return [dict(row) for row in await _fetchall(query, params)]
+
+
+async def get_history(limit=100, offset=0, status=None, workplace_id=None, model_version=None, after=None):
+    """Async variant van database.get_history"""
+    query, params = _history_query(limit, offset, status, workplace_id, model_version, after)
+    return [dict(row) for row in await _fetchall(query, params)]
+
+
+async def get_history_json(limit=100, offset=0, status=None, workplace_id=None, model_version=None, after=None):
+    """
+    Als get_history, maar de pagina komt als JSON tekst uit PostgreSQL (json_agg)
+
+    Returns:
+        Tuple (items_json, count, last) met last = (timestamp, id) of None
+    """
+    query, params = _history_query(limit, offset, status, workplace_id, model_version, after)
+    query, params = _json_page_query(query, params, "page.timestamp DESC, page.id DESC", "page.timestamp")
+    row = await _fetchone(query, params)
+    last = (row['last_key'], row['last_id']) if row['count'] else None
+    return row['items'], row['count'], last
+
+
+async def get_sync_watermark():
+    """Async variant van database.get_sync_watermark"""
+    row = await _fetchone("SELECT clock_timestamp() - make_interval(secs => %s) AS watermark",
+                          (SYNC_SAFETY_SECONDS,))
+    return row['watermark']
+
+
+async def get_history_changes(since, limit=500, status=None, workplace_id=None, model_version=None):
+    """Async variant van database.get_history_changes"""
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        cursor = await conn.execute("SELECT clock_timestamp() - make_interval(secs => %s) AS watermark",
+                                    (SYNC_SAFETY_SECONDS,))
+        watermark = (await cursor.fetchone())['watermark']
+
+        query, params = _history_changes_query(since, limit, status, workplace_id, model_version)
+        cursor = await conn.execute(query, params)
+        analyses = [dict(row) for row in await cursor.fetchall()]
+
+    last = (analyses[-1]['updated_at'], analyses[-1]['id']) if analyses else None
+    next_since, has_more = _next_sync_cursor(last, len(analyses), since, limit, watermark)
+    return analyses, next_since, has_more
+
+
+async def get_history_changes_json(since, limit=500, status=None, workplace_id=None, model_version=None):
+    """
+    Als get_history_changes, maar de rijen komen als JSON tekst uit PostgreSQL
+
+    Returns:
+        Tuple (items_json, count, next_since, has_more)
+    """
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        cursor = await conn.execute("SELECT clock_timestamp() - make_interval(secs => %s) AS watermark",
+                                    (SYNC_SAFETY_SECONDS,))
+        watermark = (await cursor.fetchone())['watermark']
+
+        query, params = _history_changes_query(since, limit, status, workplace_id, model_version)
+        query, params = _json_page_query(query, params, "page.updated_at, page.id", "page.updated_at")
+        cursor = await conn.execute(query, params)
+        row = await cursor.fetchone()
+
+    last = (row['last_key'], row['last_id']) if row['count'] else None
+    next_since, has_more = _next_sync_cursor(last, row['count'], since, limit, watermark)
+    return row['items'], row['count'], next_since, has_more
+
+
+async def estimate_history_count(status=None, workplace_id=None, model_version=None):
+    """Async variant van database.estimate_history_count"""
+    query, params = _history_count_estimate_query(status, workplace_id, model_version)
+    return _plan_rows(await _fetchone(query, params))
+
+
+async def get_analysis(analysis_id):
+    """Async variant van database.get_analysis"""
+    row = await _fetchone("SELECT * FROM analyses WHERE id = %s", (analysis_id,))
+    return dict(row) if row else None
+
+
+async def delete_analysis(analysis_id):
+    """Async variant van database.delete_analysis"""
+    row = await _fetchone("DELETE FROM analyses WHERE id = %s RETURNING image_path", (analysis_id,))
+    invalidate_analysis_cache()
+    if not row:
+        return False, None
+    return True, row['image_path']
+
+
+async def move_analysis_to_training(analysis_id, new_image_path, label):
+    """Async variant van database.move_analysis_to_training"""
+    await _execute("""
+        UPDATE analyses
+        SET image_path = %s,
+            user_correction = %s,
+            is_correct = CASE
+                WHEN model_prediction IS NULL OR model_prediction = '' THEN NULL
+                ELSE model_prediction = %s
+            END
+        WHERE id = %s
+    """, (new_image_path, label, label, analysis_id))
+    invalidate_analysis_cache()
+
+
+async def update_correction(analysis_id, corrected_class, corrected_label, notes=None, confidence_threshold=70.0):
+    """Async variant van database.update_correction"""
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        cursor = await conn.execute("""
+            SELECT model_prediction, confidence, image_path, metadata
+            FROM analyses
+            WHERE id = %s
+        """, (analysis_id,))
+        result = await cursor.fetchone()
+        if not result:
+            raise ValueError(f"Analyse met ID {analysis_id} niet gevonden")
+
+        is_correct, metadata = _correction_update(result, corrected_label, notes)
+
+        print(f"📝 Correctie ID {analysis_id}:")
+        print(f"  - AI voorspelling: {result['model_prediction']}")
+        print(f"  - Correctie: {corrected_label}")
+        print(f"  - Is correct: {is_correct}")
+        print(f"  - Confidence: {(result['confidence'] or 0.0)*100:.1f}%")
+        print(f"  - Drempel: {confidence_threshold}%")
+
+        await conn.execute("""
+            UPDATE analyses
+            SET user_correction = %s,
+                is_correct = %s,
+                metadata = %s::jsonb
+            WHERE id = %s
+        """, (corrected_label, is_correct, json.dumps(metadata), analysis_id))
+
+    invalidate_analysis_cache()
+    print("✅ Correctie opgeslagen!")
+
+
+async def get_statistics(status=None, workplace_id=None, model_version=None):
+    """Async variant van database.get_statistics (deelt de cache)"""
+    cache_key = ('statistics', status, workplace_id, model_version)
+    cached = analysis_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    generation = analysis_cache.generation
+
+    query, params = _statistics_query(status, workplace_id, model_version)
+    stats = _shape_statistics(await _fetchone(query, params))
+
+    analysis_cache.set(cache_key, stats, generation)
+    return stats
+
+
+async def get_accuracy_over_time(workplace_id=None, model_version=None):
+    """Async variant van database.get_accuracy_over_time"""
+    query, params = _accuracy_timeline_query(workplace_id, model_version)
+    return _accuracy_timeline(await _fetchall(query, params))
+
+
+async def get_accuracy_stats(workplace_id=None, model_version=None):
+    """Async variant van database.get_accuracy_stats"""
+    query, params = _accuracy_stats_query(workplace_id, model_version)
+    return _shape_accuracy_stats(await _fetchone(query, params))
+
+
+async def get_training_candidates(confidence_threshold=70.0):
+    """Async variant van database.get_training_candidates"""
+    query, params = _training_candidates_query(confidence_threshold)
+    candidates = [dict(row) for row in await _fetchall(query, params)]
+    print(f"📊 Training candidates met drempel {confidence_threshold}%: {len(candidates)} gevonden")
+    return candidates
+
+
+async def get_training_candidates_json(confidence_threshold=70.0):
+    """
+    Als get_training_candidates, maar als JSON tekst uit PostgreSQL (json_agg)
+
+    Returns:
+        Tuple (items_json, count)
+    """
+    query, params = _training_candidates_query(confidence_threshold)
+    query, params = _json_page_query(query, params, "page.timestamp DESC")
+    row = await _fetchone(query, params)
+    print(f"📊 Training candidates met drempel {confidence_threshold}%: {row['count']} gevonden")
+    return row['items'], row['count']
+
+
+async def get_training_statistics():
+    """Async variant van database.get_training_statistics"""
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        cursor = await conn.execute("SELECT COUNT(*) as count FROM analyses WHERE user_correction IS NULL")
+        unreviewed_count = (await cursor.fetchone())['count']
+
+        cursor = await conn.execute("""
+            SELECT COUNT(*) as count FROM analyses
+            WHERE user_correction IS NOT NULL AND is_correct = FALSE
+        """)
+        training_queue_count = (await cursor.fetchone())['count']
+
+        cursor = await conn.execute("SELECT COUNT(*) as count FROM analyses WHERE is_correct = TRUE")
+        exported_count = (await cursor.fetchone())['count']
+
+    return {
+        'unreviewed_count': unreviewed_count,
+        'training_queue_count': training_queue_count,
+        'exported_count': exported_count,
+        'training_target': 200,
+        'training_progress_percent': min(100, round((training_queue_count / 200) * 100, 1))
+    }
+
+
+async def mark_as_exported(analysis_ids):
+    """Async variant van database.mark_as_exported"""
+    await _execute("""
+        UPDATE analyses
+        SET metadata = COALESCE(metadata, '{}'::jsonb) || '{"exported_for_training": true}'::jsonb
+        WHERE id = ANY(%s)
+    """, (list(analysis_ids),))
+
+
+async def export_training_data(analysis_ids, export_base_path):
+    """Async variant van database.export_training_data (snapshot schrijven in een thread)"""
+    rows = await _fetchall("SELECT * FROM analyses WHERE id = ANY(%s)", (list(analysis_ids),))
+    result = await asyncio.to_thread(_export_training_files, rows, export_base_path)
+    await mark_as_exported(result['analysis_ids'])
+    return result
+
+
+async def stream_analyses_csv(start=None, end=None, workplace_id=None, model_version=None):
+    """
+    Stream analyses als CSV rechtstreeks uit COPY ... TO STDOUT
+
+    Async generator van bytes chunks; er wordt niets gebufferd of naar schijf
+    geschreven. De pool connectie blijft bezet tot de download klaar is.
+    """
+    statement, params = _export_csv_query(start, end, workplace_id, model_version)
+
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        cursor = conn.cursor()
+        async with cursor.copy(statement, params) as copy:
+            async for chunk in copy:
+                yield bytes(chunk)
+
+
+# ========================================
+# WERKPLEK MANAGEMENT FUNCTIES
+# ========================================
+
+async def create_workplace(name, description, items, reference_photo=None):
+    """Async variant van database.create_workplace"""
+    items_str = ','.join(items) if isinstance(items, list) else items
+    try:
+        row = await _fetchone("""
+            INSERT INTO workplaces (name, description, items, reference_photo_path, updated_at)
+            VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
+            RETURNING id
+        """, (name, description, items_str, reference_photo))
+    except psycopg.IntegrityError:
+        print(f"ERROR Werkplek '{name}' bestaat al!")
+        return None
+
+    invalidate_workplace_cache()
+    print(f"OK Werkplek '{name}' aangemaakt (ID: {row['id']})")
+    return row['id']
+
+
+async def get_all_workplaces(active_only=True):
+    """Async variant van database.get_all_workplaces"""
+    # NOTE: PostgreSQL schema doesn't have is_active field, skip filter
+    rows = await _fetchall("SELECT * FROM workplaces ORDER BY created_at DESC")
+    return [_shape_workplace(row) for row in rows]
+
+
+async def get_workplace_config(workplace_id):
+    """Async variant van database.get_workplace_config (deelt de cache)"""
+    cache_key = ('workplace', workplace_id)
+    cached = workplace_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    generation = workplace_cache.generation
+
+    config = _shape_workplace_config(await _fetchone(WORKPLACE_CONFIG_QUERY, (workplace_id,)))
+
+    workplace_cache.set(cache_key, config, generation)
+    return config
+
+
+async def get_workplace(workplace_id):
+    """Async variant van database.get_workplace"""
+    workplace = (await get_workplace_config(workplace_id))['workplace']
+    return copy.deepcopy(workplace) if workplace else None
+
+
+async def get_workplace_threshold(workplace_id):
+    """Async variant van database.get_workplace_threshold"""
+    return (await get_workplace_config(workplace_id))['confidence_threshold']
+
+
+async def update_workplace(workplace_id, name=None, description=None, items=None, reference_photo=None, active=None, confidence_threshold=None, whiteboard_region=None, pipeline_stages=None):
+    """Async variant van database.update_workplace"""
+    updates, params = _workplace_updates(name, description, items, reference_photo,
+                                         confidence_threshold, whiteboard_region, pipeline_stages)
+    if updates:
+        updates.append("updated_at = CURRENT_TIMESTAMP")
+        params.append(workplace_id)
+        await _execute(f"UPDATE workplaces SET {', '.join(updates)} WHERE id = %s", params)
+        invalidate_workplace_cache()
+        print(f"OK Werkplek {workplace_id} bijgewerkt")
+
+
+async def delete_workplace(workplace_id):
+    """Async variant van database.delete_workplace"""
+    await _execute("DELETE FROM workplaces WHERE id = %s", (workplace_id,))
+    invalidate_workplace_cache()
+    print(f"🗑️ Werkplek {workplace_id} verwijderd")
+
+
+async def set_workplace_model(workplace_id, model_type, model_path):
+    """Async variant van database.set_workplace_model"""
+    await _execute("""
+        UPDATE workplaces
+        SET active_model_type = %s,
+            active_model_path = %s,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = %s
+    """, (model_type, model_path, workplace_id))
+    invalidate_workplace_cache()
+    print(f"✅ Werkplek {workplace_id}: model gezet naar {model_type} ({model_path})")
+
+
+async def get_workplace_model(workplace_id):
+    """Async variant van database.get_workplace_model (uit de werkplek cache)"""
+    model = (await get_workplace_config(workplace_id))['model']
+    return dict(model) if model else None
+
+
+# ========================================
+# TRAINING IMAGES FUNCTIES
+# ========================================
+
+async def add_training_image(workplace_id, image_path, label, class_id=None, source='manual_upload', model_version=None, metadata=None):
+    """Async variant van database.add_training_image"""
+    metadata_json = json.dumps(metadata) if metadata else None
+    row = await _fetchone("""
+        INSERT INTO training_images
+        (workplace_id, image_path, label, class_id, source, model_version, metadata)
+        VALUES (%s, %s, %s, %s, %s, %s, %s::jsonb)
+        RETURNING id
+    """, (workplace_id, image_path, label, class_id, source, model_version, metadata_json))
+    return row['id']
+
+
+async def get_training_images(workplace_id, validated_only=False):
+    """Async variant van database.get_training_images"""
+    query = "SELECT * FROM training_images WHERE workplace_id = %s"
+    if validated_only:
+        query += " AND validated = TRUE"
+    query += " ORDER BY created_at DESC"
+    return [dict(row) for row in await _fetchall(query, (workplace_id,))]
+
+
+async def update_training_image_label(image_id, new_label):
+    """Async variant van database.update_training_image_label"""
+    try:
+        rowcount = await _execute("""
+            UPDATE training_images
+            SET label = %s
+            WHERE id = %s
+        """, (new_label, image_id))
+        return rowcount > 0
+    except Exception as e:
+        print(f"Error updating training image label: {e}")
+        return False
+
+
+async def delete_training_image(image_id):
+    """Async variant van database.delete_training_image"""
+    try:
+        row = await _fetchone("DELETE FROM training_images WHERE id = %s RETURNING image_path", (image_id,))
+        if not row:
+            return False, None
+        return True, row['image_path']
+    except Exception as e:
+        print(f"Error deleting training image: {e}")
+        return False, None
+
+
+async def get_training_dataset_stats(workplace_id, model_version=None, use_cache=True):
+    """Async variant van database.get_training_dataset_stats (deelt de cache)"""
+    cache_key = ('dataset_stats', workplace_id, model_version or None)
+    if use_cache:
+        cached = analysis_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    generation = analysis_cache.generation
+
+    query, params = _training_dataset_stats_query(workplace_id, model_version)
+    stats = _shape_training_dataset_stats(await _fetchone(query, params))
+
+    if use_cache:
+        analysis_cache.set(cache_key, stats, generation)
+    return stats
+
+
+async def validate_training_image(image_id, validated=True):
+    """Async variant van database.validate_training_image"""
+    await _execute("""
+        UPDATE training_images
+        SET validated = %s
+        WHERE id = %s
+    """, (validated, image_id))
+
+
+# ========================================
+# MODEL MANAGEMENT FUNCTIES
+# ========================================
+
+async def register_model(workplace_id, version, model_path, model_type='classification', uploaded_by='admin', test_accuracy=None, config=None, notes=None):
+    """Async variant van database.register_model"""
+    metrics = _model_metrics(test_accuracy, config, notes)
+    row = await _fetchone("""
+        INSERT INTO models
+        (workplace_id, version, model_path, model_type, training_date, metrics, is_active)
+        VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP, %s::jsonb, FALSE)
+        RETURNING id
+    """, (workplace_id, version, model_path, model_type, json.dumps(metrics) if metrics else None))
+
+    print(f"✅ Model {version} ({model_type}) geregistreerd voor werkplek {workplace_id} (ID: {row['id']})")
+    return row['id']
+
+
+async def get_models(workplace_id, status=None):
+    """Async variant van database.get_models"""
+    # Note: status parameter ignored - no status field in PostgreSQL schema
+    rows = await _fetchall("SELECT * FROM models WHERE workplace_id = %s ORDER BY training_date DESC", (workplace_id,))
+    return [_shape_model(row) for row in rows]
+
+
+async def get_active_model(workplace_id):
+    """Async variant van database.get_active_model"""
+    row = await _fetchone("""
+        SELECT * FROM models
+        WHERE workplace_id = %s AND is_active = TRUE
+        ORDER BY training_date DESC
+        LIMIT 1
+    """, (workplace_id,))
+    return _shape_model(row) if row else None
+
+
+async def get_model(model_id):
+    """Async variant van database.get_model"""
+    row = await _fetchone("SELECT * FROM models WHERE id = %s", (model_id,))
+    return dict(row) if row else None
+
+
+async def delete_model(model_id):
+    """Async variant van database.delete_model"""
+    await _execute("DELETE FROM models WHERE id = %s", (model_id,))
+    invalidate_workplace_cache()  # Kan het actieve model zijn
+
+
+async def get_model_versions(workplace_id):
+    """Async variant van database.get_model_versions"""
+    rows = await _fetchall("""
+        SELECT DISTINCT model_version
+        FROM analyses
+        WHERE workplace_id = %s
+        AND model_version IS NOT NULL
+        ORDER BY model_version DESC
+    """, (workplace_id,))
+    return [row['model_version'] for row in rows]
+
+
+async def activate_model(model_id):
+    """Async variant van database.activate_model (een transactie)"""
+    pool = await get_pool()
+    async with pool.connection() as conn:
+        cursor = await conn.execute("SELECT workplace_id, model_path, model_type FROM models WHERE id = %s", (model_id,))
+        result = await cursor.fetchone()
+        if not result:
+            raise ValueError(f"Model {model_id} niet gevonden")
+
+        workplace_id = result['workplace_id']
+
+        await conn.execute("""
+            UPDATE models
+            SET is_active = FALSE
+            WHERE workplace_id = %s AND is_active = TRUE
+        """, (workplace_id,))
+        await conn.execute("UPDATE models SET is_active = TRUE WHERE id = %s", (model_id,))
+        await conn.execute("""
+            UPDATE workplaces
+            SET active_model_type = %s,
+                active_model_path = %s,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+        """, (result['model_type'], result['model_path'], workplace_id))
+
+    invalidate_workplace_cache()
+    print(f"✅ Model {model_id} geactiveerd voor werkplek {workplace_id} ({result['model_type']} type)")
+
+
+# ========================================
+# DATASET EXPORT FUNCTIES
+# ========================================
+
+async def register_dataset_export(workplace_id, export_path, image_count, class_distribution, exported_by='admin', notes=None,
+                                  manifest_path=None, content_hash=None, base_export_id=None):
+    """Async variant van database.register_dataset_export"""
+    row = await _fetchone("""
+        INSERT INTO dataset_exports
+        (workplace_id, export_path, image_count, class_distribution, exported_by, notes,
+         manifest_path, content_hash, base_export_id)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+        RETURNING id
+    """, (workplace_id, export_path, image_count, json.dumps(class_distribution), exported_by, notes,
+          manifest_path, content_hash, base_export_id))
+
+    print(f"OK Dataset export geregistreerd (ID: {row['id']})")
+    return row['id']
+
+
+async def get_dataset_export(export_id):
+    """Async variant van database.get_dataset_export"""
+    row = await _fetchone("SELECT * FROM dataset_exports WHERE id = %s", (export_id,))
+    return _shape_dataset_export(row) if row else None
+
+
+async def get_dataset_exports(workplace_id):
+    """Async variant van database.get_dataset_exports"""
+    rows = await _fetchall("""
+        SELECT * FROM dataset_exports
+        WHERE workplace_id = %s
+        ORDER BY exported_at DESC
+    """, (workplace_id,))
+    return [_shape_dataset_export(row) for row in rows]
@@ -0,0 +1,152 @@
+"""
+Sharded dataset writer
+Schrijft een snapshot manifest (training_snapshots.py) als tar shards van
+maximaal SHARD_MAX_BYTES per split: train-00000.tar, val-00000.tar, ...
+Per image twee members met dezelfde sleutel (<sha256>.jpg en <sha256>.json,
+webdataset conventie), zodat een training job de shards sequentieel kan
+streamen in plaats van duizenden losse bestanden te openen.
+
+Lezen, valideren en (optioneel) verkleinen gebeurt parallel in een thread
+pool (PIL geeft de GIL vrij tijdens decode/resize); het schrijven naar de
+tar gebeurt in vaste volgorde, dus dezelfde snapshot geeft dezelfde shards.
+"""
+
+import io
+import json
+import os
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from PIL import Image
+from dotenv import load_dotenv
+
+from training_snapshots import object_store
+
+load_dotenv()
+
+SHARD_MAX_BYTES = int(os.getenv("SHARD_MAX_BYTES", str(256 * 1024 * 1024)))
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+SHARD_INDEX_NAME = "shards.json"
+
+# Metadata velden uit de manifest entry die in <sha256>.json mee gaan
+_SAMPLE_FIELDS = ("label", "class_id", "split", "file", "image_id", "analysis_id")
+
+
+def _load_sample(entry, image_size, store):
+    """
+    Lees, valideer en verklein zo nodig een image (draait in de worker pool)
+
+    Returns:
+        (entry, bytes, extensie, None) of (entry, None, None, foutmelding)
+    """
+    path = store.object_path(entry['sha256'])
+    extension = Path(entry['file']).suffix.lower().lstrip(".") or "jpg"
+    try:
+        data = path.read_bytes()
+        with Image.open(io.BytesIO(data)) as image:
+            image.verify()
+
+        if image_size:
+            with Image.open(io.BytesIO(data)) as image:
+                if image.format != "JPEG" or max(image.size) > image_size:
+                    image = image.convert("RGB")
+                    image.thumbnail((image_size, image_size))
+                    buffer = io.BytesIO()
+                    image.save(buffer, format="JPEG", quality=95)
+                    data = buffer.getvalue()
+                    extension = "jpg"
+        return entry, data, extension, None
+    except Exception as e:
+        return entry, None, None, str(e)
+
+
+def _ordered_samples(entries, image_size, store, workers):
+    """Verwerk entries parallel maar lever ze in de oorspronkelijke volgorde op"""
+    window = workers * 4
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = []
+        for entry in entries:
+            pending.append(pool.submit(_load_sample, entry, image_size, store))
+            # Beperkt aantal images tegelijk in geheugen
+            if len(pending) >= window:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def _add_member(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = 0
+    tar.addfile(info, io.BytesIO(data))
+
+
+def write_shards(manifest, output_dir, image_size=None, shard_max_bytes=SHARD_MAX_BYTES,
+                 workers=SHARD_WORKERS, store=None):
+    """
+    Schrijf de entries van een manifest als tar shards per split
+
+    Args:
+        manifest: Manifest uit training_snapshots.build_manifest
+        output_dir: Doelmap voor de shards
+        image_size: Maximale zijde in pixels (None = originele bestanden)
+        shard_max_bytes: Grootte waarna een nieuwe shard begint
+        workers: Aantal threads voor lezen/valideren/verkleinen
+        store: ObjectStore (standaard de gedeelde store)
+
+    Returns:
+        Shard index dict (ook als shards.json weggeschreven)
+    """
+    store = store or object_store
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    index = {
+        'image_size': image_size,
+        'train_split': manifest.get('train_split'),
+        'content_hash': manifest.get('content_hash'),
+        'splits': {},
+        'invalid': []
+    }
+
+    for split in ("train", "val"):
+        # Volgorde op hash: deterministisch en gemengd over classes
+        entries = sorted((e for e in manifest['entries'] if e['split'] == split),
+                         key=lambda e: e['sha256'])
+        shards = []
+        tar = None
+        shard = None
+
+        for entry, data, extension, error in _ordered_samples(entries, image_size, store, workers):
+            if error is not None:
+                index['invalid'].append({'file': entry['file'], 'sha256': entry['sha256'], 'error': error})
+                continue
+
+            if tar is None or shard['bytes'] >= shard_max_bytes:
+                if tar is not None:
+                    tar.close()
+                shard = {'file': f"{split}-{len(shards):05d}.tar", 'count': 0, 'bytes': 0, 'class_distribution': {}}
+                shards.append(shard)
+                tar = tarfile.open(output_dir / shard['file'], "w")
+
+            sample = {field: entry.get(field) for field in _SAMPLE_FIELDS if field in entry}
+            sample['sha256'] = entry['sha256']
+            _add_member(tar, f"{entry['sha256']}.{extension}", data)
+            _add_member(tar, f"{entry['sha256']}.json", json.dumps(sample, ensure_ascii=False).encode("utf-8"))
+
+            label = str(entry['label'])
+            shard['count'] += 1
+            shard['bytes'] += len(data)
+            shard['class_distribution'][label] = shard['class_distribution'].get(label, 0) + 1
+
+        if tar is not None:
+            tar.close()
+        index['splits'][split] = shards
+
+    (output_dir / SHARD_INDEX_NAME).write_text(json.dumps(index, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    counts = {split: sum(s['count'] for s in shards) for split, shards in index['splits'].items()}
+    print(f"🧱 Shards {output_dir}: train {counts['train']} / val {counts['val']} images, "
+          f"{sum(len(s) for s in index['splits'].values())} shards, {len(index['invalid'])} ongeldig")
+    return index
@@ -0,0 +1,404 @@
+"""
+Inference
+Modellen, class mapping en de inference functies voor inspecties. Het actieve
+globale model (type, pad en geladen YOLO instantie) staat op één plek in
+active_model, zodat API endpoints en jobs hetzelfde model gebruiken, ook na
+een wissel via /api/model/type.
+"""
+
+import base64
+import threading
+from pathlib import Path
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+from utils.face_blur import FaceBlurrer
+
+# Model paths
+CLASSIFICATION_MODEL_PATH = Path(__file__).parent / "models" / "werkplek_classifier (3).pt"
+DETECTION_MODEL_PATH = Path(__file__).parent / "models" / "werkplek_detector (7).pt"
+
+MODEL_PATHS = {
+    "classification": CLASSIFICATION_MODEL_PATH,
+    "detection": DETECTION_MODEL_PATH
+}
+
+# Model Type bij het opstarten: "classification" of "detection"
+DEFAULT_MODEL_TYPE = "classification"  # Wijzig naar "detection" voor object detection mode
+
+
+class ActiveModel:
+    """Het globale model: type, pad en de geladen YOLO instantie"""
+
+    def __init__(self, model_type=DEFAULT_MODEL_TYPE):
+        self._lock = threading.Lock()
+        self.model_type = model_type
+        self.model_path = MODEL_PATHS[model_type]
+        self.yolo_model = None
+
+    def current(self):
+        """(model_type, model_path) als consistent paar"""
+        with self._lock:
+            return self.model_type, self.model_path
+
+    def load(self):
+        """Laad het YOLO model van het actieve pad (lazy loading)"""
+        with self._lock:
+            if self.yolo_model is None:
+                if self.model_path.exists():
+                    print(f"📥 Laden YOLO model: {self.model_path}")
+                    self.yolo_model = YOLO(str(self.model_path))
+                else:
+                    print("⚠ YOLO model niet gevonden, gebruik dummy mode")
+                    self.yolo_model = "dummy"
+            return self.yolo_model
+
+    def switch(self, model_type):
+        """
+        Wissel tussen classification en detection
+
+        Raises:
+            ValueError: Bij een onbekend model type
+        """
+        if model_type not in MODEL_PATHS:
+            raise ValueError("model_type must be 'classification' or 'detection'")
+        with self._lock:
+            self.model_type = model_type
+            self.model_path = MODEL_PATHS[model_type]
+            self.yolo_model = None
+        self.load()
+
+
+active_model = ActiveModel()
+
+# Face blur model (lazy loading)
+face_blurrer = None
+# FaceBlurrer (YuNet input size) is niet thread-safe
+face_blur_lock = threading.Lock()
+
+# Class mapping for CLASSIFICATION models
+# BINARY CLASSIFICATION (simpel en betrouwbaar):
+# - Class 0: OK - Alle gereedschappen aanwezig
+# - Class 1: NOK - Minimaal 1 gereedschap ontbreekt
+#
+# MULTI-CLASS CLASSIFICATION (legacy, gedetailleerd maar complex):
+# YOLOv8 sorteert folders alfabetisch:
+# 0_ok, 1_nok_alles_weg, 2_nok_hamer_weg, 3_nok_schaar_weg,
+# 4_nok_schaar_sleutel_weg, 5_nok_sleutel_weg, 6_nok_alleen_sleutel
+
+# Binary Classification mapping (RECOMMENDED)
+CLASS_INFO_BINARY = {
+    0: {"name": "OK", "status": "ok", "description": "Werkplek is compleet - alle gereedschappen aanwezig"},
+    1: {"name": "NOK", "status": "nok", "description": "Werkplek incompleet - minimaal 1 gereedschap ontbreekt"}
+}
+
+# Multi-class Classification mapping (LEGACY - backwards compatibility)
+CLASS_INFO_MULTICLASS = {
+    0: {"name": "OK", "status": "ok", "description": "Werkplek is compleet en correct"},
+    1: {"name": "NOK - Alles weg", "status": "nok", "description": "Alle gereedschappen ontbreken", "missing": ["hamer", "schaar", "sleutel"]},
+    2: {"name": "NOK - Hamer weg", "status": "nok", "description": "Hamer ontbreekt", "missing": ["hamer"]},
+    3: {"name": "NOK - Schaar weg", "status": "nok", "description": "Schaar ontbreekt", "missing": ["schaar"]},
+    4: {"name": "NOK - Schaar en sleutel weg", "status": "nok", "description": "Schaar en sleutel ontbreken", "missing": ["schaar", "sleutel"]},
+    5: {"name": "NOK - Sleutel weg", "status": "nok", "description": "Sleutel ontbreekt", "missing": ["sleutel"]},
+    6: {"name": "NOK - Alleen sleutel", "status": "nok", "description": "Alleen sleutel aanwezig, hamer en schaar ontbreken", "missing": ["hamer", "schaar"]},
+    7: {"name": "NOK - Hamer en sleutel weg", "status": "nok", "description": "Hamer en sleutel ontbreken, alleen schaar aanwezig", "missing": ["hamer", "sleutel"]}
+}
+
+# Default to multiclass for backwards compatibility with existing 8-class models
+CLASS_INFO = CLASS_INFO_MULTICLASS
+
+SUGGESTIONS = {
+    "hamer": "Plaats de kunstofhamer terug op de aangewezen positie",
+    "schaar": "Plaats de schaar terug in de gereedschapskist",
+    "sleutel": "Plaats de sleutel terug op de werkbank"
+}
+
+
+def load_models():
+    """Laad AI models (lazy loading)"""
+    global face_blurrer
+
+    active_model.load()
+
+    if face_blurrer is None:
+        print("📥 Laden face blur model...")
+        face_blurrer = FaceBlurrer()
+
+
+def process_image_bytes(image_bytes):
+    """Convert bytes naar OpenCV image"""
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    return img
+
+
+def blur_faces_in_image(image):
+    """Blur gezichten in afbeelding (thread-safe, draait via asyncio.to_thread)"""
+    with face_blur_lock:
+        load_models()
+        blurred_img, face_count = face_blurrer.blur_faces(image.copy())
+    return blurred_img, face_count
+
+
+def image_to_base64(image):
+    """Convert OpenCV image naar base64 string"""
+    _, buffer = cv2.imencode('.jpg', image)
+    img_base64 = base64.b64encode(buffer).decode('utf-8')
+    return f"data:image/jpeg;base64,{img_base64}"
+
+
+def analyze_image(image, model_path=None):
+    """
+    Analyseer afbeelding met YOLO classification model
+
+    Args:
+        image: Image te analyseren
+        model_path: Optioneel custom model path (default: het actieve globale model)
+
+    Returns:
+        dict met resultaten
+    """
+    if model_path is None:
+        model_path = active_model.model_path
+
+    # Load model (cached als het hetzelfde pad is)
+    model = YOLO(str(model_path))
+
+    # YOLO inference
+    results = model(image)
+
+    for result in results:
+        top_class = result.probs.top1
+        confidence = result.probs.top1conf.item()
+
+        class_info = CLASS_INFO.get(top_class, {})
+
+        return {
+            "class_id": int(top_class),
+            "confidence": float(confidence),
+            "status": class_info.get("status", "unknown")
+        }
+
+
+def generate_suggestions(class_id):
+    """Genereer suggesties op basis van classificatie"""
+    class_info = CLASS_INFO.get(class_id, {})
+
+    if class_info.get("status") == "ok":
+        return []
+
+    missing_items = class_info.get("missing", [])
+    suggestions = []
+
+    for item in missing_items:
+        if item in SUGGESTIONS:
+            suggestions.append({
+                "item": item,
+                "action": SUGGESTIONS[item]
+            })
+
+    return suggestions
+
+
+def analyze_image_detection(image, model_path=None, confidence_threshold=0.25):
+    """
+    Analyseer afbeelding met YOLO Object Detection model
+    Telt objecten (schaar, sleutel, whiteboard) en bepaalt status
+
+    Args:
+        image: Image te analyseren
+        model_path: Optioneel custom model path (default gebruikt globaal DETECTION_MODEL_PATH)
+        confidence_threshold: Minimale confidence voor detecties (default 0.25 = 25%)
+
+    Detection model classes:
+    0: hamer
+    1: schaar
+    2: sleutel
+
+    Returns:
+        dict met resultaten inclusief bounding boxes
+    """
+    if model_path is None:
+        model_path = DETECTION_MODEL_PATH
+
+    # Load model (cached als het hetzelfde pad is)
+    model = YOLO(str(model_path))
+
+    # Haal class names uit het model zelf (dynamisch!)
+    model_class_names = model.names  # Dict: {0: 'hamer', 1: 'schaar', 2: 'sleutel'}
+    print(f"📋 Model class names: {model_class_names}")
+
+    # Normaliseer class names naar lowercase voor consistentie
+    # En map 'whiteboard' → 'hamer' voor backwards compatibility
+    def normalize_class_name(name):
+        name_lower = name.lower()
+        if name_lower == 'whiteboard':
+            return 'hamer'
+        return name_lower
+
+    # YOLO object detection inference met dynamische confidence threshold
+    # confidence_threshold: alleen detecties boven deze drempel accepteren
+    # iou=0.7 means less aggressive NMS (allows more overlapping boxes)
+    print(f"🎯 Detection confidence threshold: {confidence_threshold*100:.0f}%")
+    results = model(image, conf=confidence_threshold, iou=0.7, max_det=100)
+
+    # Tel gedetecteerde objecten (dynamisch op basis van model.names)
+    object_counts = {"hamer": 0, "schaar": 0, "sleutel": 0}
+    max_confidence = 0.0
+    bounding_boxes = []
+
+    print(f"🔍 Detection: {len(results)} result(s)")
+    for result in results:
+        if result.boxes is not None:
+            print(f"  📦 Found {len(result.boxes)} boxes")
+            for box in result.boxes:
+                class_id = int(box.cls[0])
+                confidence = float(box.conf[0])
+
+                # Get bounding box coordinates (xyxy format)
+                x1, y1, x2, y2 = box.xyxy[0].tolist()
+
+                # Haal object naam uit MODEL (niet hardcoded!)
+                if class_id in model_class_names:
+                    raw_name = model_class_names[class_id]
+                    object_name = normalize_class_name(raw_name)
+
+                    # Tel alleen bekende objecten
+                    if object_name in object_counts:
+                        object_counts[object_name] += 1
+
+                        print(f"    ✓ Detected: {object_name} (model class: {raw_name}, confidence: {confidence:.2f})")
+                        bounding_boxes.append({
+                            "object": object_name,
+                            "confidence": confidence,
+                            "bbox": {
+                                "x1": int(x1),
+                                "y1": int(y1),
+                                "x2": int(x2),
+                                "y2": int(y2)
+                            }
+                        })
+                    else:
+                        print(f"    ⚠️ Onbekend object: {object_name} (class_id: {class_id})")
+                else:
+                    print(f"    ? Unknown class_id: {class_id}")
+
+                max_confidence = max(max_confidence, confidence)
+
+    return _detection_result(object_counts, bounding_boxes, max_confidence)
+
+
+def _detection_result(object_counts, bounding_boxes, max_confidence):
+    """Bepaal class/status uit de object tellingen (gedeeld door gewone en tiled detectie)"""
+    # Bepaal status op basis van aanwezige objecten
+    hamer_present = object_counts["hamer"] > 0
+    schaar_present = object_counts["schaar"] > 0
+    sleutel_present = object_counts["sleutel"] > 0
+
+    # Map naar class_id
+    if hamer_present and schaar_present and sleutel_present:
+        class_id = 0  # OK - alles aanwezig
+    elif not hamer_present and not schaar_present and not sleutel_present:
+        class_id = 1  # NOK alles weg
+    elif not hamer_present and schaar_present and sleutel_present:
+        class_id = 2  # NOK hamer weg
+    elif hamer_present and not schaar_present and sleutel_present:
+        class_id = 3  # NOK schaar weg
+    elif hamer_present and not schaar_present and not sleutel_present:
+        class_id = 4  # NOK schaar en sleutel weg
+    elif hamer_present and schaar_present and not sleutel_present:
+        class_id = 5  # NOK sleutel weg
+    elif not hamer_present and not schaar_present and sleutel_present:
+        class_id = 6  # NOK alleen sleutel (hamer en schaar weg)
+    elif not hamer_present and schaar_present and not sleutel_present:
+        class_id = 7  # NOK hamer en sleutel weg (alleen schaar)
+    else:
+        # Fallback voor onverwachte combinaties
+        class_id = 1
+
+    # Detection models gebruiken altijd multiclass mapping (class 0-7)
+    class_info = CLASS_INFO_MULTICLASS.get(class_id, {})
+
+    print(f"📊 Final counts: hamer={object_counts['hamer']}, schaar={object_counts['schaar']}, sleutel={object_counts['sleutel']}")
+    print(f"📊 Total bounding boxes: {len(bounding_boxes)}")
+
+    # Debug info for frontend
+    debug_info = {
+        "total_boxes_detected": len(bounding_boxes),
+        "raw_counts": object_counts.copy(),
+        "detections": [f"{b['object']}({b['confidence']:.2f})" for b in bounding_boxes]
+    }
+
+    result = {
+        "class_id": int(class_id),
+        "confidence": float(max_confidence) if max_confidence > 0 else 0.5,
+        "status": class_info.get("status", "unknown"),
+        "detected_objects": object_counts,
+        "bounding_boxes": bounding_boxes,
+        "debug": debug_info  # Temporary debug info
+    }
+
+    return result
+
+
+def _box_overlap(a, b):
+    """Overlap van twee bboxes als fractie van de kleinste (vangt ook afgesneden boxes op tegelranden)"""
+    width = min(a['x2'], b['x2']) - max(a['x1'], b['x1'])
+    height = min(a['y2'], b['y2']) - max(a['y1'], b['y1'])
+    if width <= 0 or height <= 0:
+        return 0.0
+    smallest = min((a['x2'] - a['x1']) * (a['y2'] - a['y1']), (b['x2'] - b['x1']) * (b['y2'] - b['y1']))
+    return width * height / smallest if smallest > 0 else 0.0
+
+
+def analyze_image_tiled(image, model_path=None, confidence_threshold=0.25, grid=2, overlap=0.2,
+                        full_frame=None, merge_overlap=0.5):
+    """
+    Detectie per tegel voor kleine objecten
+
+    De foto wordt in grid x grid overlappende tegels gedetecteerd; boxes van
+    alle tegels (plus die van full_frame) worden in foto coördinaten
+    samengevoegd (hoogste confidence wint per object) en opnieuw geteld.
+
+    Args:
+        image: Image te analyseren
+        model_path: Detectie model (default DETECTION_MODEL_PATH)
+        confidence_threshold: Minimale confidence voor detecties
+        grid: Aantal tegels per zijde
+        overlap: Extra tegelgrootte als fractie (0.2 = 20% overlap)
+        full_frame: Optioneel resultaat van analyze_image_detection op de hele foto
+        merge_overlap: Boxes van hetzelfde object met meer overlap worden samengevoegd
+
+    Returns:
+        dict met resultaten (zelfde formaat als analyze_image_detection)
+    """
+    height, width = image.shape[:2]
+    tile_width = min(width, int(np.ceil(width / grid * (1 + overlap))))
+    tile_height = min(height, int(np.ceil(height / grid * (1 + overlap))))
+
+    boxes = list(full_frame['bounding_boxes']) if full_frame else []
+    for row in range(grid):
+        for col in range(grid):
+            x0 = int(col * (width - tile_width) / max(grid - 1, 1))
+            y0 = int(row * (height - tile_height) / max(grid - 1, 1))
+            tile = analyze_image_detection(image[y0:y0 + tile_height, x0:x0 + tile_width],
+                                           model_path, confidence_threshold)
+            for box in tile['bounding_boxes']:
+                bbox = box['bbox']
+                boxes.append({**box, 'bbox': {'x1': bbox['x1'] + x0, 'y1': bbox['y1'] + y0,
+                                              'x2': bbox['x2'] + x0, 'y2': bbox['y2'] + y0}})
+
+    merged = []
+    for box in sorted(boxes, key=lambda b: b['confidence'], reverse=True):
+        if all(kept['object'] != box['object'] or _box_overlap(kept['bbox'], box['bbox']) < merge_overlap
+               for kept in merged):
+            merged.append(box)
+
+    object_counts = {"hamer": 0, "schaar": 0, "sleutel": 0}
+    for box in merged:
+        object_counts[box['object']] += 1
+
+    print(f"🧩 Tiling {grid}x{grid}: {len(boxes)} boxes, {len(merged)} na samenvoegen")
+    return _detection_result(object_counts, merged, max((b['confidence'] for b in merged), default=0.0))
@@ -0,0 +1,163 @@
+"""
+Inspectie pipeline
+Een inspectie is een vaste reeks stages (decode, quality_gate, route, roi,
+privacy, infer, cascade, tiling, verdict, persist, respond). Elke stage is
+een async functie op een InspectionContext en heeft een eigen timing,
+foutbeleid en skip conditie. Optionele stages (roi, cascade, tiling) draaien
+alleen als de werkplek ze aanzet in workplaces.pipeline_stages.
+
+De tijd per stage (ms) komt in ctx.timings; de persist stage slaat die op in
+metadata.stage_timings van de analyse.
+"""
+
+import time
+
+from fastapi import HTTPException
+
+# Foutbeleid per stage
+ON_ERROR_FAIL = "fail"          # fout gaat door naar de client (500)
+ON_ERROR_CONTINUE = "continue"  # fout loggen en verder met de volgende stage
+
+# name -> Stage, gevuld via @inspection_stage
+STAGES = {}
+
+
+class Stage:
+    """Een stap in de inspectie pipeline"""
+
+    def __init__(self, name, func, on_error=ON_ERROR_FAIL, skip_if=None, optional=False, event=None,
+                 event_data=None):
+        self.name = name
+        self.func = func
+        self.on_error = on_error
+        self.skip_if = skip_if
+        self.optional = optional
+        self.event = event  # (stage event, progress, message) na afloop, ook bij skip
+        self.event_data = event_data
+
+    def skipped(self, ctx):
+        if self.optional and not ctx.stage_config(self.name):
+            return True
+        return bool(self.skip_if and self.skip_if(ctx))
+
+
+def inspection_stage(name, on_error=ON_ERROR_FAIL, skip_if=None, optional=False, event=None, event_data=None):
+    """
+    Registreer een functie als inspectie stage
+
+    Args:
+        name: Stage naam (ook de key in stage_timings en pipeline_stages)
+        on_error: ON_ERROR_FAIL of ON_ERROR_CONTINUE (HTTPException gaat altijd door)
+        skip_if: Optioneel callable(ctx) -> bool
+        optional: Alleen draaien als de werkplek de stage aanzet
+        event: Optioneel (stage, progress, message) voor emit na de stage
+        event_data: Optioneel callable(ctx) -> dict met extra event velden
+    """
+    def decorator(func):
+        STAGES[name] = Stage(name, func, on_error, skip_if, optional, event, event_data)
+        return func
+    return decorator
+
+
+def optional_stage_names():
+    """Namen van de stages die per werkplek aan te zetten zijn"""
+    return [name for name, stage in STAGES.items() if stage.optional]
+
+
+class InspectionContext:
+    """Invoer, tussenresultaten en timings van één inspectie"""
+
+    def __init__(self, contents, blur_faces, device_id, workplace_id, confidence_threshold,
+                 camera_metadata, emit):
+        self.contents = contents
+        self.blur_faces = blur_faces
+        self.device_id = device_id
+        self.workplace_id = workplace_id
+        self.confidence_threshold = confidence_threshold
+        self.camera_metadata = camera_metadata
+        self.emit = emit
+
+        self.started = time.perf_counter()
+        self.timings = {}  # stage -> ms
+        self.skipped = []
+        self.errors = {}  # stage -> foutmelding (ON_ERROR_CONTINUE)
+
+        # Werkplek config (route stage)
+        self.workplace = None
+        self.stages_config = {}
+
+        # Tussenresultaten van de stages
+        self.image = None
+        self.inference_image = None
+        self.roi_offset = (0, 0)
+        self.processed_image = None
+        self.face_count = 0
+        self.quality = {}
+        self.model_type = None
+        self.model_path = None
+        self.model_version = None
+        self.inference = None  # Speculatieve inference task (privacy stage)
+        self.analysis = None
+        self.class_info = {}
+        self.predicted_label = None
+        self.timestamp = None
+        self.filename = None
+        self.jpeg_bytes = None
+        self.analysis_id = None
+        self.provisional_id = None
+        self.response = None
+
+    def stage_config(self, name):
+        """Config van een optionele stage voor deze werkplek (None = uit)"""
+        return self.stages_config.get(name) or None
+
+    def elapsed(self):
+        """Seconden sinds de start van de inspectie"""
+        return time.perf_counter() - self.started
+
+
+class Pipeline:
+    """Voert stages in volgorde uit met timing, foutbeleid en skip condities"""
+
+    def __init__(self, stage_names):
+        self.stage_names = list(stage_names)
+
+    @property
+    def stages(self):
+        return [STAGES[name] for name in self.stage_names]
+
+    async def run(self, ctx):
+        """
+        Draai alle stages op de context
+
+        Raises:
+            HTTPException: Afkeuring door een stage (400/403/422)
+            Exception: Fout in een stage met ON_ERROR_FAIL
+
+        Returns:
+            ctx.response (gezet door de laatste stage)
+        """
+        for stage in self.stages:
+            if stage.skipped(ctx):
+                ctx.skipped.append(stage.name)
+            else:
+                stage_start = time.perf_counter()
+                try:
+                    await stage.func(ctx)
+                except HTTPException:
+                    raise
+                except Exception as e:
+                    if stage.on_error != ON_ERROR_CONTINUE:
+                        raise
+                    ctx.errors[stage.name] = str(e)
+                    print(f"[INSPECT] WARNING: Stage {stage.name} mislukt: {str(e)}, ga verder")
+                finally:
+                    ctx.timings[stage.name] = round((time.perf_counter() - stage_start) * 1000, 1)
+
+            if stage.event:
+                event, progress, message = stage.event
+                await ctx.emit(event, progress, message, **(stage.event_data(ctx) if stage.event_data else {}))
+
+        print(f"[TIMING] {' | '.join(f'{name} {ms:.0f}ms' for name, ms in ctx.timings.items())} "
+              f"| totaal {ctx.elapsed() * 1000:.0f}ms")
+        return ctx.response
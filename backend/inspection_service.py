@@ -0,0 +1,367 @@
+"""
+Inspectie service
+De stages van de inspectie pipeline (inspection_pipeline.py) en
+run_inspection(), gedeeld door de inspect endpoints in main.py en de
+inspection job in job_handlers.py. Staat los van main.py zodat een job
+worker deze module kan importeren zonder de API (app, broker, modellen)
+nog een keer op te bouwen.
+"""
+
+import asyncio
+import base64
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+import cv2
+from fastapi import HTTPException
+
+from inference import (active_model, CLASS_INFO, DETECTION_MODEL_PATH, process_image_bytes,
+                       blur_faces_in_image, analyze_image, analyze_image_detection,
+                       analyze_image_tiled, generate_suggestions)
+from inspection_pipeline import inspection_stage, InspectionContext, Pipeline, ON_ERROR_CONTINUE
+from analysis_journal import analysis_journal
+from analysis_writer import analysis_writer
+
+UPLOAD_DIR = Path("uploads")
+UPLOAD_DIR.mkdir(exist_ok=True)
+
+# Face detection en model inference parallel draaien (latency = max i.p.v. som)
+SPECULATIVE_INFERENCE = os.getenv("SPECULATIVE_INFERENCE", "true").lower() == "true"
+
+# Kortste zijde (px) waaronder een foto onbruikbaar is voor het model
+QUALITY_MIN_SIDE = int(os.getenv("QUALITY_MIN_SIDE", "64"))
+# Scherpte (Laplacian variance) waaronder een foto wordt afgekeurd; 0 = alleen meten
+QUALITY_MIN_SHARPNESS = float(os.getenv("QUALITY_MIN_SHARPNESS", "0"))
+
+# Defaults van de optionele stages (per werkplek te overschrijven in pipeline_stages)
+CASCADE_MIN_CONFIDENCE = 0.8  # Classificatie OK boven deze confidence: geen detectie nodig
+TILING_GRID = 2
+TILING_OVERLAP = 0.2
+
+
+def _stage_options(ctx, name):
+    """Config dict van een optionele stage ({} bij alleen 'true')"""
+    config = ctx.stage_config(name)
+    return config if isinstance(config, dict) else {}
+
+
+def _image_quality(image):
+    """Scherpte en helderheid van een foto"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return {
+        'sharpness': round(float(cv2.Laplacian(gray, cv2.CV_64F).var()), 1),
+        'brightness': round(float(gray.mean()), 1)
+    }
+
+
+def _infer(ctx, image):
+    """Inference met het model van de route stage (draait in een thread)"""
+    if ctx.model_type == "detection":
+        return analyze_image_detection(image, ctx.model_path, ctx.confidence_threshold)
+    return analyze_image(image, ctx.model_path)
+
+
+@inspection_stage("decode", event=("decoded", 25, "Privacy check"),
+                  event_data=lambda ctx: {'width': ctx.image.shape[1], 'height': ctx.image.shape[0]})
+async def _stage_decode(ctx):
+    ctx.image = await asyncio.to_thread(process_image_bytes, ctx.contents)
+    if ctx.image is None:
+        raise HTTPException(status_code=400, detail="Ongeldige afbeelding")
+    ctx.processed_image = ctx.inference_image = ctx.image
+
+
+@inspection_stage("quality_gate", on_error=ON_ERROR_CONTINUE)
+async def _stage_quality_gate(ctx):
+    height, width = ctx.image.shape[:2]
+    if min(height, width) < QUALITY_MIN_SIDE:
+        raise HTTPException(status_code=422, detail=f"Foto afgekeurd: resolutie {width}x{height} is te laag")
+
+    ctx.quality = await asyncio.to_thread(_image_quality, ctx.image)
+    if ctx.quality['sharpness'] < QUALITY_MIN_SHARPNESS:
+        raise HTTPException(status_code=422, detail="Foto afgekeurd: te onscherp, maak een nieuwe foto")
+
+
+@inspection_stage("route")
+async def _stage_route(ctx):
+    """Bepaal welk model te gebruiken (per werkplek of globaal) en de optionele stages"""
+    from database_async import get_workplace_config
+
+    # Werkplek config komt uit de werkplek cache (geen query bij een cache hit)
+    config = await get_workplace_config(ctx.workplace_id) if ctx.workplace_id else None
+    workplace_model = config['model'] if config else None
+    if ctx.confidence_threshold is None:
+        ctx.confidence_threshold = (config['confidence_threshold'] if config else None) or 0.25
+
+    ctx.workplace = config['workplace'] if config else None
+    ctx.stages_config = (ctx.workplace or {}).get('pipeline_stages') or {}
+
+    if workplace_model and workplace_model['model_path']:
+        # Gebruik werkplek-specifiek model
+        ctx.model_type = workplace_model['model_type']
+        ctx.model_path = Path(__file__).parent / workplace_model['model_path']
+        ctx.model_version = workplace_model.get('model_version')
+        print(f"🏢 Werkplek {ctx.workplace_id}: gebruik {ctx.model_type} model ({ctx.model_path.name}), versie: {ctx.model_version}")
+    else:
+        # Fallback naar globale configuratie
+        ctx.model_type, ctx.model_path = active_model.current()
+        print(f"⚙️ Geen werkplek model, gebruik globaal: {ctx.model_type}")
+
+
+@inspection_stage("roi", on_error=ON_ERROR_CONTINUE, optional=True)
+async def _stage_roi(ctx):
+    """Inference alleen op het werkplek gebied; privacy check en opslag blijven de hele foto"""
+    region = ctx.stage_config('roi')
+    if not isinstance(region, dict):
+        # roi: true -> whiteboard region van de werkplek
+        region = (ctx.workplace or {}).get('whiteboard_region')
+    if not region:
+        raise ValueError("Geen ROI region ingesteld")
+
+    height, width = ctx.image.shape[:2]
+    x1, y1 = int(region['x1'] * width), int(region['y1'] * height)
+    x2, y2 = int(region['x2'] * width), int(region['y2'] * height)
+    if x2 <= x1 or y2 <= y1:
+        raise ValueError(f"Lege ROI region: {region}")
+
+    ctx.inference_image = ctx.image[y1:y2, x1:x2]
+    ctx.roi_offset = (x1, y1)
+
+
+@inspection_stage("privacy", on_error=ON_ERROR_CONTINUE, skip_if=lambda ctx: not ctx.blur_faces,
+                  event=("privacy_checked", 35, "Model laden"),
+                  event_data=lambda ctx: {'faces_detected': ctx.face_count})
+async def _stage_privacy(ctx):
+    # Speculatief: inference loopt al terwijl de face detection draait. Zonder
+    # gezichten is de geblurde foto gelijk aan het origineel, dus het resultaat
+    # is hetzelfde; met een gezicht wordt het weggegooid (403 blijft gelijk).
+    if SPECULATIVE_INFERENCE:
+        ctx.inference = asyncio.ensure_future(asyncio.to_thread(_infer, ctx, ctx.inference_image))
+
+    # Face detection met YuNet (modern DNN model - veel accurater dan Haar Cascade)
+    processed_image, face_count = await asyncio.to_thread(blur_faces_in_image, ctx.image)
+    print(f"[INSPECT] Face detection result: {face_count} faces detected")
+
+    # Als er gezichten zijn: AFKEUREN - geen analyse
+    if face_count > 0:
+        if ctx.inference is not None:
+            # Thread loopt door; resultaat (of fout) negeren
+            ctx.inference.add_done_callback(lambda task: task.exception())
+        raise HTTPException(
+            status_code=403,
+            detail="Foto afgekeurd: Persoon gedetecteerd. Privacy vereist - verwijder personen uit het beeld."
+        )
+    ctx.processed_image = processed_image
+
+
+@inspection_stage("infer")
+async def _stage_infer(ctx):
+    await ctx.emit("model_loaded", 50, "Objecten detecteren",
+                   model_type=ctx.model_type, model_version=ctx.model_version)
+
+    if ctx.inference is not None:
+        ctx.analysis = await ctx.inference
+    else:
+        ctx.analysis = await asyncio.to_thread(_infer, ctx, ctx.inference_image)
+
+
+@inspection_stage("cascade", on_error=ON_ERROR_CONTINUE, optional=True,
+                  skip_if=lambda ctx: ctx.model_type != "classification")
+async def _stage_cascade(ctx):
+    """Classificatie eerst; bij NOK of twijfel bepaalt het detectie model het resultaat"""
+    options = _stage_options(ctx, 'cascade')
+    if ctx.analysis['status'] == 'ok' and ctx.analysis['confidence'] >= options.get('min_confidence', CASCADE_MIN_CONFIDENCE):
+        return
+
+    model_path = Path(__file__).parent / options['model_path'] if options.get('model_path') else DETECTION_MODEL_PATH
+    detection = await asyncio.to_thread(analyze_image_detection, ctx.inference_image, model_path,
+                                        ctx.confidence_threshold)
+    detection['cascade'] = {key: ctx.analysis[key] for key in ('class_id', 'confidence', 'status')}
+    print(f"🪜 Cascade: classificatie {ctx.analysis['status']} ({ctx.analysis['confidence']:.2f}) -> detectie {detection['status']}")
+
+    ctx.analysis = detection
+    ctx.model_type = "detection"
+    ctx.model_path = model_path
+
+
+@inspection_stage("tiling", on_error=ON_ERROR_CONTINUE, optional=True,
+                  skip_if=lambda ctx: ctx.model_type != "detection")
+async def _stage_tiling(ctx):
+    options = _stage_options(ctx, 'tiling')
+    ctx.analysis = await asyncio.to_thread(
+        analyze_image_tiled, ctx.inference_image, ctx.model_path, ctx.confidence_threshold,
+        int(options.get('grid', TILING_GRID)), float(options.get('overlap', TILING_OVERLAP)), ctx.analysis
+    )
+
+
+@inspection_stage("verdict", event=("inferred", 80, "Resultaten verwerken"),
+                  event_data=lambda ctx: {'result': "OK" if ctx.analysis["status"] == "ok" else "NOK",
+                                          'confidence': ctx.analysis["confidence"],
+                                          'class_id': ctx.analysis["class_id"]})
+async def _stage_verdict(ctx):
+    # ROI: bounding boxes terug naar coördinaten van de hele foto
+    offset_x, offset_y = ctx.roi_offset
+    if (offset_x or offset_y) and ctx.analysis.get("bounding_boxes"):
+        for box in ctx.analysis["bounding_boxes"]:
+            bbox = box["bbox"]
+            box["bbox"] = {'x1': bbox['x1'] + offset_x, 'y1': bbox['y1'] + offset_y,
+                           'x2': bbox['x2'] + offset_x, 'y2': bbox['y2'] + offset_y}
+
+    ctx.class_info = CLASS_INFO.get(ctx.analysis["class_id"], {})
+
+    # Voor classificatie: binair label (OK/NOK), voor detectie: volledige naam
+    if ctx.model_type == "classification":
+        ctx.predicted_label = "OK" if ctx.analysis["status"] == "ok" else "NOK"
+    else:
+        ctx.predicted_label = ctx.class_info.get("name", "Onbekend")
+
+
+@inspection_stage("persist", event=("persisted", 95, "Opgeslagen"),
+                  event_data=lambda ctx: {'analysis_id': ctx.analysis_id, 'provisional_id': ctx.provisional_id})
+async def _stage_persist(ctx):
+    """Sla resultaat op (altijd - wordt pas verwijderd na beoordeling)"""
+    ctx.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    ctx.filename = f"inspect_{ctx.timestamp}.jpg"
+    output_path = UPLOAD_DIR / ctx.filename
+
+    # Encodeer eenmalig: dezelfde JPEG bytes gaan naar disk (via journal) en frontend
+    _, jpeg_buffer = cv2.imencode('.jpg', ctx.processed_image)
+    ctx.jpeg_bytes = jpeg_buffer.tobytes()
+
+    # Parse camera metadata if provided
+    camera_info = {}
+    if ctx.camera_metadata:
+        try:
+            camera_info = json.loads(ctx.camera_metadata)
+            print(f"[INSPECT] Camera metadata ontvangen: {camera_info}")
+        except json.JSONDecodeError:
+            print(f"[INSPECT] WARNING: Could not parse camera_metadata: {ctx.camera_metadata}")
+
+    analysis = ctx.analysis
+    analysis_data = {
+        'timestamp': ctx.timestamp,
+        'image_path': str(output_path),
+        'predicted_class': str(analysis["class_id"]),
+        'predicted_label': ctx.predicted_label,
+        'confidence': analysis["confidence"],
+        'status': analysis["status"].upper(),
+        'missing_items': ctx.class_info.get("missing", []),
+        'face_count': ctx.face_count,
+        'device_id': ctx.device_id,
+        'workplace_id': ctx.workplace_id,
+        'model_type': ctx.model_type,  # Daadwerkelijk gebruikte model type
+        'model_version': ctx.model_version,
+        'camera_info': camera_info,
+        # Tijd per stage tot hier (ms) en totale verwerkingstijd (s)
+        'stage_timings': dict(ctx.timings),
+        'stage_errors': dict(ctx.errors),
+        'processing_time': round(ctx.elapsed(), 3)
+    }
+
+    # Voeg detection counts toe als detection mode actief is
+    if ctx.model_type == "detection" and "detected_objects" in analysis:
+        detected = analysis["detected_objects"]
+        analysis_data['detected_hamer'] = detected.get('hamer', 0)
+        analysis_data['detected_schaar'] = detected.get('schaar', 0)
+        analysis_data['detected_sleutel'] = detected.get('sleutel', 0)
+        analysis_data['total_detections'] = sum(detected.values())
+
+    # Write-behind: journal append (fsync) en direct antwoorden,
+    # de achtergrond flusher slaat de analyse op in PostgreSQL
+    try:
+        ctx.provisional_id = await asyncio.to_thread(analysis_journal.submit, analysis_data, ctx.jpeg_bytes)
+        print(f"[INSPECT] Analysis journaled with provisional ID: {ctx.provisional_id}")
+    except Exception as journal_error:
+        print(f"[INSPECT] WARNING: Journal append failed, saving directly: {str(journal_error)}")
+        try:
+            if not output_path.exists():
+                output_path.write_bytes(ctx.jpeg_bytes)
+            # Group commit: deelt transactie met gelijktijdige inspecties
+            ctx.analysis_id = await asyncio.wrap_future(analysis_writer.submit(analysis_data))
+            print(f"[INSPECT] Analysis saved with ID: {ctx.analysis_id}")
+        except Exception as db_error:
+            print(f"[INSPECT] WARNING: Failed to save analysis to database: {str(db_error)}")
+            import traceback
+            traceback.print_exc()
+            # Continue zonder database save - de analyse is wel gelukt
+
+
+@inspection_stage("respond", event=("done", 100, "Klaar"))
+async def _stage_respond(ctx):
+    analysis = ctx.analysis
+    class_id = analysis["class_id"]
+    img_base64 = f"data:image/jpeg;base64,{base64.b64encode(ctx.jpeg_bytes).decode('utf-8')}"
+
+    ctx.response = {
+        "success": True,
+        "analysis_id": ctx.analysis_id,
+        "provisional_id": ctx.provisional_id,  # Resolve via /api/analysis/provisional/{id}
+        "timestamp": ctx.timestamp,
+        "model_type": ctx.model_type,  # Gebruik daadwerkelijk gebruikte model type
+        "privacy": {
+            "faces_detected": ctx.face_count,
+            "faces_blurred": ctx.face_count if ctx.blur_faces else 0
+        },
+        "step1_classification": {
+            "status": analysis["status"],
+            "confidence": analysis["confidence"],
+            "result": "OK" if analysis["status"] == "ok" else "NOK"
+        },
+        "step2_analysis": {
+            "class_id": class_id,
+            "class_name": ctx.class_info.get("name", "Onbekend"),
+            "description": ctx.class_info.get("description", ""),
+            "missing_items": ctx.class_info.get("missing", [])
+        },
+        "step3_suggestions": generate_suggestions(class_id),
+        "image": {
+            "filename": ctx.filename,
+            "base64": img_base64
+        },
+        "quality": ctx.quality,
+        # Zelfde dict als ctx.timings: bevat na afloop ook respond zelf
+        "stage_timings": ctx.timings,
+        "skipped_stages": ctx.skipped
+    }
+
+    # Add detection-specific data if using detection model
+    if ctx.model_type == "detection":
+        ctx.response["detection"] = {
+            "detected_objects": analysis.get("detected_objects", {}),
+            "bounding_boxes": analysis.get("bounding_boxes", []),
+            "debug": analysis.get("debug", {})  # Include debug info
+        }
+    if analysis.get("cascade"):
+        ctx.response["cascade"] = analysis["cascade"]
+
+
+inspection_pipeline = Pipeline([
+    "decode", "quality_gate", "route", "roi", "privacy", "infer",
+    "cascade", "tiling", "verdict", "persist", "respond"
+])
+
+
+async def run_inspection(contents, blur_faces, device_id, workplace_id, confidence_threshold,
+                          camera_metadata, emit):
+    """
+    Voer een inspectie uit op de geüploade foto bytes
+
+    Gedeeld door /api/inspect, /api/inspect/stream en inspectie jobs. De
+    stappen zijn de stages van inspection_pipeline; onderweg wordt
+    emit(stage, progress, message, **data) aangeroepen: uploaded, decoded,
+    privacy_checked, model_loaded, inferred (met OK/NOK oordeel), persisted
+    en done.
+
+    Raises:
+        HTTPException: 400 bij een ongeldige afbeelding, 403 bij een persoon
+            in beeld, 422 bij een onbruikbare foto (quality gate)
+
+    Returns:
+        Complete analyse resultaten (response dict)
+    """
+    await emit("uploaded", 15, "Foto verwerken", size_kb=round(len(contents) / 1024, 1))
+
+    ctx = InspectionContext(contents, blur_faces, device_id, workplace_id, confidence_threshold,
+                            camera_metadata, emit)
+    return await inspection_pipeline.run(ctx)
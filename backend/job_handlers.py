@@ -0,0 +1,417 @@
+"""
+Job handlers voor job_queue.py
+Elke handler krijgt een JobContext (params, checkpoint, progress()) en geeft
+een JSON-serialiseerbaar resultaat terug. Handlers die lang lopen schrijven
+een checkpoint zodat een hervatte job niet opnieuw begint.
+"""
+
+import asyncio
+import http.client
+import ipaddress
+import json
+import os
+import shutil
+import socket
+import ssl
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from urllib.parse import urlparse
+
+from job_queue import job_type, JobCancelled, JOB_ARTIFACT_DIR, FINISHED_STATUSES
+
+# Analyses per batch bij bulk re-scoring (= checkpoint interval)
+RESCORE_BATCH_SIZE = 100
+
+# Foto's van inspectie jobs (blijven staan tot de job klaar is)
+INSPECTION_UPLOAD_DIR = Path(os.getenv("INSPECTION_UPLOAD_DIR", "data/inspection_jobs"))
+
+# Callback naar de client (MES, vaste camera's) na afloop van een inspectie job
+CALLBACK_TIMEOUT = 5.0
+CALLBACK_RETRIES = 3
+
+
+# ========================================
+# EXPORTS
+# ========================================
+
+@job_type("dataset_export", max_concurrency=1)
+def run_dataset_export(job):
+    """
+    Dataset export als job (zelfde snapshot als /api/workplaces/{id}/export-dataset)
+
+    Params: workplace_id, train_split (0.8), since_export_id, format (zip/shards),
+    image_size, register (True)
+    """
+    from training_snapshots import export_workplace_dataset
+    from utils.zip_stream import iter_zip
+
+    params = job.params
+    export = export_workplace_dataset(params['workplace_id'], params.get('train_split', 0.8),
+                                      params.get('since_export_id'), params.get('format', 'zip'),
+                                      params.get('image_size'), params.get('register', True), job.progress)
+
+    entries = export.pop("zip_entries", None)
+    if entries is not None:
+        # Downloadbare ZIP (zelfde inhoud als de gestreamde variant)
+        zip_path = job.artifact_path(f"{export['export_name']}.zip")
+        with open(zip_path, "wb") as f:
+            for index, chunk in enumerate(iter_zip(entries)):
+                f.write(chunk)
+                if index % 50 == 0:
+                    job.progress(50 + min(45, index * 45 // len(entries)), "ZIP schrijven")
+        export["download_path"] = str(zip_path)
+    return export
+
+
+@job_type("training_export", max_concurrency=1)
+def run_training_export(job):
+    """
+    Training data export als job (zelfde als /api/training/export)
+
+    Params: analysis_ids, export_name (optioneel)
+    """
+    from database import export_training_data
+
+    analysis_ids = job.params['analysis_ids']
+    export_name = job.params.get('export_name') or f"export_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+    job.progress(10, f"{len(analysis_ids)} analyses exporteren")
+    return export_training_data(analysis_ids, f"data/training_exports/{export_name}")
+
+
+@job_type("csv_export", max_concurrency=2)
+def run_csv_export(job):
+    """
+    CSV export als job; resultaat is een downloadbaar bestand
+
+    Params: start, end, workplace_id, model_version (allemaal optioneel)
+    """
+    from database import export_to_csv
+
+    params = job.params
+    csv_path = job.artifact_path("analyses.csv")
+
+    job.progress(10, "CSV schrijven")
+    count = export_to_csv(csv_path, params.get('start'), params.get('end'),
+                          params.get('workplace_id'), params.get('model_version'))
+    return {
+        "row_count": count,
+        "download_path": str(csv_path)
+    }
+
+
+# ========================================
+# BULK RE-SCORING
+# ========================================
+
+@job_type("rescore", max_concurrency=1)
+def run_rescore(job):
+    """
+    Draai het huidige actieve model opnieuw over bestaande analyses
+
+    Het resultaat komt in metadata.rescore; de originele voorspelling blijft
+    staan. Na elke batch wordt het laatste id als checkpoint opgeslagen.
+
+    Params: workplace_id, model_version, start, end, analysis_ids (allemaal optioneel)
+    """
+    import cv2
+    from database import (get_rescore_batch, count_rescore_candidates, save_rescore_results,
+                          get_workplace_model, get_workplace_threshold)
+    from inference import analyze_image, analyze_image_detection, CLASS_INFO, active_model
+
+    params = job.params
+    filters = {key: params.get(key) for key in ('start', 'end', 'workplace_id', 'model_version', 'analysis_ids')}
+    checkpoint = job.checkpoint or {'last_id': 0, 'processed': 0, 'changed': 0, 'missing': 0,
+                                    'total': count_rescore_candidates(**filters)}
+    models = {}
+
+    def model_for(workplace_id):
+        # Per werkplek: actief model + drempel (uit de werkplek cache)
+        if workplace_id not in models:
+            workplace_model = get_workplace_model(workplace_id) if workplace_id else None
+            if workplace_model and workplace_model['model_path']:
+                models[workplace_id] = (
+                    workplace_model['model_type'],
+                    Path(__file__).parent / workplace_model['model_path'],
+                    workplace_model.get('model_version'),
+                    get_workplace_threshold(workplace_id) or 0.25
+                )
+            else:
+                models[workplace_id] = None
+        if models[workplace_id] is None:
+            # Globaal model: altijd het huidige (kan tijdens de job gewisseld worden)
+            model_type, model_path = active_model.current()
+            return model_type, model_path, None, 0.25
+        return models[workplace_id]
+
+    while True:
+        batch = get_rescore_batch(checkpoint['last_id'], RESCORE_BATCH_SIZE, **filters)
+        if not batch:
+            break
+
+        results = []
+        for row in batch:
+            image = cv2.imread(row['image_path']) if row.get('image_path') else None
+            if image is None:
+                checkpoint['missing'] += 1
+                continue
+
+            model_type, model_path, model_version, threshold = model_for(row['workplace_id'])
+            if model_type == "detection":
+                analysis = analyze_image_detection(image, model_path, threshold)
+                prediction = CLASS_INFO.get(analysis["class_id"], {}).get("name", "Onbekend")
+            else:
+                analysis = analyze_image(image, model_path)
+                prediction = "OK" if analysis["status"] == "ok" else "NOK"
+
+            results.append((row['id'], {
+                'prediction': prediction,
+                'status': analysis["status"].upper(),
+                'confidence': analysis["confidence"],
+                'model_type': model_type,
+                'model_version': model_version,
+                'job_id': job.id,
+                'rescored_at': datetime.now().isoformat()
+            }))
+            if prediction != row['model_prediction']:
+                checkpoint['changed'] += 1
+
+        save_rescore_results(results)
+        checkpoint['processed'] += len(batch)
+        checkpoint['last_id'] = batch[-1]['id']
+        job.progress(min(99, checkpoint['processed'] * 100 // max(checkpoint['total'], 1)),
+                     f"{checkpoint['processed']} analyses opnieuw beoordeeld", checkpoint)
+
+    return checkpoint
+
+
+# ========================================
+# INSPECTIES
+# ========================================
+
+_inspection_loop = None
+_inspection_loop_lock = threading.Lock()
+
+
+def set_inspection_loop(loop):
+    """Laat inspectie jobs op de event loop van de API draaien (zelfde async pool en modellen)"""
+    global _inspection_loop
+    _inspection_loop = loop
+
+
+def _run_on_inspection_loop(coro):
+    """Voer een coroutine uit op de inspectie loop en wacht op het resultaat"""
+    global _inspection_loop
+    with _inspection_loop_lock:
+        if _inspection_loop is None:
+            # Losse worker (python job_queue.py worker): eigen loop thread
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="inspection-loop", daemon=True).start()
+            _inspection_loop = loop
+    return asyncio.run_coroutine_threadsafe(coro, _inspection_loop).result()
+
+
+def _resolve_callback(url):
+    """
+    Parse een callback URL en resolve de host naar een lokaal adres
+
+    Raises:
+        ValueError: Geen http(s) URL, onbekende host of een adres buiten loopback/privé netwerk
+
+    Returns:
+        Tuple (parsed URL, poort, IP adres)
+    """
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError("callback_url moet een http(s) URL zijn")
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+
+    try:
+        addresses = [info[4][0] for info in socket.getaddrinfo(parsed.hostname, port, type=socket.SOCK_STREAM)]
+    except socket.gaierror:
+        raise ValueError(f"callback_url host '{parsed.hostname}' onbekend")
+
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%")[0])
+        if not (ip.is_loopback or ip.is_private):
+            raise ValueError("callback_url moet naar een lokaal adres wijzen")
+    return parsed, port, addresses[0]
+
+
+def validate_callback_url(url):
+    """
+    Controleer dat een callback URL naar een lokaal adres wijst
+
+    Raises:
+        ValueError: Geen http(s) URL of een host buiten loopback/privé netwerk
+    """
+    _resolve_callback(url)
+
+
+class _PinnedHTTPConnection(http.client.HTTPConnection):
+    """HTTP connectie naar een vooraf gecontroleerd IP (geen tweede DNS lookup)"""
+
+    def __init__(self, host, port, address, timeout):
+        super().__init__(host, port, timeout=timeout)
+        self.address = address
+
+    def connect(self):
+        self.sock = socket.create_connection((self.address, self.port), self.timeout)
+
+
+class _PinnedHTTPSConnection(http.client.HTTPSConnection):
+    """HTTPS naar een vooraf gecontroleerd IP; certificaat en SNI blijven op de hostnaam"""
+
+    def __init__(self, host, port, address, timeout):
+        super().__init__(host, port, timeout=timeout, context=ssl.create_default_context())
+        self.address = address
+
+    def connect(self):
+        sock = socket.create_connection((self.address, self.port), self.timeout)
+        self.sock = self._context.wrap_socket(sock, server_hostname=self.host)
+
+
+def _post_callback(url, data):
+    """Eén POST naar de callback; redirects worden niet gevolgd"""
+    # Bij elke poging opnieuw resolven en controleren (DNS kan sinds het indienen veranderd zijn)
+    parsed, port, address = _resolve_callback(url)
+    connection_class = _PinnedHTTPSConnection if parsed.scheme == "https" else _PinnedHTTPConnection
+    connection = connection_class(parsed.hostname, port, address, CALLBACK_TIMEOUT)
+    path = (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+    try:
+        connection.request("POST", path, body=data, headers={"Content-Type": "application/json"})
+        status = connection.getresponse().status
+    finally:
+        connection.close()
+
+    if status >= 400:
+        raise RuntimeError(f"HTTP {status}")
+    if 300 <= status < 400:
+        print(f"⚠️ Callback {url} gaf redirect {status}; niet gevolgd")
+    return status
+
+
+def send_callback(url, payload):
+    """POST het job resultaat naar de callback URL (met retries); geeft de HTTP status of None"""
+    data = json.dumps(payload, default=str).encode("utf-8")
+    for attempt in range(CALLBACK_RETRIES):
+        try:
+            return _post_callback(url, data)
+        except Exception as e:
+            print(f"⚠️ Callback {url} poging {attempt + 1} mislukt: {e}")
+            if attempt < CALLBACK_RETRIES - 1:
+                time.sleep(2 ** attempt)
+    return None
+
+
+@job_type("inspection", max_concurrency=1)
+def run_inspection(job):
+    """
+    Inspectie als job (zelfde pipeline als /api/inspect)
+
+    De concurrency cap bepaalt hoeveel foto's tegelijk geïnspecteerd worden;
+    een burst van een client wacht in de queue. Na afloop (ook bij een fout
+    of annulering) volgt de callback als er een callback_url is.
+
+    Params: image_path, blur_faces, device_id, workplace_id,
+    confidence_threshold, camera_metadata, callback_url
+    """
+    from fastapi import HTTPException
+    import inspection_service
+
+    params = job.params
+    image_path = Path(params['image_path'])
+    callback = {'job_id': job.id, 'status': 'failed', 'result': None, 'error': None}
+
+    async def emit(stage, progress, message, **data):
+        await asyncio.to_thread(job.progress, progress, message)
+
+    try:
+        result = _run_on_inspection_loop(inspection_service.run_inspection(
+            image_path.read_bytes(),
+            params.get('blur_faces', True),
+            params.get('device_id') or "onbekend",
+            params.get('workplace_id'),
+            params.get('confidence_threshold'),
+            params.get('camera_metadata'),
+            emit
+        ))
+        # Foto staat al in de analyse; niet nog eens als base64 in de jobs tabel
+        result.get('image', {}).pop('base64', None)
+        callback.update(status='done', result=result)
+        image_path.unlink(missing_ok=True)
+        return result
+    except JobCancelled:
+        callback['status'] = 'cancelled'
+        raise
+    except HTTPException as e:
+        callback['error'] = e.detail
+        raise RuntimeError(e.detail)
+    except Exception as e:
+        callback['error'] = str(e)
+        raise
+    finally:
+        if params.get('callback_url'):
+            send_callback(params['callback_url'], callback)
+
+
+# ========================================
+# CLEANUP
+# ========================================
+
+@job_type("cleanup", max_concurrency=1)
+def run_cleanup(job):
+    """
+    Opruimen: oude afgeronde jobs + hun bestanden, weesobjecten in de object
+    store, achtergebleven inspectie foto's en optioneel archivering van oude
+    maandpartities
+
+    Params: older_than_days (30), objects (True), archive (False)
+    """
+    from database import get_db_connection
+    from training_snapshots import OBJECT_STORE_DIR
+
+    params = job.params
+    cutoff = datetime.now() - timedelta(days=params.get('older_than_days', 30))
+    result = {'jobs_deleted': 0, 'objects_deleted': 0, 'archived': []}
+
+    job.progress(10, "Oude jobs verwijderen")
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        DELETE FROM jobs
+        WHERE status = ANY(%s) AND finished_at < %s AND id <> %s
+        RETURNING id
+    """, (list(FINISHED_STATUSES), cutoff, job.id))
+    deleted_ids = [row['id'] for row in cursor.fetchall()]
+    conn.commit()
+    conn.close()
+
+    for job_id in deleted_ids:
+        shutil.rmtree(JOB_ARTIFACT_DIR / str(job_id), ignore_errors=True)
+    result['jobs_deleted'] = len(deleted_ids)
+
+    if params.get('objects', True) and OBJECT_STORE_DIR.is_dir():
+        # Objecten met link count 1 worden door geen bronbestand of snapshot meer gebruikt
+        job.progress(40, "Object store opruimen")
+        min_age = time.time() - 3600
+        for path in OBJECT_STORE_DIR.glob("??/*"):
+            stat = path.stat()
+            if stat.st_mtime < min_age and (stat.st_nlink == 1 or path.suffix == ".tmp"):
+                path.unlink(missing_ok=True)
+                result['objects_deleted'] += 1
+
+    if INSPECTION_UPLOAD_DIR.is_dir():
+        # Foto's van mislukte/geannuleerde inspectie jobs die niet meer hervat worden
+        for path in INSPECTION_UPLOAD_DIR.iterdir():
+            if path.stat().st_mtime < cutoff.timestamp():
+                path.unlink(missing_ok=True)
+
+    if params.get('archive'):
+        from analysis_archive import archive_old_partitions
+        job.progress(70, "Oude maanden archiveren")
+        result['archived'] = archive_old_partitions()
+
+    return result
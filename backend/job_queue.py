@@ -0,0 +1,445 @@
+"""
+Background jobs met een PostgreSQL queue
+Zware admin acties (dataset/training/CSV exports, bulk re-scoring, cleanup)
+draaien als job in plaats van binnen het HTTP request. Jobs staan in de
+jobs tabel (migratie 12); workers claimen ze met advisory locks:
+
+- pg_try_advisory_lock(JOB_LOCK_NAMESPACE, id) zolang een job draait. Sterft
+  de worker, dan valt het lock weg en pakt een andere worker de job op
+  vanaf het laatste checkpoint (resume).
+- Per job type max_concurrency slots (JOB_SLOT_NAMESPACE, hashtext(type:n)),
+  zodat bijvoorbeeld maar één dataset export tegelijk draait, ook over
+  meerdere processen heen.
+- Elke claim telt als poging; een job die na max_attempts pogingen nog
+  steeds de worker laat crashen wordt 'failed' in plaats van eindeloos
+  opnieuw geclaimd.
+
+Gebruik:
+    python job_queue.py worker     # losse worker (naast of i.p.v. JOB_WORKERS in de API)
+    python job_queue.py list       # laatste jobs
+"""
+
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+from dotenv import load_dotenv
+
+from database import get_db_connection
+from migrations import get_connection
+
+load_dotenv()
+
+# Worker threads in het API proces (0 = alleen losse `python job_queue.py worker`)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1.0"))
+
+# Downloadbare resultaten van jobs (CSV, ZIP, ...)
+JOB_ARTIFACT_DIR = Path(os.getenv("JOB_ARTIFACT_DIR", "data/jobs"))
+
+# Standaard maximum aantal claims per job (overschrijfbaar per type)
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+# Minimale tijd tussen progress writes naar de database
+JOB_PROGRESS_INTERVAL = 0.5
+
+JOB_LOCK_NAMESPACE = 0x4A4F42   # advisory lock classid voor job ids
+JOB_SLOT_NAMESPACE = 0x4A4F43   # advisory lock classid voor concurrency slots
+
+JOB_STATUSES = ("queued", "running", "done", "failed", "cancelled")
+FINISHED_STATUSES = ("done", "failed", "cancelled")
+
+# job_type -> {'handler': fn(job), 'max_concurrency': n, 'max_attempts': n}
+JOB_TYPES = {}
+
+
+class JobCancelled(Exception):
+    """Job is via cancel_job gestopt"""
+
+
+def job_type(name, max_concurrency=1, max_attempts=JOB_MAX_ATTEMPTS):
+    """Decorator: registreer een handler voor een job type"""
+    def register(handler):
+        JOB_TYPES[name] = {
+            'handler': handler,
+            'max_concurrency': int(os.getenv(f"JOB_CONCURRENCY_{name.upper()}", str(max_concurrency))),
+            'max_attempts': int(os.getenv(f"JOB_MAX_ATTEMPTS_{name.upper()}", str(max_attempts)))
+        }
+        return handler
+    return register
+
+
+def _load_handlers():
+    # Registreert de job types (import pas hier: job_handlers importeert deze module)
+    import job_handlers  # noqa: F401
+
+
+def _shape_job(row):
+    return dict(row) if row else None
+
+
+# ========================================
+# QUEUE API
+# ========================================
+
+def enqueue_job(job_type_name, params=None, created_by='admin'):
+    """
+    Zet een job in de queue
+
+    Args:
+        job_type_name: Een van de geregistreerde job types
+        params: JSON parameters voor de handler
+        created_by: Wie de job aanmaakt
+
+    Returns:
+        Job dict
+
+    Raises:
+        ValueError: Bij een onbekend job type
+    """
+    _load_handlers()
+    if job_type_name not in JOB_TYPES:
+        raise ValueError(f"Onbekend job type '{job_type_name}', kies uit: {', '.join(JOB_TYPES)}")
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO jobs (job_type, params, created_by)
+        VALUES (%s, %s, %s)
+        RETURNING *
+    """, (job_type_name, json.dumps(params or {}), created_by))
+    job = _shape_job(cursor.fetchone())
+    conn.commit()
+    conn.close()
+
+    print(f"🗂️ Job {job['id']} ({job_type_name}) in de queue")
+    return job
+
+
+def get_job(job_id):
+    """Haal een job op, of None"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM jobs WHERE id = %s", (job_id,))
+    job = _shape_job(cursor.fetchone())
+    conn.close()
+    return job
+
+
+def list_jobs(status=None, job_type_name=None, limit=50):
+    """
+    Lijst van jobs (nieuwste eerst)
+
+    Args:
+        status: Filter op status (optioneel)
+        job_type_name: Filter op job type (optioneel)
+        limit: Maximum aantal resultaten
+
+    Returns:
+        List van job dicts
+    """
+    conditions = []
+    params = []
+
+    if status:
+        conditions.append("status = %s")
+        params.append(status)
+
+    if job_type_name:
+        conditions.append("job_type = %s")
+        params.append(job_type_name)
+
+    where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+    params.append(limit)
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT * FROM jobs {where} ORDER BY id DESC LIMIT %s", params)
+    jobs = [_shape_job(row) for row in cursor.fetchall()]
+    conn.close()
+    return jobs
+
+
+def cancel_job(job_id):
+    """
+    Annuleer een job: direct als hij nog in de queue staat, anders stopt de
+    handler bij zijn volgende progress update
+
+    Returns:
+        Bijgewerkte job dict, of None als de job niet bestaat
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE jobs
+        SET status = CASE WHEN status = 'queued' THEN 'cancelled' ELSE status END,
+            finished_at = CASE WHEN status = 'queued' THEN CURRENT_TIMESTAMP ELSE finished_at END,
+            cancel_requested = (status = 'running'),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = %s
+        RETURNING *
+    """, (job_id,))
+    job = _shape_job(cursor.fetchone())
+    conn.commit()
+    conn.close()
+    return job
+
+
+def resume_job(job_id):
+    """
+    Zet een mislukte of geannuleerde job terug in de queue; de handler gaat
+    verder vanaf het opgeslagen checkpoint
+
+    Returns:
+        Bijgewerkte job dict, of None als de job niet (meer) te hervatten is
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE jobs
+        SET status = 'queued', cancel_requested = FALSE, error = NULL, attempts = 0,
+            finished_at = NULL, updated_at = CURRENT_TIMESTAMP
+        WHERE id = %s AND status IN ('failed', 'cancelled')
+        RETURNING *
+    """, (job_id,))
+    job = _shape_job(cursor.fetchone())
+    conn.commit()
+    conn.close()
+    return job
+
+
+# ========================================
+# WORKER
+# ========================================
+
+class JobContext:
+    """Wat een handler van zijn job ziet: params, checkpoint en progress()"""
+
+    def __init__(self, job, conn):
+        self.id = job['id']
+        self.job_type = job['job_type']
+        self.params = job['params'] or {}
+        self.checkpoint = job['checkpoint']
+        self._conn = conn
+        self._last_write = 0.0
+
+    def progress(self, progress, message, checkpoint=None):
+        """
+        Werk progress (0-100) en optioneel het checkpoint bij
+
+        Raises:
+            JobCancelled: Als de job intussen geannuleerd is
+        """
+        now = time.monotonic()
+        if checkpoint is None and now - self._last_write < JOB_PROGRESS_INTERVAL:
+            return
+        self._last_write = now
+        if checkpoint is not None:
+            self.checkpoint = checkpoint
+
+        with self._conn.cursor() as cursor:
+            cursor.execute("""
+                UPDATE jobs
+                SET progress = %s, message = %s, checkpoint = COALESCE(%s, checkpoint),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+                RETURNING cancel_requested
+            """, (int(progress), message, json.dumps(checkpoint) if checkpoint is not None else None, self.id))
+            row = cursor.fetchone()
+
+        if row and row['cancel_requested']:
+            raise JobCancelled()
+
+    def artifact_path(self, filename):
+        """Pad voor een downloadbaar bestand van deze job (JOB_ARTIFACT_DIR/<id>/)"""
+        path = JOB_ARTIFACT_DIR / str(self.id) / filename
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+
+class JobRunner:
+    """Worker threads die jobs claimen en uitvoeren"""
+
+    def __init__(self, workers=JOB_WORKERS, poll_seconds=JOB_POLL_SECONDS):
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.worker_name = f"{socket.gethostname()}:{os.getpid()}"
+        self._threads = []
+        self._stopping = threading.Event()
+
+    def start(self):
+        """Start de worker threads (no-op bij workers=0)"""
+        if self._threads or self.workers <= 0:
+            return
+        _load_handlers()
+        self._stopping.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"🗂️ Job runner gestart: {self.workers} worker(s), types: {', '.join(JOB_TYPES)}")
+
+    def stop(self, timeout=5.0):
+        """Stop de workers; lopende jobs houden hun checkpoint en worden later hervat"""
+        self._stopping.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _run(self):
+        conn = None
+        while not self._stopping.is_set():
+            try:
+                if conn is None or conn.closed:
+                    conn = get_connection()
+                    conn.autocommit = True
+
+                claimed = self._claim(conn)
+                if claimed is None:
+                    self._stopping.wait(self.poll_seconds)
+                    continue
+
+                job, slot = claimed
+                try:
+                    self._execute(conn, job)
+                finally:
+                    with conn.cursor() as cursor:
+                        cursor.execute("SELECT pg_advisory_unlock(%s, %s)", (JOB_LOCK_NAMESPACE, job['id']))
+                        cursor.execute("SELECT pg_advisory_unlock(%s, hashtext(%s))", (JOB_SLOT_NAMESPACE, slot))
+            except Exception as e:
+                print(f"⚠️ Job worker fout: {e}")
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                conn = None
+                self._stopping.wait(self.poll_seconds)
+
+        if conn is not None:
+            conn.close()
+
+    def _claim(self, conn):
+        """
+        Claim een job: eerst een concurrency slot voor het type, dan het job lock
+
+        Kandidaten zijn queued jobs en 'running' jobs zonder lock (worker
+        gestorven). Returns (job, slot) of None.
+        """
+        with conn.cursor() as cursor:
+            for name, spec in JOB_TYPES.items():
+                cursor.execute("""
+                    SELECT id FROM jobs
+                    WHERE job_type = %s AND status IN ('queued', 'running')
+                    ORDER BY id
+                    LIMIT 20
+                """, (name,))
+                candidates = [row['id'] for row in cursor.fetchall()]
+                if not candidates:
+                    continue
+
+                slot = None
+                for index in range(spec['max_concurrency']):
+                    cursor.execute("SELECT pg_try_advisory_lock(%s, hashtext(%s)) AS locked",
+                                   (JOB_SLOT_NAMESPACE, f"{name}:{index}"))
+                    if cursor.fetchone()['locked']:
+                        slot = f"{name}:{index}"
+                        break
+                if slot is None:
+                    continue
+
+                for job_id in candidates:
+                    cursor.execute("SELECT pg_try_advisory_lock(%s, %s) AS locked", (JOB_LOCK_NAMESPACE, job_id))
+                    if not cursor.fetchone()['locked']:
+                        continue
+                    # Status opnieuw checken: kan net klaar of geannuleerd zijn
+                    cursor.execute("""
+                        UPDATE jobs
+                        SET status = 'running', attempts = attempts + 1, worker = %s,
+                            started_at = COALESCE(started_at, CURRENT_TIMESTAMP),
+                            updated_at = CURRENT_TIMESTAMP
+                        WHERE id = %s AND status IN ('queued', 'running') AND attempts < %s
+                        RETURNING *
+                    """, (self.worker_name, job_id, spec['max_attempts']))
+                    job = cursor.fetchone()
+                    if job:
+                        return dict(job), slot
+
+                    # Pogingen op (worker crashte steeds tijdens deze job): niet meer claimen
+                    cursor.execute("""
+                        UPDATE jobs
+                        SET status = 'failed', error = %s,
+                            finished_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+                        WHERE id = %s AND status IN ('queued', 'running') AND attempts >= %s
+                        RETURNING id
+                    """, (f"Gestopt na {spec['max_attempts']} pogingen (worker afgebroken)",
+                          job_id, spec['max_attempts']))
+                    if cursor.fetchone():
+                        print(f"❌ Job {job_id} ({name}) na {spec['max_attempts']} pogingen op failed gezet")
+                    cursor.execute("SELECT pg_advisory_unlock(%s, %s)", (JOB_LOCK_NAMESPACE, job_id))
+
+                cursor.execute("SELECT pg_advisory_unlock(%s, hashtext(%s))", (JOB_SLOT_NAMESPACE, slot))
+        return None
+
+    def _execute(self, conn, job):
+        context = JobContext(job, conn)
+        resumed = " (hervat)" if job['checkpoint'] is not None else ""
+        print(f"▶️ Job {job['id']} ({job['job_type']}){resumed}")
+        start_time = time.time()
+
+        try:
+            result = JOB_TYPES[job['job_type']]['handler'](context)
+            status, error = 'done', None
+        except JobCancelled:
+            result, status, error = None, 'cancelled', None
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            result, status, error = None, 'failed', str(e)
+
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                UPDATE jobs
+                SET status = %s, result = %s, error = %s, cancel_requested = FALSE,
+                    progress = CASE WHEN %s = 'done' THEN 100 ELSE progress END,
+                    message = CASE WHEN %s = 'done' THEN 'Klaar' ELSE message END,
+                    finished_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+            """, (status, json.dumps(result, default=str) if result is not None else None, error,
+                  status, status, job['id']))
+
+        print(f"{'✅' if status == 'done' else '⏹️' if status == 'cancelled' else '❌'} "
+              f"Job {job['id']} ({job['job_type']}) {status} na {time.time() - start_time:.1f}s")
+
+
+job_runner = JobRunner()
+
+
+if __name__ == "__main__":
+    # Fix Windows console encoding
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "list"
+
+    if command == "worker":
+        from cache_listener import cache_listener
+        cache_listener.start()
+        runner = JobRunner(workers=max(JOB_WORKERS, 1))
+        runner.start()
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            runner.stop()
+            cache_listener.stop()
+    elif command == "list":
+        for job in list_jobs():
+            print(f"{job['id']:>6}  {job['job_type']:<16} {job['status']:<10} {job['progress']:>3}%  "
+                  f"{job['message'] or ''}")
+    else:
+        print(__doc__)
+        sys.exit(1)
@@ -5,23 +5,31 @@ Endpoints voor foto upload, analyse en resultaten
 
 from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from pathlib import Path
 import cv2
-import numpy as np
-from ultralytics import YOLO
 from datetime import datetime
-import io
-from PIL import Image
 import base64
 import json
+import os
 import asyncio
 from typing import AsyncGenerator
 
-from utils.face_blur import FaceBlurrer
-from database import save_analysis, get_db_connection
+from utils.progress_broker import ProgressBroker
+from inference import (active_model, CLASS_INFO, CLASSIFICATION_MODEL_PATH, DETECTION_MODEL_PATH,
+                       load_models, process_image_bytes, blur_faces_in_image, analyze_image,
+                       analyze_image_detection, generate_suggestions)
+from inspection_pipeline import optional_stage_names
+from inspection_service import run_inspection, UPLOAD_DIR
+from database import get_db_connection, request_connection_scope, get_pool_stats, close_pool
+from database_async import (get_pool as open_async_pool, close_pool as close_async_pool,
+                            get_pool_stats as get_async_pool_stats)
+from analysis_journal import analysis_journal
+from analysis_writer import analysis_writer
+from job_queue import job_runner
+from progress_transport import create_progress_transport
 
 app = FastAPI(
     title="Werkplek Inspectie API",
@@ -32,6 +40,8 @@ app = FastAPI(
 # Test database connection bij startup
 @app.on_event("startup")
 async def startup_event():
+    global progress_transport
+
     try:
         conn = get_db_connection()
         conn.close()
@@ -39,6 +49,75 @@ async def startup_event():
     except Exception as e:
         print(f"❌ Database verbinding mislukt: {e}")
 
+    # Write-behind persistence: speel journal af en start flusher
+    analysis_journal.start()
+
+    # Maandpartities van analyses alvast aanmaken (no-op zonder migratie 10)
+    try:
+        from analysis_archive import maintain_partitions
+        await asyncio.to_thread(maintain_partitions)
+    except Exception as e:
+        print(f"⚠️ Analyses partities aanmaken mislukt: {e}")
+
+    # Async pool voor de API endpoints
+    try:
+        await open_async_pool()
+    except Exception as e:
+        print(f"❌ Async database pool openen mislukt: {e}")
+
+    # Progress events delen met andere uvicorn workers / hosts
+    try:
+        progress_transport = create_progress_transport(progress_broker)
+        if progress_transport is not None:
+            await progress_transport.start()
+    except Exception as e:
+        progress_transport = None
+        print(f"⚠️ Progress transport starten mislukt: {e}")
+
+    # Werkplek cache legen bij wijzigingen uit andere processen
+    try:
+        from cache_listener import cache_listener
+        cache_listener.start()
+    except Exception as e:
+        print(f"⚠️ Cache listener starten mislukt: {e}")
+
+    # Background jobs (JOB_WORKERS=0: alleen via `python job_queue.py worker`)
+    try:
+        from job_handlers import set_inspection_loop
+        set_inspection_loop(asyncio.get_running_loop())
+        job_runner.start()
+    except Exception as e:
+        print(f"⚠️ Job runner starten mislukt: {e}")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Lopende jobs houden hun checkpoint; een volgende worker hervat ze
+    job_runner.stop()
+
+    if progress_transport is not None:
+        await progress_transport.stop()
+
+    from cache_listener import cache_listener
+    cache_listener.stop()
+
+    # Inspecties van afgebroken streams eerst afmaken (zij schrijven nog naar het journal)
+    if stream_inspections:
+        await asyncio.gather(*stream_inspections, return_exceptions=True)
+
+    # Journal leegmaken zodat geen analyses verloren gaan
+    analysis_journal.stop()
+    analysis_writer.stop()
+    await close_async_pool()
+    close_pool()
+
+
+@app.middleware("http")
+async def db_connection_per_request(request: Request, call_next):
+    """Hergebruik een enkele pool connectie voor alle database calls binnen een request"""
+    with request_connection_scope():
+        return await call_next(request)
+
 # CORS voor frontend
 app.add_middleware(
     CORSMiddleware,
@@ -58,289 +137,6 @@ training_images_dir = Path("data/training_images")
 training_images_dir.mkdir(parents=True, exist_ok=True)
 app.mount("/data/training_images", StaticFiles(directory=str(training_images_dir)), name="training_images")
 
-# Globale variabelen
-# Model Type: "classification" of "detection"
-MODEL_TYPE = "classification"  # Wijzig naar "detection" voor object detection mode
-
-# Model paths
-CLASSIFICATION_MODEL_PATH = Path(__file__).parent / "models" / "werkplek_classifier (3).pt"
-DETECTION_MODEL_PATH = Path(__file__).parent / "models" / "werkplek_detector (7).pt"
-
-# Backwards compatibility: MODEL_PATH wijst naar actieve model
-MODEL_PATH = CLASSIFICATION_MODEL_PATH if MODEL_TYPE == "classification" else DETECTION_MODEL_PATH
-
-UPLOAD_DIR = Path("uploads")
-UPLOAD_DIR.mkdir(exist_ok=True)
-
-# AI Models (lazy loading)
-yolo_model = None
-face_blurrer = None
-
-# Class mapping for CLASSIFICATION models
-# BINARY CLASSIFICATION (simpel en betrouwbaar):
-# - Class 0: OK - Alle gereedschappen aanwezig
-# - Class 1: NOK - Minimaal 1 gereedschap ontbreekt
-#
-# MULTI-CLASS CLASSIFICATION (legacy, gedetailleerd maar complex):
-# YOLOv8 sorteert folders alfabetisch:
-# 0_ok, 1_nok_alles_weg, 2_nok_hamer_weg, 3_nok_schaar_weg,
-# 4_nok_schaar_sleutel_weg, 5_nok_sleutel_weg, 6_nok_alleen_sleutel
-
-# Binary Classification mapping (RECOMMENDED)
-CLASS_INFO_BINARY = {
-    0: {"name": "OK", "status": "ok", "description": "Werkplek is compleet - alle gereedschappen aanwezig"},
-    1: {"name": "NOK", "status": "nok", "description": "Werkplek incompleet - minimaal 1 gereedschap ontbreekt"}
-}
-
-# Multi-class Classification mapping (LEGACY - backwards compatibility)
-CLASS_INFO_MULTICLASS = {
-    0: {"name": "OK", "status": "ok", "description": "Werkplek is compleet en correct"},
-    1: {"name": "NOK - Alles weg", "status": "nok", "description": "Alle gereedschappen ontbreken", "missing": ["hamer", "schaar", "sleutel"]},
-    2: {"name": "NOK - Hamer weg", "status": "nok", "description": "Hamer ontbreekt", "missing": ["hamer"]},
-    3: {"name": "NOK - Schaar weg", "status": "nok", "description": "Schaar ontbreekt", "missing": ["schaar"]},
-    4: {"name": "NOK - Schaar en sleutel weg", "status": "nok", "description": "Schaar en sleutel ontbreken", "missing": ["schaar", "sleutel"]},
-    5: {"name": "NOK - Sleutel weg", "status": "nok", "description": "Sleutel ontbreekt", "missing": ["sleutel"]},
-    6: {"name": "NOK - Alleen sleutel", "status": "nok", "description": "Alleen sleutel aanwezig, hamer en schaar ontbreken", "missing": ["hamer", "schaar"]},
-    7: {"name": "NOK - Hamer en sleutel weg", "status": "nok", "description": "Hamer en sleutel ontbreken, alleen schaar aanwezig", "missing": ["hamer", "sleutel"]}
-}
-
-# Default to multiclass for backwards compatibility with existing 8-class models
-CLASS_INFO = CLASS_INFO_MULTICLASS
-
-SUGGESTIONS = {
-    "hamer": "Plaats de kunstofhamer terug op de aangewezen positie",
-    "schaar": "Plaats de schaar terug in de gereedschapskist",
-    "sleutel": "Plaats de sleutel terug op de werkbank"
-}
-
-
-def load_models():
-    """Laad AI models (lazy loading)"""
-    global yolo_model, face_blurrer
-
-    if yolo_model is None:
-        if MODEL_PATH.exists():
-            print(f"📥 Laden YOLO model: {MODEL_PATH}")
-            yolo_model = YOLO(str(MODEL_PATH))
-        else:
-            print("⚠ YOLO model niet gevonden, gebruik dummy mode")
-            yolo_model = "dummy"
-
-    if face_blurrer is None:
-        print("📥 Laden face blur model...")
-        face_blurrer = FaceBlurrer()
-
-
-def process_image_bytes(image_bytes):
-    """Convert bytes naar OpenCV image"""
-    nparr = np.frombuffer(image_bytes, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    return img
-
-
-def blur_faces_in_image(image):
-    """Blur gezichten in afbeelding"""
-    load_models()
-    blurred_img, face_count = face_blurrer.blur_faces(image.copy())
-    return blurred_img, face_count
-
-
-def image_to_base64(image):
-    """Convert OpenCV image naar base64 string"""
-    _, buffer = cv2.imencode('.jpg', image)
-    img_base64 = base64.b64encode(buffer).decode('utf-8')
-    return f"data:image/jpeg;base64,{img_base64}"
-
-
-def analyze_image(image, model_path=None):
-    """
-    Analyseer afbeelding met YOLO classification model
-
-    Args:
-        image: Image te analyseren
-        model_path: Optioneel custom model path (default gebruikt globaal MODEL_PATH)
-
-    Returns:
-        dict met resultaten
-    """
-    if model_path is None:
-        model_path = MODEL_PATH
-
-    # Load model (cached als het hetzelfde pad is)
-    model = YOLO(str(model_path))
-
-    # YOLO inference
-    results = model(image)
-
-    for result in results:
-        top_class = result.probs.top1
-        confidence = result.probs.top1conf.item()
-
-        class_info = CLASS_INFO.get(top_class, {})
-
-        return {
-            "class_id": int(top_class),
-            "confidence": float(confidence),
-            "status": class_info.get("status", "unknown")
-        }
-
-
-def generate_suggestions(class_id):
-    """Genereer suggesties op basis van classificatie"""
-    class_info = CLASS_INFO.get(class_id, {})
-
-    if class_info.get("status") == "ok":
-        return []
-
-    missing_items = class_info.get("missing", [])
-    suggestions = []
-
-    for item in missing_items:
-        if item in SUGGESTIONS:
-            suggestions.append({
-                "item": item,
-                "action": SUGGESTIONS[item]
-            })
-
-    return suggestions
-
-
-def analyze_image_detection(image, model_path=None, confidence_threshold=0.25):
-    """
-    Analyseer afbeelding met YOLO Object Detection model
-    Telt objecten (schaar, sleutel, whiteboard) en bepaalt status
-
-    Args:
-        image: Image te analyseren
-        model_path: Optioneel custom model path (default gebruikt globaal DETECTION_MODEL_PATH)
-        confidence_threshold: Minimale confidence voor detecties (default 0.25 = 25%)
-
-    Detection model classes:
-    0: hamer
-    1: schaar
-    2: sleutel
-
-    Returns:
-        dict met resultaten inclusief bounding boxes
-    """
-    if model_path is None:
-        model_path = DETECTION_MODEL_PATH
-
-    # Load model (cached als het hetzelfde pad is)
-    model = YOLO(str(model_path))
-
-    # Haal class names uit het model zelf (dynamisch!)
-    model_class_names = model.names  # Dict: {0: 'hamer', 1: 'schaar', 2: 'sleutel'}
-    print(f"📋 Model class names: {model_class_names}")
-
-    # Normaliseer class names naar lowercase voor consistentie
-    # En map 'whiteboard' → 'hamer' voor backwards compatibility
-    def normalize_class_name(name):
-        name_lower = name.lower()
-        if name_lower == 'whiteboard':
-            return 'hamer'
-        return name_lower
-
-    # YOLO object detection inference met dynamische confidence threshold
-    # confidence_threshold: alleen detecties boven deze drempel accepteren
-    # iou=0.7 means less aggressive NMS (allows more overlapping boxes)
-    print(f"🎯 Detection confidence threshold: {confidence_threshold*100:.0f}%")
-    results = model(image, conf=confidence_threshold, iou=0.7, max_det=100)
-
-    # Tel gedetecteerde objecten (dynamisch op basis van model.names)
-    object_counts = {"hamer": 0, "schaar": 0, "sleutel": 0}
-    max_confidence = 0.0
-    bounding_boxes = []
-
-    print(f"🔍 Detection: {len(results)} result(s)")
-    for result in results:
-        if result.boxes is not None:
-            print(f"  📦 Found {len(result.boxes)} boxes")
-            for box in result.boxes:
-                class_id = int(box.cls[0])
-                confidence = float(box.conf[0])
-
-                # Get bounding box coordinates (xyxy format)
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-
-                # Haal object naam uit MODEL (niet hardcoded!)
-                if class_id in model_class_names:
-                    raw_name = model_class_names[class_id]
-                    object_name = normalize_class_name(raw_name)
-
-                    # Tel alleen bekende objecten
-                    if object_name in object_counts:
-                        object_counts[object_name] += 1
-
-                        print(f"    ✓ Detected: {object_name} (model class: {raw_name}, confidence: {confidence:.2f})")
-                        bounding_boxes.append({
-                            "object": object_name,
-                            "confidence": confidence,
-                            "bbox": {
-                                "x1": int(x1),
-                                "y1": int(y1),
-                                "x2": int(x2),
-                                "y2": int(y2)
-                            }
-                        })
-                    else:
-                        print(f"    ⚠️ Onbekend object: {object_name} (class_id: {class_id})")
-                else:
-                    print(f"    ? Unknown class_id: {class_id}")
-
-                max_confidence = max(max_confidence, confidence)
-
-    # Bepaal status op basis van aanwezige objecten
-    hamer_present = object_counts["hamer"] > 0
-    schaar_present = object_counts["schaar"] > 0
-    sleutel_present = object_counts["sleutel"] > 0
-
-    # Map naar class_id
-    if hamer_present and schaar_present and sleutel_present:
-        class_id = 0  # OK - alles aanwezig
-    elif not hamer_present and not schaar_present and not sleutel_present:
-        class_id = 1  # NOK alles weg
-    elif not hamer_present and schaar_present and sleutel_present:
-        class_id = 2  # NOK hamer weg
-    elif hamer_present and not schaar_present and sleutel_present:
-        class_id = 3  # NOK schaar weg
-    elif hamer_present and not schaar_present and not sleutel_present:
-        class_id = 4  # NOK schaar en sleutel weg
-    elif hamer_present and schaar_present and not sleutel_present:
-        class_id = 5  # NOK sleutel weg
-    elif not hamer_present and not schaar_present and sleutel_present:
-        class_id = 6  # NOK alleen sleutel (hamer en schaar weg)
-    elif not hamer_present and schaar_present and not sleutel_present:
-        class_id = 7  # NOK hamer en sleutel weg (alleen schaar)
-    else:
-        # Fallback voor onverwachte combinaties
-        class_id = 1
-
-    # Detection models gebruiken altijd multiclass mapping (class 0-7)
-    class_info = CLASS_INFO_MULTICLASS.get(class_id, {})
-
-    print(f"📊 Final counts: hamer={object_counts['hamer']}, schaar={object_counts['schaar']}, sleutel={object_counts['sleutel']}")
-    print(f"📊 Total bounding boxes: {len(bounding_boxes)}")
-
-    # Debug info for frontend
-    debug_info = {
-        "total_boxes_detected": len(bounding_boxes),
-        "raw_counts": object_counts.copy(),
-        "detections": [f"{b['object']}({b['confidence']:.2f})" for b in bounding_boxes]
-    }
-
-    result = {
-        "class_id": int(class_id),
-        "confidence": float(max_confidence) if max_confidence > 0 else 0.5,
-        "status": class_info.get("status", "unknown"),
-        "detected_objects": object_counts,
-        "bounding_boxes": bounding_boxes,
-        "debug": debug_info  # Temporary debug info
-    }
-
-    return result
-
-
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -348,7 +144,7 @@ async def root():
         "status": "online",
         "service": "Werkplek Inspectie API",
         "version": "1.0.0",
-        "model_loaded": yolo_model is not None
+        "model_loaded": active_model.yolo_model is not None
     }
 
 
@@ -364,11 +160,12 @@ async def get_classes():
 async def debug_model_info():
     """Debug endpoint - model informatie"""
     load_models()
+    yolo_model = active_model.yolo_model
     
     info = {
         "model_loaded": yolo_model != "dummy",
-        "model_path": str(MODEL_PATH),
-        "model_exists": MODEL_PATH.exists(),
+        "model_path": str(active_model.model_path),
+        "model_exists": active_model.model_path.exists(),
         "expected_classes": len(CLASS_INFO),
         "class_mapping": {k: v["name"] for k, v in CLASS_INFO.items()}
     }
@@ -387,7 +184,7 @@ async def debug_model_info():
 async def get_model_type():
     """Get current model type (classification or detection)"""
     return {
-        "model_type": MODEL_TYPE,
+        "model_type": active_model.model_type,
         "classification_model": str(CLASSIFICATION_MODEL_PATH),
         "detection_model": str(DETECTION_MODEL_PATH)
     }
@@ -401,78 +198,48 @@ async def set_model_type(model_type: str):
     Args:
         model_type: "classification" or "detection"
     """
-    global MODEL_TYPE, MODEL_PATH, yolo_model
-    
-    if model_type not in ["classification", "detection"]:
-        raise HTTPException(
-            status_code=400,
-            detail="model_type must be 'classification' or 'detection'"
-        )
-    
-    MODEL_TYPE = model_type
-    MODEL_PATH = CLASSIFICATION_MODEL_PATH if model_type == "classification" else DETECTION_MODEL_PATH
-    
-    # Reload model
-    yolo_model = None
-    load_models()
+    try:
+        # Reload model (ook voor jobs die in dit proces draaien)
+        await asyncio.to_thread(active_model.switch, model_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
+    model_type, model_path = active_model.current()
     return {
         "success": True,
-        "model_type": MODEL_TYPE,
-        "model_path": str(MODEL_PATH)
+        "model_type": model_type,
+        "model_path": str(model_path)
     }
 
 
-# Global progress tracking
-analysis_progress = {}
+# Progress per inspect sessie (push naar wachtende SSE clients, begrensd geheugen)
+progress_broker = ProgressBroker()
+
+# NOTIFY naar de andere workers (gezet bij startup, None bij PROGRESS_TRANSPORT=local)
+progress_transport = None
+
+# Lopende /api/inspect/stream inspecties. asyncio houdt alleen zwakke
+# referenties naar tasks bij; zonder deze set kan een inspectie waarvan de
+# client al weg is halverwege (voor het opslaan) opgeruimd worden.
+stream_inspections = set()
 
 async def send_progress_update(session_id: str, progress: int, message: str):
-    """Send progress update voor een specifieke sessie"""
-    analysis_progress[session_id] = {
-        'progress': progress,
-        'message': message,
-        'timestamp': datetime.now().isoformat()
-    }
+    """Send progress update voor een specifieke sessie (lokaal en naar andere workers)"""
+    event = progress_broker.publish(session_id, progress, message)
+    if progress_transport is not None:
+        progress_transport.send(session_id, event)
 
 @app.get("/api/inspect/progress/{session_id}")
 async def get_analysis_progress(session_id: str):
     """
     Server-Sent Events endpoint voor realtime progress updates
+
+    Wacht op events van de progress broker (geen polling); stopt bij 100% of
+    na 60 seconden.
     """
     async def event_generator() -> AsyncGenerator[str, None]:
-        try:
-            # Wacht tot analyse klaar is of timeout (60 sec)
-            timeout = 60
-            start_time = datetime.now()
-
-            while True:
-                # Check timeout
-                if (datetime.now() - start_time).seconds > timeout:
-                    yield f"data: {json.dumps({'progress': 100, 'message': 'Timeout', 'done': True})}\n\n"
-                    break
-
-                # Check progress
-                if session_id in analysis_progress:
-                    data = analysis_progress[session_id]
-                    progress = data['progress']
-                    message = data['message']
-
-                    # Send update
-                    yield f"data: {json.dumps({'progress': progress, 'message': message, 'done': progress >= 100})}\n\n"
-
-                    # Als klaar, stop streaming
-                    if progress >= 100:
-                        # Cleanup
-                        del analysis_progress[session_id]
-                        break
-
-                # Wacht 100ms voor volgende check
-                await asyncio.sleep(0.1)
-
-        except asyncio.CancelledError:
-            # Client heeft verbinding verbroken
-            if session_id in analysis_progress:
-                del analysis_progress[session_id]
+        async for event in progress_broker.subscribe(session_id, timeout=60):
+            yield f"data: {json.dumps({'progress': event['progress'], 'message': event['message'], 'done': event['done']})}\n\n"
 
     return StreamingResponse(
         event_generator(),
@@ -485,13 +252,106 @@ async def get_analysis_progress(session_id: str):
     )
 
 
+def _device_from_user_agent(user_agent):
+    """Leid een leesbare device omschrijving af uit de User-Agent header"""
+    ua_lower = user_agent.lower()
+
+    # Parse specifieke device informatie uit User-Agent
+    device_parts = []
+
+    # Detecteer mobiele devices
+    if "iphone" in ua_lower:
+        device_parts.append("iPhone")
+        # Probeer iOS versie te vinden
+        if "os " in ua_lower:
+            try:
+                ios_version = ua_lower.split("os ")[1].split(" ")[0].replace("_", ".")
+                device_parts.append(f"iOS {ios_version}")
+            except:
+                pass
+    elif "ipad" in ua_lower:
+        device_parts.append("iPad")
+        if "os " in ua_lower:
+            try:
+                ios_version = ua_lower.split("os ")[1].split(" ")[0].replace("_", ".")
+                device_parts.append(f"iOS {ios_version}")
+            except:
+                pass
+    elif "android" in ua_lower:
+        device_parts.append("Android")
+        # Probeer Android versie te vinden
+        if "android " in ua_lower:
+            try:
+                android_version = ua_lower.split("android ")[1].split(";")[0].strip()
+                device_parts.append(android_version)
+            except:
+                pass
+        # Probeer device model te vinden (Samsung, Huawei, etc.)
+        if "samsung" in ua_lower:
+            device_parts.append("Samsung")
+        elif "huawei" in ua_lower:
+            device_parts.append("Huawei")
+        elif "xiaomi" in ua_lower:
+            device_parts.append("Xiaomi")
+        elif "oppo" in ua_lower:
+            device_parts.append("Oppo")
+        elif "oneplus" in ua_lower:
+            device_parts.append("OnePlus")
+
+    # Detecteer desktop OS
+    elif "windows" in ua_lower:
+        device_parts.append("Windows")
+        if "windows nt 10" in ua_lower:
+            device_parts.append("10/11")
+        elif "windows nt 6.3" in ua_lower:
+            device_parts.append("8.1")
+        elif "windows nt 6.2" in ua_lower:
+            device_parts.append("8")
+        elif "windows nt 6.1" in ua_lower:
+            device_parts.append("7")
+    elif "mac os x" in ua_lower or "macintosh" in ua_lower:
+        device_parts.append("macOS")
+        if "mac os x " in ua_lower:
+            try:
+                mac_version = ua_lower.split("mac os x ")[1].split(")")[0].replace("_", ".")
+                device_parts.append(mac_version)
+            except:
+                pass
+    elif "linux" in ua_lower:
+        device_parts.append("Linux")
+        if "ubuntu" in ua_lower:
+            device_parts.append("Ubuntu")
+
+    # Detecteer browser
+    if "chrome" in ua_lower and "edg" not in ua_lower:
+        device_parts.append("Chrome")
+    elif "edg" in ua_lower:
+        device_parts.append("Edge")
+    elif "firefox" in ua_lower:
+        device_parts.append("Firefox")
+    elif "safari" in ua_lower and "chrome" not in ua_lower:
+        device_parts.append("Safari")
+
+    # Combineer alle parts
+    if device_parts:
+        return " - ".join(device_parts)
+    else:
+        # Fallback naar simpele detectie
+        if "mobile" in ua_lower:
+            return "Mobiel"
+        elif "tablet" in ua_lower:
+            return "Tablet"
+        else:
+            return "Desktop"
+
+
 @app.post("/api/inspect")
 async def inspect_workplace(
     file: UploadFile = File(...),
     blur_faces: bool = Form(True),
     device_id: str = Form("onbekend"),
     workplace_id: int = Form(None),
-    confidence_threshold: float = Form(0.25),  # Dynamische confidence threshold (0.0-1.0)
+    confidence_threshold: float = Form(None),  # Dynamische confidence threshold (0.0-1.0), default: werkplek drempel
     session_id: str = Form(None),  # Voor progress tracking
     camera_metadata: str = Form(None),  # Camera/foto eigenschappen als JSON
     request: Request = None
@@ -510,302 +370,172 @@ async def inspect_workplace(
         Complete analyse resultaten
     """
     try:
-        import time
-        start_time = time.time()
+        async def emit(stage, progress, message, **data):
+            # Progress via de broker voor clients met een SSE stream op session_id
+            if session_id:
+                await send_progress_update(session_id, progress, message)
 
         # Progress: Start
-        if session_id:
-            await send_progress_update(session_id, 5, "Foto ontvangen")
+        await emit("received", 5, "Foto ontvangen")
 
-        print(f"[TIMING] Start analyse: {time.time() - start_time:.2f}s")
         # Auto-detecteer device van User-Agent als geen device_id is opgegeven
         if device_id == "onbekend" and request:
-            user_agent = request.headers.get("user-agent", "")
-            ua_lower = user_agent.lower()
-
-            # Parse specifieke device informatie uit User-Agent
-            device_parts = []
-
-            # Detecteer mobiele devices
-            if "iphone" in ua_lower:
-                device_parts.append("iPhone")
-                # Probeer iOS versie te vinden
-                if "os " in ua_lower:
-                    try:
-                        ios_version = ua_lower.split("os ")[1].split(" ")[0].replace("_", ".")
-                        device_parts.append(f"iOS {ios_version}")
-                    except:
-                        pass
-            elif "ipad" in ua_lower:
-                device_parts.append("iPad")
-                if "os " in ua_lower:
-                    try:
-                        ios_version = ua_lower.split("os ")[1].split(" ")[0].replace("_", ".")
-                        device_parts.append(f"iOS {ios_version}")
-                    except:
-                        pass
-            elif "android" in ua_lower:
-                device_parts.append("Android")
-                # Probeer Android versie te vinden
-                if "android " in ua_lower:
-                    try:
-                        android_version = ua_lower.split("android ")[1].split(";")[0].strip()
-                        device_parts.append(android_version)
-                    except:
-                        pass
-                # Probeer device model te vinden (Samsung, Huawei, etc.)
-                if "samsung" in ua_lower:
-                    device_parts.append("Samsung")
-                elif "huawei" in ua_lower:
-                    device_parts.append("Huawei")
-                elif "xiaomi" in ua_lower:
-                    device_parts.append("Xiaomi")
-                elif "oppo" in ua_lower:
-                    device_parts.append("Oppo")
-                elif "oneplus" in ua_lower:
-                    device_parts.append("OnePlus")
-
-            # Detecteer desktop OS
-            elif "windows" in ua_lower:
-                device_parts.append("Windows")
-                if "windows nt 10" in ua_lower:
-                    device_parts.append("10/11")
-                elif "windows nt 6.3" in ua_lower:
-                    device_parts.append("8.1")
-                elif "windows nt 6.2" in ua_lower:
-                    device_parts.append("8")
-                elif "windows nt 6.1" in ua_lower:
-                    device_parts.append("7")
-            elif "mac os x" in ua_lower or "macintosh" in ua_lower:
-                device_parts.append("macOS")
-                if "mac os x " in ua_lower:
-                    try:
-                        mac_version = ua_lower.split("mac os x ")[1].split(")")[0].replace("_", ".")
-                        device_parts.append(mac_version)
-                    except:
-                        pass
-            elif "linux" in ua_lower:
-                device_parts.append("Linux")
-                if "ubuntu" in ua_lower:
-                    device_parts.append("Ubuntu")
-
-            # Detecteer browser
-            if "chrome" in ua_lower and "edg" not in ua_lower:
-                device_parts.append("Chrome")
-            elif "edg" in ua_lower:
-                device_parts.append("Edge")
-            elif "firefox" in ua_lower:
-                device_parts.append("Firefox")
-            elif "safari" in ua_lower and "chrome" not in ua_lower:
-                device_parts.append("Safari")
-
-            # Combineer alle parts
-            if device_parts:
-                device_id = " - ".join(device_parts)
-            else:
-                # Fallback naar simpele detectie
-                if "mobile" in ua_lower:
-                    device_id = "Mobiel"
-                elif "tablet" in ua_lower:
-                    device_id = "Tablet"
-                else:
-                    device_id = "Desktop"
+            device_id = _device_from_user_agent(request.headers.get("user-agent", ""))
 
         # Lees uploaded file
         contents = await file.read()
-        if session_id:
-            await send_progress_update(session_id, 15, "Foto verwerken")
 
-        image = process_image_bytes(contents)
+        return await run_inspection(contents, blur_faces, device_id, workplace_id, confidence_threshold,
+                                     camera_metadata, emit)
 
-        if image is None:
-            raise HTTPException(status_code=400, detail="Ongeldige afbeelding")
-
-        # Stap 1: Check voor gezichten (privacy)
-        if session_id:
-            await send_progress_update(session_id, 25, "Privacy check")
-
-        # Face detection met YuNet (modern DNN model - veel accurater dan Haar Cascade)
-        face_count = 0
-        processed_image = image
-
-        if blur_faces:
-            try:
-                face_start = time.time()
-                processed_image, face_count = blur_faces_in_image(image)
-                print(f"[TIMING] Face detection: {time.time() - face_start:.2f}s")
-                print(f"[INSPECT] Face detection result: {face_count} faces detected")
-
-                # Als er gezichten zijn: AFKEUREN - geen analyse
-                if face_count > 0:
-                    raise HTTPException(
-                        status_code=403,
-                        detail="Foto afgekeurd: Persoon gedetecteerd. Privacy vereist - verwijder personen uit het beeld."
-                    )
-            except HTTPException:
-                raise
-            except Exception as blur_error:
-                print(f"[INSPECT] Face detection failed: {str(blur_error)}, continuing without blur")
-                processed_image = image
-                face_count = 0
-
-        # Stap 2: Bepaal welk model te gebruiken (per werkplek of globaal)
-        if session_id:
-            await send_progress_update(session_id, 35, "Model laden")
-
-        from database import get_workplace_model
-
-        workplace_model = get_workplace_model(workplace_id) if workplace_id else None
-
-        if workplace_model and workplace_model['model_path']:
-            # Gebruik werkplek-specifiek model
-            model_type = workplace_model['model_type']
-            model_path = Path(__file__).parent / workplace_model['model_path']
-            model_version = workplace_model.get('model_version')  # Haal model versie op
-            print(f"🏢 Werkplek {workplace_id}: gebruik {model_type} model ({model_path.name}), versie: {model_version}")
-        else:
-            # Fallback naar globale configuratie
-            model_type = MODEL_TYPE
-            model_path = MODEL_PATH
-            model_version = None
-            print(f"⚙️ Geen werkplek model, gebruik globaal: {model_type}")
-
-        # Analyseer met het juiste model
-        if session_id:
-            await send_progress_update(session_id, 50, "Objecten detecteren")
-
-        model_start = time.time()
-        if model_type == "detection":
-            analysis = analyze_image_detection(processed_image, model_path, confidence_threshold)
-        else:
-            analysis = analyze_image(processed_image, model_path)
-        print(f"[TIMING] Model inference: {time.time() - model_start:.2f}s")
+    except HTTPException:
+        # Re-raise HTTPException (bijv. 403 voor face detection)
+        raise
+    except Exception as e:
+        print(f"[INSPECT] ERROR: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Error tijdens analyse: {str(e)}")
 
-        if session_id:
-            await send_progress_update(session_id, 80, "Resultaten verwerken")
 
-        # Stap 3: Haal class info op
-        class_id = analysis["class_id"]
-        class_info = CLASS_INFO.get(class_id, {})
+@app.post("/api/inspect/stream")
+async def inspect_workplace_stream(
+    file: UploadFile = File(...),
+    blur_faces: bool = Form(True),
+    device_id: str = Form("onbekend"),
+    workplace_id: int = Form(None),
+    confidence_threshold: float = Form(None),
+    camera_metadata: str = Form(None),
+    request: Request = None
+):
+    """
+    Inspecteer werkplek foto met stage events op dezelfde verbinding
 
-        # Stap 4: Genereer suggesties
-        suggestions = generate_suggestions(class_id)
+    Zelfde inspectie als /api/inspect, maar zonder session_id en aparte SSE
+    verbinding: de response is een stroom van events, NDJSON (standaard) of
+    SSE (Accept: text/event-stream). Eerst per stap
+    {"event": stage, "progress", "message", ...} (received, uploaded,
+    decoded, privacy_checked, model_loaded, inferred, persisted, done); het
+    inferred event bevat al het OK/NOK oordeel. Als laatste
+    {"event": "result", "result": {...}} of {"event": "error", "status_code", "detail"}.
 
-        # Stap 5: Sla resultaat op (altijd - wordt pas verwijderd na beoordeling)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"inspect_{timestamp}.jpg"
-        output_path = UPLOAD_DIR / filename
-        cv2.imwrite(str(output_path), processed_image)
-        image_path = str(output_path)
-
-        # Convert processed image naar base64 voor frontend
-        img_base64 = image_to_base64(processed_image)
-
-        # Stap 6: Sla analyse op in database voor later review
-        print(f"DEBUG: workplace_id ontvangen = {workplace_id}, type = {type(workplace_id)}")
-        # Voor classificatie: gebruik binair label (OK/NOK)
-        # Voor detectie: gebruik volledige naam
-        if model_type == "classification":
-            # Binair: alleen OK of NOK
-            predicted_label = "OK" if analysis["status"] == "ok" else "NOK"
-        else:
-            # Detectie: volledige naam
-            predicted_label = class_info.get("name", "Onbekend")
+    Returns:
+        StreamingResponse met inspectie events
+    """
+    if device_id == "onbekend" and request:
+        device_id = _device_from_user_agent(request.headers.get("user-agent", ""))
 
-        # Parse camera metadata if provided
-        camera_info = {}
-        if camera_metadata:
-            try:
-                camera_info = json.loads(camera_metadata)
-                print(f"[INSPECT] Camera metadata ontvangen: {camera_info}")
-            except json.JSONDecodeError:
-                print(f"[INSPECT] WARNING: Could not parse camera_metadata: {camera_metadata}")
-
-        analysis_data = {
-            'timestamp': timestamp,
-            'image_path': image_path,
-            'predicted_class': str(class_id),
-            'predicted_label': predicted_label,
-            'confidence': analysis["confidence"],
-            'status': analysis["status"].upper(),
-            'missing_items': class_info.get("missing", []),
-            'face_count': face_count,
-            'device_id': device_id,
-            'workplace_id': workplace_id,  # Voeg workplace ID toe voor filtering
-            'model_type': model_type,  # Gebruik het daadwerkelijk gebruikte model type
-            'model_version': model_version,  # Voeg model versie toe voor filtering
-            'camera_info': camera_info  # Voeg camera eigenschappen toe
-        }
+    # Upload lezen voordat de response begint (het UploadFile wordt daarna gesloten)
+    contents = await file.read()
+    sse = request is not None and "text/event-stream" in request.headers.get("accept", "")
+    events = asyncio.Queue()
 
-        # Voeg detection counts toe als detection mode actief is
-        if model_type == "detection" and "detected_objects" in analysis:
-            detected = analysis["detected_objects"]
-            analysis_data['detected_hamer'] = detected.get('hamer', 0)
-            analysis_data['detected_schaar'] = detected.get('schaar', 0)
-            analysis_data['detected_sleutel'] = detected.get('sleutel', 0)
-            analysis_data['total_detections'] = sum(detected.values())
+    async def emit(stage, progress, message, **data):
+        await events.put({"event": stage, "progress": progress, "message": message, **data})
+        # Laat de stream het event versturen voordat de volgende stap begint
+        await asyncio.sleep(0)
 
+    async def run():
         try:
-            analysis_id = save_analysis(analysis_data)
-            print(f"[INSPECT] Analysis saved with ID: {analysis_id}")
-        except Exception as db_error:
-            print(f"[INSPECT] WARNING: Failed to save analysis to database: {str(db_error)}")
+            result = await run_inspection(contents, blur_faces, device_id, workplace_id,
+                                           confidence_threshold, camera_metadata, emit)
+            await events.put({"event": "result", "result": result})
+        except HTTPException as e:
+            await events.put({"event": "error", "status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            print(f"[INSPECT] ERROR: {str(e)}")
             import traceback
             traceback.print_exc()
-            # Continue zonder database save - de analyse is wel gelukt
-            analysis_id = None
+            await events.put({"event": "error", "status_code": 500, "detail": f"Error tijdens analyse: {str(e)}"})
+
+    async def event_stream() -> AsyncGenerator[str, None]:
+        await emit("received", 5, "Foto ontvangen")
+        # Client kan eerder weg zijn; de inspectie (en het opslaan) loopt dan
+        # los van de stream door tot hij klaar is
+        task = asyncio.create_task(run())
+        stream_inspections.add(task)
+        task.add_done_callback(stream_inspections.discard)
+
+        while True:
+            event = await events.get()
+            payload = json.dumps(event, default=str)
+            yield f"event: {event['event']}\ndata: {payload}\n\n" if sse else payload + "\n"
+            if event["event"] in ("result", "error"):
+                break
 
-        # Build response
-        response = {
-            "success": True,
-            "analysis_id": analysis_id,
-            "timestamp": timestamp,
-            "model_type": model_type,  # Gebruik daadwerkelijk gebruikte model type
-            "privacy": {
-                "faces_detected": face_count,
-                "faces_blurred": face_count if blur_faces else 0
-            },
-            "step1_classification": {
-                "status": analysis["status"],
-                "confidence": analysis["confidence"],
-                "result": "OK" if analysis["status"] == "ok" else "NOK"
-            },
-            "step2_analysis": {
-                "class_id": class_id,
-                "class_name": class_info.get("name", "Onbekend"),
-                "description": class_info.get("description", ""),
-                "missing_items": class_info.get("missing", [])
-            },
-            "step3_suggestions": suggestions,
-            "image": {
-                "filename": filename,
-                "base64": img_base64
-            }
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
         }
+    )
 
-        # Add detection-specific data if using detection model
-        if model_type == "detection":
-            response["detection"] = {
-                "detected_objects": analysis.get("detected_objects", {}),
-                "bounding_boxes": analysis.get("bounding_boxes", []),
-                "debug": analysis.get("debug", {})  # Include debug info
-            }
 
-        # Final progress update
-        if session_id:
-            await send_progress_update(session_id, 100, "Klaar")
+@app.get("/api/analysis/provisional/{provisional_id}")
+async def resolve_provisional_analysis(provisional_id: str):
+    """
+    Resolve een voorlopige ID (uit /api/inspect) naar de echte analysis_id
 
-        print(f"[TIMING] Total analyse time: {time.time() - start_time:.2f}s")
-        return response
+    Args:
+        provisional_id: Voorlopige ID uit het inspect response
 
-    except HTTPException:
-        # Re-raise HTTPException (bijv. 403 voor face detection)
-        raise
+    Returns:
+        Status ('saved', 'pending' of 'quarantined') en analysis_id zodra opgeslagen
+    """
+    try:
+        status, analysis_id = await asyncio.to_thread(analysis_journal.resolve, provisional_id)
     except Exception as e:
-        print(f"[INSPECT] ERROR: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Error tijdens analyse: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+    if status == 'unknown':
+        raise HTTPException(status_code=404, detail="Voorlopige analyse ID niet gevonden")
+
+    return {
+        "success": True,
+        "provisional_id": provisional_id,
+        "status": status,
+        "analysis_id": analysis_id
+    }
+
+
+@app.get("/api/debug/journal")
+async def debug_journal():
+    """Debug endpoint - write-behind journal status"""
+    return analysis_journal.stats()
+
+
+@app.get("/api/debug/db-pool")
+async def debug_db_pool():
+    """Debug endpoint - connection pool gebruik en wait-time metrics (sync en async pool)"""
+    return {**get_pool_stats(), "async_pool": get_async_pool_stats()}
+
+
+@app.get("/api/debug/analysis-writer")
+async def debug_analysis_writer():
+    """Debug endpoint - batch grootte en commit latency van de analysis writer"""
+    return analysis_writer.metrics()
+
+
+@app.get("/api/debug/progress")
+async def debug_progress():
+    """Debug endpoint - sessies en luisteraars van de progress broker en het transport"""
+    return {
+        **progress_broker.stats(),
+        "transport": progress_transport.stats() if progress_transport is not None else {'transport': 'local'}
+    }
+
+
+@app.get("/api/debug/analysis-cache")
+async def debug_analysis_cache():
+    """Debug endpoint - hit/miss statistieken van de history/statistieken en werkplek caches"""
+    from database import analysis_cache, workplace_cache
+    from cache_listener import cache_listener
+    return {
+        **analysis_cache.stats(),
+        "workplace_cache": {**workplace_cache.stats(), "listener": cache_listener.stats()}
+    }
 
 
 @app.post("/api/blur-preview")
@@ -864,112 +594,203 @@ async def blur_preview(file: UploadFile = File(...)):
 
 
 @app.get("/api/history")
-async def get_history(limit: int = 100, offset: int = 0, status: str = None, workplace_id: int = None, model_version: str = None):
+async def get_history(request: Request, limit: int = 100, offset: int = 0, status: str = None, workplace_id: int = None,
+                      model_version: str = None, cursor: str = None, since: str = None):
     """
     Haal analyse geschiedenis op voor review
 
+    Paginatie: gebruik pagination.next_cursor als ?cursor= voor de volgende
+    (oudere) pagina; offset blijft werken voor bestaande clients.
+
+    Delta sync: geef sync.since terug als ?since= om alleen analyses op te halen
+    die daarna zijn toegevoegd of gecorrigeerd. Merge de resultaten op id.
+
+    De response wordt kort gecached (ANALYSIS_CACHE_TTL) en krijgt een ETag;
+    een ongewijzigd dashboard krijgt 304 Not Modified zonder body.
+
     Args:
         limit: Maximum aantal resultaten
-        offset: Offset voor paginatie
+        offset: Offset voor paginatie (zonder cursor)
         status: Filter op OK/NOK (optioneel)
         workplace_id: Filter op specifieke werkplek (optioneel)
         model_version: Filter op specifieke model versie (optioneel)
+        cursor: Keyset cursor uit pagination.next_cursor (optioneel)
+        since: Sync cursor uit sync.since (optioneel, rijen met removed = true zijn weg)
 
     Returns:
-        List van analyses met metadata
+        List van analyses met metadata + statistieken voor dezelfde filters
     """
-    import json
+    import hashlib
+    from fastapi.responses import Response
+    from utils.json_response import RawJSON, dumps
+    from database import analysis_cache, encode_history_cursor, decode_history_cursor
+    from database_async import (get_history_json, get_history_changes_json, get_sync_watermark,
+                                estimate_history_count, get_statistics)
 
     try:
-        # Use PostgreSQL connection from database.py
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        query = "SELECT * FROM analyses"
-        params = []
-        conditions = []
-
-        # Filter out analyses waar foto al naar training data is verplaatst
-        conditions.append("image_path IS NOT NULL")
-
-        if workplace_id is not None:
-            conditions.append("workplace_id = %s")
-            params.append(workplace_id)
-
-        if model_version is not None:
-            conditions.append("model_version = %s")
-            params.append(model_version)
-
-        if status:
-            # PostgreSQL uses 'result' field, not 'status'
-            conditions.append("result = %s")
-            params.append(status)
-
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-
-        query += " ORDER BY timestamp DESC LIMIT %s OFFSET %s"
-        params.extend([limit, offset])
-
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-
-        analyses = []
-        for row in rows:
-            analysis = dict(row)
-            # Map PostgreSQL fields to frontend expected fields
-            analysis['status'] = analysis.get('result')
-            analysis['predicted_label'] = analysis.get('model_prediction')
-            analysis['predicted_class'] = analysis.get('model_prediction')
-            analysis['corrected_label'] = analysis.get('user_correction')
-            analysis['created_at'] = analysis.get('timestamp')  # timestamp -> created_at for frontend
-
-            # Extract metadata fields
-            metadata = analysis.get('metadata', {})
-            if isinstance(metadata, str):
-                try:
-                    metadata = json.loads(metadata)
-                except (json.JSONDecodeError, TypeError):
-                    metadata = {}
-            elif metadata is None:
-                metadata = {}
-
-            analysis['missing_items'] = metadata.get('missing_items', [])
-
-            # Add detection model specific fields if available
-            analysis['model_type'] = metadata.get('model_type', 'classification')
-            if metadata.get('model_type') == 'detection':
-                analysis['detected_hamer'] = metadata.get('detected_hamer', 0)
-                analysis['detected_schaar'] = metadata.get('detected_schaar', 0)
-                analysis['detected_sleutel'] = metadata.get('detected_sleutel', 0)
-                analysis['total_detections'] = metadata.get('total_detections', 0)
-
-            # Add device_id from metadata
-            analysis['device_id'] = metadata.get('device_id', 'onbekend')
-
-            # Add camera_info from metadata
-            analysis['camera_info'] = metadata.get('camera_info', None)
-
-            analyses.append(analysis)
+        after = decode_history_cursor(cursor) if cursor else None
+        since_key = decode_history_cursor(since) if since else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        conn.close()
+    try:
+        cache_key = ('history', limit, offset, status, workplace_id, model_version, cursor, since)
+        cached = analysis_cache.get(cache_key)
+
+        if cached is None:
+            generation = analysis_cache.generation
+            stats = await get_statistics(status, workplace_id, model_version)
+
+            # De analyses komen al als JSON uit PostgreSQL (frontend velden in SQL)
+            if since_key is not None:
+                items, count, next_since, has_more = await get_history_changes_json(
+                    since_key, limit, status, workplace_id, model_version)
+                pagination = {"limit": limit, "count": count}
+            else:
+                watermark = await get_sync_watermark()
+                items, count, last = await get_history_json(limit, offset, status, workplace_id, model_version, after)
+                next_since, has_more = (watermark, 0), False
+                pagination = {
+                    "limit": limit,
+                    "offset": offset,
+                    "count": count,
+                    "next_cursor": encode_history_cursor(*last) if count == limit else None,
+                    "estimated_total": await estimate_history_count(status, workplace_id, model_version)
+                }
+
+            body = dumps({
+                "analyses": RawJSON(items),
+                "statistics": stats,
+                "pagination": pagination,
+                "sync": {
+                    "since": encode_history_cursor(*next_since),
+                    "has_more": has_more
+                },
+                "success": True  # Voor consistency met andere endpoints
+            })
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            cached = (body, etag)
+            analysis_cache.set(cache_key, cached, generation)
+
+        body, etag = cached
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+
+        return Response(content=body, media_type="application/json", headers=headers)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error tijdens ophalen geschiedenis: {str(e)}")
 
-        # Get statistics
-        from database import get_statistics
-        stats = get_statistics()
 
+@app.get("/api/archive")
+async def get_archive():
+    """
+    Lijst van gearchiveerde maanden (zie analysis_archive.py)
+
+    Returns:
+        Gearchiveerde maandpartities met aantal analyses en bestanden
+    """
+    from analysis_archive import list_archives
+
+    try:
+        archives = await asyncio.to_thread(list_archives)
         return {
+            "success": True,
+            "archives": archives,
+            "count": len(archives)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error tijdens ophalen archief: {str(e)}")
+
+
+@app.get("/api/archive/analyses")
+async def get_archived_analyses(start: datetime = None, end: datetime = None, workplace_id: int = None,
+                                model_version: str = None, status: str = None, limit: int = 1000):
+    """
+    Haal gearchiveerde analyses op uit de Parquet archieven
+
+    Args:
+        start: Vanaf datum/tijd (optioneel)
+        end: Tot datum/tijd (optioneel)
+        workplace_id: Filter op specifieke werkplek (optioneel)
+        model_version: Filter op specifieke model versie (optioneel)
+        status: Filter op OK/NOK (optioneel)
+        limit: Maximum aantal resultaten
+
+    Returns:
+        List van gearchiveerde analyses (nieuwste eerst)
+    """
+    from utils.json_response import FastJSONResponse
+    from analysis_archive import read_archived_analyses
+
+    try:
+        analyses = await asyncio.to_thread(read_archived_analyses, start, end, workplace_id,
+                                           model_version, status, limit)
+        return FastJSONResponse({
+            "success": True,
             "analyses": analyses,
-            "statistics": stats,
-            "pagination": {
-                "limit": limit,
-                "offset": offset,
-                "count": len(analyses)
-            },
-            "success": True  # Voor consistency met andere endpoints
+            "count": len(analyses)
+        })
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error tijdens lezen archief: {str(e)}")
+
+
+@app.post("/api/analytics/export")
+async def export_analytics():
+    """
+    (Her)schrijf de Parquet analytics dataset (zie analytics.py)
+
+    Returns:
+        Pad, aantal analyses en export tijdstip
+    """
+    from analytics import export_analytics_dataset
+
+    try:
+        result = await asyncio.to_thread(export_analytics_dataset)
+        return {
+            "success": True,
+            **result
         }
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error tijdens ophalen geschiedenis: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error tijdens analytics export: {str(e)}")
+
+
+@app.get("/api/analytics/summary")
+async def get_analytics_summary(group_by: str = "month", start: datetime = None, end: datetime = None,
+                                workplace_id: int = None, model_version: str = None):
+    """
+    Aggregaties over de analytics dataset (DuckDB op Parquet, niet op PostgreSQL)
+
+    Args:
+        group_by: day, week, month, workplace, model_version, model_type, device of prediction
+        start: Vanaf datum/tijd (optioneel)
+        end: Tot datum/tijd (optioneel)
+        workplace_id: Filter op specifieke werkplek (optioneel)
+        model_version: Filter op specifieke model versie (optioneel)
+
+    Returns:
+        Totalen, OK/NOK, accuracy en confidence per groep + meest ontbrekende items
+    """
+    from utils.json_response import FastJSONResponse
+    from analytics import analytics_summary
+
+    try:
+        summary = await asyncio.to_thread(analytics_summary, group_by, start, end, workplace_id, model_version)
+        return FastJSONResponse({
+            "success": True,
+            **summary
+        })
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error tijdens analytics query: {str(e)}")
 
 
 class CorrectionRequest(BaseModel):
@@ -990,10 +811,10 @@ async def correct_analysis(analysis_id: int, correction: CorrectionRequest):
     Returns:
         Success bericht
     """
-    from database import update_correction
+    from database_async import update_correction
 
     try:
-        update_correction(
+        await update_correction(
             analysis_id,
             correction.corrected_class,
             correction.corrected_label,
@@ -1013,45 +834,85 @@ async def correct_analysis(analysis_id: int, correction: CorrectionRequest):
         raise HTTPException(status_code=500, detail=f"Error tijdens correctie: {str(e)}")
 
 
+async def _gzip_stream(chunks):
+    """Comprimeer een async bytes stream on-the-fly (gzip formaat)"""
+    import zlib
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
 @app.get("/api/export/csv")
-async def export_csv():
+async def export_csv(start: datetime = None, end: datetime = None, workplace_id: int = None,
+                     model_version: str = None, gzip: bool = False):
     """
-    Export alle analyses naar CSV voor verdere analyse
+    Export analyses naar CSV voor verdere analyse
+
+    Streamt rechtstreeks uit PostgreSQL (COPY TO STDOUT): constant geheugen,
+    geen tijdelijk bestand, gelijktijdige exports zitten elkaar niet in de weg.
+
+    Args:
+        start: Vanaf datum/tijd (optioneel)
+        end: Tot datum/tijd (optioneel)
+        workplace_id: Filter op specifieke werkplek (optioneel)
+        model_version: Filter op specifieke model versie (optioneel)
+        gzip: Comprimeer de download (.csv.gz)
 
     Returns:
-        Download link voor CSV bestand
+        CSV download (chunked)
     """
-    from database import export_to_csv
-    from fastapi.responses import FileResponse
+    from database_async import stream_analyses_csv
 
-    try:
-        output_path = Path("data/analyses_export.csv")
-        count = export_to_csv(output_path)
+    filename = f"analyses_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    stream = stream_analyses_csv(start, end, workplace_id, model_version)
 
-        return FileResponse(
-            path=output_path,
-            filename=f"analyses_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-            media_type="text/csv"
-        )
+    # Eerste chunk (header) hier al ophalen: database fouten worden dan nog een 500
+    try:
+        first = await stream.__anext__()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error tijdens export: {str(e)}")
 
+    async def chunks_with_header():
+        yield first
+        async for chunk in stream:
+            yield chunk
+
+    chunks = chunks_with_header()
+    if gzip:
+        chunks = _gzip_stream(chunks)
+        filename += ".gz"
+
+    return StreamingResponse(
+        chunks,
+        media_type="application/gzip" if gzip else "text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 
 @app.get("/api/accuracy-timeline")
-async def get_accuracy_timeline():
+async def get_accuracy_timeline(workplace_id: int = None, model_version: str = None):
     """
-    Haal model accuracy over tijd op (per week)
+    Haal model accuracy over tijd op (per dag, met ISO week)
+
+    Args:
+        workplace_id: Filter op specifieke werkplek (optioneel)
+        model_version: Filter op specifieke model versie (optioneel)
 
     Returns:
-        Tijdlijn met accuracy percentages per week
+        Tijdlijn met accuracy percentages + totale accuracy voor dezelfde filters
     """
-    from database import get_accuracy_over_time
+    from database_async import get_accuracy_over_time, get_accuracy_stats
 
     try:
-        timeline = get_accuracy_over_time()
+        timeline = await get_accuracy_over_time(workplace_id, model_version)
         return {
             "success": True,
             "timeline": timeline,
+            "accuracy": await get_accuracy_stats(workplace_id, model_version),
             "count": len(timeline)
         }
     except Exception as e:
@@ -1070,10 +931,10 @@ async def get_training_statistics():
         - training_target: Doel aantal (200)
         - training_progress_percent: Percentage van doel bereikt
     """
-    from database import get_training_statistics
+    from database_async import get_training_statistics
 
     try:
-        stats = get_training_statistics()
+        stats = await get_training_statistics()
         return {
             "success": True,
             "statistics": stats
@@ -1097,15 +958,16 @@ async def get_training_candidates_endpoint(confidence_threshold: float = 70.0):
         - Foutieve voorspellingen (predicted != corrected)
         - Lage confidence (< threshold)
     """
-    from database import get_training_candidates
+    from utils.json_response import FastJSONResponse, RawJSON
+    from database_async import get_training_candidates_json
 
     try:
-        candidates = get_training_candidates(confidence_threshold)
-        return {
+        candidates, count = await get_training_candidates_json(confidence_threshold)
+        return FastJSONResponse({
             "success": True,
-            "candidates": candidates,
-            "count": len(candidates)
-        }
+            "candidates": RawJSON(candidates),
+            "count": count
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error tijdens ophalen candidates: {str(e)}")
 
@@ -1127,7 +989,7 @@ async def export_training_data(request: ExportRequest):
     Returns:
         Export statistieken + pad
     """
-    from database import export_training_data as db_export_training_data
+    from database_async import export_training_data as db_export_training_data
     from datetime import datetime
 
     try:
@@ -1140,12 +1002,16 @@ async def export_training_data(request: ExportRequest):
         export_path = f"data/training_exports/{export_name}"
 
         # Export data
-        result = db_export_training_data(request.analysis_ids, export_path)
+        result = await db_export_training_data(request.analysis_ids, export_path)
+
+        message = f"{result['total_exported']} analyses geëxporteerd naar {result['export_path']}"
+        if result['skipped']:
+            message += f" ({result['skipped']} overgeslagen, foto ontbreekt)"
 
         return {
             "success": True,
             "export": result,
-            "message": f"{result['total_exported']} analyses geëxporteerd naar {result['export_path']}"
+            "message": message
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error tijdens export: {str(e)}")
@@ -1163,27 +1029,15 @@ async def delete_analysis(analysis_id: int):
         Success bericht
     """
     import os
+    from database_async import delete_analysis as db_delete_analysis
 
     try:
-        # Use PostgreSQL connection from database.py
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT image_path FROM analyses WHERE id = %s", (analysis_id,))
-        result = cursor.fetchone()
-
-        if not result:
-            conn.close()
+        deleted, image_path = await db_delete_analysis(analysis_id)
+        if not deleted:
             raise HTTPException(status_code=404, detail=f"Analyse {analysis_id} niet gevonden")
 
-        image_path = result['image_path']
-
-        # Verwijder de analyse uit database
-        cursor.execute("DELETE FROM analyses WHERE id = %s", (analysis_id,))
-        conn.commit()
-        conn.close()
-
         # Verwijder de foto van disk
-        if os.path.exists(image_path):
+        if image_path and os.path.exists(image_path):
             os.remove(image_path)
             print(f"🗑️ Foto verwijderd: {image_path}")
 
@@ -1283,10 +1137,10 @@ async def get_workplaces(active_only: bool = True):
     Returns:
         List van werkplekken
     """
-    from database import get_all_workplaces
+    from database_async import get_all_workplaces
 
     try:
-        workplaces = get_all_workplaces(active_only=active_only)
+        workplaces = await get_all_workplaces(active_only=active_only)
         return {
             "success": True,
             "workplaces": workplaces,
@@ -1307,18 +1161,18 @@ async def get_workplace_detail(workplace_id: int):
     Returns:
         Werkplek details inclusief statistieken
     """
-    from database import (get_workplace, get_training_dataset_stats,
-                         get_models, get_dataset_exports)
+    from database_async import (get_workplace, get_training_dataset_stats,
+                                get_models, get_dataset_exports)
 
     try:
-        workplace = get_workplace(workplace_id)
+        workplace = await get_workplace(workplace_id)
         if not workplace:
             raise HTTPException(status_code=404, detail="Werkplek niet gevonden")
 
         # Haal statistieken op
-        dataset_stats = get_training_dataset_stats(workplace_id)
-        models = get_models(workplace_id)
-        exports = get_dataset_exports(workplace_id)
+        dataset_stats = await get_training_dataset_stats(workplace_id)
+        models = await get_models(workplace_id)
+        exports = await get_dataset_exports(workplace_id)
 
         return {
             "success": True,
@@ -1351,10 +1205,10 @@ async def create_workplace_endpoint(workplace: WorkplaceCreate):
     Returns:
         ID van nieuwe werkplek
     """
-    from database import create_workplace
+    from database_async import create_workplace
 
     try:
-        workplace_id = create_workplace(
+        workplace_id = await create_workplace(
             name=workplace.name,
             description=workplace.description,
             items=workplace.items,
@@ -1393,14 +1247,14 @@ async def update_workplace_endpoint(workplace_id: int, update: WorkplaceUpdate):
         workplace_id: ID van werkplek
         update: Te updaten velden
     """
-    from database import update_workplace, get_workplace
+    from database_async import update_workplace, get_workplace
 
     try:
         # Check of werkplek bestaat
-        if not get_workplace(workplace_id):
+        if not await get_workplace(workplace_id):
             raise HTTPException(status_code=404, detail="Werkplek niet gevonden")
 
-        update_workplace(
+        await update_workplace(
             workplace_id=workplace_id,
             name=update.name,
             description=update.description,
@@ -1428,14 +1282,14 @@ async def delete_workplace_endpoint(workplace_id: int):
     Args:
         workplace_id: ID van werkplek
     """
-    from database import delete_workplace, get_workplace
+    from database_async import delete_workplace, get_workplace
 
     try:
         # Check of werkplek bestaat
-        if not get_workplace(workplace_id):
+        if not await get_workplace(workplace_id):
             raise HTTPException(status_code=404, detail="Werkplek niet gevonden")
 
-        delete_workplace(workplace_id)
+        await delete_workplace(workplace_id)
 
         return {
             "success": True,
@@ -1462,18 +1316,18 @@ async def upload_reference_photo(
     Returns:
         Pad naar opgeslagen referentie foto
     """
-    from database import update_workplace, get_workplace
+    from database_async import update_workplace, get_workplace
 
     try:
         # Check of werkplek bestaat
-        workplace = get_workplace(workplace_id)
+        workplace = await get_workplace(workplace_id)
         if not workplace:
             raise HTTPException(status_code=404, detail="Werkplek niet gevonden")
 
         # Sla afbeelding op
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"reference_{workplace_id}_{timestamp}_{file.filename}"
-        reference_dir = Path(f"data/reference_photos")
+        reference_dir = Path("data/reference_photos")
         reference_dir.mkdir(parents=True, exist_ok=True)
 
         file_path = reference_dir / filename
@@ -1484,7 +1338,7 @@ async def upload_reference_photo(
 
         # Update werkplek met referentie foto pad
         relative_path = f"/data/reference_photos/{filename}"
-        update_workplace(
+        await update_workplace(
             workplace_id=workplace_id,
             reference_photo=relative_path
         )
@@ -1511,11 +1365,11 @@ async def detect_whiteboard_in_reference(workplace_id: int):
     Returns:
         Bounding box coordinaten van gedetecteerd whiteboard
     """
-    from database import get_workplace
+    from database_async import get_workplace
 
     try:
         # Haal werkplek op
-        workplace = get_workplace(workplace_id)
+        workplace = await get_workplace(workplace_id)
         if not workplace:
             raise HTTPException(status_code=404, detail="Werkplek niet gevonden")
 
@@ -1547,8 +1401,8 @@ async def detect_whiteboard_in_reference(workplace_id: int):
 
         # Gebruik detection model om whiteboard te vinden
         # Check welk model voor deze werkplek actief is
-        from database import get_active_model
-        active_model = get_active_model(workplace_id)
+        from database_async import get_active_model
+        active_model = await get_active_model(workplace_id)
 
         if active_model and active_model.get("model_path"):
             model_path = Path(active_model["model_path"])
@@ -1616,11 +1470,11 @@ async def save_whiteboard_region(workplace_id: int, region: dict):
     Returns:
         Success status
     """
-    from database import get_workplace, update_workplace
+    from database_async import get_workplace, update_workplace
 
     try:
         # Check of werkplek bestaat
-        workplace = get_workplace(workplace_id)
+        workplace = await get_workplace(workplace_id)
         if not workplace:
             raise HTTPException(status_code=404, detail="Werkplek niet gevonden")
 
@@ -1634,7 +1488,7 @@ async def save_whiteboard_region(workplace_id: int, region: dict):
                 raise HTTPException(status_code=400, detail=f"{key} moet tussen 0 en 1 zijn")
 
         # Update werkplek
-        update_workplace(
+        await update_workplace(
             workplace_id=workplace_id,
             whiteboard_region=region
         )
@@ -1650,6 +1504,51 @@ async def save_whiteboard_region(workplace_id: int, region: dict):
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 
+@app.post("/api/workplaces/{workplace_id}/pipeline-stages")
+async def save_pipeline_stages(workplace_id: int, stages: dict):
+    """
+    Zet optionele inspectie stages aan of uit voor een werkplek
+
+    Args:
+        workplace_id: ID van werkplek
+        stages: Dict stage -> true/false of een config dict, bijv.
+            {"roi": true, "tiling": {"grid": 3, "overlap": 0.2},
+             "cascade": {"min_confidence": 0.9}}
+
+    Returns:
+        Success status en de opgeslagen stages
+    """
+    from database_async import get_workplace, update_workplace
+
+    try:
+        workplace = await get_workplace(workplace_id)
+        if not workplace:
+            raise HTTPException(status_code=404, detail="Werkplek niet gevonden")
+
+        available = optional_stage_names()
+        unknown = [name for name in stages if name not in available]
+        if unknown:
+            raise HTTPException(status_code=400,
+                                detail=f"Onbekende stage(s) {', '.join(unknown)}, kies uit: {', '.join(available)}")
+        for name, config in stages.items():
+            if not isinstance(config, (bool, dict)):
+                raise HTTPException(status_code=400, detail=f"{name} moet true/false of een config object zijn")
+
+        # Uitgeschakelde stages niet opslaan
+        enabled = {name: config for name, config in stages.items() if config}
+        await update_workplace(workplace_id=workplace_id, pipeline_stages=enabled)
+
+        return {
+            "success": True,
+            "message": "Inspectie stages opgeslagen",
+            "pipeline_stages": enabled
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+
 # ========================================
 # TRAINING DATA MANAGEMENT ENDPOINTS
 # ========================================
@@ -1673,11 +1572,11 @@ async def upload_training_image(
     Returns:
         Training image ID
     """
-    from database import add_training_image, get_workplace
+    from database_async import add_training_image, get_workplace
 
     try:
         # Check of werkplek bestaat
-        if not get_workplace(workplace_id):
+        if not await get_workplace(workplace_id):
             raise HTTPException(status_code=404, detail="Werkplek niet gevonden")
 
         # Sla afbeelding op
@@ -1694,7 +1593,7 @@ async def upload_training_image(
 
         # Registreer in database (met relatieve path voor frontend)
         relative_path = str(file_path).replace("\\", "/")
-        image_id = add_training_image(
+        image_id = await add_training_image(
             workplace_id=workplace_id,
             image_path=relative_path,
             label=label or "unlabeled",
@@ -1727,21 +1626,17 @@ async def add_analysis_to_training(workplace_id: int, analysis_id: int = Form(..
     Returns:
         Success bericht
     """
-    from database import get_workplace
+    from database_async import get_workplace, get_analysis, move_analysis_to_training
     import shutil
 
     try:
         # Check of werkplek bestaat
-        workplace = get_workplace(workplace_id)
+        workplace = await get_workplace(workplace_id)
         if not workplace:
             raise HTTPException(status_code=404, detail="Werkplek niet gevonden")
 
         # Haal analyse op using PostgreSQL
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM analyses WHERE id = %s", (analysis_id,))
-        analysis = cursor.fetchone()
-        conn.close()
+        analysis = await get_analysis(analysis_id)
 
         if not analysis:
             raise HTTPException(status_code=404, detail="Analyse niet gevonden")
@@ -1772,28 +1667,11 @@ async def add_analysis_to_training(workplace_id: int, analysis_id: int = Form(..
         # - Update image_path naar nieuwe locatie
         # - Set user_correction to label (PostgreSQL field)
         # - is_correct will be determined by comparing model_prediction with user_correction
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Get current model_prediction to determine is_correct
-        cursor.execute("SELECT model_prediction FROM analyses WHERE id = %s", (analysis_id,))
-        result = cursor.fetchone()
-        model_prediction = result['model_prediction'] if result else None
-        is_correct = (model_prediction == label) if model_prediction else None
-
-        cursor.execute("""
-            UPDATE analyses
-            SET image_path = %s,
-                user_correction = %s,
-                is_correct = %s
-            WHERE id = %s
-        """, (str(new_path), label, is_correct, analysis_id))
-        conn.commit()
-        conn.close()
+        await move_analysis_to_training(analysis_id, str(new_path), label)
 
         return {
             "success": True,
-            "message": f"Foto verplaatst naar trainingsdata",
+            "message": "Foto verplaatst naar trainingsdata",
             "analysis_id": analysis_id,
             "path": str(new_path)
         }
@@ -1816,14 +1694,14 @@ async def get_training_images_endpoint(workplace_id: int, validated_only: bool =
     Returns:
         List van training images
     """
-    from database import get_training_images, get_workplace
+    from database_async import get_training_images, get_workplace
 
     try:
         # Check of werkplek bestaat
-        if not get_workplace(workplace_id):
+        if not await get_workplace(workplace_id):
             raise HTTPException(status_code=404, detail="Werkplek niet gevonden")
 
-        images = get_training_images(workplace_id, validated_only=validated_only)
+        images = await get_training_images(workplace_id, validated_only=validated_only)
 
         return {
             "success": True,
@@ -1853,14 +1731,14 @@ async def update_training_image_endpoint(
     Returns:
         Success message
     """
-    from database import update_training_image_label, get_workplace
+    from database_async import update_training_image_label, get_workplace
 
     try:
         # Check of werkplek bestaat
-        if not get_workplace(workplace_id):
+        if not await get_workplace(workplace_id):
             raise HTTPException(status_code=404, detail="Werkplek niet gevonden")
 
-        success = update_training_image_label(image_id, label)
+        success = await update_training_image_label(image_id, label)
 
         if not success:
             raise HTTPException(status_code=404, detail="Training image niet gevonden")
@@ -1887,15 +1765,15 @@ async def delete_training_image_endpoint(workplace_id: int, image_id: int):
     Returns:
         Success message
     """
-    from database import delete_training_image, get_workplace
+    from database_async import delete_training_image, get_workplace
     import os
 
     try:
         # Check of werkplek bestaat
-        if not get_workplace(workplace_id):
+        if not await get_workplace(workplace_id):
             raise HTTPException(status_code=404, detail="Werkplek niet gevonden")
 
-        success, image_path = delete_training_image(image_id)
+        success, image_path = await delete_training_image(image_id)
 
         if not success:
             raise HTTPException(status_code=404, detail="Training image niet gevonden")
@@ -1924,26 +1802,13 @@ async def get_model_versions_endpoint(workplace_id: int):
 
     Returns lijst van unieke model versies die data hebben gegenereerd
     """
-    from database import get_workplace
+    from database_async import get_workplace, get_model_versions
 
     try:
-        if not get_workplace(workplace_id):
+        if not await get_workplace(workplace_id):
             raise HTTPException(status_code=404, detail="Werkplek niet gevonden")
 
-        # Use PostgreSQL connection
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            SELECT DISTINCT model_version
-            FROM analyses
-            WHERE workplace_id = %s
-            AND model_version IS NOT NULL
-            ORDER BY model_version DESC
-        """, (workplace_id,))
-
-        versions = [row['model_version'] for row in cursor.fetchall()]
-        conn.close()
+        versions = await get_model_versions(workplace_id)
 
         return {
             "success": True,
@@ -1967,14 +1832,14 @@ async def get_dataset_stats_endpoint(workplace_id: int, model_version: str = Non
     Returns:
         Dataset statistieken
     """
-    from database import get_training_dataset_stats, get_workplace
+    from database_async import get_training_dataset_stats, get_workplace
 
     try:
         # Check of werkplek bestaat
-        if not get_workplace(workplace_id):
+        if not await get_workplace(workplace_id):
             raise HTTPException(status_code=404, detail="Werkplek niet gevonden")
 
-        stats = get_training_dataset_stats(workplace_id, model_version=model_version)
+        stats = await get_training_dataset_stats(workplace_id, model_version=model_version)
 
         return {
             "success": True,
@@ -2013,11 +1878,12 @@ async def upload_model(
     Returns:
         Model ID
     """
-    from database import register_model, get_workplace
+    from database_async import register_model, get_workplace
 
     try:
-        # Check of werkplek bestaat
-        if not get_workplace(workplace_id):
+        # Check of werkplek bestaat (ook gebruikt voor unieke naming hieronder)
+        workplace = await get_workplace(workplace_id)
+        if not workplace:
             raise HTTPException(status_code=404, detail="Werkplek niet gevonden")
 
         # Check of het een .pt bestand is
@@ -2028,8 +1894,7 @@ async def upload_model(
         if model_type not in ['classification', 'detection']:
             raise HTTPException(status_code=400, detail="Model type moet 'classification' of 'detection' zijn")
 
-        # Haal werkplek info op voor unieke naming
-        workplace = get_workplace(workplace_id)
+        # Werkplek naam voor unieke naming
         workplace_name_clean = workplace['name'].lower().replace(' ', '_').replace('-', '_')
 
         # Sla model op met werkplek naam in filename
@@ -2038,8 +1903,8 @@ async def upload_model(
 
         if version is None:
             # Auto-genereer versie
-            from database import get_models
-            existing_models = get_models(workplace_id)
+            from database_async import get_models
+            existing_models = await get_models(workplace_id)
             version = f"v{len(existing_models) + 1}.0"
 
         # Model filename bevat: werkplek_naam_versie_type.pt
@@ -2052,7 +1917,7 @@ async def upload_model(
             f.write(contents)
 
         # Registreer in database
-        model_id = register_model(
+        model_id = await register_model(
             workplace_id=workplace_id,
             version=version,
             model_path=str(model_path),
@@ -2087,14 +1952,14 @@ async def get_models_endpoint(workplace_id: int, status: str = None):
     Returns:
         List van modellen
     """
-    from database import get_models, get_workplace
+    from database_async import get_models, get_workplace
 
     try:
         # Check of werkplek bestaat
-        if not get_workplace(workplace_id):
+        if not await get_workplace(workplace_id):
             raise HTTPException(status_code=404, detail="Werkplek niet gevonden")
 
-        models = get_models(workplace_id, status=status)
+        models = await get_models(workplace_id, status=status)
 
         return {
             "success": True,
@@ -2118,10 +1983,10 @@ async def activate_model_endpoint(model_id: int):
     Returns:
         Success bericht
     """
-    from database import activate_model
+    from database_async import activate_model
 
     try:
-        activate_model(model_id)
+        await activate_model(model_id)
 
         return {
             "success": True,
@@ -2146,23 +2011,17 @@ async def delete_model_endpoint(model_id: int):
     """
     import os
     from pathlib import Path
+    from database_async import get_model, delete_model
 
     try:
-        # Use PostgreSQL connection
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
         # Haal model info op
-        cursor.execute("SELECT * FROM models WHERE id = %s", (model_id,))
-        model = cursor.fetchone()
+        model = await get_model(model_id)
 
         if not model:
-            conn.close()
             raise HTTPException(status_code=404, detail="Model niet gevonden")
 
         # Check of model actief is (PostgreSQL uses is_active boolean, not status)
         if model['is_active']:
-            conn.close()
             raise HTTPException(status_code=400, detail="Kan actief model niet verwijderen. Deactiveer het model eerst.")
 
         # Verwijder fysiek bestand
@@ -2171,9 +2030,7 @@ async def delete_model_endpoint(model_id: int):
             os.remove(model_path)
 
         # Verwijder uit database
-        cursor.execute("DELETE FROM models WHERE id = %s", (model_id,))
-        conn.commit()
-        conn.close()
+        await delete_model(model_id)
 
         return {
             "success": True,
@@ -2202,11 +2059,11 @@ async def set_workplace_model_endpoint(
     Returns:
         Success bericht
     """
-    from database import set_workplace_model, get_workplace
+    from database_async import set_workplace_model, get_workplace
 
     try:
         # Check of werkplek bestaat
-        workplace = get_workplace(workplace_id)
+        workplace = await get_workplace(workplace_id)
         if not workplace:
             raise HTTPException(status_code=404, detail="Werkplek niet gevonden")
 
@@ -2226,7 +2083,7 @@ async def set_workplace_model_endpoint(
             )
 
         # Sla op in database
-        set_workplace_model(workplace_id, model_type, model_path)
+        await set_workplace_model(workplace_id, model_type, model_path)
 
         return {
             "success": True,
@@ -2252,10 +2109,10 @@ async def get_workplace_model_endpoint(workplace_id: int):
     Returns:
         Model configuratie of None
     """
-    from database import get_workplace_model as db_get_workplace_model
+    from database_async import get_workplace_model as db_get_workplace_model
 
     try:
-        model_config = db_get_workplace_model(workplace_id)
+        model_config = await db_get_workplace_model(workplace_id)
 
         return {
             "success": True,
@@ -2267,172 +2124,334 @@ async def get_workplace_model_endpoint(workplace_id: int):
 
 
 # ========================================
-# DATASET EXPORT ENDPOINTS
+# JOB ENDPOINTS
 # ========================================
 
-@app.post("/api/workplaces/{workplace_id}/export-dataset")
-async def export_dataset_for_training(workplace_id: int, train_split: float = 0.8):
+class JobRequest(BaseModel):
+    job_type: str
+    params: dict = {}
+
+
+@app.post("/api/jobs")
+async def create_job(request: JobRequest):
     """
-    Exporteer dataset in YOLO format voor training
+    Start een background job (zie job_queue.py / job_handlers.py)
+
+    Job types: dataset_export, training_export, csv_export, rescore, cleanup, inspection
+
+    Returns:
+        De aangemaakte job (status queued)
+    """
+    from job_queue import enqueue_job
+
+    try:
+        job = await asyncio.to_thread(enqueue_job, request.job_type, request.params)
+        return {
+            "success": True,
+            "job": job
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+
+@app.get("/api/jobs")
+async def get_jobs(status: str = None, job_type: str = None, limit: int = 50):
+    """
+    Lijst van jobs (nieuwste eerst)
 
     Args:
-        workplace_id: ID van werkplek
-        train_split: Percentage voor training (0.8 = 80% train, 20% val)
+        status: Filter op status (optioneel)
+        job_type: Filter op job type (optioneel)
+        limit: Maximum aantal resultaten
+    """
+    from job_queue import list_jobs
+
+    try:
+        jobs = await asyncio.to_thread(list_jobs, status, job_type, limit)
+        return {
+            "success": True,
+            "jobs": jobs,
+            "count": len(jobs)
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: int):
+    """Status, progress en resultaat van een job"""
+    from job_queue import get_job
+
+    job = await asyncio.to_thread(get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job niet gevonden")
+    return {
+        "success": True,
+        "job": job
+    }
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def get_job_events(job_id: int):
+    """
+    Server-Sent Events met de progress van een job (zelfde event formaat als
+    /api/inspect/progress); stopt als de job klaar, mislukt of geannuleerd is
+    """
+    from job_queue import get_job, FINISHED_STATUSES
+
+    async def event_generator() -> AsyncGenerator[str, None]:
+        last_event = None
+        while True:
+            job = await asyncio.to_thread(get_job, job_id)
+            if not job:
+                yield f"data: {json.dumps({'progress': 100, 'message': 'Job niet gevonden', 'done': True})}\n\n"
+                break
+
+            done = job['status'] in FINISHED_STATUSES
+            event = {
+                'job_id': job_id,
+                'status': job['status'],
+                'progress': job['progress'],
+                'message': job['error'] or job['message'],
+                'done': done
+            }
+            if event != last_event:
+                yield f"data: {json.dumps(event)}\n\n"
+                last_event = event
+            if done:
+                break
+
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job_endpoint(job_id: int):
+    """Annuleer een job (queued: direct, running: bij de volgende progress update)"""
+    from job_queue import cancel_job
+
+    job = await asyncio.to_thread(cancel_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job niet gevonden")
+    return {
+        "success": True,
+        "job": job
+    }
+
+
+@app.post("/api/jobs/{job_id}/resume")
+async def resume_job_endpoint(job_id: int):
+    """Hervat een mislukte of geannuleerde job vanaf zijn checkpoint"""
+    from job_queue import resume_job
+
+    job = await asyncio.to_thread(resume_job, job_id)
+    if not job:
+        raise HTTPException(status_code=409, detail="Job bestaat niet of is niet mislukt/geannuleerd")
+    return {
+        "success": True,
+        "job": job
+    }
+
+
+@app.get("/api/jobs/{job_id}/download")
+async def download_job_result(job_id: int):
+    """Download het bestand van een afgeronde job (CSV, dataset ZIP)"""
+    from job_queue import get_job
+
+    job = await asyncio.to_thread(get_job, job_id)
+    download_path = ((job or {}).get('result') or {}).get('download_path')
+    if not download_path or not Path(download_path).is_file():
+        raise HTTPException(status_code=404, detail="Geen download beschikbaar voor deze job")
+    return FileResponse(download_path, filename=Path(download_path).name)
+
+
+# ========================================
+# INSPECTIE JOB ENDPOINTS
+# ========================================
+
+def _save_inspection_frame(contents, suffix):
+    """Sla een foto duurzaam op (fsync) voordat de job in de queue komt"""
+    import uuid
+    from job_handlers import INSPECTION_UPLOAD_DIR
+
+    INSPECTION_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    path = INSPECTION_UPLOAD_DIR / f"{uuid.uuid4().hex}{suffix}"
+    with open(path, "wb") as f:
+        f.write(contents)
+        f.flush()
+        os.fsync(f.fileno())
+    return path
+
+
+@app.post("/api/inspections/jobs", status_code=202)
+async def create_inspection_job(
+    file: UploadFile = File(...),
+    blur_faces: bool = Form(True),
+    device_id: str = Form("onbekend"),
+    workplace_id: int = Form(None),
+    confidence_threshold: float = Form(None),
+    camera_metadata: str = Form(None),
+    callback_url: str = Form(None),  # Lokale URL die het resultaat als POST krijgt
+    request: Request = None
+):
+    """
+    Inspectie zonder op het resultaat te wachten (vaste camera's, MES)
+
+    De foto wordt opgeslagen en als "inspection" job in de queue gezet; de
+    response komt direct met het job ID. Een burst aan foto's wacht in de
+    queue en wordt afgewerkt volgens JOB_CONCURRENCY_INSPECTION. Het
+    resultaat is op te halen via GET /api/inspections/jobs/{id} of komt als
+    POST {job_id, status, result, error} op callback_url.
 
     Returns:
-        ZIP file met dataset in YOLO format
+        202 met job_id, status en status_url
     """
-    from database import (get_workplace, get_training_images,
-                         register_dataset_export)
-    import zipfile
-    import shutil
-    import random
-    from io import BytesIO
+    from job_queue import enqueue_job
+    from job_handlers import validate_callback_url
+
+    if callback_url:
+        try:
+            await asyncio.to_thread(validate_callback_url, callback_url)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    if device_id == "onbekend" and request:
+        device_id = _device_from_user_agent(request.headers.get("user-agent", ""))
+
+    contents = await file.read()
+    if not contents:
+        raise HTTPException(status_code=400, detail="Lege foto")
 
     try:
-        # Check workplace
-        workplace = get_workplace(workplace_id)
-        if not workplace:
-            raise HTTPException(status_code=404, detail="Werkplek niet gevonden")
+        image_path = await asyncio.to_thread(_save_inspection_frame, contents,
+                                             Path(file.filename or "").suffix or ".jpg")
+        job = await asyncio.to_thread(enqueue_job, "inspection", {
+            'image_path': str(image_path),
+            'blur_faces': blur_faces,
+            'device_id': device_id,
+            'workplace_id': workplace_id,
+            'confidence_threshold': confidence_threshold,
+            'camera_metadata': camera_metadata,
+            'callback_url': callback_url
+        }, created_by=device_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
-        # Haal alle gevalideerde training images op
-        images = get_training_images(workplace_id, validated_only=False)
-
-        if len(images) == 0:
-            raise HTTPException(status_code=400, detail="Geen training images gevonden")
-
-        # Maak tijdelijke export directory (alleen images, geen classificatie structuur)
-        export_dir = Path(f"data/temp_export_{workplace_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
-        images_dir = export_dir / "images"
-        images_dir.mkdir(parents=True, exist_ok=True)
-
-        # Kopieer alle images (zonder classificatie structuur of train/val split)
-        total_exported = 0
-        for img in images:
-            src = Path(img['image_path'])
-            if src.exists():
-                dst = images_dir / src.name
-                shutil.copy2(src, dst)
-                total_exported += 1
-
-        # Statistieken voor README (optioneel, alleen ter info)
-        label_counts = {}
-        for img in images:
-            label = img.get('label', 'unknown')
-            if label not in label_counts:
-                label_counts[label] = 0
-            label_counts[label] += 1
-
-        # Maak README (geen YAML - annotaties gebeuren buiten de app)
-        readme_content = f"""# Training Dataset - {workplace['name']}
-
-## Dataset Informatie
-
-- **Werkplek:** {workplace['name']}
-- **Beschrijving:** {workplace['description'] or 'Geen beschrijving'}
-- **Items:** {', '.join(workplace['items'])}
-- **Totaal Images:** {total_exported}
-- **Gegenereerd:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-## Label Distributie (ter info)
-
-{chr(10).join([f"- **{label}**: {count} images" for label, count in sorted(label_counts.items())])}
-
-## Structuur
-
-```
-dataset/
-└── images/
-    ├── inspect_20251226_180127.jpg
-    ├── inspect_20251226_203702.jpg
-    └── ...
-```
-
-## Annotatie Workflow
-
-Deze export bevat **alleen images** zonder annotaties.
-De images zijn klaar voor:
-1. Import in Label Studio of andere annotatie tool
-2. Handmatige bounding box annotatie
-3. Export naar YOLO detection format
-4. Training van object detection model
-
-## Volgende Stappen
-
-1. Upload images naar je annotatie tool (bijv. Label Studio)
-2. Annoteer objecten met bounding boxes:
-   - hamer (class 0)
-   - schaar (class 1)
-   - sleutel (class 2)
-3. Exporteer annotaties in YOLO detection format
-4. Train model met YOLOv8/v11 detection
-
-```python
-from ultralytics import YOLO
-
-# Load detection model
-model = YOLO('yolo11n.pt')  # pretrained detection model
-
-# Train (na annotatie)
-results = model.train(
-    data='path/to/data.yaml',  # YOLO config met annotaties
-    epochs=100,
-    imgsz=640,
-    batch=16,
-    name='werkplek_detector'
-)
-```
+    return {
+        "success": True,
+        "job_id": job['id'],
+        "status": job['status'],
+        "status_url": f"/api/inspections/jobs/{job['id']}"
+    }
 
-## Download Trained Model
 
-Na training, download het beste model:
-- `runs/classify/werkplek_classifier/weights/best.pt`
+@app.get("/api/inspections/jobs/{job_id}")
+async def get_inspection_job(job_id: int):
+    """Status en (na afloop) het inspectie resultaat van een inspectie job"""
+    from job_queue import get_job
 
-Upload dit bestand in het Admin Dashboard onder "Modellen".
-"""
+    job = await asyncio.to_thread(get_job, job_id)
+    if not job or job['job_type'] != 'inspection':
+        raise HTTPException(status_code=404, detail="Inspectie job niet gevonden")
+    return {
+        "success": True,
+        "job_id": job['id'],
+        "status": job['status'],
+        "progress": job['progress'],
+        "message": job['message'],
+        "result": job['result'],
+        "error": job['error']
+    }
 
-        readme_path = export_dir / "README.md"
-        with open(readme_path, 'w', encoding='utf-8') as f:
-            f.write(readme_content)
 
-        # Maak ZIP file
-        zip_filename = f"dataset_{workplace['name'].replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
-        zip_path = Path("data/exports") / zip_filename
-        zip_path.parent.mkdir(parents=True, exist_ok=True)
+# ========================================
+# DATASET EXPORT ENDPOINTS
+# ========================================
 
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for file in export_dir.rglob('*'):
-                if file.is_file():
-                    arcname = file.relative_to(export_dir)
-                    zipf.write(file, arcname)
+@app.post("/api/workplaces/{workplace_id}/export-dataset")
+async def export_dataset_for_training(workplace_id: int, train_split: float = 0.8, register: bool = True,
+                                      since_export_id: int = None, format: str = "zip", image_size: int = None):
+    """
+    Exporteer dataset in YOLO format voor training
 
-        # Registreer export in database
-        register_dataset_export(
-            workplace_id=workplace_id,
-            export_path=str(zip_path),
-            image_count=total_exported,
-            class_distribution=label_counts
-        )
+    Elke export is een snapshot (training_snapshots.py): manifest.json legt per
+    image content hash, label en split vast, de images staan een keer in de
+    object store. Met since_export_id bevat de ZIP alleen images die sinds die
+    export nieuw zijn of een ander label kregen; het manifest vermeldt ook wat
+    verwijderd is. Bij register=True komt de snapshot (hardlinks, geen
+    kopieën) in data/exports en wordt hij als dataset export geregistreerd.
 
-        # Cleanup temp directory
-        shutil.rmtree(export_dir)
+    De train/val split is deterministisch en per class gestratificeerd op
+    content hash (training_snapshots.stratified_split).
 
-        # Return ZIP file
-        return FileResponse(
-            path=zip_path,
-            filename=zip_filename,
-            media_type='application/zip',
-            headers={"Content-Disposition": f"attachment; filename={zip_filename}"}
-        )
+    format=zip: het ZIP archief wordt gestreamd terwijl het gebouwd wordt:
+    images direct uit de bronbestanden (ZIP_STORED), README.md en
+    manifest.json on-the-fly.
+    format=shards: de volledige set als tar shards per split in
+    data/exports/<export>/shards (dataset_shards.py), optioneel verkleind
+    tot image_size; de response is de shard index.
 
-    except HTTPException:
-        raise
+    Args:
+        workplace_id: ID van werkplek
+        train_split: Percentage voor training (0.8 = 80% train, 20% val)
+        register: Bewaar de snapshot in data/exports en registreer de export
+        since_export_id: Alleen de delta t.o.v. deze (geregistreerde) export
+        format: zip (download) of shards (tar shards op de server)
+        image_size: Maximale zijde in pixels voor shards (None = origineel)
+
+    Returns:
+        ZIP file met dataset in YOLO format (gestreamd), of de shard index
+    """
+    from training_snapshots import export_workplace_dataset
+    from utils.zip_stream import iter_zip
+
+    if format not in ("zip", "shards"):
+        raise HTTPException(status_code=400, detail="format moet 'zip' of 'shards' zijn")
+    if not 0 < train_split <= 1:
+        raise HTTPException(status_code=400, detail="train_split moet tussen 0 en 1 liggen")
+
+    try:
+        # Hashen en snapshot/shards schrijven in een thread (zelfde helper als de dataset_export job)
+        export = await asyncio.to_thread(export_workplace_dataset, workplace_id, train_split,
+                                         since_export_id, format, image_size, register)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error during export: {str(e)}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
+    if format == "shards":
+        return {
+            "success": True,
+            "export_id": export['export_id'],
+            "export_path": export['export_path'],
+            "image_count": export['image_count'],
+            "class_distribution": export['class_distribution'],
+            "shards": export['shards']
+        }
+
+    # StreamingResponse draait deze (sync) generator in de threadpool
+    return StreamingResponse(
+        iter_zip(export['zip_entries']),
+        media_type='application/zip',
+        headers={"Content-Disposition": f"attachment; filename={export['export_name']}.zip"}
+    )
+
 
 if __name__ == "__main__":
     import uvicorn
@@ -2440,15 +2459,15 @@ if __name__ == "__main__":
     print("="*60)
     print("🚀 Werkplek Inspectie API")
     print("="*60)
-    print(f"Model pad: {MODEL_PATH}")
-    print(f"Model bestaat: {MODEL_PATH.exists()}")
+    print(f"Model pad: {active_model.model_path}")
+    print(f"Model bestaat: {active_model.model_path.exists()}")
     print("="*60)
 
     # PostgreSQL database - geen init nodig, schema bestaat al
     print("✅ Using existing PostgreSQL database")
 
     # Start backend met HTTPS
-    print(f"Starting backend with HTTPS on https://0.0.0.0:8000")
+    print("Starting backend with HTTPS on https://0.0.0.0:8000")
     uvicorn.run(
         app,
         host="0.0.0.0",
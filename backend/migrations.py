@@ -0,0 +1,1183 @@
+"""
+Schema migraties voor de analyses database
+Versioned migraties (bijgehouden in schema_migrations) plus een EXPLAIN-based
+verificatie dat de hot queries uit database.py hun index gebruiken.
+
+Gebruik:
+    python migrations.py status            # toon toegepaste / openstaande migraties
+    python migrations.py migrate           # pas openstaande migraties toe
+    python migrations.py verify [--rows N] # controleer index gebruik op testdata
+    python migrations.py backfill-metadata [--batch N]
+                                           # (her)vul gepromoveerde metadata kolommen
+    python migrations.py rebuild-rollup    # herbouw analyses_daily_rollup uit analyses
+    python migrations.py partitions        # maak komende maandpartities van analyses aan
+
+Index migraties gebruiken CREATE INDEX CONCURRENTLY zodat de analyses tabel
+tijdens het aanmaken beschikbaar blijft voor inspecties.
+"""
+
+import json
+import os
+import sys
+from datetime import date, datetime, timedelta, timezone
+import psycopg2
+from psycopg2.extras import RealDictCursor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+
+# ========================================
+# INDEX DEFINITIES
+# ========================================
+
+# (naam, tabel, definitie) - huidige index set, gebruikt door migraties en verify
+ANALYSES_INDEXES = [
+    # /api/history zonder filters: keyset ORDER BY timestamp DESC, id DESC op nog niet verplaatste foto's
+    ("idx_analyses_history_keyset", "analyses",
+     "(timestamp DESC, id DESC) WHERE image_path IS NOT NULL"),
+    # /api/history, statistieken en dataset stats per werkplek
+    ("idx_analyses_workplace_keyset", "analyses",
+     "(workplace_id, timestamp DESC, id DESC) WHERE image_path IS NOT NULL"),
+    # Filters op werkplek + model versie (history, dataset stats, model versies)
+    ("idx_analyses_workplace_version_ts", "analyses",
+     "(workplace_id, model_version, timestamp DESC)"),
+    # /api/history?status=OK|NOK
+    ("idx_analyses_result_ts", "analyses",
+     "(result, timestamp DESC)"),
+    # Beoordeelde analyses: accuracy tijdlijn, training candidates
+    ("idx_analyses_corrected_ts", "analyses",
+     "(timestamp DESC) WHERE user_correction IS NOT NULL"),
+    # Model fouten: training statistieken en fout types
+    ("idx_analyses_incorrect", "analyses",
+     "(workplace_id, model_version) WHERE user_correction IS NOT NULL AND is_correct = FALSE"),
+    # Write-behind journal replay / resolve
+    ("idx_analyses_provisional_id", "analyses",
+     "((metadata->>'provisional_id')) WHERE metadata ? 'provisional_id'"),
+    # Containment / key lookups in metadata (o.a. correction_notes)
+    ("idx_analyses_metadata_gin", "analyses",
+     "USING GIN (metadata)"),
+    # Delta sync: rijen toegevoegd of gecorrigeerd na de 'since' cursor
+    ("idx_analyses_updated_at", "analyses",
+     "(updated_at, id) WHERE updated_at IS NOT NULL"),
+    # Gepromoveerde metadata kolommen (versie 5)
+    ("idx_analyses_workplace_model_type", "analyses",
+     "(workplace_id, model_type)"),
+    ("idx_analyses_device_ts", "analyses",
+     "(device_id, timestamp DESC)"),
+    ("idx_analyses_missing_items_gin", "analyses",
+     "USING GIN (missing_items)"),
+]
+
+# Indexes uit migratie 1 die door de keyset varianten vervangen zijn
+_V1_HISTORY_INDEXES = [
+    ("idx_analyses_history_ts", "analyses",
+     "(timestamp DESC) WHERE image_path IS NOT NULL"),
+    ("idx_analyses_workplace_ts", "analyses",
+     "(workplace_id, timestamp DESC) WHERE image_path IS NOT NULL"),
+]
+
+_NEW_IN_V4 = {"idx_analyses_history_keyset", "idx_analyses_workplace_keyset", "idx_analyses_updated_at"}
+_NEW_IN_V7 = {"idx_analyses_workplace_model_type", "idx_analyses_device_ts", "idx_analyses_missing_items_gin"}
+
+RELATED_INDEXES = [
+    ("idx_models_workplace_active", "models", "(workplace_id, is_active)"),
+    ("idx_training_images_workplace", "training_images", "(workplace_id, created_at DESC)"),
+    ("idx_dataset_exports_workplace", "dataset_exports", "(workplace_id, exported_at DESC)"),
+]
+
+
+def _create_index_sql(name, table, definition, concurrently=True):
+    concurrent = "CONCURRENTLY " if concurrently else ""
+    return f"CREATE INDEX {concurrent}IF NOT EXISTS {name} ON {table} {definition}"
+
+
+# ========================================
+# DATA MIGRATIES
+# ========================================
+
+# Metadata velden die een eigen kolom hebben gekregen (versie 5)
+PROMOTED_METADATA_FIELDS = [
+    "model_type", "device_id", "detected_hamer", "detected_schaar",
+    "detected_sleutel", "total_detections", "missing_items"
+]
+
+
+def backfill_promoted_metadata(conn, batch_size=5000):
+    """
+    Vul de gepromoveerde kolommen vanuit metadata en haal de velden daar weg
+
+    Loopt in batches op id (keyset) met een commit per batch, zodat de tabel
+    beschikbaar blijft; opnieuw draaien is veilig (bestaande kolom waarden
+    winnen). analyses.skip_touch voorkomt dat delta sync alle rijen als
+    gewijzigd ziet.
+
+    Args:
+        conn: Database connectie (autocommit uit)
+        batch_size: Aantal rijen per transactie
+
+    Returns:
+        Aantal bijgewerkte rijen
+    """
+    last_id = 0
+    updated = 0
+
+    while True:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT MAX(id) AS max_id FROM (SELECT id FROM analyses WHERE id > %s ORDER BY id LIMIT %s) batch",
+                           (last_id, batch_size))
+            batch_max = cursor.fetchone()['max_id']
+            if batch_max is None:
+                break
+
+            cursor.execute("SET LOCAL analyses.skip_touch = 'on'")
+            cursor.execute("""
+                UPDATE analyses SET
+                    model_type = COALESCE(model_type, metadata->>'model_type'),
+                    device_id = COALESCE(device_id, metadata->>'device_id'),
+                    detected_hamer = COALESCE(detected_hamer, (metadata->>'detected_hamer')::numeric::integer),
+                    detected_schaar = COALESCE(detected_schaar, (metadata->>'detected_schaar')::numeric::integer),
+                    detected_sleutel = COALESCE(detected_sleutel, (metadata->>'detected_sleutel')::numeric::integer),
+                    total_detections = COALESCE(total_detections, (metadata->>'total_detections')::numeric::integer),
+                    missing_items = COALESCE(missing_items,
+                        CASE WHEN jsonb_typeof(metadata->'missing_items') = 'array'
+                             THEN ARRAY(SELECT jsonb_array_elements_text(metadata->'missing_items')) END),
+                    metadata = NULLIF(metadata - %s::text[], '{}'::jsonb)
+                WHERE id > %s AND id <= %s
+                AND metadata ?| %s::text[]
+            """, (PROMOTED_METADATA_FIELDS, last_id, batch_max, PROMOTED_METADATA_FIELDS))
+            updated += cursor.rowcount
+        conn.commit()
+
+        last_id = batch_max
+        print(f"  … backfill tot id {last_id} ({updated} rijen bijgewerkt)")
+
+    return updated
+
+
+def rebuild_analysis_rollup(conn):
+    """
+    Herbouw analyses_daily_rollup volledig uit analyses
+
+    Normaal houdt de trigger de rollup bij; dit is de backfill bij het
+    aanmaken en het herstel als de rollup ooit afwijkt. Draait in een
+    transactie met een SHARE ROW EXCLUSIVE lock op analyses: lezen blijft
+    mogelijk, schrijvers wachten tot de rollup klaar is (geen dubbele tellingen).
+
+    Args:
+        conn: Database connectie (autocommit uit)
+
+    Returns:
+        Aantal rollup rijen
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("LOCK TABLE analyses IN SHARE ROW EXCLUSIVE MODE")
+        cursor.execute("DELETE FROM analyses_daily_rollup")
+        cursor.execute("""
+            WITH per_prediction AS (
+                SELECT
+                    COALESCE(workplace_id, 0) AS workplace_id,
+                    COALESCE(model_version, '') AS model_version,
+                    timestamp::date AS day,
+                    COALESCE(result, '') AS result,
+                    COALESCE(model_prediction, '') AS prediction,
+                    COUNT(*) AS total,
+                    COALESCE(SUM(confidence), 0) AS confidence_sum,
+                    COUNT(confidence) AS confidence_count,
+                    COUNT(*) FILTER (WHERE user_correction IS NOT NULL) AS reviewed,
+                    COUNT(*) FILTER (WHERE user_correction IS NOT NULL AND is_correct) AS correct
+                FROM analyses
+                WHERE timestamp IS NOT NULL
+                GROUP BY 1, 2, 3, 4, 5
+            )
+            INSERT INTO analyses_daily_rollup
+                (workplace_id, model_version, day, result, total, confidence_sum,
+                 confidence_count, reviewed, correct, prediction_counts)
+            SELECT workplace_id, model_version, day, result,
+                   SUM(total), SUM(confidence_sum), SUM(confidence_count),
+                   SUM(reviewed), SUM(correct), jsonb_object_agg(prediction, total)
+            FROM per_prediction
+            GROUP BY workplace_id, model_version, day, result
+        """)
+        count = cursor.rowcount
+    conn.commit()
+
+    print(f"  … rollup herbouwd ({count} rijen)")
+    return count
+
+
+# ========================================
+# PARTITIONERING
+# ========================================
+
+# analyses is (vanaf migratie 10) per maand gepartitioneerd op timestamp:
+# analyses_pYYYY_MM bevat [1e van de maand, 1e van de volgende maand).
+# Rijen buiten de aangemaakte maanden komen in de default partitie.
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+DEFAULT_PARTITION = "analyses_default"
+
+# Rollup functies/triggers voor de gepartitioneerde tabel. Ten opzichte van
+# migratie 8: analyses.skip_rollup slaat de rollup (en vanaf migratie 15 de
+# tombstones) over wanneer rijen alleen tussen partities verhuizen (zie
+# create_month_partition).
+ROLLUP_FUNCTION_SQL = """
+    CREATE OR REPLACE FUNCTION analyses_rollup_add(r analyses, delta INTEGER) RETURNS void AS $$
+    DECLARE
+        prediction TEXT := COALESCE(r.model_prediction, '');
+        is_reviewed BOOLEAN := r.user_correction IS NOT NULL;
+    BEGIN
+        IF r."timestamp" IS NULL THEN
+            RETURN;
+        END IF;
+        INSERT INTO analyses_daily_rollup AS t
+            (workplace_id, model_version, day, result, total, confidence_sum,
+             confidence_count, reviewed, correct, prediction_counts)
+        VALUES (
+            COALESCE(r.workplace_id, 0), COALESCE(r.model_version, ''),
+            r."timestamp"::date, COALESCE(r.result, ''),
+            delta, delta * COALESCE(r.confidence, 0),
+            CASE WHEN r.confidence IS NULL THEN 0 ELSE delta END,
+            CASE WHEN is_reviewed THEN delta ELSE 0 END,
+            CASE WHEN is_reviewed AND r.is_correct THEN delta ELSE 0 END,
+            jsonb_build_object(prediction, delta)
+        )
+        ON CONFLICT (workplace_id, model_version, day, result) DO UPDATE SET
+            total = t.total + EXCLUDED.total,
+            confidence_sum = t.confidence_sum + EXCLUDED.confidence_sum,
+            confidence_count = t.confidence_count + EXCLUDED.confidence_count,
+            reviewed = t.reviewed + EXCLUDED.reviewed,
+            correct = t.correct + EXCLUDED.correct,
+            prediction_counts = t.prediction_counts || jsonb_build_object(
+                prediction, COALESCE((t.prediction_counts->>prediction)::bigint, 0) + delta);
+    END
+    $$ LANGUAGE plpgsql
+"""
+
+ROLLUP_TRIGGER_FUNCTION_SQL = """
+    CREATE OR REPLACE FUNCTION analyses_rollup_trigger() RETURNS trigger AS $$
+    BEGIN
+        IF current_setting('analyses.skip_rollup', true) = 'on' THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM analyses_rollup_add(OLD, -1);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM analyses_rollup_add(NEW, 1);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+"""
+
+ANALYSES_TRIGGERS_SQL = [
+    """
+    CREATE TRIGGER trg_analyses_updated_at
+    BEFORE INSERT OR UPDATE ON analyses
+    FOR EACH ROW EXECUTE FUNCTION analyses_touch_updated_at()
+    """,
+    """
+    CREATE TRIGGER trg_analyses_rollup
+    AFTER INSERT OR DELETE ON analyses
+    FOR EACH ROW EXECUTE FUNCTION analyses_rollup_trigger()
+    """,
+    """
+    CREATE TRIGGER trg_analyses_rollup_update
+    AFTER UPDATE OF timestamp, workplace_id, model_version, result, confidence,
+                    model_prediction, user_correction, is_correct ON analyses
+    FOR EACH ROW
+    WHEN ((OLD.timestamp, OLD.workplace_id, OLD.model_version, OLD.result, OLD.confidence,
+           OLD.model_prediction, OLD.user_correction IS NOT NULL, OLD.is_correct)
+          IS DISTINCT FROM
+          (NEW.timestamp, NEW.workplace_id, NEW.model_version, NEW.result, NEW.confidence,
+           NEW.model_prediction, NEW.user_correction IS NOT NULL, NEW.is_correct))
+    EXECUTE FUNCTION analyses_rollup_trigger()
+    """,
+]
+
+
+def month_start(value):
+    """Eerste dag van de maand van een date/datetime"""
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    """Eerste dag van de maand `count` maanden na `month`"""
+    years, index = divmod(month.month - 1 + count, 12)
+    return date(month.year + years, index + 1, 1)
+
+
+def partition_name(month):
+    return f"analyses_p{month:%Y_%m}"
+
+
+def is_partitioned(cursor):
+    """True als analyses een gepartitioneerde tabel is"""
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('analyses')")
+    row = cursor.fetchone()
+    return bool(row) and row['relkind'] == 'p'
+
+
+def list_partitions(cursor):
+    """Namen van de maandpartities van analyses (zonder default), oud naar nieuw"""
+    cursor.execute("""
+        SELECT child.relname AS name
+        FROM pg_inherits i
+        JOIN pg_class parent ON parent.oid = i.inhparent
+        JOIN pg_class child ON child.oid = i.inhrelid
+        WHERE parent.relname = 'analyses' AND child.relname LIKE 'analyses\\_p%'
+        ORDER BY child.relname
+    """)
+    return [row['name'] for row in cursor.fetchall()]
+
+
+def create_month_partition(cursor, month):
+    """
+    Maak de partitie voor een maand aan (no-op als die al bestaat)
+
+    Staan er al rijen voor die maand in de default partitie, dan worden die
+    eerst naar een losse tabel verplaatst die daarna als partitie wordt
+    gekoppeld; analyses.skip_rollup voorkomt dat de rollup die verhuizing telt
+    en dat de tombstone trigger (migratie 15) de rijen als verwijderd ziet.
+    Moet binnen een transactie draaien (SET LOCAL); de caller commit.
+
+    Returns:
+        True als de partitie is aangemaakt
+    """
+    name = partition_name(month)
+    start, end = month, add_months(month, 1)
+
+    cursor.execute("SELECT to_regclass(%s) IS NOT NULL AS present, to_regclass(%s) IS NOT NULL AS has_default",
+                   (name, DEFAULT_PARTITION))
+    row = cursor.fetchone()
+    if row['present']:
+        return False
+
+    pending = 0
+    if row['has_default']:
+        cursor.execute(f"SELECT COUNT(*) AS count FROM {DEFAULT_PARTITION} WHERE timestamp >= %s AND timestamp < %s",
+                       (start, end))
+        pending = cursor.fetchone()['count']
+
+    if not pending:
+        cursor.execute(f"CREATE TABLE {name} PARTITION OF analyses FOR VALUES FROM (%s) TO (%s)", (start, end))
+        return True
+
+    cursor.execute("SET LOCAL analyses.skip_rollup = 'on'")
+    cursor.execute(f"CREATE TABLE {name} (LIKE analyses INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cursor.execute(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= %s AND timestamp < %s
+            RETURNING *
+        )
+        INSERT INTO {name} SELECT * FROM moved
+    """, (start, end))
+    cursor.execute(f"ALTER TABLE analyses ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)", (start, end))
+    cursor.execute("SET LOCAL analyses.skip_rollup = 'off'")
+    print(f"  … {pending} rijen uit {DEFAULT_PARTITION} naar {name} verplaatst")
+    return True
+
+
+def ensure_partitions(cursor, months_ahead=PARTITION_MONTHS_AHEAD, start=None):
+    """
+    Zorg dat er partities zijn van `start` (default: deze maand) tot en met
+    `months_ahead` maanden vooruit
+
+    Returns:
+        List van aangemaakte partitie namen
+    """
+    current = month_start(date.today())
+    month = month_start(start) if start else current
+    created = []
+
+    while month <= add_months(current, months_ahead):
+        if create_month_partition(cursor, month):
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+
+    return created
+
+
+def partition_analyses_table(conn):
+    """
+    Zet analyses om naar een per maand (timestamp) gepartitioneerde tabel
+
+    Eenmalig en in een transactie onder een ACCESS EXCLUSIVE lock: de data wordt
+    gekopieerd, dus plan dit buiten productie-uren. Primary key wordt
+    (id, timestamp) (partitie sleutel moet in elke unique constraint), de id
+    sequence blijft behouden, en indexes, updated_at en rollup triggers worden
+    op de nieuwe tabel opnieuw aangemaakt. De rollup telt niet opnieuw.
+
+    Args:
+        conn: Database connectie (autocommit uit)
+    """
+    with conn.cursor() as cursor:
+        if is_partitioned(cursor):
+            print("  analyses is al gepartitioneerd")
+            return
+
+        cursor.execute("LOCK TABLE analyses IN ACCESS EXCLUSIVE MODE")
+        cursor.execute("SELECT pg_get_serial_sequence('analyses', 'id') AS seq")
+        sequence = cursor.fetchone()['seq']
+
+        # Partitie sleutel mag niet NULL zijn
+        cursor.execute("UPDATE analyses SET timestamp = COALESCE(updated_at, CURRENT_TIMESTAMP) WHERE timestamp IS NULL")
+
+        cursor.execute("SELECT MIN(timestamp) AS first FROM analyses")
+        first = cursor.fetchone()['first']
+
+        cursor.execute("ALTER TABLE analyses RENAME TO analyses_unpartitioned")
+        cursor.execute("""
+            CREATE TABLE analyses (LIKE analyses_unpartitioned INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+            PARTITION BY RANGE (timestamp)
+        """)
+        created = ensure_partitions(cursor, start=first)
+        cursor.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF analyses DEFAULT")
+        print(f"  {len(created)} maandpartities aangemaakt")
+
+        # Nog geen triggers op de nieuwe tabel: updated_at en rollup blijven ongewijzigd
+        cursor.execute("INSERT INTO analyses SELECT * FROM analyses_unpartitioned")
+        print(f"  {cursor.rowcount} analyses gekopieerd")
+
+        if sequence:
+            cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY analyses.id")
+        cursor.execute("DROP FUNCTION IF EXISTS analyses_rollup_add(analyses_unpartitioned, integer)")
+        cursor.execute("DROP TABLE analyses_unpartitioned")
+
+        cursor.execute("ALTER TABLE analyses ALTER COLUMN timestamp SET NOT NULL")
+        cursor.execute("ALTER TABLE analyses ADD PRIMARY KEY (id, timestamp)")
+        for name, table, definition in ANALYSES_INDEXES:
+            cursor.execute(_create_index_sql(name, table, definition, concurrently=False))
+
+        cursor.execute(ROLLUP_FUNCTION_SQL)
+        cursor.execute(ROLLUP_TRIGGER_FUNCTION_SQL)
+        for statement in ANALYSES_TRIGGERS_SQL:
+            cursor.execute(statement)
+
+        cursor.execute("ANALYZE analyses")
+    conn.commit()
+
+
+# ========================================
+# MIGRATIES
+# ========================================
+
+# Elke migratie: version (oplopend), name, statements en concurrent.
+# concurrent=True: statements draaien buiten een transactie (autocommit),
+# nodig voor CREATE INDEX CONCURRENTLY. Anders: een transactie per migratie.
+MIGRATIONS = [
+    {
+        "version": 1,
+        "name": "analyses_hot_query_indexes",
+        "concurrent": True,
+        "statements": [_create_index_sql(name, table, definition)
+                       for name, table, definition in _V1_HISTORY_INDEXES + ANALYSES_INDEXES
+                       if name not in _NEW_IN_V4 | _NEW_IN_V7],
+    },
+    {
+        "version": 2,
+        "name": "related_table_indexes",
+        "concurrent": True,
+        "statements": [_create_index_sql(name, table, definition)
+                       for name, table, definition in RELATED_INDEXES],
+    },
+    {
+        # Delta sync: updated_at wordt bij elke INSERT/UPDATE door de database gezet
+        # (clock_timestamp, niet now(), zodat lange transacties geen oude tijd krijgen).
+        # Geen default: bestaande rijen houden NULL en tellen niet als gewijzigd.
+        "version": 3,
+        "name": "analyses_updated_at",
+        "concurrent": False,
+        "statements": [
+            "ALTER TABLE analyses ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ",
+            """
+            CREATE OR REPLACE FUNCTION analyses_touch_updated_at() RETURNS trigger AS $$
+            BEGIN
+                NEW.updated_at := clock_timestamp();
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS trg_analyses_updated_at ON analyses",
+            """
+            CREATE TRIGGER trg_analyses_updated_at
+            BEFORE INSERT OR UPDATE ON analyses
+            FOR EACH ROW EXECUTE FUNCTION analyses_touch_updated_at()
+            """,
+        ],
+    },
+    {
+        "version": 4,
+        "name": "analyses_keyset_and_delta_indexes",
+        "concurrent": True,
+        "statements": [_create_index_sql(name, table, definition)
+                       for name, table, definition in ANALYSES_INDEXES
+                       if name in _NEW_IN_V4] + [
+            f"DROP INDEX CONCURRENTLY IF EXISTS {name}" for name, _, _ in _V1_HISTORY_INDEXES
+        ],
+    },
+    {
+        # Hot metadata velden naar eigen kolommen (nullable: ADD COLUMN is direct,
+        # geen table rewrite). Trigger: onderhoudsjobs kunnen updated_at overslaan.
+        "version": 5,
+        "name": "analyses_promoted_metadata_columns",
+        "concurrent": False,
+        "statements": [
+            """
+            ALTER TABLE analyses
+                ADD COLUMN IF NOT EXISTS model_type TEXT,
+                ADD COLUMN IF NOT EXISTS device_id TEXT,
+                ADD COLUMN IF NOT EXISTS detected_hamer INTEGER,
+                ADD COLUMN IF NOT EXISTS detected_schaar INTEGER,
+                ADD COLUMN IF NOT EXISTS detected_sleutel INTEGER,
+                ADD COLUMN IF NOT EXISTS total_detections INTEGER,
+                ADD COLUMN IF NOT EXISTS missing_items TEXT[]
+            """,
+            """
+            CREATE OR REPLACE FUNCTION analyses_touch_updated_at() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'UPDATE' AND current_setting('analyses.skip_touch', true) = 'on' THEN
+                    RETURN NEW;
+                END IF;
+                NEW.updated_at := clock_timestamp();
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql
+            """,
+        ],
+    },
+    {
+        "version": 6,
+        "name": "analyses_backfill_promoted_metadata",
+        "concurrent": False,
+        "statements": [],
+        "run": backfill_promoted_metadata,
+    },
+    {
+        "version": 7,
+        "name": "analyses_promoted_metadata_indexes",
+        "concurrent": True,
+        "statements": [_create_index_sql(name, table, definition)
+                       for name, table, definition in ANALYSES_INDEXES
+                       if name in _NEW_IN_V7],
+    },
+    {
+        # Dagelijkse rollup voor statistieken / accuracy tijdlijn. Een rij per
+        # (werkplek, model versie, dag, resultaat); 0 / '' staan voor onbekend
+        # zodat de primary key geen NULLs bevat. De triggers werken de rollup
+        # bij in dezelfde transactie als save_analysis, update_correction,
+        # batch/COPY inserts en deletes.
+        "version": 8,
+        "name": "analyses_daily_rollup",
+        "concurrent": False,
+        "statements": [
+            """
+            CREATE TABLE IF NOT EXISTS analyses_daily_rollup (
+                workplace_id INTEGER NOT NULL,
+                model_version TEXT NOT NULL,
+                day DATE NOT NULL,
+                result TEXT NOT NULL,
+                total BIGINT NOT NULL DEFAULT 0,
+                confidence_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+                confidence_count BIGINT NOT NULL DEFAULT 0,
+                reviewed BIGINT NOT NULL DEFAULT 0,
+                correct BIGINT NOT NULL DEFAULT 0,
+                prediction_counts JSONB NOT NULL DEFAULT '{}'::jsonb,
+                PRIMARY KEY (workplace_id, model_version, day, result)
+            )
+            """,
+            """
+            CREATE OR REPLACE FUNCTION analyses_rollup_add(r analyses, delta INTEGER) RETURNS void AS $$
+            DECLARE
+                prediction TEXT := COALESCE(r.model_prediction, '');
+                is_reviewed BOOLEAN := r.user_correction IS NOT NULL;
+            BEGIN
+                IF r."timestamp" IS NULL THEN
+                    RETURN;
+                END IF;
+                INSERT INTO analyses_daily_rollup AS t
+                    (workplace_id, model_version, day, result, total, confidence_sum,
+                     confidence_count, reviewed, correct, prediction_counts)
+                VALUES (
+                    COALESCE(r.workplace_id, 0), COALESCE(r.model_version, ''),
+                    r."timestamp"::date, COALESCE(r.result, ''),
+                    delta, delta * COALESCE(r.confidence, 0),
+                    CASE WHEN r.confidence IS NULL THEN 0 ELSE delta END,
+                    CASE WHEN is_reviewed THEN delta ELSE 0 END,
+                    CASE WHEN is_reviewed AND r.is_correct THEN delta ELSE 0 END,
+                    jsonb_build_object(prediction, delta)
+                )
+                ON CONFLICT (workplace_id, model_version, day, result) DO UPDATE SET
+                    total = t.total + EXCLUDED.total,
+                    confidence_sum = t.confidence_sum + EXCLUDED.confidence_sum,
+                    confidence_count = t.confidence_count + EXCLUDED.confidence_count,
+                    reviewed = t.reviewed + EXCLUDED.reviewed,
+                    correct = t.correct + EXCLUDED.correct,
+                    prediction_counts = t.prediction_counts || jsonb_build_object(
+                        prediction, COALESCE((t.prediction_counts->>prediction)::bigint, 0) + delta);
+            END
+            $$ LANGUAGE plpgsql
+            """,
+            """
+            CREATE OR REPLACE FUNCTION analyses_rollup_trigger() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                    PERFORM analyses_rollup_add(OLD, -1);
+                END IF;
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                    PERFORM analyses_rollup_add(NEW, 1);
+                END IF;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS trg_analyses_rollup ON analyses",
+            """
+            CREATE TRIGGER trg_analyses_rollup
+            AFTER INSERT OR DELETE ON analyses
+            FOR EACH ROW EXECUTE FUNCTION analyses_rollup_trigger()
+            """,
+            "DROP TRIGGER IF EXISTS trg_analyses_rollup_update ON analyses",
+            # Alleen updates die de rollup raken (niet image_path, metadata, ...)
+            """
+            CREATE TRIGGER trg_analyses_rollup_update
+            AFTER UPDATE OF timestamp, workplace_id, model_version, result, confidence,
+                            model_prediction, user_correction, is_correct ON analyses
+            FOR EACH ROW
+            WHEN ((OLD.timestamp, OLD.workplace_id, OLD.model_version, OLD.result, OLD.confidence,
+                   OLD.model_prediction, OLD.user_correction IS NOT NULL, OLD.is_correct)
+                  IS DISTINCT FROM
+                  (NEW.timestamp, NEW.workplace_id, NEW.model_version, NEW.result, NEW.confidence,
+                   NEW.model_prediction, NEW.user_correction IS NOT NULL, NEW.is_correct))
+            EXECUTE FUNCTION analyses_rollup_trigger()
+            """,
+        ],
+    },
+    {
+        "version": 9,
+        "name": "analyses_daily_rollup_backfill",
+        "concurrent": False,
+        "statements": [],
+        "run": rebuild_analysis_rollup,
+    },
+    {
+        # Maandpartities + register van gearchiveerde maanden (analysis_archive.py)
+        "version": 10,
+        "name": "analyses_monthly_partitions",
+        "concurrent": False,
+        "statements": [
+            """
+            CREATE TABLE IF NOT EXISTS analyses_archive (
+                partition_name TEXT PRIMARY KEY,
+                range_start DATE NOT NULL,
+                range_end DATE NOT NULL,
+                parquet_path TEXT NOT NULL,
+                manifest_path TEXT NOT NULL,
+                row_count BIGINT NOT NULL,
+                archived_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ],
+        "run": partition_analyses_table,
+    },
+    {
+        # Snapshot exports (training_snapshots.py): manifest, content hash en
+        # de export waar een delta export op voortbouwt
+        "version": 11,
+        "name": "dataset_exports_snapshots",
+        "concurrent": False,
+        "statements": [
+            """
+            ALTER TABLE dataset_exports
+                ADD COLUMN IF NOT EXISTS manifest_path TEXT,
+                ADD COLUMN IF NOT EXISTS content_hash TEXT,
+                ADD COLUMN IF NOT EXISTS base_export_id INTEGER
+                    REFERENCES dataset_exports(id) ON DELETE SET NULL
+            """,
+        ],
+    },
+    {
+        # Background jobs (job_queue.py); claimen gaat via advisory locks
+        "version": 12,
+        "name": "jobs_queue",
+        "concurrent": False,
+        "statements": [
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id SERIAL PRIMARY KEY,
+                job_type TEXT NOT NULL,
+                params JSONB NOT NULL DEFAULT '{}'::jsonb,
+                status TEXT NOT NULL DEFAULT 'queued'
+                    CHECK (status IN ('queued', 'running', 'done', 'failed', 'cancelled')),
+                progress INTEGER NOT NULL DEFAULT 0,
+                message TEXT,
+                checkpoint JSONB,
+                result JSONB,
+                error TEXT,
+                cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                created_by TEXT,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                started_at TIMESTAMPTZ,
+                finished_at TIMESTAMPTZ,
+                updated_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_jobs_pending
+            ON jobs (job_type, id) WHERE status IN ('queued', 'running')
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs (created_at DESC)",
+        ],
+    },
+    {
+        # Optionele inspectie stages per werkplek (inspection_pipeline.py),
+        # bijv. {"roi": true, "tiling": {"grid": 3}, "cascade": {"min_confidence": 0.9}}
+        "version": 13,
+        "name": "workplaces_pipeline_stages",
+        "concurrent": False,
+        "statements": [
+            "ALTER TABLE workplaces ADD COLUMN IF NOT EXISTS pipeline_stages JSONB",
+        ],
+    },
+    {
+        # Delta sync tombstones: een verwijderde analyse laat een rij achter
+        # zodat clients hem bij de volgende sync ook lokaal weghalen.
+        # Gearchiveerde maanden (DETACH + DROP) vuren geen row triggers.
+        "version": 14,
+        "name": "analyses_tombstones",
+        "concurrent": False,
+        "statements": [
+            """
+            CREATE TABLE IF NOT EXISTS analyses_tombstones (
+                id INTEGER PRIMARY KEY,
+                workplace_id INTEGER,
+                model_version TEXT,
+                result TEXT,
+                deleted_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_analyses_tombstones_deleted ON analyses_tombstones (deleted_at, id)",
+            """
+            CREATE OR REPLACE FUNCTION analyses_tombstone_trigger() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO analyses_tombstones (id, workplace_id, model_version, result, deleted_at)
+                VALUES (OLD.id, OLD.workplace_id, OLD.model_version, OLD.result, clock_timestamp())
+                ON CONFLICT (id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS trg_analyses_tombstone ON analyses",
+            """
+            CREATE TRIGGER trg_analyses_tombstone
+            AFTER DELETE ON analyses
+            FOR EACH ROW EXECUTE FUNCTION analyses_tombstone_trigger()
+            """,
+        ],
+    },
+    {
+        # Rijen die alleen van partitie wisselen zijn niet verwijderd:
+        # create_month_partition zet analyses.skip_rollup, en een UPDATE van
+        # timestamp naar een andere maand (DELETE + INSERT) ruimt zijn eigen
+        # tombstone op bij de INSERT. Onterechte tombstones van voor deze
+        # migratie worden verwijderd.
+        "version": 15,
+        "name": "analyses_tombstones_partition_moves",
+        "concurrent": False,
+        "statements": [
+            """
+            CREATE OR REPLACE FUNCTION analyses_tombstone_trigger() RETURNS trigger AS $$
+            BEGIN
+                IF current_setting('analyses.skip_rollup', true) = 'on' THEN
+                    RETURN NULL;
+                END IF;
+                IF TG_OP = 'INSERT' THEN
+                    DELETE FROM analyses_tombstones WHERE id = NEW.id;
+                    RETURN NULL;
+                END IF;
+                INSERT INTO analyses_tombstones (id, workplace_id, model_version, result, deleted_at)
+                VALUES (OLD.id, OLD.workplace_id, OLD.model_version, OLD.result, clock_timestamp())
+                ON CONFLICT (id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS trg_analyses_tombstone ON analyses",
+            """
+            CREATE TRIGGER trg_analyses_tombstone
+            AFTER INSERT OR DELETE ON analyses
+            FOR EACH ROW EXECUTE FUNCTION analyses_tombstone_trigger()
+            """,
+            "DELETE FROM analyses_tombstones t USING analyses a WHERE a.id = t.id",
+        ],
+    },
+    {
+        # Werkplek cache invalidatie tussen processen (cache_listener.py): elke
+        # wijziging van workplaces of models stuurt bij commit een NOTIFY
+        "version": 16,
+        "name": "workplace_cache_notify",
+        "concurrent": False,
+        "statements": [
+            """
+            CREATE OR REPLACE FUNCTION workplace_cache_notify() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_notify('workplace_cache', TG_TABLE_NAME);
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+            """,
+            "DROP TRIGGER IF EXISTS trg_workplaces_cache_notify ON workplaces",
+            """
+            CREATE TRIGGER trg_workplaces_cache_notify
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON workplaces
+            FOR EACH STATEMENT EXECUTE FUNCTION workplace_cache_notify()
+            """,
+            "DROP TRIGGER IF EXISTS trg_models_cache_notify ON models",
+            """
+            CREATE TRIGGER trg_models_cache_notify
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON models
+            FOR EACH STATEMENT EXECUTE FUNCTION workplace_cache_notify()
+            """,
+        ],
+    },
+]
+
+
+def get_connection():
+    """Losse connectie voor migraties (buiten de pool, autocommit instelbaar)"""
+    return psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+
+
+def _ensure_migrations_table(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+    conn.commit()
+
+
+def get_applied_versions(conn):
+    """Set van toegepaste migratie versies"""
+    _ensure_migrations_table(conn)
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT version FROM schema_migrations")
+        return {row['version'] for row in cursor.fetchall()}
+
+
+def _drop_invalid_index(cursor, statement):
+    """
+    Een afgebroken CREATE INDEX CONCURRENTLY laat een INVALID index achter
+    die IF NOT EXISTS blokkeert; ruim die eerst op.
+    """
+    parts = statement.split()
+    if "INDEX" not in parts or "EXISTS" not in parts:
+        return
+    index_name = parts[parts.index("EXISTS") + 1]
+    cursor.execute("""
+        SELECT 1 FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE c.relname = %s AND NOT i.indisvalid
+    """, (index_name,))
+    if cursor.fetchone():
+        print(f"  ⚠️ Ongeldige index {index_name} gevonden, opnieuw aanmaken")
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {index_name}")
+
+
+def apply_migration(conn, migration):
+    """Pas een enkele migratie toe en registreer hem in schema_migrations"""
+    print(f"→ Migratie {migration['version']}: {migration['name']}")
+
+    if migration.get("concurrent"):
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                for statement in migration["statements"]:
+                    if statement.startswith("CREATE INDEX CONCURRENTLY"):
+                        _drop_invalid_index(cursor, statement)
+                    print(f"  {statement}")
+                    cursor.execute(statement)
+                cursor.execute("""
+                    INSERT INTO schema_migrations (version, name) VALUES (%s, %s)
+                    ON CONFLICT (version) DO NOTHING
+                """, (migration["version"], migration["name"]))
+        finally:
+            conn.autocommit = False
+        return
+
+    try:
+        # Data migratie: beheert zelf zijn transacties (batches)
+        if migration.get("run"):
+            migration["run"](conn)
+
+        with conn.cursor() as cursor:
+            for statement in migration["statements"]:
+                print(f"  {statement.strip().splitlines()[0]}")
+                cursor.execute(statement)
+            cursor.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                           (migration["version"], migration["name"]))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def migrate(target=None):
+    """
+    Pas alle openstaande migraties toe (tot en met target versie)
+
+    Returns:
+        List van toegepaste versies
+    """
+    conn = get_connection()
+    applied = []
+    try:
+        done = get_applied_versions(conn)
+        for migration in sorted(MIGRATIONS, key=lambda m: m["version"]):
+            if migration["version"] in done:
+                continue
+            if target is not None and migration["version"] > target:
+                break
+            apply_migration(conn, migration)
+            applied.append(migration["version"])
+    finally:
+        conn.close()
+
+    print(f"✅ {len(applied)} migratie(s) toegepast" if applied else "✅ Database is up-to-date")
+    return applied
+
+
+def status():
+    """Print toegepaste en openstaande migraties"""
+    conn = get_connection()
+    try:
+        done = get_applied_versions(conn)
+    finally:
+        conn.close()
+
+    for migration in sorted(MIGRATIONS, key=lambda m: m["version"]):
+        marker = "✅" if migration["version"] in done else "⏳"
+        print(f"{marker} {migration['version']:>3}  {migration['name']}")
+
+
+# ========================================
+# EXPLAIN VERIFICATIE
+# ========================================
+
+def _verify_checks():
+    """
+    (omschrijving, verwachte index, query, params) voor de hot queries
+
+    Queries komen waar mogelijk uit dezelfde builders als database.py zodat de
+    verificatie meebeweegt met de code.
+    """
+    from database import (_history_query, _history_changes_query, PROVISIONAL_ID_LOOKUP_QUERY,
+                          _training_dataset_stats_query, _training_candidates_query)
+
+    checks = []
+
+    query, params = _history_query(100, 0)
+    checks.append(("history (geen filter)", "idx_analyses_history_keyset", query, params))
+
+    query, params = _history_query(100, 0, workplace_id=3)
+    checks.append(("history per werkplek", "idx_analyses_workplace_keyset", query, params))
+
+    query, params = _history_query(100, 0, workplace_id=3,
+                                   after=(datetime.now() - timedelta(days=30), 10**9))
+    checks.append(("history keyset pagina per werkplek", "idx_analyses_workplace_keyset", query, params))
+
+    query, params = _history_changes_query((datetime.now(timezone.utc) - timedelta(minutes=5), 0), 500)
+    checks.append(("history delta sync", "idx_analyses_updated_at", query, params))
+
+    query, params = _history_query(100, 0, workplace_id=3, model_version="v2")
+    checks.append(("history per werkplek + model", "idx_analyses_workplace_version_ts", query, params))
+
+    query, params = _history_query(100, 0, status="NOK")
+    checks.append(("history per status", "idx_analyses_result_ts", query, params))
+
+    query, params = _training_dataset_stats_query(3, "v2")
+    checks.append(("dataset stats per werkplek + model", "idx_analyses_workplace_version_ts", query, params))
+
+    query, params = _training_candidates_query(70.0)
+    checks.append(("training candidates", "idx_analyses_corrected_ts", query, params))
+
+    checks.append(("training statistieken (model fouten)", "idx_analyses_incorrect", """
+        SELECT COUNT(*) as count FROM analyses
+        WHERE user_correction IS NOT NULL AND is_correct = FALSE
+    """, ()))
+
+    checks.append(("journal provisional_id lookup", "idx_analyses_provisional_id",
+                   PROVISIONAL_ID_LOOKUP_QUERY, (["p-42", "p-4242"],)))
+
+    checks.append(("metadata correction_notes (GIN)", "idx_analyses_metadata_gin", """
+        SELECT id FROM analyses WHERE metadata ? 'correction_notes'
+    """, ()))
+
+    checks.append(("analyses per apparaat", "idx_analyses_device_ts", """
+        SELECT * FROM analyses WHERE device_id = %s ORDER BY timestamp DESC LIMIT 100
+    """, ("device-7",)))
+
+    checks.append(("ontbrekend item (GIN)", "idx_analyses_missing_items_gin", """
+        SELECT id FROM analyses WHERE missing_items && %s::text[]
+    """, (["schaar"],)))
+
+    return checks
+
+
+def _plan_index_names(plan):
+    """Verzamel alle index namen uit een EXPLAIN (FORMAT JSON) plan"""
+    names = set()
+    if "Index Name" in plan:
+        names.add(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        names |= _plan_index_names(child)
+    return names
+
+
+def verify(rows=200000):
+    """
+    Controleer met EXPLAIN dat elke hot query zijn index gebruikt
+
+    Maakt een tijdelijke 'analyses' tabel (schaduwt de echte tabel binnen
+    deze sessie), vult die met gegenereerde data, maakt dezelfde indexes aan
+    en controleert per query het plan. Er wordt niets in de echte tabel
+    geschreven; de transactie wordt aan het einde teruggedraaid.
+
+    Args:
+        rows: Aantal te genereren analyses
+
+    Returns:
+        True als alle queries hun index gebruiken
+    """
+    conn = get_connection()
+    all_ok = True
+    try:
+        with conn.cursor() as cursor:
+            # LIKE zonder DEFAULTS: geen nextval op de echte id sequence
+            cursor.execute("CREATE TEMP TABLE analyses (LIKE public.analyses) ON COMMIT DROP")
+            cursor.execute("ALTER TABLE analyses ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ")
+            cursor.execute("""
+                ALTER TABLE analyses
+                    ADD COLUMN IF NOT EXISTS model_type TEXT,
+                    ADD COLUMN IF NOT EXISTS device_id TEXT,
+                    ADD COLUMN IF NOT EXISTS missing_items TEXT[]
+            """)
+            # Delta sync leest ook de tombstones (versie 14)
+            cursor.execute("""
+                CREATE TEMP TABLE analyses_tombstones (
+                    id INTEGER PRIMARY KEY, workplace_id INTEGER, model_version TEXT,
+                    result TEXT, deleted_at TIMESTAMPTZ NOT NULL
+                ) ON COMMIT DROP
+            """)
+            cursor.execute("CREATE INDEX ON analyses_tombstones (deleted_at, id)")
+
+            print(f"📦 {rows} test analyses genereren...")
+            cursor.execute("""
+                INSERT INTO analyses
+                    (id, workplace_id, user_id, timestamp, image_path, result, confidence,
+                     model_prediction, is_correct, processing_time, metadata, model_version,
+                     user_correction, updated_at, model_type, device_id, missing_items)
+                SELECT
+                    g,
+                    1 + (g %% 20),
+                    NULL,
+                    CURRENT_TIMESTAMP - (g || ' minutes')::interval,
+                    CASE WHEN g %% 20 = 0 THEN NULL ELSE 'data/uploads/test_' || g || '.jpg' END,
+                    CASE WHEN g %% 3 = 0 THEN 'NOK' ELSE 'OK' END,
+                    random(),
+                    CASE WHEN g %% 3 = 0 THEN 'hamer_ontbreekt' ELSE 'compleet' END,
+                    CASE WHEN g %% 10 = 0 THEN (g %% 30 <> 0) END,
+                    random(),
+                    CASE
+                        WHEN g %% 50 = 0 THEN jsonb_build_object(
+                            'provisional_id', 'p-' || g,
+                            'correction_notes', jsonb_build_object('missing_items', jsonb_build_array('hamer')))
+                        ELSE jsonb_build_object('provisional_id', 'p-' || g, 'model_type', 'detection')
+                    END,
+                    'v' || (1 + (g %% 5)),
+                    CASE WHEN g %% 10 = 0 THEN 'compleet' END,
+                    CASE WHEN g %% 10 = 0 THEN CURRENT_TIMESTAMP - (g || ' seconds')::interval END,
+                    CASE WHEN g %% 4 = 0 THEN 'detection' ELSE 'classification' END,
+                    'device-' || (g %% 200),
+                    CASE WHEN g %% 50 = 0 THEN ARRAY['schaar']
+                         WHEN g %% 3 = 0 THEN ARRAY['hamer'] ELSE ARRAY[]::text[] END
+                FROM generate_series(1, %s) AS g
+            """, (rows,))
+
+            for name, table, definition in ANALYSES_INDEXES:
+                cursor.execute(_create_index_sql(name, "analyses", definition, concurrently=False))
+            cursor.execute("ANALYZE analyses")
+
+            print("\n== EXPLAIN verificatie ==")
+            for description, expected_index, query, params in _verify_checks():
+                cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+                plan = cursor.fetchone()["QUERY PLAN"]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                used = _plan_index_names(plan[0]["Plan"])
+
+                ok = expected_index in used
+                all_ok = all_ok and ok
+                marker = "✅" if ok else "❌"
+                print(f"{marker} {description}: verwacht {expected_index}, gebruikt {sorted(used) or 'seq scan'}")
+    finally:
+        conn.rollback()
+        conn.close()
+
+    print("\n✅ Alle queries gebruiken hun index" if all_ok else "\n❌ Niet alle queries gebruiken hun index")
+    return all_ok
+
+
+if __name__ == "__main__":
+    # Fix Windows console encoding
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+
+    if command == "migrate":
+        target = int(sys.argv[2]) if len(sys.argv) > 2 else None
+        migrate(target)
+    elif command == "status":
+        status()
+    elif command == "backfill-metadata":
+        batch_size = 5000
+        if "--batch" in sys.argv:
+            batch_size = int(sys.argv[sys.argv.index("--batch") + 1])
+        conn = get_connection()
+        try:
+            count = backfill_promoted_metadata(conn, batch_size)
+        finally:
+            conn.close()
+        print(f"✅ {count} analyses bijgewerkt")
+    elif command == "partitions":
+        conn = get_connection()
+        try:
+            with conn.cursor() as cursor:
+                created = ensure_partitions(cursor) if is_partitioned(cursor) else []
+            conn.commit()
+        finally:
+            conn.close()
+        print(f"✅ {len(created)} partities aangemaakt: {', '.join(created) or '-'}")
+    elif command == "rebuild-rollup":
+        conn = get_connection()
+        try:
+            rebuild_analysis_rollup(conn)
+        finally:
+            conn.close()
+        print("✅ analyses_daily_rollup herbouwd")
+    elif command == "verify":
+        rows = 200000
+        if "--rows" in sys.argv:
+            rows = int(sys.argv[sys.argv.index("--rows") + 1])
+        sys.exit(0 if verify(rows) else 1)
+    else:
+        print(__doc__)
+        sys.exit(1)
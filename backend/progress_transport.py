@@ -0,0 +1,122 @@
+"""
+Progress transport tussen uvicorn workers via PostgreSQL LISTEN/NOTIFY
+Met meerdere workers kan /api/inspect op een ander proces draaien dan de
+SSE stream van dezelfde sessie. Elk progress event gaat daarom ook als
+NOTIFY naar alle processen (ook op andere hosts); de listener van elk proces
+levert het af aan zijn lokale progress broker. Het event formaat blijft
+gelijk aan utils/progress_broker.py.
+
+Versturen loopt via een queue en één sender task: de inspect request wacht
+niet op de database, de volgorde blijft behouden en events die kort na
+elkaar komen gaan in één round trip.
+"""
+
+import asyncio
+import json
+import os
+import socket
+import psycopg
+from dotenv import load_dotenv
+
+from database import DATABASE_URL
+
+load_dotenv()
+
+# "postgres" (standaard) of "local" (alleen binnen dit proces, één worker)
+PROGRESS_TRANSPORT = os.getenv("PROGRESS_TRANSPORT", "postgres")
+PROGRESS_CHANNEL = "inspect_progress"
+PROGRESS_RECONNECT_SECONDS = 2.0
+
+# Events die nog verstuurd moeten worden; bij een volle queue vervalt het event
+PROGRESS_SEND_QUEUE_SIZE = 1000
+
+
+class PostgresProgressTransport:
+    """Stuurt progress events via NOTIFY en levert ontvangen events af aan een broker"""
+
+    def __init__(self, broker, channel=PROGRESS_CHANNEL):
+        self.broker = broker
+        self.channel = channel
+        self.origin = f"{socket.gethostname()}:{os.getpid()}"
+        self._outbox = asyncio.Queue(PROGRESS_SEND_QUEUE_SIZE)
+        self._tasks = []
+        self._sent = 0
+        self._received = 0
+        self._dropped = 0
+        self._connected = False
+
+    async def start(self):
+        """Start listener en sender task"""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._listen()), asyncio.create_task(self._send_loop())]
+            print(f"📡 Progress transport: LISTEN {self.channel} ({self.origin})")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def send(self, session_id, event):
+        """Zet een lokaal gepubliceerd event klaar voor de andere processen"""
+        try:
+            self._outbox.put_nowait(json.dumps({'origin': self.origin, 'session_id': session_id, 'event': event}))
+        except asyncio.QueueFull:
+            self._dropped += 1
+
+    async def _send_loop(self):
+        from database_async import get_pool
+
+        while True:
+            payloads = [await self._outbox.get()]
+            while not self._outbox.empty():
+                payloads.append(self._outbox.get_nowait())
+            try:
+                pool = await get_pool()
+                async with pool.connection() as conn:
+                    # Eén transactie: NOTIFYs komen in deze volgorde aan
+                    await conn.execute("SELECT pg_notify(%s, payload) FROM unnest(%s::text[]) AS payload",
+                                       (self.channel, payloads))
+                self._sent += len(payloads)
+            except Exception as e:
+                self._dropped += len(payloads)
+                print(f"⚠️ Progress NOTIFY mislukt: {e}")
+
+    async def _listen(self):
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(DATABASE_URL, autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {self.channel}")
+                    self._connected = True
+                    async for notify in conn.notifies():
+                        message = json.loads(notify.payload)
+                        if message['origin'] == self.origin:
+                            continue
+                        self._received += 1
+                        self.broker.deliver(message['session_id'], message['event'])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Progress listener verbroken: {e}")
+            finally:
+                self._connected = False
+            await asyncio.sleep(PROGRESS_RECONNECT_SECONDS)
+
+    def stats(self):
+        return {
+            'transport': 'postgres',
+            'channel': self.channel,
+            'origin': self.origin,
+            'connected': self._connected,
+            'sent': self._sent,
+            'received': self._received,
+            'dropped': self._dropped,
+            'pending': self._outbox.qsize()
+        }
+
+
+def create_progress_transport(broker):
+    """Transport volgens PROGRESS_TRANSPORT, of None bij 'local'"""
+    if PROGRESS_TRANSPORT == "local":
+        return None
+    return PostgresProgressTransport(broker)
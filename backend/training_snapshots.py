@@ -0,0 +1,477 @@
+"""
+Content-addressed training snapshots
+Een export is een manifest van (content hash, label, split) per afbeelding
+plus een map met hardlinks naar een gedeelde object store
+(data/objects/ab/abcdef...). Elke afbeelding staat daardoor één keer op
+schijf, hoeveel exports er ook naar verwijzen. Een delta snapshot (t.o.v.
+een eerdere export) materialiseert alleen wat nieuw is of een ander label
+kreeg en vermeldt wat er verdwenen is.
+
+Hardlinks: foto's worden na opslaan niet meer aangepast, dus bron, object
+en snapshot mogen dezelfde inode delen. Op een ander filesystem (of zonder
+hardlink support) valt alles terug op een gewone kopie.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv()
+
+OBJECT_STORE_DIR = Path(os.getenv("OBJECT_STORE_DIR", "data/objects"))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+MANIFEST_NAME = "manifest.json"
+
+
+# ========================================
+# OBJECT STORE
+# ========================================
+
+class ObjectStore:
+    """
+    Bestanden op sha256, met een index (pad, grootte, mtime) -> hash zodat
+    ongewijzigde bronbestanden bij een volgende export niet opnieuw gelezen
+    hoeven te worden
+    """
+
+    def __init__(self, root=OBJECT_STORE_DIR):
+        self.root = Path(root)
+        self._index_path = self.root / "index.json"
+        self._index = None
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    def _load_index(self):
+        if self._index is None:
+            try:
+                self._index = json.loads(self._index_path.read_text(encoding="utf-8"))
+            except (FileNotFoundError, json.JSONDecodeError):
+                self._index = {}
+        return self._index
+
+    def save_index(self):
+        """Schrijf de hash index weg (atomisch) als er iets veranderd is"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._index_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(self._index), encoding="utf-8")
+            tmp_path.replace(self._index_path)
+            self._dirty = False
+
+    def object_path(self, digest):
+        return self.root / digest[:2] / digest
+
+    def digest(self, path):
+        """sha256 van een bestand (uit de index als grootte en mtime gelijk zijn)"""
+        path = Path(path)
+        stat = path.stat()
+        key = str(path.resolve())
+
+        with self._lock:
+            cached = self._load_index().get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(HASH_CHUNK_SIZE)
+                if not chunk:
+                    break
+                sha.update(chunk)
+        digest = sha.hexdigest()
+
+        with self._lock:
+            self._load_index()[key] = [stat.st_size, stat.st_mtime_ns, digest]
+            self._dirty = True
+        return digest
+
+    def put(self, path):
+        """
+        Zet een bestand in de store (hardlink, anders kopie)
+
+        Args:
+            path: Bronbestand
+
+        Returns:
+            sha256 hex digest
+        """
+        digest = self.digest(path)
+        target = self.object_path(digest)
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = target.with_name(f"{digest}.{os.getpid()}.{threading.get_ident()}.tmp")
+            link_or_copy(path, tmp_path)
+            os.replace(tmp_path, target)
+        return digest
+
+
+def link_or_copy(source, dest):
+    """Hardlink source naar dest; kopie als hardlinken niet kan (ander device e.d.)"""
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copy2(source, dest)
+
+
+object_store = ObjectStore()
+
+
+# ========================================
+# SNAPSHOTS
+# ========================================
+
+def stratified_split(entries, train_split):
+    """
+    Deterministische train/val split per class op basis van de content hash
+
+    Per label worden de entries op sha256 gesorteerd; de eerste
+    round(n * train_split) gaan naar train. Dezelfde set geeft dus altijd
+    dezelfde split, elke class zit in dezelfde verhouding in train en val, en
+    een nieuwe image verschuift hooguit een grensgeval van split.
+
+    Args:
+        entries: Manifest entries (met sha256 en label); split wordt gezet
+        train_split: Aandeel train (0.8 = 80% train, 20% val)
+    """
+    by_label = {}
+    for entry in entries:
+        by_label.setdefault(str(entry['label']), []).append(entry)
+
+    for group in by_label.values():
+        group.sort(key=lambda e: e['sha256'])
+        train_count = round(len(group) * train_split)
+        # Minstens een val image per class zodra er een val split gevraagd is
+        if train_split < 1 and len(group) > 1:
+            train_count = min(train_count, len(group) - 1)
+        for index, entry in enumerate(group):
+            entry['split'] = "train" if index < train_count else "val"
+
+
+def load_manifest(snapshot_path):
+    """Lees het manifest van een snapshot (map of manifest.json pad), of None"""
+    path = Path(snapshot_path)
+    if path.is_dir():
+        path = path / MANIFEST_NAME
+    if not path.is_file():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _content_hash(entries):
+    """Hash over (sha256, label, split) van alle entries, onafhankelijk van volgorde"""
+    lines = sorted(f"{e['sha256']}\t{e['label']}\t{e['split']}" for e in entries)
+    return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+def build_manifest(items, train_split=0.8, base_manifest=None, base_export_id=None, store=None):
+    """
+    Hash alle bronbestanden, zet ze in de object store en bouw het manifest
+
+    Args:
+        items: Iterable van dicts met file (relatief pad in de snapshot),
+               source (bronbestand) en label; overige sleutels (image_id,
+               class_id, ...) gaan ongewijzigd mee in de manifest entry
+        train_split: Aandeel train (zie stratified_split)
+        base_manifest: Manifest van een eerdere export voor delta mode
+        base_export_id: ID van die export (alleen ter vermelding)
+        store: ObjectStore (standaard de gedeelde store)
+
+    Returns:
+        Manifest dict; entries bevat altijd de volledige set, bij delta mode
+        staat in delta welke files nieuw/herlabeld zijn en wat verwijderd is
+    """
+    store = store or object_store
+    entries = []
+    seen_files = set()
+
+    for item in items:
+        source = Path(item['source'])
+        if item['file'] in seen_files or not source.is_file():
+            continue
+        seen_files.add(item['file'])
+
+        digest = store.put(source)
+        entry = {key: value for key, value in item.items() if key != 'source'}
+        entry.update({
+            'sha256': digest,
+            'label': item.get('label'),
+        })
+        entries.append(entry)
+
+    store.save_index()
+    stratified_split(entries, train_split)
+
+    class_distribution = {}
+    for entry in entries:
+        label = str(entry['label'])
+        class_distribution[label] = class_distribution.get(label, 0) + 1
+
+    manifest = {
+        'created_at': datetime.now().isoformat(),
+        'train_split': train_split,
+        'image_count': len(entries),
+        'content_hash': _content_hash(entries),
+        'class_distribution': class_distribution,
+        'entries': entries,
+        'delta': None,
+    }
+
+    if base_manifest is not None:
+        base_labels = {e['sha256']: e['label'] for e in base_manifest.get('entries', [])}
+        current = {e['sha256'] for e in entries}
+        manifest['delta'] = {
+            'base_export_id': base_export_id,
+            'base_content_hash': base_manifest.get('content_hash'),
+            'added': [e['file'] for e in entries if e['sha256'] not in base_labels],
+            'relabeled': [e['file'] for e in entries
+                          if e['sha256'] in base_labels and base_labels[e['sha256']] != e['label']],
+            'removed': [{'sha256': e['sha256'], 'label': e['label'], 'file': e['file']}
+                        for e in base_manifest.get('entries', []) if e['sha256'] not in current],
+        }
+
+    return manifest
+
+
+def delta_files(manifest):
+    """Files die een snapshot moet bevatten: alles, of bij delta alleen nieuw + herlabeld"""
+    if manifest.get('delta') is None:
+        return [entry['file'] for entry in manifest['entries']]
+    return manifest['delta']['added'] + manifest['delta']['relabeled']
+
+
+def write_snapshot(snapshot_dir, manifest, store=None, materialize=True):
+    """
+    Materialiseer een snapshot: hardlinks uit de object store + manifest.json
+
+    Args:
+        snapshot_dir: Doelmap
+        manifest: Manifest uit build_manifest
+        store: ObjectStore (standaard de gedeelde store)
+        materialize: False = alleen manifest.json (bijv. naast tar shards)
+
+    Returns:
+        Pad naar manifest.json
+    """
+    store = store or object_store
+    snapshot_dir = Path(snapshot_dir)
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+
+    by_file = {entry['file']: entry for entry in manifest['entries']}
+    for file in (delta_files(manifest) if materialize else []):
+        dest = snapshot_dir / file
+        if dest.exists():
+            continue
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        link_or_copy(store.object_path(by_file[file]['sha256']), dest)
+
+    manifest_path = snapshot_dir / MANIFEST_NAME
+    manifest_path.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    delta = manifest.get('delta')
+    if delta is None:
+        print(f"📦 Snapshot {snapshot_dir}: {manifest['image_count']} images")
+    else:
+        print(f"📦 Delta snapshot {snapshot_dir}: +{len(delta['added'])} nieuw, "
+              f"{len(delta['relabeled'])} herlabeld, -{len(delta['removed'])} verwijderd")
+    return manifest_path
+
+
+# ========================================
+# DATASET README
+# ========================================
+
+def dataset_readme(workplace, total_exported, label_counts):
+    """README.md voor een dataset export (alleen images, annotatie buiten de app)"""
+    return f"""# Training Dataset - {workplace['name']}
+
+## Dataset Informatie
+
+- **Werkplek:** {workplace['name']}
+- **Beschrijving:** {workplace['description'] or 'Geen beschrijving'}
+- **Items:** {', '.join(workplace['items'])}
+- **Totaal Images:** {total_exported}
+- **Gegenereerd:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+
+## Label Distributie (ter info)
+
+{chr(10).join([f"- **{label}**: {count} images" for label, count in sorted(label_counts.items())])}
+
+## Structuur
+
+```
+dataset/
+├── README.md
+├── manifest.json   (bestand -> label, class_id, bron)
+└── images/
+    ├── inspect_20251226_180127.jpg
+    ├── inspect_20251226_203702.jpg
+    └── ...
+```
+
+## Annotatie Workflow
+
+Deze export bevat **alleen images** zonder annotaties.
+De images zijn klaar voor:
+1. Import in Label Studio of andere annotatie tool
+2. Handmatige bounding box annotatie
+3. Export naar YOLO detection format
+4. Training van object detection model
+
+## Volgende Stappen
+
+1. Upload images naar je annotatie tool (bijv. Label Studio)
+2. Annoteer objecten met bounding boxes:
+   - hamer (class 0)
+   - schaar (class 1)
+   - sleutel (class 2)
+3. Exporteer annotaties in YOLO detection format
+4. Train model met YOLOv8/v11 detection
+
+```python
+from ultralytics import YOLO
+
+# Load detection model
+model = YOLO('yolo11n.pt')  # pretrained detection model
+
+# Train (na annotatie)
+results = model.train(
+    data='path/to/data.yaml',  # YOLO config met annotaties
+    epochs=100,
+    imgsz=640,
+    batch=16,
+    name='werkplek_detector'
+)
+```
+
+## Download Trained Model
+
+Na training, download het beste model:
+- `runs/classify/werkplek_classifier/weights/best.pt`
+
+Upload dit bestand in het Admin Dashboard onder "Modellen".
+"""
+
+
+# ========================================
+# DATASET EXPORT
+# ========================================
+
+EXPORTS_DIR = Path("data/exports")
+
+
+def export_workplace_dataset(workplace_id, train_split=0.8, since_export_id=None, export_format="zip",
+                             image_size=None, register=True, progress=None):
+    """
+    Dataset export van een werkplek als snapshot (endpoint en dataset_export job)
+
+    format=zip: de snapshot komt (alleen bij register) in data/exports, de
+    ZIP inhoud wordt als zip_entries teruggegeven (naam, bytes of pad) voor
+    utils.zip_stream.iter_zip; met since_export_id alleen de delta.
+    format=shards: manifest in data/exports/<export> en de volledige set als
+    tar shards in de shards map (dataset_shards.py).
+
+    Args:
+        workplace_id: ID van werkplek
+        train_split: Percentage voor training (0.8 = 80% train, 20% val)
+        since_export_id: Alleen de delta t.o.v. deze (geregistreerde) export
+        export_format: zip of shards
+        image_size: Maximale zijde in pixels voor shards (None = origineel)
+        register: Registreer de export in dataset_exports
+        progress: Optioneel callable(percentage, bericht)
+
+    Raises:
+        LookupError: Werkplek of basis export niet gevonden
+        ValueError: Geen training images, of basis export zonder manifest
+
+    Returns:
+        Dict met export_id, export_name, export_path, image_count,
+        class_distribution, content_hash en zip_entries of shards
+    """
+    from database import get_workplace, get_training_images, get_dataset_export, register_dataset_export
+    from dataset_shards import write_shards
+
+    progress = progress or (lambda percentage, message: None)
+
+    workplace = get_workplace(workplace_id)
+    if not workplace:
+        raise LookupError("Werkplek niet gevonden")
+
+    base_manifest = None
+    if since_export_id is not None:
+        base_export = get_dataset_export(since_export_id)
+        if not base_export or base_export['workplace_id'] != workplace_id:
+            raise LookupError("Basis export niet gevonden")
+        base_manifest = load_manifest(base_export.get('manifest_path') or base_export['export_path'])
+        if base_manifest is None:
+            raise ValueError("Basis export heeft geen snapshot manifest")
+
+    progress(5, "Training images ophalen")
+    images = get_training_images(workplace_id, validated_only=False)
+    if not images:
+        raise ValueError("Geen training images gevonden")
+
+    # Alleen images (zonder classificatie structuur); dubbele namen een keer.
+    # Hashen via de index: alleen nieuwe/gewijzigde bestanden worden gelezen
+    progress(10, f"{len(images)} images hashen")
+    manifest = build_manifest([{
+        "file": f"images/{Path(img['image_path']).name}",
+        "source": img['image_path'],
+        "image_id": img.get('id'),
+        "label": img.get('label'),
+        "class_id": img.get('class_id'),
+        "source_type": img.get('source')
+    } for img in images], train_split, base_manifest, since_export_id)
+    manifest.update({"workplace_id": workplace_id, "workplace": workplace['name']})
+
+    export_name = f"dataset_{workplace['name'].replace(' ', '_')}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    snapshot_dir = EXPORTS_DIR / export_name
+    export = {
+        "export_id": None,
+        "export_name": export_name,
+        "export_path": str(snapshot_dir),
+        "image_count": manifest['image_count'],
+        "class_distribution": manifest['class_distribution'],
+        "content_hash": manifest['content_hash']
+    }
+
+    manifest_path = None
+    if export_format == "shards":
+        # Shards bevatten de volledige set; de snapshot map krijgt alleen het manifest
+        progress(40, "Tar shards schrijven")
+        manifest_path = write_snapshot(snapshot_dir, manifest, materialize=False)
+        export["shards"] = write_shards(manifest, snapshot_dir / "shards", image_size)
+        notes = "Tar shards"
+    else:
+        if register:
+            progress(40, "Snapshot schrijven")
+            manifest_path = write_snapshot(snapshot_dir, manifest)
+        files = delta_files(manifest)
+        sources = {entry['file']: entry['sha256'] for entry in manifest['entries']}
+        export["zip_entries"] = [
+            ("README.md", dataset_readme(workplace, len(files), manifest['class_distribution'])),
+            ("manifest.json", json.dumps(manifest, indent=2, ensure_ascii=False)),
+        ] + [(file, object_store.object_path(sources[file])) for file in files]
+        notes = f"Delta t.o.v. export {since_export_id}" if since_export_id is not None else None
+
+    if register:
+        export["export_id"] = register_dataset_export(
+            workplace_id=workplace_id,
+            export_path=str(snapshot_dir),
+            image_count=manifest['image_count'],
+            class_distribution=manifest['class_distribution'],
+            notes=notes,
+            manifest_path=str(manifest_path),
+            content_hash=manifest['content_hash'],
+            base_export_id=since_export_id
+        )
+    return export
@@ -0,0 +1,78 @@
+"""
+JSON Response Utility
+Snelle JSON serialisatie voor list endpoints (orjson indien beschikbaar)
+"""
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson is optioneel; stdlib json als fallback
+    orjson = None
+
+
+class RawJSON:
+    """
+    Al geserialiseerde JSON (bijv. json_agg uit PostgreSQL) die ongewijzigd
+    in een response wordt opgenomen in plaats van opnieuw te encoden
+    """
+
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text if isinstance(text, str) else text.decode("utf-8")
+
+
+def _default(value):
+    """Types die orjson/json niet zelf kennen"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    raise TypeError(f"Type {type(value).__name__} is niet JSON serialiseerbaar")
+
+
+def _dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps(content):
+    """
+    Serialiseer naar UTF-8 bytes
+
+    RawJSON waarden op het hoogste niveau van een dict worden letterlijk
+    ingevoegd, zodat een pagina uit json_agg niet geparsed en opnieuw
+    geëncodeerd hoeft te worden.
+
+    Args:
+        content: Dict/list/waarde om te serialiseren
+
+    Returns:
+        JSON als bytes
+    """
+    if isinstance(content, RawJSON):
+        return content.text.encode("utf-8")
+
+    if not isinstance(content, dict) or not any(isinstance(v, RawJSON) for v in content.values()):
+        return _dumps(content)
+
+    parts = []
+    for key, value in content.items():
+        encoded = value.text.encode("utf-8") if isinstance(value, RawJSON) else _dumps(value)
+        parts.append(_dumps(str(key)) + b":" + encoded)
+    return b"{" + b",".join(parts) + b"}"
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse die dumps() gebruikt (orjson + RawJSON fragmenten)"""
+
+    def render(self, content):
+        return dumps(content)
@@ -0,0 +1,166 @@
+"""
+Progress Broker Utility
+In-process pub/sub voor progress events per sessie. Publiceren zet het event
+direct in de asyncio queue van elke luisterende SSE client; wachtende clients
+kosten dus geen CPU. Per sessie wordt alleen het laatste event bewaard en
+sessies zonder luisteraar verlopen na een TTL, zodat het geheugengebruik
+begrensd blijft (ook als een client de SSE stream nooit opent).
+
+Alleen te gebruiken vanaf de event loop (async endpoints).
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+# Sessie zonder luisteraar vervalt na zoveel seconden zonder events
+PROGRESS_TTL_SECONDS = 120.0
+
+# Harde bovengrens; de oudste sessies zonder luisteraar gaan er eerst uit
+PROGRESS_MAX_SESSIONS = 10000
+
+# Events per luisteraar in de wachtrij; bij een volle queue vervalt de oudste
+# (progress is oplopend, alleen het laatste event telt echt)
+PROGRESS_QUEUE_SIZE = 16
+
+
+class _Session:
+    __slots__ = ("latest", "subscribers", "touched")
+
+    def __init__(self):
+        self.latest = None
+        self.subscribers = set()
+        self.touched = time.monotonic()
+
+
+class ProgressBroker:
+    """Per sessie het laatste progress event plus de queues van de luisteraars"""
+
+    def __init__(self, ttl=PROGRESS_TTL_SECONDS, max_sessions=PROGRESS_MAX_SESSIONS,
+                 queue_size=PROGRESS_QUEUE_SIZE):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.queue_size = queue_size
+        self._sessions = OrderedDict()  # session_id -> _Session, oudste eerst
+        self._published = 0
+        self._expired = 0
+
+    def _session(self, session_id):
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _Session()
+        else:
+            session.touched = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def _expire(self):
+        """Verwijder verlopen sessies en sessies boven de limiet (zonder luisteraar)"""
+        now = time.monotonic()
+        excess = len(self._sessions) - self.max_sessions
+        expired = []
+
+        for session_id, session in self._sessions.items():
+            if excess <= 0 and now - session.touched < self.ttl:
+                break
+            if session.subscribers:
+                continue
+            expired.append(session_id)
+            excess -= 1
+
+        for session_id in expired:
+            del self._sessions[session_id]
+        self._expired += len(expired)
+
+    def publish(self, session_id, progress, message):
+        """
+        Publiceer een progress event (wakker maken van luisteraars, geen polling)
+
+        Args:
+            session_id: Sessie van de client
+            progress: Percentage 0-100 (100 = klaar)
+            message: Statusmelding
+
+        Returns:
+            Het event dict
+        """
+        event = {
+            'progress': progress,
+            'message': message,
+            'done': progress >= 100,
+            'timestamp': datetime.now().isoformat()
+        }
+        self.deliver(session_id, event)
+        return event
+
+    def deliver(self, session_id, event):
+        """
+        Lever een (elders gemaakt) event af aan de lokale luisteraars
+
+        Gebruikt door publish() en door een transport dat events van andere
+        processen doorgeeft.
+        """
+        session = self._session(session_id)
+        session.latest = event
+        for queue in session.subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+        self._published += 1
+        self._expire()
+
+    async def subscribe(self, session_id, timeout=60.0):
+        """
+        Async generator van progress events voor een sessie
+
+        Begint met het laatste bekende event (als de client later aansluit dan
+        de eerste publish) en stopt na het done event of na timeout seconden
+        (dan volgt een afsluitend Timeout event).
+
+        Args:
+            session_id: Sessie van de client
+            timeout: Maximale duur van de stream in seconden
+
+        Yields:
+            Event dicts (progress, message, done, timestamp)
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+
+        queue = asyncio.Queue(self.queue_size)
+        session = self._session(session_id)
+        session.subscribers.add(queue)
+        if session.latest is not None:
+            queue.put_nowait(session.latest)
+
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    yield {'progress': 100, 'message': 'Timeout', 'done': True}
+                    break
+
+                yield event
+                if event['done']:
+                    break
+        finally:
+            session.subscribers.discard(queue)
+            # Afgeronde sessie is afgeleverd: direct opruimen
+            if (not session.subscribers and session.latest is not None and session.latest['done']
+                    and self._sessions.get(session_id) is session):
+                del self._sessions[session_id]
+            self._expire()
+
+    def stats(self):
+        """Aantal sessies, luisteraars en events (voor debug endpoint)"""
+        return {
+            'sessions': len(self._sessions),
+            'subscribers': sum(len(session.subscribers) for session in self._sessions.values()),
+            'published': self._published,
+            'expired': self._expired,
+            'ttl': self.ttl,
+            'max_sessions': self.max_sessions
+        }
@@ -0,0 +1,94 @@
+"""
+TTL Cache Utility
+Kleine thread-safe in-memory cache met verlooptijd en invalidatie per namespace
+"""
+
+import threading
+import time
+
+
+class TTLCache:
+    """
+    In-memory cache waarbij elke entry na `ttl` seconden verloopt
+
+    Keys zijn tuples waarvan het eerste element de namespace is
+    (bijv. ('statistics', workplace_id, model_version, status)), zodat een
+    hele namespace in een keer geïnvalideerd kan worden.
+
+    Elke invalidatie verhoogt een generatie teller. Een waarde die berekend is
+    voor een invalidatie wordt via set(..., generation=...) niet meer opgeslagen,
+    zodat een trage query geen verouderde data in de cache kan zetten.
+    """
+
+    def __init__(self, ttl=5.0, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}  # key -> (expires_at, value)
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+
+    @property
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def get(self, key):
+        """Geef de gecachte waarde of None als die ontbreekt of verlopen is"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self._misses += 1
+                return None
+            self._hits += 1
+            return entry[1]
+
+    def set(self, key, value, generation=None):
+        """
+        Sla waarde op
+
+        Args:
+            key: Cache key (tuple met namespace als eerste element)
+            value: Te cachen waarde
+            generation: Generatie van voor de berekening; bij een tussentijdse
+                        invalidatie wordt de waarde niet opgeslagen
+        """
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            if len(self._entries) >= self.max_entries:
+                self._evict_expired()
+                if len(self._entries) >= self.max_entries:
+                    self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, *namespaces):
+        """Verwijder alle entries (of alleen die in de opgegeven namespaces)"""
+        with self._lock:
+            self._generation += 1
+            if not namespaces:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] in namespaces]:
+                del self._entries[key]
+
+    def stats(self):
+        """Hit/miss statistieken voor monitoring"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "generation": self._generation,
+                "ttl": self.ttl
+            }
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        for key in [k for k, (expires_at, _) in self._entries.items() if expires_at < now]:
+            del self._entries[key]
@@ -0,0 +1,77 @@
+"""
+Streaming ZIP Utility
+Bouwt een ZIP archief terwijl het verstuurd wordt: geen tijdelijke kopieën
+of ZIP op schijf. Foto's gaan als ZIP_STORED (JPEG is al gecomprimeerd),
+gegenereerde tekstbestanden als ZIP_DEFLATED.
+"""
+
+import zipfile
+from datetime import datetime
+from pathlib import Path
+
+ZIP_CHUNK_SIZE = 1024 * 1024
+
+
+class _StreamSink:
+    """Niet-seekable file-like waar zipfile in schrijft; bytes worden opgehaald via drain()"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+
+    def write(self, data):
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def iter_zip(entries, chunk_size=ZIP_CHUNK_SIZE):
+    """
+    Genereer een ZIP archief als stroom van bytes chunks
+
+    Args:
+        entries: Iterable van (arcname, bron); bron is een Path (bestand wordt
+                 in chunks gelezen, ZIP_STORED) of str/bytes (gegenereerde
+                 inhoud, ZIP_DEFLATED)
+        chunk_size: Leesgrootte voor bestanden
+
+    Yields:
+        Bytes chunks van het archief
+    """
+    sink = _StreamSink()
+
+    with zipfile.ZipFile(sink, mode="w") as archive:
+        for arcname, source in entries:
+            if isinstance(source, Path):
+                info = zipfile.ZipInfo.from_file(source, arcname)
+                info.compress_type = zipfile.ZIP_STORED
+                with open(source, "rb") as src, archive.open(info, "w") as dst:
+                    while True:
+                        chunk = src.read(chunk_size)
+                        if not chunk:
+                            break
+                        dst.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            else:
+                info = zipfile.ZipInfo(arcname, date_time=datetime.now().timetuple()[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                archive.writestr(info, source)
+            data = sink.drain()
+            if data:
+                yield data
+
+    # Central directory
+    yield sink.drain()